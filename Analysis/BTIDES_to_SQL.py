@@ -26,13 +26,15 @@ activate_venv()
 
 import argparse
 import json
+import multiprocessing
+import queue
+import zlib
 
 from jsonschema import validate, ValidationError
-from referencing import Registry, Resource
-from jsonschema import Draft202012Validator
 
 import TME.TME_glob
-from TME.TME_helpers import execute_query, execute_update, execute_insert, qprint, hex_str_to_bytes, hex_str_to_utf8
+import TME.TME_helpers
+from TME.TME_helpers import execute_query, execute_update, execute_insert, queue_insert, flush_all_insert_batches, record_bdaddr_presence, flush_bdaddr_presence, qprint, hex_str_to_bytes, hex_str_to_utf8
 from TME.TME_BTIDES_base import *
 from TME.TME_BTIDES_AdvData import *
 from TME.TME_UUID128 import add_dashes_to_UUID128
@@ -95,11 +97,11 @@ def import_AdvData_Flags(bdaddr, random, db_type, leaf):
         # EIR
         values = (bdaddr, le_limited_discoverable_mode, le_general_discoverable_mode, bredr_not_supported, le_bredr_support_controller, le_bredr_support_host)
         eir_insert = f"INSERT IGNORE INTO EIR_bdaddr_to_flags (bdaddr, le_limited_discoverable_mode, le_general_discoverable_mode, bredr_not_supported, le_bredr_support_controller, le_bredr_support_host) VALUES (%s, %s, %s, %s, %s, %s);"
-        execute_insert(eir_insert, values)
+        queue_insert(eir_insert, values)
     else:
         values = (bdaddr, random, le_evt_type, le_limited_discoverable_mode, le_general_discoverable_mode, bredr_not_supported, le_bredr_support_controller, le_bredr_support_host)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_flags (bdaddr, bdaddr_random, le_evt_type, le_limited_discoverable_mode, le_general_discoverable_mode, bredr_not_supported, le_bredr_support_controller, le_bredr_support_host) VALUES (%s, %s, %s, %s, %s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # types 0x02 & 0x03
@@ -113,11 +115,11 @@ def import_AdvData_UUID16s(bdaddr, random, db_type, leaf):
         # EIR
         values = (bdaddr, list_type, str_UUID16s)
         eir_insert = f"INSERT IGNORE INTO EIR_bdaddr_to_UUID16s (bdaddr, list_type, str_UUID16s) VALUES (%s, %s, %s);"
-        execute_insert(eir_insert, values)
+        queue_insert(eir_insert, values)
     else:
         values = (bdaddr, random, le_evt_type, list_type, str_UUID16s)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_UUID16s_list (bdaddr, bdaddr_random, le_evt_type, list_type, str_UUID16s) VALUES (%s, %s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # types 0x04 & 0x05
@@ -131,11 +133,11 @@ def import_AdvData_UUID32s(bdaddr, random, db_type, leaf):
         # EIR
         values = (bdaddr, list_type, str_UUID32s)
         eir_insert = f"INSERT IGNORE INTO EIR_bdaddr_to_UUID32s (bdaddr, list_type, str_UUID32s) VALUES (%s, %s, %s);"
-        execute_insert(eir_insert, values)
+        queue_insert(eir_insert, values)
     else:
         values = (bdaddr, random, le_evt_type, list_type, str_UUID32s)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_UUID32s_list (bdaddr, bdaddr_random, le_evt_type, list_type, str_UUID32s) VALUES (%s, %s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # types 0x06 & 0x07
@@ -153,11 +155,11 @@ def import_AdvData_UUID128s(bdaddr, random, db_type, leaf):
         # EIR
         values = (bdaddr, list_type, str_UUID128s)
         eir_insert = f"INSERT IGNORE INTO EIR_bdaddr_to_UUID128s (bdaddr, list_type, str_UUID128s) VALUES (%s, %s, %s);"
-        execute_insert(eir_insert, values)
+        queue_insert(eir_insert, values)
     else:
         values = (bdaddr, random, le_evt_type, list_type, str_UUID128s)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_UUID128s_list (bdaddr, bdaddr_random, le_evt_type, list_type, str_UUID128s) VALUES (%s, %s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # types 0x08 & 0x09 & 0x30
@@ -171,11 +173,11 @@ def import_AdvData_Names(bdaddr, random, db_type, leaf):
         # EIR
         values = (bdaddr, device_name_type, name_hex_str)
         eir_insert = f"INSERT IGNORE INTO EIR_bdaddr_to_name (bdaddr, device_name_type, name_hex_str) VALUES (%s, %s, %s);"
-        execute_insert(eir_insert, values)
+        queue_insert(eir_insert, values)
     else:
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_name (bdaddr, bdaddr_random, le_evt_type, device_name_type, name_hex_str) VALUES (%s, %s, %s, %s, %s);"
         values = (bdaddr, random, le_evt_type, device_name_type, name_hex_str)
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # type 0x0A
@@ -188,11 +190,11 @@ def import_AdvData_TxPower(bdaddr, random, db_type, leaf):
         # EIR
         values = (bdaddr, device_tx_power)
         eir_insert = f"INSERT IGNORE INTO EIR_bdaddr_to_tx_power (bdaddr, device_tx_power) VALUES (%s, %s);"
-        execute_insert(eir_insert, values)
+        queue_insert(eir_insert, values)
     else:
         values = (bdaddr, random, le_evt_type, device_tx_power)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_tx_power (bdaddr, bdaddr_random, le_evt_type, device_tx_power) VALUES (%s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # type 0x0D
@@ -206,11 +208,11 @@ def import_AdvData_ClassOfDevice(bdaddr, random, db_type, leaf):
         # EIR
         values = (bdaddr, CoD_int)
         eir_insert = f"INSERT IGNORE INTO EIR_bdaddr_to_CoD (bdaddr, class_of_device) VALUES (%s, %s);"
-        execute_insert(eir_insert, values)
+        queue_insert(eir_insert, values)
     else:
         values = (bdaddr, random, le_evt_type, CoD_int)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_CoD (bdaddr, bdaddr_random, le_evt_type, class_of_device) VALUES (%s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # type 0x10
@@ -226,7 +228,7 @@ def import_AdvData_DeviceID(bdaddr, db_type, leaf):
         # EIR
         values = (bdaddr, vendor_id_source, vendor_id, product_id, product_version)
         eir_insert = f"INSERT IGNORE INTO EIR_bdaddr_to_DevID (bdaddr, vendor_id_source, vendor_id, product_id, product_version) VALUES (%s, %s, %s, %s, %s);"
-        execute_insert(eir_insert, values)
+        queue_insert(eir_insert, values)
     # AFAIK this can't exist in LE AdvData, only EIR
 
 
@@ -245,7 +247,7 @@ def import_AdvData_PeripheralConnectionIntervalRange(bdaddr, random, db_type, le
     else:
         values = (bdaddr, random, le_evt_type, conn_interval_min, conn_interval_max)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_connect_interval (bdaddr, bdaddr_random, le_evt_type, interval_min, interval_max) VALUES (%s, %s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 # type 0x14
 def import_AdvData_UUID16ListServiceSolicit(bdaddr, random, db_type, leaf):
@@ -261,7 +263,7 @@ def import_AdvData_UUID16ListServiceSolicit(bdaddr, random, db_type, leaf):
         values = (bdaddr, random, le_evt_type, str_UUID16s)
 
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_UUID16_service_solicit (bdaddr, bdaddr_random, le_evt_type, str_UUID16s) VALUES (%s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 # type 0x15
 def import_AdvData_UUID128ListServiceSolicit(bdaddr, random, db_type, leaf):
@@ -281,7 +283,7 @@ def import_AdvData_UUID128ListServiceSolicit(bdaddr, random, db_type, leaf):
     else:
         values = (bdaddr, random, le_evt_type, str_UUID128s)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_UUID128_service_solicit (bdaddr, bdaddr_random, le_evt_type, str_UUID128s) VALUES (%s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # type 0x16
@@ -300,7 +302,7 @@ def import_AdvData_UUID16ServiceData(bdaddr, random, db_type, leaf):
     else:
         values = (bdaddr, random, le_evt_type, ACID_length, UUID16_hex_str, service_data_hex_str)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_UUID16_service_data (bdaddr, bdaddr_random, le_evt_type, ACID_length, UUID16_hex_str, service_data_hex_str) VALUES (%s, %s, %s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # type 0x17
@@ -316,7 +318,7 @@ def import_AdvData_PublicTargetAddress(bdaddr, random, db_type, leaf):
     else:
         values = (bdaddr, random, le_evt_type, public_bdaddr)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_public_target_bdaddr (bdaddr, bdaddr_random, le_evt_type, public_bdaddr) VALUES (%s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 # type 0x18
 def import_AdvData_RandomTargetAddress(bdaddr, random, db_type, leaf):
@@ -331,7 +333,7 @@ def import_AdvData_RandomTargetAddress(bdaddr, random, db_type, leaf):
     else:
         values = (bdaddr, random, le_evt_type, random_bdaddr)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_random_target_bdaddr (bdaddr, bdaddr_random, le_evt_type, random_bdaddr) VALUES (%s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # type 0x19
@@ -348,7 +350,7 @@ def import_AdvData_Appearance(bdaddr, random, db_type, leaf):
     else:
         values = (bdaddr, random, le_evt_type, appearance_int)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_appearance (bdaddr, bdaddr_random, le_evt_type, appearance) VALUES (%s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 # type 0x1B
 def import_AdvData_LE_BDADDR(bdaddr, random, db_type, leaf):
@@ -364,7 +366,7 @@ def import_AdvData_LE_BDADDR(bdaddr, random, db_type, leaf):
     else:
         values = (bdaddr, random, le_evt_type,le_bdaddr, bdaddr_type)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_other_le_bdaddr (bdaddr, bdaddr_random, le_evt_type, other_bdaddr, other_bdaddr_random) VALUES (%s, %s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # type 0x1C - According to the spec this should only occur in OOB data, but we've seen devices using it for OTA data
@@ -380,7 +382,7 @@ def import_AdvData_LE_Role(bdaddr, random, db_type, leaf):
     else:
         values = (bdaddr, random, le_evt_type, role)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_role (bdaddr, bdaddr_random, le_evt_type, role) VALUES (%s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # type 0x20
@@ -399,7 +401,7 @@ def import_AdvData_UUID32ServiceData(bdaddr, random, db_type, leaf):
     else:
         values = (bdaddr, random, le_evt_type, ACID_length, UUID32_hex_str, service_data_hex_str)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_UUID32_service_data (bdaddr, bdaddr_random, le_evt_type, ACID_length, UUID32_hex_str, service_data_hex_str) VALUES (%s, %s, %s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # type 0x21
@@ -418,7 +420,7 @@ def import_AdvData_UUID128ServiceData(bdaddr, random, db_type, leaf):
     else:
         values = (bdaddr, random, le_evt_type, ACID_length, UUID128_hex_str, service_data_hex_str)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_UUID128_service_data (bdaddr, bdaddr_random, le_evt_type, ACID_length, UUID128_hex_str, service_data_hex_str) VALUES (%s, %s, %s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # type 0x24
@@ -431,11 +433,11 @@ def import_AdvData_URI(bdaddr, random, db_type, leaf):
     if(db_type == 50):
         values = (bdaddr, uri_hex_str)
         le_insert = f"INSERT IGNORE INTO EIR_bdaddr_to_URI (bdaddr, uri_hex_str) VALUES (%s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
     else:
         values = (bdaddr, random, le_evt_type, uri_hex_str)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_URI (bdaddr, bdaddr_random, le_evt_type, uri_hex_str) VALUES (%s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # type 0x30
@@ -453,11 +455,11 @@ def import_AdvData_3DInfoData(bdaddr, random, db_type, leaf):
     if(db_type == 50):
         values = (bdaddr, byte1, path_loss)
         le_insert = f"INSERT IGNORE INTO EIR_bdaddr_to_3d_info (bdaddr, byte1, path_loss) VALUES (%s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
     else:
         values = (bdaddr, random, le_evt_type, byte1, path_loss)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_3d_info (bdaddr, bdaddr_random, le_evt_type, byte1, path_loss) VALUES (%s, %s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 # type 0xFF
@@ -472,11 +474,11 @@ def import_AdvData_MSD(bdaddr, random, db_type, leaf):
         # EIR
         values = (bdaddr, device_BT_CID, manufacturer_specific_data)
         eir_insert = f"INSERT IGNORE INTO EIR_bdaddr_to_MSD (bdaddr, device_BT_CID, manufacturer_specific_data) VALUES (%s, %s, %s);"
-        execute_insert(eir_insert, values)
+        queue_insert(eir_insert, values)
     else:
         values = (bdaddr, random, le_evt_type, device_BT_CID, manufacturer_specific_data)
         le_insert = f"INSERT IGNORE INTO LE_bdaddr_to_MSD (bdaddr, bdaddr_random, le_evt_type, device_BT_CID, manufacturer_specific_data) VALUES (%s, %s, %s, %s, %s);"
-        execute_insert(le_insert, values)
+        queue_insert(le_insert, values)
 
 
 def has_AdvDataArray(entry):
@@ -620,7 +622,7 @@ def import_LL_UNKNOWN_RSP(bdaddr, random, ll_entry):
     unknown_opcode = ll_entry["unknown_type"]
     values = (bdaddr, random, unknown_opcode)
     insert = f"INSERT IGNORE INTO LL_UNKNOWN_RSP (bdaddr, bdaddr_random, unknown_opcode) VALUES (%s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_LL_VERSION_IND(bdaddr, random, ll_entry):
@@ -629,7 +631,7 @@ def import_LL_VERSION_IND(bdaddr, random, ll_entry):
     ll_sub_version = ll_entry["subversion"]
     values = (bdaddr, random, ll_version, device_BT_CID, ll_sub_version)
     insert = f"INSERT IGNORE INTO LL_VERSION_IND (bdaddr, bdaddr_random, ll_version, device_BT_CID, ll_sub_version) VALUES (%s, %s, %s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 # This can be used for LL_FEATURE_REQ, LL_FEATURE_RSP, and LL_PERIPHERAL_FEATURE_REQ, since they're all going into the same table
@@ -638,7 +640,7 @@ def import_LL_FEATUREs(bdaddr, random, ll_entry):
     features = int(ll_entry["le_features_hex_str"], 16)
     values = (bdaddr, random, opcode, features)
     insert = f"INSERT IGNORE INTO LL_FEATUREs (bdaddr, bdaddr_random, opcode, features) VALUES (%s, %s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 # This can be used for LL_PING_REQ or LL_PING_RSP since they're all going into the same table
@@ -661,7 +663,7 @@ def import_LL_PINGs(bdaddr, random, ll_entry, entry):
             return
     values = (bdaddr, random, opcode, direction)
     insert = f"INSERT IGNORE INTO LL_PINGs (bdaddr, bdaddr_random, opcode, direction) VALUES (%s, %s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 # This can be used for LL_FEATURE_REQ, LL_FEATURE_RSP, and LL_PERIPHERAL_FEATURE_REQ, since they're all going into the same table
@@ -673,7 +675,7 @@ def import_LL_LENGTHs(bdaddr, random, ll_entry):
     max_tx_time = ll_entry["max_tx_time"]
     values = (bdaddr, random, opcode, max_rx_octets, max_rx_time, max_tx_octets, max_tx_time)
     insert = f"INSERT IGNORE INTO LL_LENGTHs (bdaddr, bdaddr_random, opcode, max_rx_octets, max_rx_time, max_tx_octets, max_tx_time) VALUES (%s, %s, %s, %s, %s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 # This can be used for LL_PHY_REQ, LL_PHY_RSP since they're all going into the same table
@@ -692,7 +694,7 @@ def import_LL_PHYs(bdaddr, random, ll_entry, entry):
     rx_phys = ll_entry["RX_PHYS"]
     values = (bdaddr, random, opcode, direction, tx_phys, rx_phys)
     insert = f"INSERT IGNORE INTO LL_PHYs (bdaddr, bdaddr_random, opcode, direction, tx_phys, rx_phys) VALUES (%s, %s, %s, %s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def has_known_LL_packet(opcode, ll_entry):
@@ -735,7 +737,7 @@ def parse_LLArray(entry):
 def import_LMP_NAME_RES_defragmented(bdaddr, name):
     values = (bdaddr, name)
     insert = f"INSERT IGNORE INTO LMP_NAME_RES_defragmented (bdaddr, device_name) VALUES (%s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_LMP_NAME_RES_fragmented(bdaddr, lmp_entry):
@@ -748,7 +750,7 @@ def import_LMP_NAME_RES_fragmented(bdaddr, lmp_entry):
     name_fragment_bytes = hex_str_to_bytes(lmp_entry["full_pkt_hex_str"][4:])
     values = (bdaddr, name_offset, name_total_length, name_fragment_bytes)
     insert = f"INSERT IGNORE INTO LMP_NAME_RES_fragmented (bdaddr, name_offset, name_total_length, name_fragment) VALUES (%s, %s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_LMP_ACCEPTED(bdaddr, lmp_entry):
@@ -759,7 +761,7 @@ def import_LMP_ACCEPTED(bdaddr, lmp_entry):
         rcvd_opcode = lmp_entry["rcvd_opcode"]
     values = (bdaddr, rcvd_opcode)
     insert = f"INSERT IGNORE INTO LMP_ACCEPTED (bdaddr, rcvd_opcode) VALUES (%s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_LMP_NOT_ACCEPTED(bdaddr, lmp_entry):
@@ -772,7 +774,7 @@ def import_LMP_NOT_ACCEPTED(bdaddr, lmp_entry):
         error_code = lmp_entry["error_code"]
     values = (bdaddr, rcvd_opcode, error_code)
     insert = f"INSERT IGNORE INTO LMP_NOT_ACCEPTED (bdaddr, rcvd_opcode, error_code) VALUES (%s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_LMP_ACCEPTED_EXT(bdaddr, lmp_entry):
@@ -785,7 +787,7 @@ def import_LMP_ACCEPTED_EXT(bdaddr, lmp_entry):
         rcvd_extended_opcode = lmp_entry["rcvd_extended_opcode"]
     values = (bdaddr, rcvd_escape_opcode, rcvd_extended_opcode)
     insert = f"INSERT IGNORE INTO LMP_ACCEPTED_EXT (bdaddr, rcvd_escape_opcode, rcvd_extended_opcode) VALUES (%s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_LMP_NOT_ACCEPTED_EXT(bdaddr, lmp_entry):
@@ -800,7 +802,7 @@ def import_LMP_NOT_ACCEPTED_EXT(bdaddr, lmp_entry):
         error_code = lmp_entry["error_code"]
     values = (bdaddr, rcvd_escape_opcode, rcvd_extended_opcode, error_code)
     insert = f"INSERT IGNORE INTO LMP_NOT_ACCEPTED_EXT (bdaddr, rcvd_escape_opcode, rcvd_extended_opcode, error_code) VALUES (%s, %s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_LMP_DETACH(bdaddr, lmp_entry):
@@ -811,7 +813,7 @@ def import_LMP_DETACH(bdaddr, lmp_entry):
         error_code = lmp_entry["error_code"]
     values = (bdaddr, error_code)
     insert = f"INSERT IGNORE INTO LMP_DETACH (bdaddr, error_code) VALUES (%s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_LMP_PREFERRED_RATE(bdaddr, lmp_entry):
@@ -822,7 +824,7 @@ def import_LMP_PREFERRED_RATE(bdaddr, lmp_entry):
         data_rate = lmp_entry["data_rate"]
     values = (bdaddr, data_rate)
     insert = f"INSERT IGNORE INTO LMP_PREFERRED_RATE(bdaddr, data_rate) VALUES (%s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_LMP_VERSION_REQ_or_RES(bdaddr, opcode, lmp_entry):
@@ -840,7 +842,7 @@ def import_LMP_VERSION_REQ_or_RES(bdaddr, opcode, lmp_entry):
         insert = f"INSERT IGNORE INTO LMP_VERSION_REQ (bdaddr, lmp_version, device_BT_CID, lmp_sub_version) VALUES (%s, %s, %s, %s);"
     else:
         insert = f"INSERT IGNORE INTO LMP_VERSION_RES (bdaddr, lmp_version, device_BT_CID, lmp_sub_version) VALUES (%s, %s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_LMP_FEATURES_REQ_or_RES(bdaddr, opcode, lmp_entry):
@@ -854,7 +856,7 @@ def import_LMP_FEATURES_REQ_or_RES(bdaddr, opcode, lmp_entry):
         insert = f"INSERT IGNORE INTO LMP_FEATURES_REQ (bdaddr, page, features) VALUES (%s, %s, %s);"
     else:
         insert = f"INSERT IGNORE INTO LMP_FEATURES_RES (bdaddr, page, features) VALUES (%s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_LMP_FEATURES_RES_or_REQ_EXT(bdaddr, opcode, lmp_entry):
@@ -872,7 +874,7 @@ def import_LMP_FEATURES_RES_or_REQ_EXT(bdaddr, opcode, lmp_entry):
         insert = f"INSERT IGNORE INTO LMP_FEATURES_RES_EXT (bdaddr, page, max_page, features) VALUES (%s, %s, %s, %s);"
     else:
         insert = f"INSERT IGNORE INTO LMP_FEATURES_REQ_EXT (bdaddr, page, max_page, features) VALUES (%s, %s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_LMP_CHANNEL_CLASSIFICATION(bdaddr, lmp_entry):
@@ -883,7 +885,7 @@ def import_LMP_CHANNEL_CLASSIFICATION(bdaddr, lmp_entry):
         afh_channel_classification = bytes.fromhex(lmp_entry["afh_channel_classification"])
     values = (bdaddr, afh_channel_classification)
     insert = f"INSERT IGNORE INTO LMP_CHANNEL_CLASSIFICATION (bdaddr, afh_channel_classification) VALUES (%s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_LMP_POWER_CONTROL_REQ(bdaddr, lmp_entry):
@@ -894,7 +896,7 @@ def import_LMP_POWER_CONTROL_REQ(bdaddr, lmp_entry):
         power_adj_req = lmp_entry["power_adj_req"]
     values = (bdaddr, power_adj_req)
     insert = f"INSERT IGNORE INTO LMP_POWER_CONTROL_REQ (bdaddr, power_adj_req) VALUES (%s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 def import_LMP_POWER_CONTROL_RES(bdaddr, lmp_entry):
     # Check if it's a full_pkt_hex_str-type entry, and if so, parse the raw bytes out of the string
@@ -910,14 +912,14 @@ def import_LMP_POWER_CONTROL_RES(bdaddr, lmp_entry):
             power_adj_res = lmp_entry["power_adj_res"]
     values = (bdaddr, power_adj_res)
     insert = f"INSERT IGNORE INTO LMP_POWER_CONTROL_RES (bdaddr, power_adj_res) VALUES (%s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 
 def import_LMP_empty_opcode(bdaddr, opcode):
     values = (bdaddr, opcode)
     insert = f"INSERT IGNORE INTO LMP_empty_opcodes (bdaddr, opcode) VALUES (%s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def has_known_LMP_packet(opcode, lmp_entry, extended_opcode=None):
@@ -1050,7 +1052,7 @@ def import_HCI_Remote_Name_Request_Complete(bdaddr, hci_entry):
     device_name = hci_entry["remote_name_hex_str"]
     values = (bdaddr, device_name)
     insert = f"INSERT IGNORE INTO HCI_bdaddr_to_name (bdaddr, status, name_hex_str) VALUES (%s, 0, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def has_known_HCI_entry(event_code, hci_entry):
@@ -1085,7 +1087,7 @@ def import_L2CAP_CONNECTION_PARAMETER_UPDATE_REQ(bdaddr, bdaddr_random, l2cap_en
     timeout = l2cap_entry["timeout"]
     values = (bdaddr, bdaddr_random, direction, code, pkt_id, data_len, interval_min, interval_max, latency, timeout)
     insert = f"INSERT IGNORE INTO L2CAP_CONNECTION_PARAMETER_UPDATE_REQ (bdaddr, bdaddr_random, direction, code, pkt_id, data_len, interval_min, interval_max, latency, timeout) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_L2CAP_CONNECTION_PARAMETER_UPDATE_RSP(bdaddr, bdaddr_random, l2cap_entry):
@@ -1096,7 +1098,7 @@ def import_L2CAP_CONNECTION_PARAMETER_UPDATE_RSP(bdaddr, bdaddr_random, l2cap_en
     result = l2cap_entry["result"]
     values = (bdaddr, bdaddr_random, direction, code, id, data_len, result)
     insert = f"INSERT IGNORE INTO L2CAP_CONNECTION_PARAMETER_UPDATE_RSP (bdaddr, bdaddr_random, direction, code, id, data_len, result) VALUES (%s, %s, %s, %s, %s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def parse_L2CAPArray(entry):
@@ -1129,14 +1131,14 @@ def import_Page_Scan_Repetition_Mode(bdaddr, eir_entry):
     page_scan_repetition_mode = eir_entry["page_scan_repetition_mode"]
     values = (bdaddr, page_scan_repetition_mode)
     insert = f"INSERT IGNORE INTO EIR_bdaddr_to_PSRM (bdaddr, page_scan_rep_mode) VALUES (%s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_Class_of_Device(bdaddr, eir_entry):
     class_of_device = int(eir_entry["CoD_hex_str"], 16)
     values = (bdaddr, class_of_device)
     insert = f"INSERT IGNORE INTO EIR_bdaddr_to_CoD (bdaddr, class_of_device) VALUES (%s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def has_known_EIR_entry(type, eir_entry):
@@ -1168,7 +1170,7 @@ def import_ATT_handle_entry(bdaddr, bdaddr_random, att_handle_entry):
     UUID = convert_UUID128_to_UUID16_if_possible(att_handle_entry["UUID"])
     values = (bdaddr, bdaddr_random, attribute_handle, UUID)
     insert = f"INSERT IGNORE INTO GATT_attribute_handles (bdaddr, bdaddr_random, attribute_handle, UUID) VALUES (%s, %s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 def import_ATT_handle_enumeration(bdaddr, bdaddr_random, att_entry):
     for att_handle_entry in att_entry["ATT_handle_enumeration"]:
@@ -1216,14 +1218,14 @@ def import_ATT_packet(bdaddr, bdaddr_random, att_entry):
                     UUID = convert_UUID128_to_UUID16_if_possible(UUID) # Just in case they sent us a 16 bit UUID as a 128 bit UUID for some dumb reason...
                 values = (bdaddr, bdaddr_random, declaration_handle, char_properties, char_value_handle, UUID)
                 insert = f"INSERT IGNORE INTO GATT_characteristics (bdaddr, bdaddr_random, declaration_handle, char_properties, char_value_handle, UUID) VALUES (%s, %s, %s, %s, %s, %s);"
-                execute_insert(insert, values)
+                queue_insert(insert, values)
         else:
             if(handle != 0):
                 # Handle 0 would be invalid, so ignore any cases where we don't have a last read handle request != 0
                 # We don't want characteristics to go into the GATT_characteristics_values table
                 values = (bdaddr, bdaddr_random, handle, operation, byte_values)
                 insert = f"INSERT IGNORE INTO GATT_characteristics_values (bdaddr, bdaddr_random, char_value_handle, operation, byte_values) VALUES (%s, %s, %s, %s, %s);"
-                execute_insert(insert, values)
+                queue_insert(insert, values)
 
 
 def parse_ATTArray(entry):
@@ -1271,7 +1273,7 @@ def import_GATT_service_entry(bdaddr, bdaddr_random, gatt_service_entry):
         UUID = convert_UUID128_to_UUID16_if_possible(gatt_service_entry["UUID"])
         values = (bdaddr, bdaddr_random, service_type, begin_handle, end_handle, UUID)
         insert = f"INSERT IGNORE INTO GATT_services (bdaddr, bdaddr_random, service_type, begin_handle, end_handle, UUID) VALUES (%s, %s, %s, %s, %s, %s);"
-        execute_insert(insert, values)
+        queue_insert(insert, values)
 
     # Now insert any characteristics
     if("characteristics" in gatt_service_entry.keys()):
@@ -1288,7 +1290,7 @@ def import_GATT_service_entry(bdaddr, bdaddr_random, gatt_service_entry):
                 UUID = convert_UUID128_to_UUID16_if_possible(char["value_uuid"])
                 values = (bdaddr, bdaddr_random, declaration_handle, char_properties, char_value_handle, UUID)
                 insert = f"INSERT IGNORE INTO GATT_characteristics (bdaddr, bdaddr_random, declaration_handle, char_properties, char_value_handle, UUID) VALUES (%s, %s, %s, %s, %s, %s);"
-                execute_insert(insert, values)
+                queue_insert(insert, values)
 
             # Now insert any characteristic values
             if("char_value" in char.keys()):
@@ -1307,7 +1309,7 @@ def import_GATT_service_entry(bdaddr, bdaddr_random, gatt_service_entry):
                                 exit(-1)
                         values = (bdaddr, bdaddr_random, char_value_handle, operation, byte_values)
                         insert = f"INSERT IGNORE INTO GATT_characteristics_values (bdaddr, bdaddr_random, char_value_handle, operation, byte_values) VALUES (%s, %s, %s, %s, %s);"
-                        execute_insert(insert, values)
+                        queue_insert(insert, values)
 
             # Now convert any characteristic descriptors into values appropriate for storage in the GATT_characteristic_descriptor_values table
             # TODO: do I need to add an io_array to every descriptor entry, to support operation types other than read?
@@ -1338,7 +1340,7 @@ def import_GATT_service_entry(bdaddr, bdaddr_random, gatt_service_entry):
 
                     values = (bdaddr, bdaddr_random, UUID, handle, operation, byte_values)
                     insert = f"INSERT IGNORE INTO GATT_characteristic_descriptor_values (bdaddr, bdaddr_random, UUID, descriptor_handle, operation, byte_values) VALUES (%s, %s, %s, %s, %s, %s);"
-                    execute_insert(insert, values)
+                    queue_insert(insert, values)
 
 def parse_GATTArray(entry):
     #qprint(json.dumps(entry, indent=2))
@@ -1365,7 +1367,7 @@ def import_SMP_Pairing_Req_Res(bdaddr, bdaddr_random, smp_entry):
     responder_key_dist = smp_entry["responder_key_dist"]
     values = (bdaddr, bdaddr_random, opcode, io_cap, oob_data, auth_req, max_key_size, initiator_key_dist, responder_key_dist)
     insert = f"INSERT IGNORE INTO SMP_Pairing_Req_Res (bdaddr, bdaddr_random, opcode, io_cap, oob_data, auth_req, max_key_size, initiator_key_dist, responder_key_dist) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 def parse_SMPArray(entry):
     if("SMPArray" not in entry.keys() or entry["SMPArray"] == None):
@@ -1402,7 +1404,7 @@ def import_SDP_ERROR_RSP(bdaddr, sdp_entry):
     error_code = sdp_entry["error_code"]
     values = (bdaddr, direction, l2cap_len, l2cap_cid, transaction_id, param_len, error_code)
     insert = f"INSERT IGNORE INTO SDP_ERROR_RSP (bdaddr, direction, l2cap_len, l2cap_cid, transaction_id, param_len, error_code) VALUES (%s, %s, %s, %s, %s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def import_SDP_Common(bdaddr, sdp_entry):
@@ -1415,7 +1417,7 @@ def import_SDP_Common(bdaddr, sdp_entry):
     byte_values = bytes.fromhex(sdp_entry["raw_data_hex_str"])
     values = (bdaddr, direction, l2cap_len, l2cap_cid, pdu_id, transaction_id, param_len, byte_values)
     insert = f"INSERT IGNORE INTO SDP_Common (bdaddr, direction, l2cap_len, l2cap_cid, pdu_id, transaction_id, param_len, byte_values) VALUES (%s, %s, %s, %s, %s, %s, %s, %s);"
-    execute_insert(insert, values)
+    queue_insert(insert, values)
 
 
 def parse_SDPArray(entry):
@@ -1512,10 +1514,15 @@ def parse_GPSArray(entry):
 # GPSArray in a single pre-fetch + bulk INSERT. Semantics match the per-entry
 # version exactly: preserves the "promote existing rssi=0 to new non-zero
 # rssi" behavior and the "skip rssi=0 when a non-zero row already exists" rule.
-def parse_all_GPSArrays_batched(chunk_size=1000):
+# entries defaults to the whole TME.TME_glob.BTIDES_JSON. Calling it on
+# successive slices of the input gives the same result as one call on the
+# whole thing, since each call re-reads what the previous ones inserted.
+def parse_all_GPSArrays_batched(chunk_size=1000, entries=None):
+    if(entries is None):
+        entries = TME.TME_glob.BTIDES_JSON
     # Step 1: Collect every valid (bdaddr, bdaddr_random, time, time_type, rssi, lat, lon) op from the JSON.
     all_ops = []
-    for entry in TME.TME_glob.BTIDES_JSON:
+    for entry in entries:
         if("GPSArray" not in entry or entry.get("GPSArray") is None
            or entry.get("bdaddr") is None or entry.get("bdaddr_rand") is None):
             continue
@@ -1595,12 +1602,15 @@ def parse_all_GPSArrays_batched(chunk_size=1000):
             # Use execute_update: bulk inserts don't need the per-row
             # duplicate-detection logic that execute_insert does.
             execute_update(q, params)
+        for (bdaddr, bdaddr_random, *_) in inserts:
+            record_bdaddr_presence("bdaddr_to_GPS", bdaddr, bdaddr_random)
+        flush_bdaddr_presence()
 
 
 ###################################
 
 class btides_to_sql_args:
-    def __init__(self, input=None, skip_invalid=True, verbose_print=False, quiet_print=True, use_test_db=True, skip_schema_validation=False):
+    def __init__(self, input=None, skip_invalid=True, verbose_print=False, quiet_print=True, use_test_db=True, skip_schema_validation=False, insert_batch_size=1000, workers=1):
         self.input = input
         self.skip_invalid = skip_invalid
         self.verbose_print = verbose_print
@@ -1610,6 +1620,10 @@ class btides_to_sql_args:
         # known to have just been produced (and thus already validated) by
         # write_BTIDES — e.g. when called in-process from WIGLE_to_BTIDES.py.
         self.skip_schema_validation = skip_schema_validation
+        # Rows per multi-row INSERT (see TME_helpers.queue_insert).
+        self.insert_batch_size = insert_batch_size
+        # Number of worker processes to shard the import across (by bdaddr).
+        self.workers = workers
 
     def set_input(self, input):
         self.input = input
@@ -1626,102 +1640,255 @@ class btides_to_sql_args:
     def set_use_test_db(self, use_test_db):
         self.use_test_db = use_test_db
 
+    def set_insert_batch_size(self, insert_batch_size):
+        self.insert_batch_size = insert_batch_size
+
+    def set_workers(self, workers):
+        self.workers = workers
+
+
+# The per-entry validator is built once per process (see TME_BTIDES_base.get_BTIDES_validators())
+# and reused for every entry and every input file.
+# Re-constructing it per entry re-parsed the schema and rebuilt the keyword
+# dispatch table for every BTIDES entry.
+def build_BTIDES_entry_validator():
+    return get_BTIDES_entry_validator()
+
+
+# GPS-bearing entries are held back and handed to parse_all_GPSArrays_batched
+# this many at a time, so streamed input doesn't have to be kept in memory.
+GPS_ENTRIES_PER_BATCH = 10000
+
+# Validate (unless entry_validator is None) and import every entry in entries, in order.
+# entries can be any iterable, including the iter_BTIDES_entries() stream.
+# progress_callback, if given, is called with the running count of processed entries.
+def import_BTIDES_entries(entries, entry_validator, skip_invalid, progress_callback=None):
+    global g_last_read_req_handle
+
+    count = 0
+    gps_entries = []
+    for entry in entries:
+        if entry_validator is not None:
+            # Sanity check every entry against the Schema's SingleBDADDR (this way we don't have to validate all up front)
+            try:
+                entry_validator.validate(instance=entry)
+                #qprint("JSON is valid according to BTIDES Schema")
+            except ValidationError as e:
+                qprint(f"JSON data is invalid per BTIDES Schema: {e.message}")
+                if(skip_invalid):
+                    continue
+                else:
+                    qprint(json.dumps(entry, indent=2))
+                    #return False
+                    flush_all_insert_batches() # Keep the rows from the entries before this one, as the per-row path did
+                    exit(-1)
+
+        parse_AdvChanArray(entry)
+
+        parse_LLArray(entry)
+
+        parse_LMPArray(entry)
+
+        parse_HCIArray(entry)
+
+        parse_L2CAPArray(entry)
+
+        g_last_read_req_handle = 0
+        parse_ATTArray(entry)
+
+        parse_GATTArray(entry)
+
+        parse_SMPArray(entry)
+
+        parse_EIRArray(entry)
+
+        parse_SDPArray(entry)
+
+        # parse_GPSArray(entry) -- replaced by batched calls to parse_all_GPSArrays_batched().
+        if(entry.get("GPSArray") is not None):
+            gps_entries.append(entry)
+            if(len(gps_entries) >= GPS_ENTRIES_PER_BATCH):
+                parse_all_GPSArrays_batched(entries=gps_entries)
+                gps_entries = []
+
+        count += 1
+        if(progress_callback is not None):
+            progress_callback(count)
+
+    # Push out whatever is still sitting in the per-table insert batches
+    flush_all_insert_batches()
+
+    # Batched GPS insertion collapses ~2-3 MySQL roundtrips per GPS entry
+    # down to O(distinct_bdaddrs / chunk_size) SELECTs + O(total / chunk_size)
+    # INSERTs. Semantics match parse_GPSArray exactly.
+    if(gps_entries):
+        parse_all_GPSArrays_batched(entries=gps_entries)
+
+
+###################################
+# Multi-process (--workers) import
+###################################
+
+# Every table is keyed by bdaddr, and the only cross-entry state
+# (g_handle_to_UUID_map, the GPS read-modify-write) is per-device, so entries
+# can be imported in parallel as long as all the entries for a given
+# peripheral bdaddr land in the same worker, in their original order.
+# That gives exactly the same row set as the serial path.
+def BTIDES_entry_shard(entry, num_shards):
+    try:
+        bdaddr, _ = get_bdaddr_peripheral(entry)
+    except (KeyError, AttributeError, TypeError):
+        # Malformed entry (it will fail validation anyway), any shard will do
+        return 0
+    return zlib.crc32(bdaddr.encode('utf-8')) % num_shards
+
+
+def _btides_to_sql_worker(entry_queue, args, result_queue):
+    # Each worker needs its own MySQL connection (see prepare_mysql_for_fork())
+    TME.TME_helpers.reset_mysql_state_after_fork()
+    TME.TME_glob.verbose_print = args.verbose_print
+    TME.TME_glob.quiet_print = args.quiet_print
+    TME.TME_glob.use_test_db = args.use_test_db
+    insert_batch_size = getattr(args, 'insert_batch_size', None)
+    if(insert_batch_size is not None):
+        TME.TME_glob.insert_batch_size = max(1, insert_batch_size)
+    TME.TME_glob.insert_count = 0
+    TME.TME_glob.duplicate_count = 0
+
+    entry_validator = None
+    if not getattr(args, 'skip_schema_validation', False):
+        entry_validator = build_BTIDES_entry_validator()
+
+    # None marks the end of this worker's entries
+    import_BTIDES_entries(iter(entry_queue.get, None), entry_validator, args.skip_invalid)
+    result_queue.put((TME.TME_glob.insert_count, TME.TME_glob.duplicate_count))
+
+
+# How many entries can be waiting for each worker. Keeps the memory use of a
+# --workers import bounded, like the serial streaming import's.
+WORKER_ENTRY_QUEUE_SIZE = 1000
+
+# Returns False if the worker has died (e.g. exit(-1) on a schema-invalid entry), rather than blocking forever
+def _put_for_worker(entry_queue, worker, item):
+    while True:
+        try:
+            entry_queue.put(item, timeout=1)
+            return True
+        except queue.Full:
+            if not worker.is_alive():
+                return False
+
+
+# entries can be any iterable, including the iter_BTIDES_entries() stream, which
+# is read as the workers go, so only a few entries per worker are in memory at a time.
+# progress_callback(count) is called with the number of entries handed out so far.
+# Returns False if any worker failed (e.g. exit(-1) on a schema-invalid entry without skip_invalid)
+def import_BTIDES_entries_parallel(entries, args, num_workers, progress_callback=None):
+    TME.TME_helpers.prepare_mysql_for_fork()
+    result_queue = multiprocessing.Queue()
+    entry_queues = [multiprocessing.Queue(maxsize=WORKER_ENTRY_QUEUE_SIZE) for _ in range(num_workers)]
+    workers = [multiprocessing.Process(target=_btides_to_sql_worker, args=(entry_queue, args, result_queue)) for entry_queue in entry_queues]
+    for worker in workers:
+        worker.start()
+
+    succeeded = True
+    try:
+        count = 0
+        for entry in entries:
+            shard = BTIDES_entry_shard(entry, num_workers)
+            if not _put_for_worker(entry_queues[shard], workers[shard], entry):
+                # Like the serial import, a failed entry stops the whole import
+                succeeded = False
+                break
+            count += 1
+            if(progress_callback is not None):
+                progress_callback(count)
+    finally:
+        # Also when reading entries raised (e.g. JSONDecodeError), so that what was already handed out still gets imported
+        for entry_queue, worker in zip(entry_queues, workers):
+            _put_for_worker(entry_queue, worker, None)
+
+        finished = 0
+        while finished < len(workers):
+            try:
+                (insert_count, duplicate_count) = result_queue.get(timeout=1)
+            except queue.Empty:
+                # A worker that died never sends its counts
+                if all(not worker.is_alive() for worker in workers):
+                    break
+                continue
+            TME.TME_glob.insert_count += insert_count
+            TME.TME_glob.duplicate_count += duplicate_count
+            finished += 1
+
+        for entry_queue, worker in zip(entry_queues, workers):
+            worker.join()
+            if(worker.exitcode != 0):
+                succeeded = False
+            # Entries left behind for a worker that died must not keep this process from exiting
+            entry_queue.cancel_join_thread()
+    return succeeded
+
 
 # Input must be a Namespace like args from argparse
 # Magic input filename "SKIPME" tells btides_to_sql to not read from file, but just use the global TME.TME_glob.BTIDES_JSON
+# Input files are streamed straight into the database, and are NOT loaded into TME.TME_glob.BTIDES_JSON
 def btides_to_sql(args):
     TME.TME_glob.verbose_print = args.verbose_print
     TME.TME_glob.quiet_print = args.quiet_print
     TME.TME_glob.use_test_db = args.use_test_db
     skip_invalid = args.skip_invalid
     skip_schema_validation = getattr(args, 'skip_schema_validation', False)
+    insert_batch_size = getattr(args, 'insert_batch_size', None)
+    if(insert_batch_size is not None):
+        TME.TME_glob.insert_batch_size = max(1, insert_batch_size)
+    num_workers = max(1, getattr(args, 'workers', 1) or 1)
     global last_printed_percentage
-    global BTIDES_JSON
-    global g_last_read_req_handle
 
     last_printed_percentage = 0
     for input_file in args.input:
         last_printed_percentage = 0
-        if(input_file != "SKIPME"):
+        entry_validator = None
+        if not skip_schema_validation and num_workers == 1:
+            entry_validator = build_BTIDES_entry_validator()
+
+        if(input_file == "SKIPME"):
+            total = len(TME.TME_glob.BTIDES_JSON)
+            if(num_workers > 1):
+                succeeded = import_BTIDES_entries_parallel(TME.TME_glob.BTIDES_JSON, args, num_workers,
+                                                           lambda count: progress_update(total, count))
+            else:
+                import_BTIDES_entries(TME.TME_glob.BTIDES_JSON, entry_validator, skip_invalid,
+                                      lambda count: progress_update(total, count))
+                succeeded = True
+        else:
             if not os.path.isfile(input_file):
                 qprint(f"Error: Input file '{input_file}' does not exist or is not a file.")
                 return False
-            with open(input_file, 'r') as f:
-                TME.TME_glob.BTIDES_JSON = json.load(f) # We have to just trust that this JSON parser doesn't have any issues...
-                rebuild_SingleBDADDR_index() # Keep the O(1) lookup index in sync with the just-loaded list.
-                #qprint(json.dumps(BTIDES_JSON, indent=2))
-
-        # Import all the local BTIDES json schema files, so that we don't hit the website all the time
-        all_schemas = []
-        for file in BTIDES_files:
-            with open(f"./BTIDES_Schema/{file}", 'r') as f:
-                #BTIDES_Schema
-                s = json.load(f)
-                #qprint(s["$id"])
-                schema = Resource.from_contents(s)
-                all_schemas.append((s["$id"], schema))
-
-        registry = Registry().with_resources( all_schemas )
-
-        # Build the per-entry validator once and reuse. Re-constructing inside
-        # the loop re-parsed the schema and rebuilt the keyword dispatch table
-        # for every BTIDES entry.
-        entry_validator = Draft202012Validator(
-            {"anyOf": [
-                {"$ref": "https://darkmentor.com/BTIDES_Schema/BTIDES_base.json#/definitions/SingleBDADDR"},
-                {"$ref": "https://darkmentor.com/BTIDES_Schema/BTIDES_base.json#/definitions/DualBDADDR"}
-            ]},
-            registry=registry,
-        )
-
-        total = len(TME.TME_glob.BTIDES_JSON)
-        count = 0;
-        for entry in TME.TME_glob.BTIDES_JSON:
-            if not skip_schema_validation:
-                # Sanity check every entry against the Schema's SingleBDADDR (this way we don't have to validate all up front)
+            # Stream the entries out of the file one at a time rather than json.load()ing
+            # the whole thing, so that memory is bounded by the largest single entry and
+            # the first rows go in right away. Progress is reported by bytes consumed.
+            file_size = max(1, os.path.getsize(input_file))
+            bytes_read = [0]
+            with open(input_file, 'rb') as f:
                 try:
-                    entry_validator.validate(instance=entry)
-                    #qprint("JSON is valid according to BTIDES Schema")
-                except ValidationError as e:
-                    qprint(f"JSON data is invalid per BTIDES Schema: {e.message}")
-                    if(skip_invalid):
-                        continue
+                    entries = iter_BTIDES_entries(f, progress=bytes_read) # We have to just trust that this JSON parser doesn't have any issues...
+                    if(num_workers > 1):
+                        succeeded = import_BTIDES_entries_parallel(entries, args, num_workers,
+                                                                   lambda count: progress_update(file_size, bytes_read[0]))
                     else:
-                        qprint(json.dumps(entry, indent=2))
-                        #return False
-                        exit(-1)
-
-            parse_AdvChanArray(entry)
-
-            parse_LLArray(entry)
-
-            parse_LMPArray(entry)
-
-            parse_HCIArray(entry)
-
-            parse_L2CAPArray(entry)
-
-            g_last_read_req_handle = 0
-            parse_ATTArray(entry)
-
-            parse_GATTArray(entry)
-
-            parse_SMPArray(entry)
-
-            parse_EIRArray(entry)
-
-            parse_SDPArray(entry)
-
-            # parse_GPSArray(entry) -- replaced by a single bulk call after the loop.
-
-            count += 1
-            progress_update(total, count)
-
-        # Batched GPS insertion runs once across the whole BTIDES_JSON,
-        # collapsing ~2-3 MySQL roundtrips per GPS entry down to
-        # O(distinct_bdaddrs / chunk_size) SELECTs + O(total / chunk_size)
-        # INSERTs. Semantics match parse_GPSArray exactly.
-        parse_all_GPSArrays_batched()
+                        import_BTIDES_entries(entries, entry_validator, skip_invalid,
+                                              lambda count: progress_update(file_size, bytes_read[0]))
+                        succeeded = True
+                except json.JSONDecodeError as e:
+                    # Anything streamed in before the malformed part has already been imported
+                    flush_all_insert_batches()
+                    qprint(f"Error: Input file '{input_file}' is not valid JSON: {e}")
+                    return False
+
+        if not succeeded:
+            qprint("Error: one or more --workers import processes failed.")
+            exit(-1)
 
         qprint(f"New db records inserted: {TME.TME_glob.insert_count}")
         qprint(f"Duplicate db records ignored: {TME.TME_glob.duplicate_count}")
@@ -1759,6 +1926,8 @@ def main():
     parser.add_argument('--verbose-print', action='store_true', required=False, help='Print verbose output.')
     parser.add_argument('--quiet-print', action='store_true', required=False, help='Hide all print output.')
     parser.add_argument('--use-test-db', action='store_true', required=False, help='This will query from an alternate database, used for testing.')
+    parser.add_argument('--insert-batch-size', type=int, default=1000, required=False, help='Number of rows per multi-row INSERT (one transaction per batch). 1 gives the old row-at-a-time behavior. Default 1000.')
+    parser.add_argument('--workers', type=int, default=1, required=False, help='Number of worker processes to import with. Entries are sharded by bdaddr, each worker uses its own MySQL connection. Default 1 (serial).')
     args = parser.parse_args()
 
     btides_to_sql_succeeded = btides_to_sql(args)
@@ -0,0 +1,42 @@
+########################################
+# Created by Xeno Kovah
+# Copyright(c) © Dark Mentor LLC 2023-2026
+########################################
+# This file fills in the bdaddr_presence, bdaddr_to_UUID, and device_names index
+# tables (see TME_helpers.py) from the per-device tables, and recomputes the
+# UUID_stats summary tables from them. BTIDES_to_SQL.py keeps them up to
+# date as it imports, so this only needs to be run for data that got into the
+# database some other way, e.g. before the tables existed, or from a .sql dump.
+
+# Activate venv before any other imports
+from handle_venv import activate_venv
+activate_venv()
+
+import argparse
+
+import TME.TME_glob
+from TME.TME_helpers import backfill_bdaddr_presence, backfill_uuid_index, backfill_device_names, rebuild_uuid_stats, qprint
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill in the bdaddr_presence, bdaddr_to_UUID, and device_names index tables from the existing per-device tables, and recompute the UUID_stats summary tables.')
+    parser.add_argument('--rebuild', action='store_true', required=False, help='Empty the index tables first, so that entries for since-deleted rows are dropped. (This also resets bdaddr_presence.first_seen.)')
+    parser.add_argument('--UUID-stats-only', action='store_true', required=False, help='Only recompute the UUID_stats summary tables (used by --UUID16-stats / --UUID128-stats) from the existing index tables.')
+    parser.add_argument('--quiet-print', action='store_true', required=False, help='Hide all print output.')
+    parser.add_argument('--use-test-db', action='store_true', required=False, help='This will query from an alternate database, used for testing.')
+    args = parser.parse_args()
+
+    TME.TME_glob.quiet_print = args.quiet_print
+    TME.TME_glob.use_test_db = args.use_test_db
+
+    if(not args.UUID_stats_only):
+        count = backfill_bdaddr_presence(rebuild=args.rebuild)
+        qprint(f"bdaddr_presence now has {count} entries")
+        count = backfill_uuid_index(rebuild=args.rebuild)
+        qprint(f"bdaddr_to_UUID now has {count} entries")
+        count = backfill_device_names(rebuild=args.rebuild)
+        qprint(f"device_names now has {count} entries")
+    count = rebuild_uuid_stats()
+    qprint(f"UUID_stats now has {count} entries")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+########################################
+# Created by Xeno Kovah
+# Copyright(c) © Dark Mentor LLC 2023-2026
+########################################
+# Micro-benchmark for the combined NamePrint matcher (see build_regex_matcher()
+# in TME_helpers.py). Times matching a corpus of real device names against the
+# NAMEPRINT_*_DB.csv regexes and the Metadata_v2 2thprint_NamePrint regexes,
+# the old way (re.search() with every regex in turn) and with the matcher
+# (one name at a time, and all the names at once), and checks that all three
+# find the same matches.
+#
+# The names come from the device_names table by default, or from a file with
+# one name per line.
+
+# Activate venv before any other imports
+from handle_venv import activate_venv
+activate_venv()
+
+import argparse
+import re
+import time
+
+import TME.TME_glob
+from TME.TME_helpers import *
+from TME.TME_import import import_all_startup_data
+
+
+def load_names(names_file):
+    if(names_file is not None):
+        with open(names_file, 'r', encoding='utf-8') as f:
+            return [line.rstrip('\n') for line in f]
+    return [name for (name,) in execute_query("SELECT name FROM device_names", ())]
+
+
+def search_each_regex(patterns, name):
+    return [index for index, pattern in enumerate(patterns) if re.search(pattern, name)]
+
+
+def time_it(label, function, repeat, name_count):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    qprint(f"{i1}{label:<30} {best * 1000:10.1f} ms ({best * 1e6 / max(name_count, 1):8.2f} us/name)")
+    return (result, best)
+
+
+def benchmark(label, matcher, names, repeat):
+    patterns = matcher["patterns"]
+    qprint(f"{label}: {len(patterns)} regexes ({len(matcher['always'])} without a literal to prefilter on), {len(names)} names")
+    (each_regex, old_time) = time_it("re.search() with each regex", lambda: [search_each_regex(patterns, name) for name in names], repeat, len(names))
+    (one_at_a_time, _) = time_it("matcher, one name at a time", lambda: [regex_matcher_search(matcher, name) for name in names], repeat, len(names))
+    (all_at_once, new_time) = time_it("matcher, all names at once", lambda: regex_matcher_search_names(matcher, names), repeat, len(names))
+    if(each_regex != one_at_a_time or each_regex != all_at_once):
+        print(f"{i1}ERROR: the matcher's results differ from searching each regex!")
+        return False
+    match_count = sum(1 for matches in each_regex if matches)
+    qprint(f"{i1}{match_count} names matched, speedup {old_time / max(new_time, 1e-9):.1f}x")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the combined NamePrint matcher against searching each NamePrint regex in turn.')
+    parser.add_argument('--names-file', type=str, required=False, help='File with one device name per line to use as the corpus, instead of the names in the device_names table.')
+    parser.add_argument('--repeat', type=int, default=3, required=False, help='Number of times to time each method (the best time is reported). Default 3.')
+    parser.add_argument('--use-test-db', action='store_true', required=False, help='This will query from an alternate database, used for testing.')
+    args = parser.parse_args()
+
+    TME.TME_glob.use_test_db = args.use_test_db
+
+    import_all_startup_data()
+    start = time.perf_counter()
+    build_nameprint_matchers()
+    qprint(f"Building the NamePrint matchers took {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    names = load_names(args.names_file)
+    ok = benchmark("NAMEPRINT_*_DB.csv", get_nameprint_matcher(), names, args.repeat)
+    ok = benchmark("Metadata_v2 2thprint_NamePrint", get_metadata_v2_nameprint_matcher(), names, args.repeat) and ok
+    if(not ok):
+        exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+########################################
+# Created by Xeno Kovah
+# Copyright(c) © Dark Mentor LLC 2023-2026
+########################################
+# This file fills in a Better_Getter GATT Database Hash cache (see --gatt-hash-cache
+# in Scripts/BG/Better_Getter.py) from the GATT tables. Every device in the database
+# which has a GATT Database Hash (0x2B2A) value, and whose GATT structure looks
+# complete, contributes an entry for its hash, so that BG can skip enumerating the
+# GATT database of any other device with the same hash.
+
+# Activate venv before any other imports
+from handle_venv import activate_venv
+activate_venv()
+
+import os
+import json
+import fcntl
+import argparse
+
+import TME.TME_glob
+from TME.TME_helpers import execute_query, qprint
+
+gatt_db_hash_query = """
+    SELECT c.bdaddr, c.bdaddr_random, v.byte_values
+    FROM GATT_characteristics AS c
+    JOIN GATT_characteristics_values AS v
+      ON v.bdaddr = c.bdaddr AND v.bdaddr_random = c.bdaddr_random AND v.char_value_handle = c.char_value_handle
+    WHERE LOWER(c.UUID) = '2b2a'
+"""
+
+# The DB stores UUID16s as 4 hex digits, and UUID128s as 32 hex digits (maybe with dashes),
+# which is the same form BG's cache uses, once normalized
+def cache_UUID_str(UUID):
+    UUID = UUID.lower().replace('-','')
+    if(UUID.startswith("0000") and UUID.endswith("00001000800000805f9b34fb")):
+        return UUID[4:8]
+    return UUID
+
+# Returns the cache entry for a device, or None if its GATT structure in the DB is incomplete
+# (i.e. an enumerated 0x2800/0x2801/0x2803 handle without the matching service or characteristic)
+def build_cache_entry(bdaddr, bdaddr_random):
+    values = (bdaddr, bdaddr_random)
+    handles = execute_query("SELECT attribute_handle, UUID FROM GATT_attribute_handles WHERE bdaddr = %s AND bdaddr_random = %s ORDER BY attribute_handle", values)
+    services = execute_query("SELECT begin_handle, UUID FROM GATT_services WHERE bdaddr = %s AND bdaddr_random = %s ORDER BY begin_handle", values)
+    characteristics = execute_query("SELECT declaration_handle, char_properties, char_value_handle, UUID FROM GATT_characteristics WHERE bdaddr = %s AND bdaddr_random = %s ORDER BY declaration_handle", values)
+
+    entry = {"bdaddr": bdaddr,
+             "handles": [[handle, cache_UUID_str(UUID)] for (handle, UUID) in handles],
+             "services": [[begin_handle, cache_UUID_str(UUID)] for (begin_handle, UUID) in services],
+             "characteristics": [[handle, char_properties, char_value_handle, cache_UUID_str(UUID)] for (handle, char_properties, char_value_handle, UUID) in characteristics]}
+    if(len(entry["handles"]) == 0):
+        return None
+
+    service_handles = {begin_handle for (begin_handle, _) in entry["services"]}
+    declaration_handles = {handle for (handle, _, _, _) in entry["characteristics"]}
+    for (handle, UUID) in entry["handles"]:
+        if(UUID in ("2800", "2801") and handle not in service_handles):
+            return None
+        if(UUID == "2803" and handle not in declaration_handles):
+            return None
+    return entry
+
+def read_cache(path):
+    if(not os.path.exists(path)):
+        return {}
+    with open(path, 'r') as cache_file:
+        return json.load(cache_file)
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill in a Better_Getter GATT Database Hash cache file (see Better_Getter.py --gatt-hash-cache) from the GATT tables.')
+    parser.add_argument('--output', type=str, required=True, help='GATT Database Hash cache file to add entries to (it is created if it does not exist).')
+    parser.add_argument('--overwrite', action='store_true', required=False, help='Replace entries that are already in the file, instead of keeping them.')
+    parser.add_argument('--quiet-print', action='store_true', required=False, help='Hide all print output.')
+    parser.add_argument('--use-test-db', action='store_true', required=False, help='This will query from an alternate database, used for testing.')
+    args = parser.parse_args()
+
+    TME.TME_glob.quiet_print = args.quiet_print
+    TME.TME_glob.use_test_db = args.use_test_db
+
+    cache = read_cache(args.output)
+
+    # The DB queries are done without holding the cache lock, so that BGs can keep adding to it meanwhile
+    new_entries = {}
+    incomplete = 0
+    for (bdaddr, bdaddr_random, byte_values) in execute_query(gatt_db_hash_query, ()):
+        # The Database Hash is 128 bits, anything else is a bogus value
+        if(len(byte_values) != 16):
+            continue
+        hash_str = bytes(byte_values).hex()
+        if((hash_str in cache or hash_str in new_entries) and not args.overwrite):
+            continue
+        entry = build_cache_entry(bdaddr, bdaddr_random)
+        if(entry is None):
+            incomplete += 1
+            continue
+        new_entries[hash_str] = entry
+
+    # Same sidecar lock BG takes (see GATT_DB_hash_cache_locked() in Scripts/BG/BG_Helper_Output.py),
+    # so that entries a BG added since the read above aren't lost. Re-read the file under it,
+    # then write it to the side and rename it into place, since BG may be reading it.
+    added = 0
+    with open(f"{args.output}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            cache = read_cache(args.output)
+            for (hash_str, entry) in new_entries.items():
+                if(hash_str in cache and not args.overwrite):
+                    continue
+                cache[hash_str] = entry
+                added += 1
+            tmp_path = f"{args.output}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as cache_file:
+                json.dump(cache, cache_file)
+            os.replace(tmp_path, args.output)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    qprint(f"Added {added} GATT Database Hashes ({incomplete} skipped for incomplete GATT data), {args.output} now has {len(cache)} entries")
+
+if __name__ == "__main__":
+    main()
@@ -24,7 +24,7 @@ import TME.TME_glob
 from TME.TME_helpers import qprint, vprint
 from TME.BT_Data_Types import *
 from TME.BTIDES_Data_Types import *
-from TME.TME_BTIDES_base import write_BTIDES
+from TME.TME_BTIDES_base import write_BTIDES, BTIDES_validation_summary
 
 # BTIDALPOOL access related
 from oauth_helper import AuthClient
@@ -598,6 +598,7 @@ def main():
     btides_group = parser.add_argument_group('BTIDES file output arguments')
     btides_group.add_argument('--output', type=str, required=False, help='Output file name for BTIDES JSON file.')
     btides_group.add_argument('--verbose-BTIDES', action='store_true', required=False, help='Include optional fields in BTIDES output that make it more human-readable.')
+    btides_group.add_argument('--validate', choices=['full', 'sample', 'off'], default='full', required=False, help='How much of the BTIDES output to check against the schema before writing it: every entry (full, the default), a random %d-entry sample (sample), or nothing (off). Only use sample/off for trusted input, since invalid output will be written as-is.' % TME.TME_glob.BTIDES_validate_sample_size)
 
     # SQL arguments
     sql = parser.add_argument_group('Local SQL database storage arguments (only applicable in the context of a local Blue2thprinting setup, not 3rd party tool usage.)')
@@ -623,6 +624,7 @@ def main():
     TME.TME_glob.verbose_print = args.verbose_print
     TME.TME_glob.quiet_print = args.quiet_print
     TME.TME_glob.verbose_BTIDES = args.verbose_BTIDES
+    TME.TME_glob.BTIDES_validate = args.validate
 
     qprint("Reading all events from HCI log into memory.")
     read_HCI(args.input)
@@ -630,6 +632,7 @@ def main():
     qprint("Writing BTIDES data to file.")
     write_BTIDES(out_BTIDES_filename)
     qprint("Export completed with no errors.")
+    qprint(BTIDES_validation_summary())
 
     btides_to_sql_succeeded = False
     if args.to_SQL:
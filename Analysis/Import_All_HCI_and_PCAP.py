@@ -7,6 +7,8 @@
 from handle_venv import activate_venv
 activate_venv()
 import argparse
+import multiprocessing
+import os
 
 # Scapy related
 from scapy.layers.bluetooth4LE import *
@@ -14,14 +16,16 @@ from scapy.layers.bluetooth import *
 from scapy.all import *
 
 # Common code for BTIDES export assuming scapy formatted input data structures
+import scapy_to_BTIDES_common
 from scapy_to_BTIDES_common import *
 
 # BTIDES format related
 import TME.TME_glob
+import TME.TME_helpers
 from TME.TME_helpers import qprint, vprint
 from TME.BT_Data_Types import *
 from TME.BTIDES_Data_Types import *
-from TME.TME_BTIDES_base import write_BTIDES
+from TME.TME_BTIDES_base import write_BTIDES, get_BTIDES_validators, rebuild_SingleBDADDR_index
 
 # BTIDALPOOL access related
 from oauth_helper import AuthClient
@@ -29,13 +33,16 @@ from BTIDES_to_SQL import btides_to_sql_args, btides_to_sql
 from BTIDES_to_BTIDALPOOL import send_btides_to_btidalpool
 
 # HCI_to_BTIDES and PCAP_to_BTIDES
+import HCI_to_BTIDES
+import PCAP_to_BTIDES
 from HCI_to_BTIDES import *
 from PCAP_to_BTIDES import *
 
-def optionally_store_to_SQL(btides_file, to_SQL, to_BTIDALPOOL, token_file, use_test_db, quiet_print, verbose_print, rename):
+# skip_schema_validation should only be set if btides_file was just fully validated by write_BTIDES
+def optionally_store_to_SQL(btides_file, to_SQL, to_BTIDALPOOL, token_file, use_test_db, quiet_print, verbose_print, rename, skip_schema_validation=False):
     btides_to_sql_succeeded = False
     if to_SQL:
-        b2s_args = btides_to_sql_args(input=[btides_file], use_test_db=use_test_db, quiet_print=quiet_print, verbose_print=verbose_print)
+        b2s_args = btides_to_sql_args(input=[btides_file], use_test_db=use_test_db, quiet_print=quiet_print, verbose_print=verbose_print, skip_schema_validation=skip_schema_validation)
         btides_to_sql_succeeded = btides_to_sql(b2s_args)
 
     if to_BTIDALPOOL:
@@ -56,6 +63,121 @@ def optionally_store_to_SQL(btides_file, to_SQL, to_BTIDALPOOL, token_file, use_
         vprint(f"Renamed to {btides_file}.processed")
 
 
+###################################
+# Per-file import jobs
+###################################
+
+# A job is (kind, input_file, btides_file, convert), where kind is "HCI" or "pcap",
+# and convert is False if the existing btides_file should just be stored (--read-existing-BTIDES)
+def find_import_jobs(kind, folders, suffix, overwrite_existing_BTIDES, read_existing_BTIDES):
+    jobs = []
+    for folder in folders:
+        for root, dirs, files in os.walk(folder):
+            for file in files:
+                if file.endswith(suffix):
+                    base_file_name = file[:-len(suffix)]
+                    input_file = os.path.join(root, file)
+                    btides_file = os.path.join(root, f"{base_file_name}.btides")
+                    btides_processed_file = os.path.join(root, f"{base_file_name}.btides.processed")
+                    if (not os.path.exists(btides_file) and not os.path.exists(btides_processed_file)):
+                        jobs.append((kind, input_file, btides_file, True))
+                    elif(overwrite_existing_BTIDES):
+                        jobs.append((kind, input_file, btides_file, True))
+                    elif(read_existing_BTIDES and os.path.exists(btides_file)):
+                        # Don't re-process .processed files. If we need to do that, use the --overwrite-existing-BTIDES path
+                        # This path will just be for processing unprocessed .btides files
+                        jobs.append((kind, input_file, btides_file, False))
+    return jobs
+
+
+# Size of the file a job will actually spend its time reading, for largest-first ordering
+def import_job_size(job):
+    kind, input_file, btides_file, convert = job
+    try:
+        return os.path.getsize(input_file if convert else btides_file)
+    except OSError:
+        return 0
+
+
+# Reset the per-file conversion state, so nothing carries over from one file to the next
+# (and so the result doesn't depend on which worker processed which files before this one)
+def reset_import_globals():
+    TME.TME_glob.BTIDES_JSON = []
+    rebuild_SingleBDADDR_index()
+    TME.TME_glob.duplicate_count = 0
+    TME.TME_glob.insert_count = 0
+    HCI_to_BTIDES.g_last_handle_to_bdaddr = {}
+    HCI_to_BTIDES.g_last_bdaddr_connected_to = None
+    PCAP_to_BTIDES.g_access_address_to_connect_ind_obj = {}
+    PCAP_to_BTIDES.g_stop_exporting_encrypted_packets_by_AA = {}
+    scapy_to_BTIDES_common.g_last_ATT_group_type_requested = "2800"
+    scapy_to_BTIDES_common.g_last_read_handle = 0
+    scapy_to_BTIDES_common.g_last_seen_characteristic_handle = 0
+    scapy_to_BTIDES_common.g_bdaddr_to_list_of_ff_ATT_FIND_INFORMATION_RSP_information_data = {}
+    scapy_to_BTIDES_common.g_CIDs_used_for_SDP = {}
+    scapy_to_BTIDES_common.g_last_requested_uuid_type = None
+
+
+# Returns (kind, input_file, exported, error, validation), where error is None on success,
+# and validation is the (entry count, seconds) of BTIDES schema validation spent on this file.
+# Any failure (including the exit() calls in write_BTIDES / btides_to_sql) is caught
+# and returned, so that one bad file doesn't abort the rest of the batch.
+def run_import_job(job, args):
+    kind, input_file, btides_file, convert = job
+    exported = False
+    validated_count = TME.TME_glob.BTIDES_validated_count
+    validation_time = TME.TME_glob.BTIDES_validation_time
+    try:
+        if(convert):
+            if(kind == "HCI"):
+                qprint(f"Reading all events from HCI log {input_file} into memory.")
+                if(not read_HCI(input_file)):
+                    return (kind, input_file, False, None, (0, 0.0))
+            else:
+                qprint(f"Reading all packets from pcap {input_file} into memory. (This can take a while for large pcaps. Assume a total time of 1 second per 1000 packets.)")
+                read_pcap(input_file)
+            write_BTIDES(btides_file)
+            qprint(f"Export {btides_file} completed with no errors.")
+            exported = True
+        # No need for BTIDES_to_SQL to re-validate every entry of a file that was just fully validated on export
+        optionally_store_to_SQL(btides_file, args.to_SQL, args.to_BTIDALPOOL, args.token_file, args.use_test_db, args.quiet_print, args.verbose_print, args.rename,
+                                skip_schema_validation=(exported and TME.TME_glob.BTIDES_validate == "full"))
+        error = None
+    except SystemExit as e:
+        error = f"exited with status {e.code}"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        # Reset globals to not accumulate wasted memory
+        reset_import_globals()
+    validation = (TME.TME_glob.BTIDES_validated_count - validated_count, TME.TME_glob.BTIDES_validation_time - validation_time)
+    return (kind, input_file, exported, error, validation)
+
+
+def _import_worker_init():
+    # Each worker needs its own MySQL connection (see prepare_mysql_for_fork())
+    TME.TME_helpers.reset_mysql_state_after_fork()
+    reset_import_globals()
+
+
+def _import_worker_run(job_and_args):
+    return run_import_job(*job_and_args)
+
+
+# Yields the result of each job as it completes. Jobs are handed out largest-first,
+# so a big pcap found late in the walk doesn't end up running alone at the end.
+def run_import_jobs(jobs, args, num_workers):
+    jobs = sorted(jobs, key=import_job_size, reverse=True)
+    if(num_workers <= 1 or len(jobs) <= 1):
+        for job in jobs:
+            yield run_import_job(job, args)
+        return
+
+    TME.TME_helpers.prepare_mysql_for_fork()
+    with multiprocessing.Pool(processes=min(num_workers, len(jobs)), initializer=_import_worker_init) as pool:
+        yield from pool.imap_unordered(_import_worker_run, [(job, args) for job in jobs], chunksize=1)
+
+
 def main():
     global verbose_print, verbose_BTIDES
     global BTIDES_JSON
@@ -68,6 +190,7 @@ def main():
     # BTIDES arguments
     btides_group = parser.add_argument_group('BTIDES file output arguments')
     btides_group.add_argument('--verbose-BTIDES', action='store_true', required=False, help='Include optional fields in BTIDES output that make it more human-readable.')
+    btides_group.add_argument('--validate', choices=['full', 'sample', 'off'], default='full', required=False, help='How much of the BTIDES output to check against the schema before writing it: every entry (full, the default), a random %d-entry sample (sample), or nothing (off). Only use sample/off for trusted input, since invalid output will be written as-is.' % TME.TME_glob.BTIDES_validate_sample_size)
     btides_group.add_argument('--overwrite-existing-BTIDES', action='store_true', required=False, help='If this is set, it will process the specified HCI/PCAP file, overwriting any existing .btides file that may exist next to it. (Mutually exclusive with --read-existing-BTIDES.)')
     btides_group.add_argument('--read-existing-BTIDES', action='store_true', required=False, help='If this is set, and a file with suffix .btides is found next to the target HCI/PCAP file, it will skip attempting conversion, and just read the existing .btides file instead.')
 
@@ -82,6 +205,8 @@ def main():
     btidalpool_group.add_argument('--to-BTIDALPOOL', action='store_true', required=False, help='Send output BTIDES data to the BTIDALPOOL crowdsourcing SQL database.')
     btidalpool_group.add_argument('--token-file', type=str, required=False, help='Path to file containing JSON with the \"token\" and \"refresh_token\" fields, as obtained from Google SSO. If not provided, you will be prompted to perform Google SSO, after which you can save the token to a file and pass this argument.')
 
+    parser.add_argument('--workers', type=int, default=1, required=False, help='Number of worker processes to convert/import files with, each with its own state and SQL connection. Files are processed largest first. Default is 1, i.e. everything is processed in this process.')
+
     printout_group = parser.add_argument_group('Print verbosity arguments')
     printout_group.add_argument('--verbose-print', action='store_true', required=False, help='Show explicit data-not-found output.')
     printout_group.add_argument('--quiet-print', action='store_true', required=False, help='Hide all print output (useful when you only want to use --output to export data).')
@@ -91,6 +216,7 @@ def main():
     TME.TME_glob.verbose_print = args.verbose_print
     TME.TME_glob.quiet_print = args.quiet_print
     TME.TME_glob.verbose_BTIDES = args.verbose_BTIDES
+    TME.TME_glob.BTIDES_validate = args.validate
 
     # Sanity check args
     if args.HCI_logs_folder:
@@ -117,87 +243,53 @@ def main():
         print("You can only pass one of --overwrite-existing-BTIDES or --read-existing-BTIDES at the same time.")
         exit(1)
 
-    hci_file_export_count = 0
+    if(args.workers < 1):
+        print("--workers must be at least 1.")
+        exit(1)
+
+    if(args.to_BTIDALPOOL and args.token_file is None and args.workers > 1):
+        # The interactive Google SSO prompt can't be answered from inside a worker process
+        print("--to-BTIDALPOOL with --workers > 1 requires --token-file. (Or pass --workers 1 to be prompted to log in.)")
+        exit(1)
+
+    jobs = []
     if args.HCI_logs_folder:
-        for folder in args.HCI_logs_folder:
-            for root, dirs, files in os.walk(folder):
-                for file in files:
-                    if file.endswith(args.HCI_logs_suffix):
-                        base_file_name = file[:-len(args.HCI_logs_suffix)]
-                        btides_file = os.path.join(root, f"{base_file_name}.btides")
-                        btides_processed_file = os.path.join(root, f"{base_file_name}.btides.processed")
-                        if (not os.path.exists(btides_file) and not os.path.exists(btides_processed_file)):
-                            qprint(f"Reading all events from HCI log {os.path.join(root, file)} into memory.")
-                            if(not read_HCI(os.path.join(root, file))):
-                                continue
-                            write_BTIDES(btides_file)
-                            qprint(f"Export {btides_file} completed with no errors.")
-                            hci_file_export_count += 1
-                            optionally_store_to_SQL(btides_file, args.to_SQL, args.to_BTIDALPOOL, args.token_file, args.use_test_db, args.quiet_print, args.verbose_print, args.rename)
-                        else:
-                            if(args.overwrite_existing_BTIDES):
-                                qprint(f"Reading all events from HCI log {os.path.join(root, file)} into memory.")
-                                if(not read_HCI(os.path.join(root, file))):
-                                    continue
-                                write_BTIDES(btides_file)
-                                qprint(f"Export {btides_file} completed with no errors.")
-                                hci_file_export_count += 1
-                                optionally_store_to_SQL(btides_file, args.to_SQL, args.to_BTIDALPOOL, args.token_file, args.use_test_db, args.quiet_print, args.verbose_print, args.rename)
-                            elif(args.read_existing_BTIDES):
-                                if(os.path.exists(btides_file)):
-                                    # Don't re-process .processed files. If we need to do that, use the --overwrite-existing-BTIDES path
-                                    # This path will just be for processing unprocessed .btides files
-                                    optionally_store_to_SQL(btides_file, args.to_SQL, args.to_BTIDALPOOL, args.token_file, args.use_test_db, args.quiet_print, args.verbose_print, args.rename)
-
-                        # Reset globals to not accumulate wasted memory
-                        TME.TME_glob.BTIDES_JSON = []
-                        TME.TME_glob.BTIDES_JSON_by_bdaddr_key.clear()
-                        TME.TME_glob.duplicate_count = 0
-                        TME.TME_glob.insert_count = 0
-                        g_last_handle_to_bdaddr = {}
+        jobs += find_import_jobs("HCI", args.HCI_logs_folder, args.HCI_logs_suffix, args.overwrite_existing_BTIDES, args.read_existing_BTIDES)
+    if args.pcaps_folder:
+        jobs += find_import_jobs("pcap", args.pcaps_folder, args.pcaps_suffix, args.overwrite_existing_BTIDES, args.read_existing_BTIDES)
 
+    # Build the schema validators once here, so that worker processes inherit them rather than each building their own
+    if(TME.TME_glob.BTIDES_validate != "off" and any(convert for (_, _, _, convert) in jobs)):
+        get_BTIDES_validators()
+
+    hci_file_export_count = 0
     pcap_file_export_count = 0
-    if args.pcaps_folder:
-        for folder in args.pcaps_folder:
-            for root, dirs, files in os.walk(folder):
-                for file in files:
-                    if file.endswith(args.pcaps_suffix):
-                        base_file_name = file[:-len(args.pcaps_suffix)]
-                        btides_file = os.path.join(root, f"{base_file_name}.btides")
-                        btides_processed_file = os.path.join(root, f"{base_file_name}.btides.processed")
-                        if (not os.path.exists(btides_file) and not os.path.exists(btides_processed_file)):
-                            qprint(f"Reading all packets from pcap {os.path.join(root, file)} into memory. (This can take a while for large pcaps. Assume a total time of 1 second per 1000 packets.)")
-                            read_pcap(os.path.join(root, file))
-                            write_BTIDES(btides_file)
-                            qprint(f"Export {btides_file} completed with no errors.")
-                            pcap_file_export_count += 1
-                            optionally_store_to_SQL(btides_file, args.to_SQL, args.to_BTIDALPOOL, args.token_file, args.use_test_db, args.quiet_print, args.verbose_print, args.rename)
-                        else:
-                            if(args.overwrite_existing_BTIDES):
-                                qprint(f"Reading all packets from pcap {os.path.join(root, file)} into memory. (This can take a while for large pcaps. Assume a total time of 1 second per 1000 packets.)")
-                                read_pcap(os.path.join(root, file))
-                                write_BTIDES(btides_file)
-                                qprint(f"Export {btides_file} completed with no errors.")
-                                pcap_file_export_count += 1
-                                optionally_store_to_SQL(btides_file, args.to_SQL, args.to_BTIDALPOOL, args.token_file, args.use_test_db, args.quiet_print, args.verbose_print, args.rename)
-                            elif(args.read_existing_BTIDES):
-                                if(os.path.exists(btides_file)):
-                                    # Don't re-process .processed files. If we need to do that, use the --overwrite-existing-BTIDES path
-                                    # This path will just be for processing unprocessed .btides files
-                                    optionally_store_to_SQL(btides_file, args.to_SQL, args.to_BTIDALPOOL, args.token_file, args.use_test_db, args.quiet_print, args.verbose_print, args.rename)
-
-                        # Reset globals to not accumulate wasted memory
-                        TME.TME_glob.BTIDES_JSON = []
-                        TME.TME_glob.BTIDES_JSON_by_bdaddr_key.clear()
-                        TME.TME_glob.duplicate_count = 0
-                        TME.TME_glob.insert_count = 0
-                        g_access_address_to_connect_ind_obj = {}
+    validated_count = 0
+    validation_time = 0.0
+    failed_jobs = []
+    for (kind, input_file, exported, error, validation) in run_import_jobs(jobs, args, args.workers):
+        validated_count += validation[0]
+        validation_time += validation[1]
+        if(error is not None):
+            print(f"Failed to import {input_file}: {error}")
+            failed_jobs.append((input_file, error))
+        if(exported):
+            if(kind == "HCI"):
+                hci_file_export_count += 1
+            else:
+                pcap_file_export_count += 1
 
     print("File conversion to BTIDES completed.")
     if(args.HCI_logs_folder):
         print(f"Converted {hci_file_export_count} HCI files found in {args.HCI_logs_folder} with suffix {args.HCI_logs_suffix}.")
     if(args.pcaps_folder):
         print(f"Converted {pcap_file_export_count} pcap files found in {args.pcaps_folder} with suffix {args.pcaps_suffix}.")
+    print(f"BTIDES schema validation ({args.validate}): {validated_count} entries in {validation_time * 1000:.1f} ms total across all files.")
+    if(failed_jobs):
+        print(f"{len(failed_jobs)} of {len(jobs)} files failed:")
+        for (input_file, error) in failed_jobs:
+            print(f"    {input_file}: {error}")
+        exit(1)
 
 
 if __name__ == "__main__":
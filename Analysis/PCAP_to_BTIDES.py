@@ -7,6 +7,9 @@
 from handle_venv import activate_venv
 activate_venv()
 import argparse
+import os
+import struct
+import uuid
 
 # Scapy related
 from scapy.layers.bluetooth4LE import *
@@ -32,7 +35,7 @@ from TME.TME_helpers import qprint, vprint
 from TME.BT_Data_Types import *
 from TME.BTIDES_Data_Types import *
 import TME.TME_glob
-from TME.TME_BTIDES_base import write_BTIDES, insert_std_optional_fields
+from TME.TME_BTIDES_base import write_BTIDES, insert_std_optional_fields, BTIDES_validation_summary
 # Advertisement Channel
 from scapy_to_BTIDES_common import *
 from TME.TME_AdvChan import *
@@ -600,7 +603,337 @@ def export_CONNECT_IND(packet):
     return True
 
 
-def read_pcap(file_path):
+# Export a single scapy-dissected packet
+def export_packet(packet):
+    # Confirm packet is BTLE
+    if packet.haslayer(BTLE):
+        btle_hdr = packet.getlayer(BTLE)
+        if(btle_hdr.access_addr != 0x8e89bed6 and btle_hdr.len == 0):
+            #qprint("Found empty non-advertisement packet, continuing")
+            return
+
+        if(btle_hdr.access_addr in g_stop_exporting_encrypted_packets_by_AA.keys()):
+            # Don't bother processing the packet if we've seen an LL_START_ENC_REQ in this connection already
+            return
+
+        if packet.haslayer(BTLE_SCAN_REQ) or packet.haslayer(BTLE_ADV_DIRECT_IND):
+            # Ignore for now. I don't particularly care to import that information for now (though TODO later it should be in the interest of completeness)
+            return
+
+        # If a packet matches on any export function, move on to the next packet
+
+        # Connection requests
+        if packet.haslayer(BTLE_CONNECT_IND):
+            if(export_CONNECT_IND(packet)): return
+
+        # Advertisement channel packets
+        # Need to check this before ADV_IND since it's a sub-class
+        if packet.haslayer(BTLE_ADV_NONCONN_IND):
+            if(export_AdvChannelData(packet, BTLE_ADV_NONCONN_IND, type_AdvChanPDU_ADV_NONCONN_IND)):
+                return
+        # Need to check this before ADV_IND since it's a sub-class
+        if packet.haslayer(BTLE_ADV_SCAN_IND):
+            adv_hdr = packet.getlayer(BTLE_ADV)
+            # Special case to ignore things which only have an AdvA, which isn't useful to us
+            if(adv_hdr.Length <= 9): # 6 for AdvA + 3 for EIR_Hdr (2) + at least 1 byte of data
+                return
+            else:
+                if(export_AdvChannelData(packet, BTLE_ADV_SCAN_IND, type_AdvChanPDU_ADV_SCAN_IND)):
+                    return
+        if packet.haslayer(BTLE_ADV_IND):
+            # It's rare, but some things advertise but then don't include any AdvData...
+            btle_adv = packet.getlayer(BTLE_ADV_IND)
+            if(len(btle_adv.data) == 0):
+                return
+            if(export_AdvChannelData(packet, BTLE_ADV_IND, type_AdvChanPDU_ADV_IND)): return
+        if packet.haslayer(BTLE_SCAN_RSP):
+            # Special case SCAN_RSP because Apple devices like to send back SCAN_RSP with no data in it,
+            # which causes it to return false and then continue to be processed above
+            btle_adv = packet.getlayer(BTLE_SCAN_RSP)
+            if(len(btle_adv.data) == 0): return
+            if(export_AdvChannelData(packet, BTLE_SCAN_RSP, type_AdvChanPDU_SCAN_RSP)): return
+        if packet.haslayer(BTLE_ADV):
+            btle_adv = packet.getlayer(BTLE_ADV)
+            if(btle_adv.PDU_type == type_AdvChanPDU_ADV_DIRECT_IND): # for malformed packets that Scapy couldn't add a BTLE_ADV_DIRECT_IND layer to...
+                # Ignore for now. I don't particularly care to import that information for now (though TODO later it should be in the interest of completeness)
+                return
+            # qprint(packet.layers())
+            # qprint("")
+
+        # LL Control packets
+        if packet.haslayer(BTLE_CTRL):
+            if(export_BTLE_CTRL(packet)): return
+
+        # ATT packets
+        # packet.show()
+        if packet.haslayer(ATT_Hdr):
+            if(export_to_ATTArray(packet)): return
+
+        # L2CAP signal channel packets
+        if packet.haslayer(L2CAP_CmdHdr):
+            if(export_to_L2CAPArray(packet)): return
+
+        # Skipping SDP for now, even though we have the capability for it,
+        # because it'd be untested since I have no pcaps w/ SDP...
+
+        # SMP packets
+        if packet.haslayer(SM_Hdr):
+            if(export_to_SMPArray(packet)): return
+        else:
+            if(TME.TME_glob.verbose_print):
+                qprint("Unknown or unparsable packet type. Skipped")
+                packet.show()
+
+
+###################################
+# Raw-struct fast path
+###################################
+
+# A full scapy dissection plus the haslayer() chain in export_packet() costs
+# about 1ms per packet, and advertising channel traffic is 95%+ of a wardriving
+# capture. So, like Scripts/Clean_BG.py, stream the pcap records ourselves and
+# decode the BLE-LL-PHDR + advertising PDU header with struct. Advertisements
+# made up entirely of the common AdvData types below are exported directly;
+# everything else (connection-mode PDUs, CONNECT_IND, unusual or malformed
+# AdvData) is handed to scapy and export_packet() exactly as before.
+# Any AdvData element that export_AdvData() would reject sends the whole packet
+# to scapy, so the two paths produce the same BTIDES output.
+
+PCAP_GLOBAL_HEADER_LEN = 24
+PCAP_RECORD_HEADER_LEN = 16
+PCAP_MAGICS = (0xA1B2C3D4, 0xA1B23C4D) # microsecond and nanosecond timestamps
+DLT_BLE_LL_WITH_PHDR = 256
+PHDR_LEN = 10
+BLE_ADV_ACCESS_ADDRESS = 0x8e89bed6
+# PHDR + access address + 2 byte PDU header + 3 byte CRC
+RAW_MIN_PACKET_LEN = PHDR_LEN + 4 + 2 + 3
+
+# Returns a generator of the raw packet bytes of every record of a classic pcap with
+# the BLE-LL-PHDR linktype, or returns None if the file is anything else
+# (e.g. pcapng), in which case the caller should fall back to scapy's PcapReader.
+def raw_pcap_records(f):
+    global_hdr = f.read(PCAP_GLOBAL_HEADER_LEN)
+    if len(global_hdr) < PCAP_GLOBAL_HEADER_LEN:
+        return None
+    for endian in ("<", ">"):
+        magic, _vmaj, _vmin, _tz, _sig, _snap, dlt = struct.unpack(endian + "IHHIIII", global_hdr)
+        if magic in PCAP_MAGICS:
+            break
+    else:
+        return None
+    if dlt != DLT_BLE_LL_WITH_PHDR:
+        return None
+    record_hdr_fmt = endian + "IIII"
+
+    def records():
+        while True:
+            rec_hdr = f.read(PCAP_RECORD_HEADER_LEN)
+            if len(rec_hdr) < PCAP_RECORD_HEADER_LEN:
+                return
+            _ts_s, _ts_u, incl_len, _orig_len = struct.unpack(record_hdr_fmt, rec_hdr)
+            pkt = f.read(incl_len)
+            if len(pkt) < incl_len:
+                return
+            yield pkt
+    return records()
+
+def raw_UUID_list(body, size, fmt_str):
+    if(len(body) % size != 0):
+        return None
+    return [fmt_str.format(int.from_bytes(body[i:i+size], byteorder='little')) for i in range(0, len(body), size)]
+
+def raw_UUID128_list(body):
+    if(len(body) % 16 != 0):
+        return None
+    return [str(uuid.UUID(bytes=body[i:i+16][::-1])) for i in range(0, len(body), 16)]
+
+# Each of these takes the EIR length byte and the element body (after the type byte),
+# and returns (BTIDES AdvData type, data, description for vprint), or None if the
+# element needs scapy + export_AdvData() to handle it.
+
+def raw_AdvData_Flags(length, body):
+    if(length != 2):
+        return None
+    flags_hex_str = f"{body[0] & 0x1F:02x}"
+    return (type_AdvData_Flags, {"length": length, "flags_hex_str": flags_hex_str}, f"Flags: {flags_hex_str}")
+
+def raw_AdvData_UUID16List(adv_data_type, desc):
+    def parse(length, body):
+        UUID16List = raw_UUID_list(body, 2, "{:04x}")
+        if(UUID16List is None):
+            return None
+        return (adv_data_type, {"length": length, "UUID16List": UUID16List}, f"{desc}: {','.join(UUID16List)}")
+    return parse
+
+def raw_AdvData_UUID32List(adv_data_type, desc):
+    def parse(length, body):
+        UUID32List = raw_UUID_list(body, 4, "{:08x}")
+        if(UUID32List is None):
+            return None
+        return (adv_data_type, {"length": length, "UUID32List": UUID32List}, f"{desc}: {','.join(UUID32List)}")
+    return parse
+
+def raw_AdvData_UUID128List(adv_data_type, desc):
+    def parse(length, body):
+        UUID128List = raw_UUID128_list(body)
+        if(UUID128List is None):
+            return None
+        return (adv_data_type, {"length": length, "UUID128List": UUID128List}, f"{desc}: {','.join(UUID128List)}")
+    return parse
+
+def raw_AdvData_Name(adv_data_type, desc):
+    def parse(length, body):
+        utf8_name = bytes_to_utf8(body)
+        data = {"length": length, "utf8_name": utf8_name, "name_hex_str": bytes_to_hex_str(body)}
+        return (adv_data_type, data, f"{desc}: {utf8_name}")
+    return parse
+
+def raw_AdvData_TxPower(length, body):
+    if(length != 2):
+        return None
+    device_tx_power = int.from_bytes(body, byteorder='little', signed=True)
+    return (type_AdvData_TxPower, {"length": length, "tx_power": device_tx_power}, f"TxPower level: {device_tx_power}")
+
+def raw_AdvData_UUID16ServiceData(length, body):
+    if(length < 3):
+        return None
+    UUID16_hex_str = f"{int.from_bytes(body[:2], byteorder='little'):04x}"
+    service_data_hex_str = bytes_to_hex_str(body[2:])
+    data = {"length": length, "UUID16": UUID16_hex_str, "service_data_hex_str": service_data_hex_str}
+    return (type_AdvData_UUID16ServiceData, data, f"UUID16: {UUID16_hex_str}, service_data_hex_str: {service_data_hex_str}")
+
+def raw_AdvData_Appearance(length, body):
+    if(length != 3):
+        return None
+    appearance_hex_str = f"{int.from_bytes(body, byteorder='little'):04x}"
+    return (type_AdvData_Appearance, {"length": length, "appearance_hex_str": appearance_hex_str}, f"appearance_hex_str: {appearance_hex_str}")
+
+def raw_AdvData_MSD(length, body):
+    # export_AdvData() doesn't export MSD without at least 1 byte beyond the company ID
+    if(length <= 3):
+        return None
+    company_id_hex_str = f"{int.from_bytes(body[:2], byteorder='little'):04x}"
+    msd_hex_str = bytes_to_hex_str(body[2:])
+    data = {"length": length, "company_id_hex_str": company_id_hex_str, "msd_hex_str": msd_hex_str}
+    return (type_AdvData_MSD, data, f"MSD: company_id = {company_id_hex_str}, data = {msd_hex_str}")
+
+g_raw_AdvData_parsers = {
+    0x01: raw_AdvData_Flags,
+    0x02: raw_AdvData_UUID16List(type_AdvData_UUID16ListIncomplete, "Incomplete UUID16 list"),
+    0x03: raw_AdvData_UUID16List(type_AdvData_UUID16ListComplete, "Complete UUID16 list"),
+    0x04: raw_AdvData_UUID32List(type_AdvData_UUID32ListIncomplete, "Incomplete UUID32 list"),
+    0x05: raw_AdvData_UUID32List(type_AdvData_UUID32ListComplete, "Complete UUID32 list"),
+    0x06: raw_AdvData_UUID128List(type_AdvData_UUID128ListIncomplete, "Incomplete UUID128 list"),
+    0x07: raw_AdvData_UUID128List(type_AdvData_UUID128ListComplete, "Complete UUID128 list"),
+    0x08: raw_AdvData_Name(type_AdvData_IncompleteName, "Incomplete Local Name"),
+    0x09: raw_AdvData_Name(type_AdvData_CompleteName, "Complete Local Name"),
+    0x0A: raw_AdvData_TxPower,
+    0x16: raw_AdvData_UUID16ServiceData,
+    0x19: raw_AdvData_Appearance,
+    0xFF: raw_AdvData_MSD,
+}
+
+# Returns the list of decoded AdvData elements, or None if any of them needs scapy
+def raw_parse_AdvData(adv_data):
+    elements = []
+    i = 0
+    adv_data_len = len(adv_data)
+    while i < adv_data_len:
+        length = adv_data[i]
+        # Zero-length padding, empty elements, and elements that run off the end of the PDU are left to scapy
+        if(length <= 1 or i + 1 + length > adv_data_len):
+            return None
+        parser = g_raw_AdvData_parsers.get(adv_data[i+1])
+        if(parser is None):
+            return None
+        element = parser(length, adv_data[i+2:i+1+length])
+        if(element is None):
+            return None
+        elements.append(element)
+        i += 1 + length
+    return elements
+
+# Returns True if the packet was fully handled (exported or deliberately ignored,
+# same as export_packet() would), or False if it needs to go through scapy instead.
+def export_raw_packet(pkt):
+    if(len(pkt) < RAW_MIN_PACKET_LEN):
+        return False
+    access_addr, = struct.unpack_from("<I", pkt, PHDR_LEN)
+    if(access_addr != BLE_ADV_ACCESS_ADDRESS):
+        if(pkt[PHDR_LEN+5] == 0):
+            # Empty non-advertisement packet
+            return True
+        if(access_addr in g_stop_exporting_encrypted_packets_by_AA.keys()):
+            return True
+        # Connection-mode PDU
+        return False
+    if(access_addr in g_stop_exporting_encrypted_packets_by_AA.keys()):
+        return True
+
+    adv_hdr = pkt[PHDR_LEN+4]
+    adv_len = pkt[PHDR_LEN+5]
+    pdu_type = adv_hdr & 0x0F
+    bdaddr_random = (adv_hdr >> 6) & 1
+    payload = pkt[PHDR_LEN+6:-3]
+
+    if(pdu_type == type_AdvChanPDU_SCAN_REQ or pdu_type == type_AdvChanPDU_ADV_DIRECT_IND):
+        # Same as export_packet(), as long as scapy would have found both BDADDRs
+        return len(payload) >= 12
+    if(pdu_type not in (type_AdvChanPDU_ADV_IND, type_AdvChanPDU_ADV_NONCONN_IND, type_AdvChanPDU_SCAN_RSP, type_AdvChanPDU_ADV_SCAN_IND)):
+        return False
+    if(len(payload) < 6):
+        return False
+    adv_data = payload[6:]
+
+    if(pdu_type == type_AdvChanPDU_ADV_SCAN_IND and adv_len <= 9):
+        return True
+    if(len(adv_data) == 0):
+        # Ignored for ADV_IND and SCAN_RSP. Leave the rare empty ADV_NONCONN_IND to scapy.
+        return pdu_type != type_AdvChanPDU_ADV_NONCONN_IND
+
+    elements = raw_parse_AdvData(adv_data)
+    if(elements is None):
+        return False
+
+    bdaddr = ':'.join(f"{b:02x}" for b in reversed(payload[:6]))
+    for (adv_data_type, data, desc) in elements:
+        vprint(f"{bdaddr}: {pdu_type} {desc}")
+        BTIDES_export_AdvData(bdaddr, bdaddr_random, pdu_type, adv_data_type, data)
+    return True
+
+
+def read_pcap(file_path, fast_path=True):
+    if(fast_path and os.path.isfile(file_path)):
+        with open(file_path, 'rb') as f:
+            records = raw_pcap_records(f)
+            if(records is not None):
+                read_raw_pcap_records(records)
+                return
+    # Not a BLE-LL-PHDR pcap (or unreadable), let scapy deal with it / report the error
+    read_pcap_scapy(file_path)
+
+
+def read_raw_pcap_records(records):
+    try:
+        i = 0
+        for pkt in records:
+            i+=1
+            if i % 1000 == 0:
+                qprint(f"Processed {i} packets")
+            if(export_raw_packet(pkt)):
+                continue
+            # Same fallback PcapReader uses for packets scapy can't dissect
+            try:
+                packet = BTLE_RF(pkt)
+            except Exception:
+                packet = conf.raw_layer(pkt)
+            export_packet(packet)
+        print(f"Done processing pcap file: {i} packets processed.")
+    except Exception as e:
+        print(f"Error reading pcap file: {e}")
+
+
+def read_pcap_scapy(file_path):
     try:
         pcap_reader = PcapReader(file_path)
 
@@ -617,84 +950,7 @@ def read_pcap(file_path):
             if i % 1000 == 0:
                 qprint(f"Processed {i} packets")
 
-            # Confirm packet is BTLE
-            if packet.haslayer(BTLE):
-                btle_hdr = packet.getlayer(BTLE)
-                if(btle_hdr.access_addr != 0x8e89bed6 and btle_hdr.len == 0):
-                    #qprint("Found empty non-advertisement packet, continuing")
-                    continue
-
-                if(btle_hdr.access_addr in g_stop_exporting_encrypted_packets_by_AA.keys()):
-                    # Don't bother processing the packet if we've seen an LL_START_ENC_REQ in this connection already
-                    continue
-
-                if packet.haslayer(BTLE_SCAN_REQ) or packet.haslayer(BTLE_ADV_DIRECT_IND):
-                    # Ignore for now. I don't particularly care to import that information for now (though TODO later it should be in the interest of completeness)
-                    continue
-
-                # If a packet matches on any export function, move on to the next packet
-
-                # Connection requests
-                if packet.haslayer(BTLE_CONNECT_IND):
-                    if(export_CONNECT_IND(packet)): continue
-
-                # Advertisement channel packets
-                # Need to check this before ADV_IND since it's a sub-class
-                if packet.haslayer(BTLE_ADV_NONCONN_IND):
-                    if(export_AdvChannelData(packet, BTLE_ADV_NONCONN_IND, type_AdvChanPDU_ADV_NONCONN_IND)):
-                        continue
-                # Need to check this before ADV_IND since it's a sub-class
-                if packet.haslayer(BTLE_ADV_SCAN_IND):
-                    adv_hdr = packet.getlayer(BTLE_ADV)
-                    # Special case to ignore things which only have an AdvA, which isn't useful to us
-                    if(adv_hdr.Length <= 9): # 6 for AdvA + 3 for EIR_Hdr (2) + at least 1 byte of data
-                        continue
-                    else:
-                        if(export_AdvChannelData(packet, BTLE_ADV_SCAN_IND, type_AdvChanPDU_ADV_SCAN_IND)):
-                            continue
-                if packet.haslayer(BTLE_ADV_IND):
-                    # It's rare, but some things advertise but then don't include any AdvData...
-                    btle_adv = packet.getlayer(BTLE_ADV_IND)
-                    if(len(btle_adv.data) == 0):
-                        continue
-                    if(export_AdvChannelData(packet, BTLE_ADV_IND, type_AdvChanPDU_ADV_IND)): continue
-                if packet.haslayer(BTLE_SCAN_RSP):
-                    # Special case SCAN_RSP because Apple devices like to send back SCAN_RSP with no data in it,
-                    # which causes it to return false and then continue to be processed above
-                    btle_adv = packet.getlayer(BTLE_SCAN_RSP)
-                    if(len(btle_adv.data) == 0): continue
-                    if(export_AdvChannelData(packet, BTLE_SCAN_RSP, type_AdvChanPDU_SCAN_RSP)): continue
-                if packet.haslayer(BTLE_ADV):
-                    btle_adv = packet.getlayer(BTLE_ADV)
-                    if(btle_adv.PDU_type == type_AdvChanPDU_ADV_DIRECT_IND): # for malformed packets that Scapy couldn't add a BTLE_ADV_DIRECT_IND layer to...
-                        # Ignore for now. I don't particularly care to import that information for now (though TODO later it should be in the interest of completeness)
-                        continue
-                    # qprint(packet.layers())
-                    # qprint("")
-
-                # LL Control packets
-                if packet.haslayer(BTLE_CTRL):
-                    if(export_BTLE_CTRL(packet)): continue
-
-                # ATT packets
-                # packet.show()
-                if packet.haslayer(ATT_Hdr):
-                    if(export_to_ATTArray(packet)): continue
-
-                # L2CAP signal channel packets
-                if packet.haslayer(L2CAP_CmdHdr):
-                    if(export_to_L2CAPArray(packet)): continue
-
-                # Skipping SDP for now, even though we have the capability for it,
-                # because it'd be untested since I have no pcaps w/ SDP...
-
-                # SMP packets
-                if packet.haslayer(SM_Hdr):
-                    if(export_to_SMPArray(packet)): continue
-                else:
-                    if(TME.TME_glob.verbose_print):
-                        qprint("Unknown or unparsable packet type. Skipped")
-                        packet.show()
+            export_packet(packet)
         return
     except Exception as e:
         print(f"Error reading pcap file: {e}")
@@ -709,6 +965,7 @@ def main():
     btides_group = parser.add_argument_group('BTIDES file output arguments')
     btides_group.add_argument('--output', action='append', required=False, help='Output file name for BTIDES JSON file.')
     btides_group.add_argument('--verbose-BTIDES', action='store_true', required=False, help='Include optional fields in BTIDES output that make it more human-readable.')
+    btides_group.add_argument('--validate', choices=['full', 'sample', 'off'], default='full', required=False, help='How much of the BTIDES output to check against the schema before writing it: every entry (full, the default), a random %d-entry sample (sample), or nothing (off). Only use sample/off for trusted input, since invalid output will be written as-is.' % TME.TME_glob.BTIDES_validate_sample_size)
 
     # SQL arguments
     sql = parser.add_argument_group('Local SQL database storage arguments (only applicable in the context of a local Blue2thprinting setup, not 3rd party tool usage.)')
@@ -721,6 +978,8 @@ def main():
     btidalpool_group.add_argument('--to-BTIDALPOOL', action='store_true', required=False, help='Send output BTIDES data to the BTIDALPOOL crowdsourcing SQL database.')
     btidalpool_group.add_argument('--token-file', type=str, required=False, help='Path to file containing JSON with the \"token\" and \"refresh_token\" fields, as obtained from Google SSO. If not provided, you will be prompted to perform Google SSO, after which you can save the token to a file and pass this argument.')
 
+    parser.add_argument('--no-fast-path', action='store_true', required=False, help='Dissect every packet with scapy, instead of decoding common advertisements directly from the pcap records. Slower, but useful for checking the fast path.')
+
     printout_group = parser.add_argument_group('Print verbosity arguments')
     printout_group.add_argument('--verbose-print', action='store_true', required=False, help='Show explicit data-not-found output.')
     printout_group.add_argument('--quiet-print', action='store_true', required=False, help='Hide all print output (useful when you only want to use --output to export data).')
@@ -744,13 +1003,15 @@ def main():
         TME.TME_glob.verbose_print = args.verbose_print
         TME.TME_glob.quiet_print = args.quiet_print
         TME.TME_glob.verbose_BTIDES = args.verbose_BTIDES
+        TME.TME_glob.BTIDES_validate = args.validate
 
         qprint("Reading all packets from pcap into memory. (This can take a while for large pcaps. Assume a total time of 1 second per 1000 packets.)")
-        read_pcap(in_pcap_filename)
+        read_pcap(in_pcap_filename, fast_path=not args.no_fast_path)
 
         qprint("Writing BTIDES data to file.")
         write_BTIDES(out_BTIDES_filename)
         qprint("Export completed with no errors.")
+        qprint(BTIDES_validation_summary())
 
         btides_to_sql_succeeded = False
         if args.to_SQL:
@@ -0,0 +1,36 @@
+########################################
+# Created by Xeno Kovah
+# Copyright(c) © Dark Mentor LLC 2023-2026
+########################################
+# This file fills in the ChipMaker_OUIs table (see TME_helpers.py) with the
+# IEEE OUIs that match each of the chip maker regexes in TME_metadata.py.
+# translator_fill_IEEE_bdaddr_to_company.sh runs it after importing the OUIs,
+# and Tell_Me_Everything.py recomputes any chip makers that are out of date
+# when it starts up, so this only needs to be run by hand with --rebuild.
+
+# Activate venv before any other imports
+from handle_venv import activate_venv
+activate_venv()
+
+import argparse
+
+import TME.TME_glob
+from TME.TME_helpers import refresh_chipmaker_ouis, load_chipmaker_ouis, qprint
+from TME.TME_metadata import ChipMaker_names_and_BT_CIDs
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill in the ChipMaker_OUIs table from IEEE_bdaddr_to_company.')
+    parser.add_argument('--rebuild', action='store_true', required=False, help='Recompute every chip maker, not just the ones whose regex or OUI import changed.')
+    parser.add_argument('--quiet-print', action='store_true', required=False, help='Hide all print output.')
+    parser.add_argument('--use-test-db', action='store_true', required=False, help='This will query from an alternate database, used for testing.')
+    args = parser.parse_args()
+
+    TME.TME_glob.quiet_print = args.quiet_print
+    TME.TME_glob.use_test_db = args.use_test_db
+
+    count = refresh_chipmaker_ouis(ChipMaker_names_and_BT_CIDs.keys(), rebuild=args.rebuild)
+    qprint(f"Recomputed the OUIs for {count} of {len(ChipMaker_names_and_BT_CIDs)} chip makers")
+    qprint(f"ChipMaker_OUIs now has {len(load_chipmaker_ouis())} OUIs")
+
+if __name__ == "__main__":
+    main()
@@ -16,7 +16,7 @@ import json
 import datetime
 import hashlib
 import threading
-import subprocess
+import multiprocessing
 import time
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
@@ -30,6 +30,8 @@ from collections import defaultdict, deque
 from pathlib import Path
 from oauth_helper import AuthClient
 from BTIDES_to_SQL import btides_to_sql_args, btides_to_sql
+from TME.TME_BTIDES_base import get_BTIDES_entry_validator
+from Tell_Me_Everything import init_query_worker, run_query_worker
 
 g_local_testing = False
 
@@ -41,6 +43,10 @@ g_max_connections_per_day = 100
 g_max_simultaneous_connections = 10
 g_max_returned_records_per_query = 100
 
+# Number of long-lived Tell_Me_Everything query worker processes.
+# This also bounds how many queries run against the database at once.
+g_num_query_workers = 4
+
 # Global dictionary to store unique file hashes for avoiding duplicate uploads
 g_unique_files = {}
 
@@ -115,41 +121,53 @@ def validate_json_content(json_content, registry):
         return False
 
 
+# Validate an (already decoded) upload one entry at a time, with the per-entry validator
+# that's built once per process, rather than building a whole-document validator per upload.
+def validate_btides_entries(json_content):
+    if not isinstance(json_content, list):
+        print("JSON data is not a BTIDES array.")
+        return False
+    entry_validator = get_BTIDES_entry_validator()
+    try:
+        for entry in json_content:
+            entry_validator.validate(instance=entry)
+        return True
+    except ValidationError as e:
+        print(f"JSON data is invalid per BTIDES Schema. Error: {e.message}")
+        return False
+
+
 def run_btides_to_sql(filename, use_test_db=False):
     # Run the primary code from BTIDES_to_SQL.py script
     # TODO: make this run in a separate thread? (Need to check if it's already running in its own thread vs. other queries)
-    b2s_args = btides_to_sql_args(input=[filename], use_test_db=use_test_db)
+    # btides_to_sql streams the file back in one entry at a time. handle_btides_data has
+    # already validated every entry (see validate_btides_entries) before writing it to
+    # pool_files, so don't validate every entry a second time.
+    b2s_args = btides_to_sql_args(input=[filename], use_test_db=use_test_db, skip_schema_validation=True)
     if(btides_to_sql(b2s_args)):
         os.rename(filename, filename + ".processed")
 
 
-# args_array should be individual arguments to pass to the script
-def run_TellMeEverything(self, username, args_array, output_filename):
-    # Run the TellMeEverything.py script in a new thread.
-    def target():
-        # FIXME: update to refactor to not require subprocess.run (or to use a separate script)
-        args_list = ["python3", "Tell_Me_Everything.py"] + args_array + ["--output", output_filename]
-        subprocess.run(args_list)
-    thread = threading.Thread(target=target)
-    thread.start()  # Starts the thread and returns immediately.
-    thread.join()   # Blocks until the thread has finished executing.
+# args_array should be individual arguments to pass to Tell_Me_Everything.py
+def run_TellMeEverything(self, username, args_array):
+    # Run the query in one of the query_pool worker processes, which already have
+    # the TME metadata loaded and a MySQL connection open, rather than paying for
+    # a new interpreter + metadata load + connection per query.
+    # Blocks this request's thread until a worker is free and has finished.
+    json_content = query_pool.apply(run_query_worker, (args_array,))
 
-    try:
-        with open(output_filename, 'r') as f:
-            json_content = json.load(f)
-
-            if len(json_content) == 0:  # Content is just []
-                send_back_response(self, username, 400, 'text/plain', b'Query yielded empty result.')
-                return 1
+    if json_content is None:
+        # Invalid arguments, or a bug in the query code
+        send_back_response(self, username, 500, 'text/plain', b'Query failed.')
+        return 1
 
-            # Validate the JSON content
-            if not validate_json_content(json_content, registry):
-                send_back_response(self, username, 400, 'text/plain', b'Query yielded invalid JSON data according to schema. Rejected.')
-                return 1
+    if len(json_content) == 0:  # Content is just []
+        send_back_response(self, username, 400, 'text/plain', b'Query yielded empty result.')
+        return 1
 
-    except FileNotFoundError:
-        # This will happen if there's a bug that causes TellMeEverything to not write the output file
-        send_back_response(self, username, 500, 'text/plain', b'Output file not found.')
+    # Validate the JSON content
+    if not validate_json_content(json_content, registry):
+        send_back_response(self, username, 400, 'text/plain', b'Query yielded invalid JSON data according to schema. Rejected.')
         return 1
 
     return json_content
@@ -222,7 +240,7 @@ def handle_btides_data(self, username, json_content, use_test_db=False):
                 return
 
             # Validate the JSON content if we don't have this file already
-            if not validate_json_content(json_content, registry):
+            if not validate_btides_entries(json_content):
                 send_back_response(self, username, 400, 'text/plain', b'Invalid JSON data according to schema. Rejected.')
                 user_log_file.write(f"{current_time}: {username}: {sha1_hash}: Invalid JSON data according to schema. Rejected.\n")
                 return
@@ -230,9 +248,9 @@ def handle_btides_data(self, username, json_content, use_test_db=False):
             # Generate the filename
             filename = f'./pool_files/{sha1_hash}-{username}-{current_time}.json'
 
-            # Save the JSON content to the file
+            # Save the JSON content to the file (the string that was hashed, rather than serializing it again)
             with open(filename, 'w') as f:
-                json.dump(json_content, f)
+                f.write(json_content_str)
 
             # Update the global dictionary
             g_unique_files[sha1_hash] = True
@@ -314,6 +332,12 @@ def handle_query(self, username, query_object, use_test_db=False):
     if("GPS_exclude_lower_right" in query_object):
         args_array.append(f"--GPS-exclude-lower-right")
         args_array.append(f"{query_object['GPS_exclude_lower_right']}")
+    if("GPS_include_upper_left" in query_object):
+        args_array.append(f"--GPS-include-upper-left")
+        args_array.append(f"{query_object['GPS_include_upper_left']}")
+    if("GPS_include_lower_right" in query_object):
+        args_array.append(f"--GPS-include-lower-right")
+        args_array.append(f"{query_object['GPS_include_lower_right']}")
     if("require_GPS" in query_object):
         args_array.append(f"--require-GPS")
     if("require_GATT_any" in query_object):
@@ -332,8 +356,6 @@ def handle_query(self, username, query_object, use_test_db=False):
         args_array.append(f"--require-LMP_VERSION_RES")
 
     current_time = datetime.datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
-    random = os.urandom(4).hex()
-    output_filename = f"/tmp/{username}-{current_time}-{random}.json"
 
     # Create a sanitized version of the username for the output filename
     sanitized_username = username.replace('@', '_at_').replace('.', '_dot_')
@@ -346,7 +368,7 @@ def handle_query(self, username, query_object, use_test_db=False):
     with open(user_log_filename, 'a') as user_log_file:
         user_log_file.write(f"{current_time}: {username}: Query: {query_object}\n")
 
-    json_content = run_TellMeEverything(self, username, args_array, output_filename)
+    json_content = run_TellMeEverything(self, username, args_array)
     if(json_content == 1): # Error
         # Error message should have already been sent to the client in run_TellMeEverything
         return
@@ -354,10 +376,6 @@ def handle_query(self, username, query_object, use_test_db=False):
         send_back_response(self, username, 200, 'application/json', json.dumps(json_content).encode('utf-8'))
         log_user_result(username, self.client_address[0], f"{len(json_content)} records returned.")
 
-    # Delete the output file after sending the response
-    if os.path.exists(output_filename):
-        os.remove(output_filename)
-
 
 log_file = open('./user_access.log', 'a')
 log_mutex = threading.Lock()
@@ -429,6 +447,12 @@ class CustomHandler(http.server.SimpleHTTPRequestHandler):
         # Get the content length
         content_length = int(self.headers['Content-Length'])
 
+        # Don't read (let alone decode) an upload that can't fit under g_max_file_size anyway.
+        # The extra 64KB is room for the token and the rest of the request around btides_content.
+        if content_length > g_max_file_size * 1024 * 1024 + 64 * 1024:
+            send_back_response(self, None, 413, 'text/plain', b'File size too big.')
+            return
+
         # Read the POST data
         post_raw_data = self.rfile.read(content_length)
 
@@ -480,28 +504,37 @@ class CustomHandler(http.server.SimpleHTTPRequestHandler):
         # Decrement the connection count
         connection_data[client_ip]["count"] -= 1
 
-# Initialize the unique files dictionary
-initialize_unique_files('./pool_files')
+# Only when run as the server, not when the query workers import this script (see query_pool below)
+if __name__ == "__main__":
+    # Initialize the unique files dictionary
+    initialize_unique_files('./pool_files')
 
-# Load the schemas and create a registry
-registry = load_schemas()
+    # Load the schemas and create a registry
+    registry = load_schemas()
 
-# Define the handler to use for the server
-handler = CustomHandler
+    # Start the query workers. They're started by a "forkserver" rather than fork()ed from
+    # this (threaded) process, because the Pool starts a replacement whenever a worker exits,
+    # which with "fork" would copy whatever locks other threads held at that moment, and
+    # the MySQL connection that run_btides_to_sql() may have opened by then.
+    # init_query_worker loads the startup data itself.
+    query_pool = multiprocessing.get_context("forkserver").Pool(g_num_query_workers, initializer=init_query_worker)
 
-# Create the server
-if(g_local_testing):
-    hostname = 'localhost'
-else:
-    hostname = '0.0.0.0'
-httpd = ThreadingHTTPServer((hostname, 3567), handler)
+    # Define the handler to use for the server
+    handler = CustomHandler
+
+    # Create the server
+    if(g_local_testing):
+        hostname = 'localhost'
+    else:
+        hostname = '0.0.0.0'
+    httpd = ThreadingHTTPServer((hostname, 3567), handler)
 
-# Create an SSL context
-context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-context.load_cert_chain(certfile="./btidalpool.ddns.net.crt", keyfile="./btidalpool.ddns.net.key")
+    # Create an SSL context
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile="./btidalpool.ddns.net.crt", keyfile="./btidalpool.ddns.net.key")
 
-# Wrap the server socket with SSL
-httpd.socket = context.wrap_socket(httpd.socket, server_side=True)
+    # Wrap the server socket with SSL
+    httpd.socket = context.wrap_socket(httpd.socket, server_side=True)
 
-print(f"Serving on https://{hostname}:3567")
-httpd.serve_forever()
\ No newline at end of file
+    print(f"Serving on https://{hostname}:3567")
+    httpd.serve_forever()
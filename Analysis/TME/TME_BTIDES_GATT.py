@@ -106,6 +106,9 @@ def BTIDES_export_GATT_Service(connect_ind_obj=None, bdaddr=None, random=None, d
             random = is_bdaddr_le_and_random(bdaddr)
         generic_SingleBDADDR_insertion_into_BTIDES_first_level_array(bdaddr, random, data, "GATTArray")
 
+# Returns the first service in GATTArray whose handle range encloses target_handle.
+# The answer for each target_handle is remembered (in TME_glob.BTIDES_subarray_indexes),
+# so that later calls only have to check services appended to GATTArray since the last one.
 def find_service_with_target_handle_in_range(connect_ind_obj=None, bdaddr=None, random=None, target_handle=None):
     if(connect_ind_obj):
         base = lookup_DualBDADDR_base_entry(connect_ind_obj)
@@ -113,12 +116,24 @@ def find_service_with_target_handle_in_range(connect_ind_obj=None, bdaddr=None,
         base = lookup_SingleBDADDR_base_entry(bdaddr, random)
     if("GATTArray" not in base.keys()):
         return None
-    for service_entry in base["GATTArray"]:
-        # Check if the begin and end service handles enclose this characteristic value
-        if(service_entry != None and "begin_handle" in service_entry.keys() and service_entry["begin_handle"] < target_handle and
-           "end_handle" in service_entry.keys() and service_entry["end_handle"] >= target_handle):
-            return service_entry
-    return None
+    GATTArray = base["GATTArray"]
+    index = TME.TME_glob.BTIDES_subarray_indexes.get((id(GATTArray), "service_by_handle"))
+    if(index is None or index["array"] is not GATTArray or index["count"] > len(GATTArray)):
+        index = {"array": GATTArray, "count": 0, "by_handle": {}}
+        TME.TME_glob.BTIDES_subarray_indexes[(id(GATTArray), "service_by_handle")] = index
+    index["count"] = len(GATTArray)
+
+    # [first matching service or None, number of services checked]
+    found = index["by_handle"].setdefault(target_handle, [None, 0])
+    if(found[0] is None):
+        for service_entry in GATTArray[found[1]:]:
+            # Check if the begin and end service handles enclose this characteristic value
+            if(service_entry != None and "begin_handle" in service_entry.keys() and service_entry["begin_handle"] < target_handle and
+               "end_handle" in service_entry.keys() and service_entry["end_handle"] >= target_handle):
+                found[0] = service_entry
+                break
+        found[1] = len(GATTArray)
+    return found[0]
 
 def BTIDES_export_GATT_Characteristic(connect_ind_obj=None, bdaddr=None, random=None, data=None):
     global BTIDES_JSON
@@ -145,6 +160,8 @@ def find_matching_characteristic(characteristics, target_handle):
     return None
 
 # Pass either handle for the Characteristic itself's handle, or value_handle for the Characteristic's value_handle
+# Looks the handle up in an index of every characteristic in GATTArray, which is kept up to date
+# by indexing just the characteristics appended to each service since the last call.
 def find_characteristic_by_handle(connect_ind_obj=None, bdaddr=None, random=None, handle=None, value_handle=None):
     if(connect_ind_obj):
         base = lookup_DualBDADDR_base_entry(connect_ind_obj)
@@ -152,15 +169,34 @@ def find_characteristic_by_handle(connect_ind_obj=None, bdaddr=None, random=None
         base = lookup_SingleBDADDR_base_entry(bdaddr, random)
     if("GATTArray" not in base.keys()):
         return None
-    for service_entry in base["GATTArray"]:
-        # Check if the begin and end service handles enclose this characteristic value
+    GATTArray = base["GATTArray"]
+    index = TME.TME_glob.BTIDES_subarray_indexes.get((id(GATTArray), "characteristic_by_handle"))
+    if(index is None or index["array"] is not GATTArray or len(index["counts"]) > len(GATTArray)):
+        # counts[i] is how many of GATTArray[i]["characteristics"] have been indexed
+        index = {"array": GATTArray, "counts": [], "handle": {}, "value_handle": {}}
+        TME.TME_glob.BTIDES_subarray_indexes[(id(GATTArray), "characteristic_by_handle")] = index
+    counts = index["counts"]
+    counts.extend([0] * (len(GATTArray) - len(counts)))
+    for service_pos, service_entry in enumerate(GATTArray):
         if(service_entry != None and "characteristics" in service_entry.keys()):
-            for characteristic_entry in service_entry["characteristics"]:
-                if(characteristic_entry and handle and characteristic_entry["handle"] == handle):
-                    return characteristic_entry
-                if(characteristic_entry and value_handle and characteristic_entry["value_handle"] == value_handle):
-                    return characteristic_entry
-    return None
+            characteristics = service_entry["characteristics"]
+            for char_pos in range(counts[service_pos], len(characteristics)):
+                characteristic_entry = characteristics[char_pos]
+                if(characteristic_entry):
+                    # Entries are (position, characteristic), so the first one in GATTArray order can be picked
+                    for key in ("handle", "value_handle"):
+                        if(key in characteristic_entry.keys()):
+                            index[key].setdefault(characteristic_entry[key], []).append(((service_pos, char_pos), characteristic_entry))
+            counts[service_pos] = len(characteristics)
+
+    matches = []
+    if(handle):
+        matches += index["handle"].get(handle, [])
+    if(value_handle):
+        matches += index["value_handle"].get(value_handle, [])
+    if(len(matches) == 0):
+        return None
+    return min(matches, key=lambda match: match[0])[1]
 
 def BTIDES_export_GATT_Characteristic_Value(connect_ind_obj=None, bdaddr=None, random=None, data=None):
     global BTIDES_JSON
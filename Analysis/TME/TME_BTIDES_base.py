@@ -7,7 +7,7 @@
 # BlueTooth Information Data Exchange Schema (BTIDES!)
 # as given here: https://darkmentor.com/BTIDES_Schema/BTIDES.html
 
-import json, os, re
+import codecs, json, operator, os, random, re, time
 import TME.TME_glob
 
 from jsonschema import validate, ValidationError
@@ -36,42 +36,106 @@ BTIDES_files = ["BTIDES_base.json",
                 "BTIDES_GPS.json"
                 ]
 
-def write_BTIDES(out_filename):
-    # print(json.dumps(TME.TME_glob.BTIDES_JSON, indent=2))
-    # Sanity check the BTIDES data against the schema before export, to not write garbage
-    # Import all the local BTIDES json schema files, so that we don't hit the website all the time
-    if(len(TME.TME_glob.BTIDES_JSON) == 0):
-        print("BTIDES_JSON is empty. Nothing to write.")
-        #exit(-1)
+BTIDES_required_version = "0.5.0"
 
-    all_schemas = []
-    required_version = "0.5.0"
+def version_tuple(v):
+    return tuple(map(int, (v.split("."))))
+
+# The schema validators are built once per process (per schema directory) and then reused,
+# since loading the 12 schema files and building the referencing Registry costs far more
+# than validating a typical per-file or per-device BTIDES list.
+# Maps schema dir -> (validator for a whole BTIDES list, validator for a single entry)
+_BTIDES_validators = {}
 
-    def version_tuple(v):
-        return tuple(map(int, (v.split("."))))
+# Import all the local BTIDES json schema files, so that we don't hit the website all the time
+# Raises ValueError if the on-disk schema is older than BTIDES_required_version
+def get_BTIDES_validators():
+    schema_dir = _BTIDES_SCHEMA_DIR
+    validators = _BTIDES_validators.get(schema_dir)
+    if(validators is not None):
+        return validators
 
+    all_schemas = []
     for file in BTIDES_files:
-        with open(os.path.join(_BTIDES_SCHEMA_DIR, file), 'r') as f:
+        with open(os.path.join(schema_dir, file), 'r') as f:
             #BTIDES_Schema
             s = json.load(f)
             if file == "BTIDES_base.json":
                 schema_version = s.get("version", "0.0.0")
-                if version_tuple(schema_version) < version_tuple(required_version):
-                    raise ValueError(f"Schema version {schema_version} is less than the required version {required_version}")
+                if version_tuple(schema_version) < version_tuple(BTIDES_required_version):
+                    raise ValueError(f"Schema version {schema_version} is less than the required version {BTIDES_required_version}")
             schema = Resource.from_contents(s)
             all_schemas.append((s["$id"], schema))
 
     registry = Registry().with_resources( all_schemas )
 
+    list_validator = Draft202012Validator(
+        {"$ref": "https://darkmentor.com/BTIDES_Schema/BTIDES_base.json"},
+        registry=registry,
+    )
+    entry_validator = Draft202012Validator(
+        {"anyOf": [
+            {"$ref": "https://darkmentor.com/BTIDES_Schema/BTIDES_base.json#/definitions/SingleBDADDR"},
+            {"$ref": "https://darkmentor.com/BTIDES_Schema/BTIDES_base.json#/definitions/DualBDADDR"}
+        ]},
+        registry=registry,
+    )
+    validators = (list_validator, entry_validator)
+    _BTIDES_validators[schema_dir] = validators
+    return validators
+
+def get_BTIDES_entry_validator():
+    return get_BTIDES_validators()[1]
+
+# Validate the entries that write_BTIDES is about to export, according to TME_glob.BTIDES_validate:
+#   "full"   - the whole list, against BTIDES_base.json
+#   "sample" - a random BTIDES_validate_sample_size entries (for trusted internal producers)
+#   "off"    - nothing
+# If changed_entries is given (and the policy isn't "off"), only those entries are validated,
+# because the caller knows the rest of the list was already validated when it was last written.
+# Raises ValidationError for the first invalid entry found.
+def validate_BTIDES_for_export(changed_entries=None):
+    policy = TME.TME_glob.BTIDES_validate
+    if(policy == "off"):
+        return
+    list_validator, entry_validator = get_BTIDES_validators()
+
+    start = time.perf_counter()
+    try:
+        if(changed_entries is not None):
+            entries = changed_entries
+        elif(policy == "sample"):
+            entries = TME.TME_glob.BTIDES_JSON
+            if(len(entries) > TME.TME_glob.BTIDES_validate_sample_size):
+                entries = random.sample(entries, TME.TME_glob.BTIDES_validate_sample_size)
+        else:
+            list_validator.validate(instance=TME.TME_glob.BTIDES_JSON)
+            TME.TME_glob.BTIDES_validated_count += len(TME.TME_glob.BTIDES_JSON)
+            return
+        for entry in entries:
+            entry_validator.validate(instance=entry)
+            TME.TME_glob.BTIDES_validated_count += 1
+    finally:
+        TME.TME_glob.BTIDES_validation_time += time.perf_counter() - start
+
+# One-line timing report of the validation done so far by this process
+def BTIDES_validation_summary():
+    return f"BTIDES schema validation ({TME.TME_glob.BTIDES_validate}): {TME.TME_glob.BTIDES_validated_count} entries in {TME.TME_glob.BTIDES_validation_time * 1000:.1f} ms"
+
+# changed_entries: see validate_BTIDES_for_export()
+def write_BTIDES(out_filename, changed_entries=None):
+    # print(json.dumps(TME.TME_glob.BTIDES_JSON, indent=2))
+    # Sanity check the BTIDES data against the schema before export, to not write garbage
+    if(len(TME.TME_glob.BTIDES_JSON) == 0):
+        print("BTIDES_JSON is empty. Nothing to write.")
+        #exit(-1)
+
     # Sanity check every entry against the Schema
     try:
-        Draft202012Validator(
-            {"$ref": "https://darkmentor.com/BTIDES_Schema/BTIDES_base.json"},
-            registry=registry,
-        ).validate(instance=TME.TME_glob.BTIDES_JSON)
+        validate_BTIDES_for_export(changed_entries)
         #print("JSON is valid according to BTIDES Schema")
     except ValidationError as e:
-        print(f"JSON data is invalid per BTIDES Schema version {required_version}. Check any changes to schema or code. Error:", e.message)
+        print(f"JSON data is invalid per BTIDES Schema version {BTIDES_required_version}. Check any changes to schema or code. Error:", e.message)
         print(json.dumps(TME.TME_glob.BTIDES_JSON, indent=2))
         exit(-1)
 
@@ -80,6 +144,95 @@ def write_BTIDES(out_filename):
         #json.dump(TME.TME_glob.BTIDES_JSON, fp=f, indent=2) # For pretty-printing to make output more readable
 
 
+# Incremental reader for a BTIDES file (a top-level JSON array of entries).
+# Yields one top-level entry at a time instead of json.load()ing the whole
+# file, so peak memory is bounded by the largest single entry (plus one read
+# chunk) and callers can start importing the first entry immediately.
+# f must be opened in binary mode. If progress is a list, progress[0] is kept
+# updated with the number of bytes read so far (for percentage reporting).
+# Raises json.JSONDecodeError on malformed input, like json.load() would.
+_ws_re = re.compile(r'[ \t\n\r]*')
+
+def iter_BTIDES_entries(f, chunk_size=1024*1024, progress=None):
+    decoder = json.JSONDecoder()
+    utf8_decoder = codecs.getincrementaldecoder('utf-8')()
+    buf = ""
+    pos = 0
+    eof = False
+    bytes_read = 0
+
+    # Appends the next size bytes to the unconsumed part of the buffer.
+    # Returns False at EOF.
+    def read_more(size):
+        nonlocal buf, pos, eof, bytes_read
+        data = f.read(size)
+        if not data:
+            eof = True
+            buf = buf[pos:] + utf8_decoder.decode(b"", final=True)
+            pos = 0
+            return False
+        bytes_read += len(data)
+        if progress is not None:
+            progress[0] = bytes_read
+        buf = buf[pos:] + utf8_decoder.decode(data)
+        pos = 0
+        return True
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            pos = _ws_re.match(buf, pos).end()
+            if pos < len(buf) or eof or not read_more(chunk_size):
+                return
+
+    def error(msg):
+        raise json.JSONDecodeError(msg, buf, pos)
+
+    read_more(chunk_size)
+    if buf.startswith('\ufeff'):
+        pos = 1
+    skip_ws()
+    if pos >= len(buf) or buf[pos] != '[':
+        error("Expecting '[' at start of BTIDES array")
+    pos += 1
+    skip_ws()
+    if pos < len(buf) and buf[pos] == ']':
+        return
+
+    while True:
+        skip_ws()
+        read_size = chunk_size
+        while True:
+            try:
+                entry, end = decoder.raw_decode(buf, pos)
+                # A value ending exactly at the end of the buffer may be a
+                # truncated scalar, so only trust it once more data (or EOF) follows
+                if end < len(buf) or eof:
+                    break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            # Double the read size when a single entry spans many chunks, so
+            # the re-attempted decodes stay amortized linear
+            read_more(read_size)
+            read_size *= 2
+        pos = end
+        yield entry
+
+        skip_ws()
+        if pos >= len(buf):
+            error("Unterminated BTIDES array")
+        if buf[pos] == ']':
+            pos += 1
+            skip_ws()
+            if pos < len(buf):
+                error("Extra data after BTIDES array")
+            return
+        if buf[pos] != ',':
+            error("Expecting ',' delimiter between BTIDES entries")
+        pos += 1
+
+
 # Find SingleBDADDR type entries which match the given bdaddr and random.
 # O(1) dict lookup against BTIDES_JSON_by_bdaddr_key. The index is maintained
 # by register_SingleBDADDR_in_index (called from every SingleBDADDR append
@@ -99,23 +252,134 @@ def register_SingleBDADDR_in_index(base):
     TME.TME_glob.BTIDES_JSON_by_bdaddr_key[(bdaddr.lower(), base.get("bdaddr_rand"))] = base
 
 
-# Rebuild the SingleBDADDR lookup index from the current BTIDES_JSON list.
+# Rebuild the SingleBDADDR and DualBDADDR lookup indexes from the current BTIDES_JSON list,
+# and drop the sub-array indexes (they get rebuilt lazily on next use).
 # Call after any bulk mutation that bypasses the insertion helpers (e.g.
-# TME.TME_glob.BTIDES_JSON = json.load(f) in BTIDES_to_SQL.py) or after a
+# TME.TME_glob.BTIDES_JSON = json.load(f) in Tell_Me_Everything.py) or after a
 # bulk removal (filter, slice-replace) if subsequent lookups are expected.
 def rebuild_SingleBDADDR_index():
     TME.TME_glob.BTIDES_JSON_by_bdaddr_key.clear()
+    TME.TME_glob.BTIDES_JSON_by_connect_ind_key.clear()
+    TME.TME_glob.BTIDES_subarray_indexes.clear()
     for item in TME.TME_glob.BTIDES_JSON:
         if "bdaddr" in item:
             register_SingleBDADDR_in_index(item)
+        elif "CONNECT_IND" in item:
+            register_DualBDADDR_in_index(item)
+
+
+# Returns a hashable stand-in for a JSON value, such that
+# BTIDES_hash_key(a) == BTIDES_hash_key(b) exactly when a == b
+def BTIDES_hash_key(value):
+    if isinstance(value, dict):
+        return frozenset((k, BTIDES_hash_key(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(BTIDES_hash_key(v) for v in value)
+    return value
 
 
 # Find DualBDADDR type entries which match the given CONNECT_IND
+# O(1) dict lookup against BTIDES_JSON_by_connect_ind_key, which is maintained
+# the same way as BTIDES_JSON_by_bdaddr_key (see lookup_SingleBDADDR_base_entry)
 def lookup_DualBDADDR_base_entry(connect_ind_obj):
-    for item in TME.TME_glob.BTIDES_JSON:
-        if "CONNECT_IND" in item.keys() and item["CONNECT_IND"] == connect_ind_obj:
-            return item
-    return None
+    return TME.TME_glob.BTIDES_JSON_by_connect_ind_key.get(BTIDES_hash_key(connect_ind_obj))
+
+
+# Call after appending a DualBDADDR base entry to BTIDES_JSON, to keep the lookup index in sync.
+# The first entry for a given CONNECT_IND wins, as it did with the old linear search.
+def register_DualBDADDR_in_index(base):
+    TME.TME_glob.BTIDES_JSON_by_connect_ind_key.setdefault(BTIDES_hash_key(base["CONNECT_IND"]), base)
+
+
+#################################
+# Sub-array indexes
+#################################
+# Adding an object to a sub-array of a BTIDES entry (e.g. AdvChanArray, or the AdvDataArray
+# within one of its entries) first checks that a matching object isn't already there.
+# A linear search for that makes building a device's entry quadratic in the size of its arrays,
+# so instead each array gets a hash index, built on first use and then caught up with whatever
+# has been appended to the array since (by anyone), so it needs no per-append-site upkeep.
+# Objects are hashed by just their primitive (int/float/str/bool) fields, since those are the only
+# values non_recursive_primitive_equality_check() compares, and they don't change once an object is
+# in an array (whereas nested arrays, e.g. a GATT service's characteristics, keep growing).
+# That comparison treats a primitive on one side and anything else (e.g. None) on the other as
+# equal, so objects are first grouped by their "shape" (which of their fields hold primitives),
+# and a lookup only hashes the fields that the data and a shape both have primitives for.
+# (Not by their whole key set, since objects can gain keys once they're in an array, e.g. a
+# GATT service's "characteristics".) Every hash hit is then checked with the original comparison.
+
+BTIDES_primitive_types = (int, float, str, bool)
+
+def primitive_fields_shape(obj):
+    if(not isinstance(obj, dict)):
+        return None
+    return frozenset(k for k, v in obj.items() if isinstance(v, BTIDES_primitive_types))
+
+def primitive_fields_hash_key(obj, fields=None):
+    if(not isinstance(obj, dict)):
+        return BTIDES_hash_key(obj)
+    if(fields is None):
+        return frozenset((k, v) for k, v in obj.items() if isinstance(v, BTIDES_primitive_types))
+    return frozenset((k, obj[k]) for k in fields)
+
+# Arrays up to this long (which is most of them) are just searched linearly, which is cheaper
+BTIDES_subarray_index_min_len = 32
+
+# Returns the first object in array which matches data, or None
+# kind is "exact" (== comparison) or "shallow" (non_recursive_primitive_equality_check())
+def find_in_BTIDES_subarray(array, data, kind="exact"):
+    if(len(array) <= BTIDES_subarray_index_min_len):
+        if(kind == "exact"):
+            for obj in array:
+                if(obj == data):
+                    return obj
+        else:
+            for obj in array:
+                if(obj is not None and non_recursive_primitive_equality_check(obj, data)):
+                    return obj
+        return None
+
+    # Holding a reference to the array in the index keeps its id() from being reused
+    index = TME.TME_glob.BTIDES_subarray_indexes.get(id(array))
+    if(index is None or index["array"] is not array or index["count"] > len(array)):
+        index = {"array": array, "count": 0, "shapes": {}}
+        TME.TME_glob.BTIDES_subarray_indexes[id(array)] = index
+    # shape -> hash key -> [(position in array, object)], in array order
+    shapes = index["shapes"]
+    if(index["count"] < len(array)):
+        for position in range(index["count"], len(array)):
+            obj = array[position]
+            if(obj is not None):
+                buckets = shapes.setdefault(primitive_fields_shape(obj), {})
+                buckets.setdefault(primitive_fields_hash_key(obj), []).append((position, obj))
+        index["count"] = len(array)
+
+    match_func = BTIDES_subarray_match_funcs[kind]
+    data_shape = primitive_fields_shape(data)
+    if(data_shape is None):
+        candidate_buckets = [shapes.get(None, {}).get(primitive_fields_hash_key(data), ())]
+    else:
+        candidate_buckets = []
+        for (shape, buckets) in shapes.items():
+            if(shape is None):
+                continue
+            if(shape <= data_shape):
+                candidate_buckets.append(buckets.get(primitive_fields_hash_key(data, shape), ()))
+            elif(all(k in data for k in shape - data_shape)):
+                # data has something other than a primitive where these objects have one,
+                # which the comparison skips, so there's no one bucket to look in
+                candidate_buckets.extend(buckets.values())
+            # else these objects have a field data doesn't have at all, so none of them can match
+    # The first match in array order, across all the shapes
+    found = None
+    for bucket in candidate_buckets:
+        for (position, obj) in bucket:
+            if(found is not None and position >= found[0]):
+                break
+            if(match_func(obj, data)):
+                found = (position, obj)
+                break
+    return None if found is None else found[1]
 
 
 ############################
@@ -167,9 +431,8 @@ def generic_SingleBDADDR_insertion_into_BTIDES_first_level_array(bdaddr, random,
             return True
         else:
             # There is an bdaddr_specific_entry for this BDADDR, and GATTArray entries, so check if ours already exists, and if so, we're done
-            for obj in bdaddr_specific_entry[target_tier1_array_name]:
-                if(obj == tier1_data):
-                    return True
+            if(find_in_BTIDES_subarray(bdaddr_specific_entry[target_tier1_array_name], tier1_data) is not None):
+                return True
             # If we get here, we exhaused all target_tier1_array_name entries without a match. So append our new bdaddr_specific_entry onto GATTArray
             bdaddr_specific_entry[target_tier1_array_name].append(tier1_data)
             return True
@@ -188,11 +451,13 @@ def generic_DualBDADDR_insertion_into_BTIDES_zeroth_level(connect_ind_obj):
             # If there's nothing in the BTIDES JSON, then we need to add the DualBDADDR entry as the first thing
             DualBDADDR_entry = ff_DualBDADDR_base(connect_ind_obj)
             TME.TME_glob.BTIDES_JSON = [ DualBDADDR_entry ]
+            register_DualBDADDR_in_index(DualBDADDR_entry)
             return True
         else:
             # If there's already stuff in the BTIDES JSON, append this new DualBDADDR entry to the end
             DualBDADDR_entry = ff_DualBDADDR_base(connect_ind_obj)
             TME.TME_glob.BTIDES_JSON.append(DualBDADDR_entry)
+            register_DualBDADDR_in_index(DualBDADDR_entry)
             return True
     else:
         #print("CONNECT_IND already exists in the BTIDES JSON. Nothing to do.")
@@ -210,6 +475,7 @@ def generic_DualBDADDR_insertion_into_BTIDES_first_level_array(connect_ind_obj,
         base = ff_DualBDADDR_base(connect_ind_obj)
         base[target_tier1_array_name] = [ tier1_data ]
         TME.TME_glob.BTIDES_JSON.append(base)
+        register_DualBDADDR_in_index(base)
         return True
     else:
         if(target_tier1_array_name not in bdaddr_pair_specific_entry.keys()):
@@ -218,9 +484,8 @@ def generic_DualBDADDR_insertion_into_BTIDES_first_level_array(connect_ind_obj,
             return True
         else:
             # There is an bdaddr_specific_entry for this BDADDR, and GATTArray entries, so check if ours already exists, and if so, we're done
-            for obj in bdaddr_pair_specific_entry[target_tier1_array_name]:
-                if(obj == tier1_data):
-                    return True
+            if(find_in_BTIDES_subarray(bdaddr_pair_specific_entry[target_tier1_array_name], tier1_data) is not None):
+                return True
             # If we get here, we exhaused all target_tier1_array_name entries without a match. So append our new bdaddr_specific_entry onto GATTArray
             bdaddr_pair_specific_entry[target_tier1_array_name].append(tier1_data)
             return True
@@ -250,6 +515,12 @@ def non_recursive_primitive_equality_check(dict1, dict2):
 
     return True
 
+# Comparison for each find_in_BTIDES_subarray() kind
+BTIDES_subarray_match_funcs = {
+    "exact": operator.eq,
+    "shallow": non_recursive_primitive_equality_check,
+}
+
 
 # This is for inserting things into not the top level array, but a sub-array
 # e.g. "AdvDataArray" (tier2) under "AdvChanArray" (tier1), or "characteristics" (tier1), under "GATTArray" (tier1)
@@ -280,23 +551,22 @@ def generic_SingleBDADDR_insertion_into_BTIDES_second_level_array(bdaddr, random
             return True
         else:
             # There is an bdaddr_specific_entry for this BDADDR, and GATTArray entries, so check if ours already exists, and if so, we're done
-            for t1_obj in bdaddr_specific_entry[target_tier1_array_name]:
-                # Do a shallow check of whether the found object matches the target tier1 data, while not recursing into embedded objects
-                if(non_recursive_primitive_equality_check(t1_obj, tier1_data)):
-                    # Descend into the second level
-                    if(target_tier2_array_name not in t1_obj.keys()):
-                        # Key is missing, so just insert new tier2_array with tier2_data
-                        t1_obj[target_tier2_array_name] = [ tier2_data ]
-                        return True
-                    else:
-                        # Check for an exact match of the tier2_data, and if so, we're done
-                        for t2_obj in t1_obj[target_tier2_array_name]:
-                            if(t2_obj == tier2_data):
-                                return True
-
-                        # If we got here, nothing matched, so append the tier2_data
-                        t1_obj[target_tier2_array_name].append(tier2_data)
+            # Do a shallow check of whether the found object matches the target tier1 data, while not recursing into embedded objects
+            t1_obj = find_in_BTIDES_subarray(bdaddr_specific_entry[target_tier1_array_name], tier1_data, "shallow")
+            if(t1_obj is not None):
+                # Descend into the second level
+                if(target_tier2_array_name not in t1_obj.keys()):
+                    # Key is missing, so just insert new tier2_array with tier2_data
+                    t1_obj[target_tier2_array_name] = [ tier2_data ]
+                    return True
+                else:
+                    # Check for an exact match of the tier2_data, and if so, we're done
+                    if(find_in_BTIDES_subarray(t1_obj[target_tier2_array_name], tier2_data) is not None):
                         return True
+
+                    # If we got here, nothing matched, so append the tier2_data
+                    t1_obj[target_tier2_array_name].append(tier2_data)
+                    return True
             # If we get here, we exhaused all target_tier1_array_name entries without a match. So append our new bdaddr_specific_entry onto GATTArray
             bdaddr_specific_entry[target_tier1_array_name].append(tier1_data)
             return True
@@ -317,6 +587,7 @@ def generic_DualBDADDR_insertion_into_BTIDES_second_level_array(connect_ind_obj,
         base = ff_DualBDADDR_base(connect_ind_obj)
         base[target_tier1_array_name] = [ tier1_data ]
         TME.TME_glob.BTIDES_JSON.append(base)
+        register_DualBDADDR_in_index(base)
         return True
     else:
         if(target_tier1_array_name not in bdaddr_pair_specific_entry.keys()):
@@ -325,23 +596,22 @@ def generic_DualBDADDR_insertion_into_BTIDES_second_level_array(connect_ind_obj,
             return True
         else:
             # There is an bdaddr_pair_specific_entry for this BDADDR pair, and GATTArray entries, so check if ours already exists, and if so, we're done
-            for t1_obj in bdaddr_pair_specific_entry[target_tier1_array_name]:
-                # Do a shallow check of whether the found object matches the target tier1 data, while not recursing into embedded objects
-                if(non_recursive_primitive_equality_check(t1_obj, tier1_data)):
-                    # Descend into the second level
-                    if(target_tier2_array_name not in t1_obj.keys()):
-                        # Key is missing, so just insert new tier2_array with tier2_data
-                        t1_obj[target_tier2_array_name] = [ tier2_data ]
-                        return True
-                    else:
-                        # Check for an exact match of the tier2_data, and if so, we're done
-                        for t2_obj in t1_obj[target_tier2_array_name]:
-                            if(t2_obj == tier2_data):
-                                return True
-
-                        # If we got here, nothing matched, so append the tier2_data
-                        t1_obj[target_tier2_array_name].append(tier2_data)
+            # Do a shallow check of whether the found object matches the target tier1 data, while not recursing into embedded objects
+            t1_obj = find_in_BTIDES_subarray(bdaddr_pair_specific_entry[target_tier1_array_name], tier1_data, "shallow")
+            if(t1_obj is not None):
+                # Descend into the second level
+                if(target_tier2_array_name not in t1_obj.keys()):
+                    # Key is missing, so just insert new tier2_array with tier2_data
+                    t1_obj[target_tier2_array_name] = [ tier2_data ]
+                    return True
+                else:
+                    # Check for an exact match of the tier2_data, and if so, we're done
+                    if(find_in_BTIDES_subarray(t1_obj[target_tier2_array_name], tier2_data) is not None):
                         return True
+
+                    # If we got here, nothing matched, so append the tier2_data
+                    t1_obj[target_tier2_array_name].append(tier2_data)
+                    return True
             # If we get here, we exhaused all target_tier1_array_name entries without a match. So append our new bdaddr_pair_specific_entry onto the target_tier1_array
             bdaddr_pair_specific_entry[target_tier1_array_name].append(tier1_data)
             return True
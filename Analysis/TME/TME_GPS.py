@@ -3,27 +3,81 @@
 # Copyright(c) © Dark Mentor LLC 2023-2026
 ########################################
 
+import math
 from datetime import datetime
 
 from TME.TME_helpers import *
 from TME.TME_BTIDES_GPS import BTIDES_export_GPS_coordinate
 from TME.TME_glob import i1, i2, i3, i4, i5 # Required for terser usage within print statements
 
-###########################################
-# Print GPS information, if present
-###########################################
+########################################
+# GPS bounding box searches
+########################################
+# bdaddr_to_GPS has a gps_cell column, generated by MySQL from lat/lon, that
+# numbers the 0.1 x 0.1 degree grid cell each coordinate falls in, row by row:
+#   (FLOOR(lat * 10) + 900) * 3601 + (FLOOR(lon * 10) + 1800)
+# So the cells covering a bounding box are one contiguous range of gps_cell
+# values per row of cells, which the (gps_cell, lat, lon, bdaddr) index can
+# answer without reading the table, and a box search is a single query no
+# matter how many devices are being filtered, instead of fetching and testing
+# every coordinate of every device in Python.
+# Boxes are given as (lat, lon) tuples for the upper left (north west) and
+# lower right (south east) corners, and include their edges.
+
+GPS_CELLS_PER_DEGREE = 10
+GPS_CELL_ROW_LENGTH = 360 * GPS_CELLS_PER_DEGREE + 1
+
+# Beyond this many rows of cells, a box covers enough of the table that it's
+# cheaper to just scan lat/lon than to do that many index ranges
+MAX_GPS_CELL_RANGES = 64
+
+# Returns the (first gps_cell, last gps_cell) ranges covering the box, one per row of cells,
+# or None if that's more than MAX_GPS_CELL_RANGES
+def gps_cell_ranges(upper_left_tuple, lower_right_tuple):
+    (lat_max, lon_min) = upper_left_tuple
+    (lat_min, lon_max) = lower_right_tuple
+    first_row = math.floor(lat_min * GPS_CELLS_PER_DEGREE) + 90 * GPS_CELLS_PER_DEGREE
+    last_row = math.floor(lat_max * GPS_CELLS_PER_DEGREE) + 90 * GPS_CELLS_PER_DEGREE
+    first_column = math.floor(lon_min * GPS_CELLS_PER_DEGREE) + 180 * GPS_CELLS_PER_DEGREE
+    last_column = math.floor(lon_max * GPS_CELLS_PER_DEGREE) + 180 * GPS_CELLS_PER_DEGREE
+    if(last_row - first_row + 1 > MAX_GPS_CELL_RANGES):
+        return None
+    return [(row * GPS_CELL_ROW_LENGTH + first_column, row * GPS_CELL_ROW_LENGTH + last_column) for row in range(first_row, last_row + 1)]
+
+# Returns (WHERE clause, values) selecting the bdaddr_to_GPS rows within the box
+def gps_box_condition(upper_left_tuple, lower_right_tuple):
+    condition = "lat BETWEEN %s AND %s AND lon BETWEEN %s AND %s"
+    values = (lower_right_tuple[0], upper_left_tuple[0], upper_left_tuple[1], lower_right_tuple[1])
+    ranges = gps_cell_ranges(upper_left_tuple, lower_right_tuple)
+    if(ranges is None):
+        return (condition, values)
+    if(len(ranges) == 0):
+        # Upside down box
+        return ("FALSE", ())
+    cell_condition = " OR ".join(["gps_cell BETWEEN %s AND %s"] * len(ranges))
+    return (f"({cell_condition}) AND {condition}", tuple(v for cell_range in ranges for v in cell_range) + values)
+
+# Returns the set of bdaddrs with any GPS coordinate within the box
+def get_bdaddrs_in_GPS_box(upper_left_tuple, lower_right_tuple, bdaddr_random=None):
+    (condition, values) = gps_box_condition(upper_left_tuple, lower_right_tuple)
+    if(bdaddr_random is not None):
+        # Same as print_GPS(): BT Classic coordinates are stored under bdaddr_random = 0
+        condition = f"bdaddr_random = %s AND {condition}"
+        values = (bdaddr_random,) + values
+    select_query = f"SELECT DISTINCT bdaddr FROM bdaddr_to_GPS WHERE {condition}"
+    return {bdaddr for (bdaddr,) in execute_query(select_query, values)}
 
 # If there exists any GPS coordinates for the given bdaddr within the exclusion box,
 # return True, otherwise return False.
+# (To filter many bdaddrs, use get_bdaddrs_in_GPS_box() once instead.)
 def is_GPS_coordinate_within_exclusion_box(bdaddr, gps_exclude_upper_left_tuple, gps_exclude_lower_right_tuple):
-    select_query = f"SELECT lat, lon FROM bdaddr_to_GPS WHERE bdaddr = %s;"
-    select_results = execute_query(select_query, (bdaddr,))
-    for lat, lon in select_results:
-        if (gps_exclude_upper_left_tuple[0] >= lat >= gps_exclude_lower_right_tuple[0] and
-            gps_exclude_upper_left_tuple[1] <= lon <= gps_exclude_lower_right_tuple[1]):
-            return True
-
-    return False
+    (condition, values) = gps_box_condition(gps_exclude_upper_left_tuple, gps_exclude_lower_right_tuple)
+    select_query = f"SELECT 1 FROM bdaddr_to_GPS WHERE bdaddr = %s AND {condition} LIMIT 1"
+    return len(execute_query(select_query, (bdaddr,) + values)) > 0
+
+###########################################
+# Print GPS information, if present
+###########################################
 
 def device_has_GPS(bdaddr):
     # bdaddr_to_GPS's unique index has `bdaddr` as the leftmost-prefix
@@ -36,6 +36,9 @@ clues_regexed = {}
 full_nameprint_data = {}
 presumed_unique_nameprint_data = {}
 nonunique_nameprint_data = {}
+# Combined matchers over the full_nameprint_data regexes and the Metadata_v2 2thprint_NamePrint regexes (see build_regex_matcher() in TME_helpers)
+nameprint_matcher = {}
+metadata_v2_nameprint_matcher = {}
 privacy_report_no_results_found = True
 
 #########################################
@@ -142,7 +145,20 @@ BTIDES_JSON = []
 # (bdaddr.lower(), bdaddr_rand). Maintained by TME_BTIDES_base helpers and
 # invalidated by any bulk mutation of BTIDES_JSON (e.g. filters, resets).
 BTIDES_JSON_by_bdaddr_key = {}
+# Same for DualBDADDR entries, keyed by TME_BTIDES_base.BTIDES_hash_key(CONNECT_IND)
+BTIDES_JSON_by_connect_ind_key = {}
+# Lazily built dedup/handle indexes for the sub-arrays inside BTIDES_JSON entries
+# (e.g. AdvChanArray/AdvDataArray, GATTArray), keyed by id(array) (or (id(array), index kind)).
+# Cleared along with the above by TME_BTIDES_base.rebuild_SingleBDADDR_index().
+BTIDES_subarray_indexes = {}
 verbose_BTIDES = False
+# Schema validation policy for write_BTIDES(): "full", "sample", or "off" (see TME_BTIDES_base.validate_BTIDES_for_export())
+BTIDES_validate = "full"
+# Entries validated per write_BTIDES() call under the "sample" policy
+BTIDES_validate_sample_size = 100
+# Running totals for the validation timing report
+BTIDES_validation_time = 0.0
+BTIDES_validated_count = 0
 
 #########################################
 # Verbose/quiet printing
@@ -156,6 +172,10 @@ quiet_print = False
 use_test_db = False
 insert_count = 0
 duplicate_count = 0
+# Rows per multi-row INSERT issued by TME_helpers.queue_insert()
+insert_batch_size = 1000
+# bdaddrs per block prefetched by TME_helpers.set_prefetch_bdaddrs()
+prefetch_block_size = 500
 
 ###############################################
 # For making the output more terse
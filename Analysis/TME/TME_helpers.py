@@ -5,6 +5,7 @@
 
 import mysql.connector
 import re
+import time
 import TME.TME_glob
 from TME.TME_BTIDES_AdvData import *
 from TME.TME_BTIDES_HCI import *
@@ -42,8 +43,168 @@ def _get_mysql_conn():
     return _mysql_conn
 
 
+# For long-lived processes (e.g. the BTIDALPOOL server's query workers) whose
+# TME_glob.use_test_db changes: the next query will reconnect to the right db.
+def close_mysql_conn():
+    global _mysql_conn
+    if _mysql_conn is not None:
+        try:
+            _mysql_conn.close()
+        except mysql.connector.Error:
+            pass
+        _mysql_conn = None
+
+
+# execute_query() never commits, so under InnoDB's default REPEATABLE READ a
+# long-lived connection keeps reading from the snapshot taken by its first
+# SELECT, and wouldn't see rows inserted since. Long-lived processes call
+# this before each new query to end that read transaction.
+def start_new_mysql_snapshot():
+    if _mysql_conn is None:
+        return
+    try:
+        _mysql_conn.rollback()
+    except mysql.connector.Error:
+        # E.g. the server dropped the idle connection. Reconnect lazily.
+        close_mysql_conn()
+
+
+# Worker processes (BTIDES_to_SQL --workers, Import_All_HCI_and_PCAP --workers)
+# are forked, and inherit this module's state. A connection object that a child
+# inherits must never be used *or* garbage collected there: mysql-connector's
+# socket destructor does shutdown(SHUT_RDWR), which would kill the parent's
+# connection on the shared socket. So the parent calls prepare_mysql_for_fork()
+# before starting workers (it reconnects lazily afterwards), and each child calls
+# reset_mysql_state_after_fork() before doing anything else.
+def prepare_mysql_for_fork():
+    flush_all_insert_batches()
+    close_mysql_conn()
+
+
+# Inherited connection objects, kept referenced so they're never garbage collected in the child
+_inherited_mysql_conns = []
+
+
+def reset_mysql_state_after_fork():
+    global _mysql_conn
+    if _mysql_conn is not None:
+        _inherited_mysql_conns.append(_mysql_conn)
+        _mysql_conn = None
+    # Anything the parent had queued is the parent's to write, not the child's
+    _pending_insert_batches.clear()
+    _pending_bdaddr_presence.clear()
+    _pending_uuid_index.clear()
+    _pending_device_names.clear()
+    _pending_gatt_name_bdaddrs.clear()
+
+
+########################################
+# Per-bdaddr prefetch cache
+########################################
+# Printing/exporting one device calls dozens of print_* functions, which each
+# issue their own small
+#     SELECT <cols> FROM <table> WHERE bdaddr = %s [AND bdaddr_random = %s]
+# so one device costs 100+ round trips. Instead, Tell_Me_Everything sets a
+# block of bdaddrs with set_prefetch_bdaddrs(), and the first query of that
+# shape against a table pulls that table's rows for the *whole block* with a
+# single `WHERE bdaddr IN (...)` (bdaddr is the leftmost uni_name index
+# column on every per-device table). All later queries of that shape for a
+# bdaddr in the block are answered from memory by execute_query().
+# Queries of any other shape, or for a bdaddr outside the block, go to
+# MySQL as before.
+
+_prefetch_bdaddrs = None    # Lowercase bdaddrs of the current block, or None when not prefetching
+_prefetch_tables = {}       # table -> (column name -> index, {lowercase bdaddr: [rows]})
+
+_per_bdaddr_query_re = re.compile(
+    r"^\s*SELECT\s+(?P<cols>\w+(?:\s*,\s*\w+)*)\s+FROM\s+(?P<table>\w+)\s+WHERE\s+"
+    r"(?:(?P<b_first>bdaddr\s*=\s*%s(?P<b_rand>\s+AND\s+bdaddr_random\s*=\s*%s)?)"
+    r"|(?P<rand_first>bdaddr_random\s*=\s*%s\s+AND\s+bdaddr\s*=\s*%s))\s*;?\s*$",
+    re.IGNORECASE)
+# query string -> (columns, table, bdaddr value index, bdaddr_random value index or None), or None if not cacheable
+_per_bdaddr_query_shapes = {}
+
+
+def set_prefetch_bdaddrs(bdaddrs):
+    global _prefetch_bdaddrs, _prefetch_tables
+    _prefetch_bdaddrs = {bdaddr.lower() for bdaddr in bdaddrs}
+    _prefetch_tables = {}
+
+
+def clear_prefetch_bdaddrs():
+    global _prefetch_bdaddrs, _prefetch_tables
+    _prefetch_bdaddrs = None
+    _prefetch_tables = {}
+
+
+def _per_bdaddr_query_shape(query):
+    if query in _per_bdaddr_query_shapes:
+        return _per_bdaddr_query_shapes[query]
+    shape = None
+    m = _per_bdaddr_query_re.match(query)
+    if m:
+        columns = [c.strip() for c in m.group("cols").split(",")]
+        if m.group("rand_first"):
+            shape = (columns, m.group("table"), 1, 0)
+        elif m.group("b_rand"):
+            shape = (columns, m.group("table"), 0, 1)
+        else:
+            shape = (columns, m.group("table"), 0, None)
+    _per_bdaddr_query_shapes[query] = shape
+    return shape
+
+
+def _prefetch_table(table):
+    connection = _get_mysql_conn()
+    cursor = connection.cursor()
+    bdaddrs = sorted(_prefetch_bdaddrs)
+    placeholders = ", ".join(["%s"] * len(bdaddrs))
+    cursor.execute(f"SELECT * FROM {table} WHERE bdaddr IN ({placeholders})", bdaddrs)
+    column_index = {name.lower(): i for i, name in enumerate(cursor.column_names)}
+    rows_by_bdaddr = {}
+    bdaddr_i = column_index["bdaddr"]
+    for row in cursor.fetchall():
+        rows_by_bdaddr.setdefault(row[bdaddr_i].lower(), []).append(row)
+    cursor.close()
+    _prefetch_tables[table] = (column_index, rows_by_bdaddr)
+
+
+# Returns the same list of row tuples that MySQL would have, or None if this
+# query can't be answered from the prefetch cache.
+def _prefetched_query(query, values):
+    shape = _per_bdaddr_query_shape(query)
+    if shape is None:
+        return None
+    (columns, table, bdaddr_i, random_i) = shape
+    bdaddr = values[bdaddr_i]
+    if not isinstance(bdaddr, str) or bdaddr.lower() not in _prefetch_bdaddrs:
+        return None
+    if table not in _prefetch_tables:
+        _prefetch_table(table)
+    (column_index, rows_by_bdaddr) = _prefetch_tables[table]
+    try:
+        indexes = [column_index[c.lower()] for c in columns]
+    except KeyError:
+        return None # Let MySQL produce the error
+    rows = rows_by_bdaddr.get(bdaddr.lower(), [])
+    if random_i is not None:
+        rand_col = column_index.get("bdaddr_random")
+        if rand_col is None:
+            return None
+        try:
+            bdaddr_random = int(values[random_i])
+        except (TypeError, ValueError):
+            return None
+        rows = [row for row in rows if row[rand_col] == bdaddr_random]
+    return [tuple(row[i] for i in indexes) for row in rows]
+
+
 # Function to execute a MySQL query and fetch results
 def execute_query(query, values):
+    if _prefetch_bdaddrs is not None:
+        result = _prefetched_query(query, values)
+        if result is not None:
+            return result
     connection = _get_mysql_conn()
     cursor = connection.cursor()
     cursor.execute(query, values)
@@ -63,6 +224,8 @@ def execute_insert(query, values):
     global insert_count, duplicate_count
     connection = _get_mysql_conn()
     cursor = connection.cursor()
+    row_in_table = False
+    duplicate = False
     # TODO: FIXME: I can't find a way around the
     # "1300: Invalid utf8mb4 character string:..."
     # warning for use of the BLOB or VARBINARY type of byte_values in the SDP_Common table
@@ -72,6 +235,7 @@ def execute_insert(query, values):
         cursor.execute(query, values)
         connection.commit()  # Commit the transaction
         TME.TME_glob.insert_count += 1  # Increment insert_count if no exception is raised
+        row_in_table = True
     except Exception as e:
         # Be more specific and only count it as a duplicate if the warning->error code is 1062
         duplicate = False
@@ -90,6 +254,8 @@ def execute_insert(query, values):
                 # Wasn't a duplicate, just a warning (i.e. the non-utf8 byte_values in SDP_Commone)
                 connection.commit()
                 TME.TME_glob.insert_count += 1  # Increment insert_count only if no duplicates
+            # Either way the row is in the table now
+            row_in_table = True
 
 
     # OLD CODE: leaving it here for now though...
@@ -122,6 +288,975 @@ def execute_insert(query, values):
         cursor.close()
         # Connection is module-level persistent; do not close it here.
 
+    if(row_in_table):
+        record_inserted_rows_presence(query, [values])
+        flush_bdaddr_presence()
+        record_inserted_rows_uuids(query, [values], observed=not duplicate)
+        flush_uuid_index()
+        record_inserted_rows_device_names(query, [values])
+        flush_device_names()
+
+########################################
+# Batched multi-row inserts
+########################################
+# execute_insert() commits once per row, so importing a multi-hundred-MB
+# .btides file costs one round trip and one fsync per row. BTIDES_to_SQL
+# instead hands its rows to queue_insert(), which accumulates them per
+# single-row INSERT statement (i.e. per table + column list) and, once
+# TME_glob.insert_batch_size rows are pending, rewrites the statement into a
+# single multi-row "VALUES (...), (...), ..." INSERT committed as one
+# transaction. This is the generalization to every table of what
+# BTIDES_to_SQL.parse_all_GPSArrays_batched does for bdaddr_to_GPS.
+#
+# Callers MUST call flush_all_insert_batches() before reading back anything
+# they queued, and before exiting.
+
+# single-row INSERT statement -> list of pending value tuples
+_pending_insert_batches = {}
+
+
+def queue_insert(query, values):
+    rows = _pending_insert_batches.setdefault(query, [])
+    rows.append(values)
+    if(len(rows) >= TME.TME_glob.insert_batch_size):
+        flush_insert_batch(query)
+
+
+def flush_insert_batch(query):
+    rows = _pending_insert_batches.pop(query, None)
+    if not rows:
+        return
+    # "INSERT IGNORE INTO t (cols) VALUES (%s, ...);" -> "... VALUES (%s, ...), (%s, ...), ..."
+    head, _, row_placeholder = query.strip().rstrip(';').partition(" VALUES ")
+    multi_row_query = f"{head} VALUES " + ", ".join([row_placeholder] * len(rows))
+    params = tuple(v for row in rows for v in row)
+
+    connection = _get_mysql_conn()
+    cursor = connection.cursor()
+    uuid_shape = _uuid_index_insert_shape(query)
+    try:
+        if(uuid_shape is not None):
+            rows_before = _uuid_source_row_counts(cursor, uuid_shape, rows)
+        try:
+            cursor.execute(multi_row_query, params)
+        except mysql.connector.Error as err:
+            # raise_on_warnings turns INSERT IGNORE's expected 1062 (duplicate)
+            # and 1300 (non-utf8 bytes in SDP_Common.byte_values) warnings into
+            # exceptions *after* the statement has run. Only an exception with
+            # no warnings attached is a real failure.
+            if not cursor.fetchwarnings():
+                # That fails the whole batch, so don't drop the good rows along with the bad one
+                print(f"Error: {err} (inserting the batch's {len(rows)} rows one at a time instead)")
+                connection.rollback()
+                _insert_rows_one_at_a_time(query, rows)
+                return
+        # Rows skipped by INSERT IGNORE (duplicates, including duplicates
+        # within this batch) aren't counted in affected rows.
+        inserted = max(cursor.rowcount, 0)
+        # If only some of the batch were new, the table's rows for the same
+        # devices before and after tell which, so that UUID_stats.observations
+        # counts exactly the new rows whatever the batch size.
+        new_rows = None
+        if(uuid_shape is not None and 0 < inserted < len(rows)):
+            rows_after = _uuid_source_row_counts(cursor, uuid_shape, rows)
+            new_rows = {key: count - rows_before.get(key, 0) for (key, count) in rows_after.items() if count > rows_before.get(key, 0)}
+        connection.commit()
+        TME.TME_glob.insert_count += inserted
+        TME.TME_glob.duplicate_count += len(rows) - inserted
+    finally:
+        cursor.close()
+    record_inserted_rows_presence(query, rows)
+    if(new_rows is None):
+        record_inserted_rows_uuids(query, rows, observed=(inserted == len(rows)))
+    else:
+        record_inserted_rows_uuids(query, rows, observed=False)
+        for ((bdaddr, bdaddr_random, uuids), count) in new_rows.items():
+            record_bdaddr_uuids(uuid_shape[0], bdaddr, bdaddr_random, uuids, observations=count)
+    record_inserted_rows_device_names(query, rows)
+
+
+# flush_insert_batch()'s fallback for a batch that failed: every row is committed
+# on its own, so only the rows that fail by themselves are lost (and reported).
+def _insert_rows_one_at_a_time(query, rows):
+    connection = _get_mysql_conn()
+    cursor = connection.cursor()
+    new_rows = []
+    duplicate_rows = []
+    try:
+        for row in rows:
+            try:
+                cursor.execute(query, row)
+            except mysql.connector.Error as err:
+                if not cursor.fetchwarnings():
+                    print(f"Error: {err} (row {row})")
+                    connection.rollback()
+                    continue
+            connection.commit()
+            if(cursor.rowcount > 0):
+                new_rows.append(row)
+            else:
+                duplicate_rows.append(row)
+    finally:
+        cursor.close()
+    TME.TME_glob.insert_count += len(new_rows)
+    TME.TME_glob.duplicate_count += len(duplicate_rows)
+    for (written, observed) in ((new_rows, True), (duplicate_rows, False)):
+        record_inserted_rows_presence(query, written)
+        record_inserted_rows_uuids(query, written, observed)
+        record_inserted_rows_device_names(query, written)
+
+
+def flush_all_insert_batches():
+    for query in list(_pending_insert_batches.keys()):
+        flush_insert_batch(query)
+    flush_bdaddr_presence()
+    flush_uuid_index()
+    flush_device_names()
+
+########################################
+# bdaddr presence index
+########################################
+# Finding out which tables have rows for a bdaddr used to take a UNION (or
+# one EXISTS probe) across every per-device table: 33 tables for
+# is_bdaddr_le_and_random(), 56 for bdaddr_found_in_any_table(), and 52
+# REGEXP-filtered ones for TME_lookup.get_bdaddrs_by_bdaddr_regex().
+# The bdaddr_presence table instead holds one row per (bdaddr, bdaddr_random)
+# whose tables_bitmap has bit N set when BDADDR_PRESENCE_TABLES[N] has a row
+# for it, so each of those lookups is a single indexed query.
+#
+# BTIDES_to_SQL (and its Rust port) keeps it up to date at insert time: every
+# row that flush_insert_batch() / execute_insert() writes to one of these
+# tables marks its bdaddr here (and parse_all_GPSArrays_batched() does the
+# same for bdaddr_to_GPS). backfill_bdaddr_presence() (see Backfill_bdaddr_presence.py)
+# fills it in from the tables themselves, for data that got into the database
+# some other way, e.g. from before this table existed, or a .sql dump.
+#
+# The BT Classic tables have no bdaddr_random column, so their rows are
+# recorded under bdaddr_random = 0.
+#
+# A table's bit is its index in this list, and the bits are stored in the
+# database, so only ever append to it. tables_bitmap is 64 bits wide.
+BDADDR_PRESENCE_TABLES = [
+    "bdaddr_to_GPS", "EIR_bdaddr_to_3d_info", "EIR_bdaddr_to_CoD", "EIR_bdaddr_to_DevID",
+    "EIR_bdaddr_to_flags", "EIR_bdaddr_to_MSD", "EIR_bdaddr_to_name", "EIR_bdaddr_to_PSRM",
+    "EIR_bdaddr_to_tx_power", "EIR_bdaddr_to_URI", "EIR_bdaddr_to_UUID128s",
+    "EIR_bdaddr_to_UUID16s", "EIR_bdaddr_to_UUID32s", "GATT_attribute_handles",
+    "GATT_characteristic_descriptor_values", "GATT_characteristics", "GATT_characteristics_values",
+    "GATT_services", "HCI_bdaddr_to_name", "L2CAP_CONNECTION_PARAMETER_UPDATE_REQ",
+    "L2CAP_CONNECTION_PARAMETER_UPDATE_RSP", "LE_bdaddr_to_3d_info", "LE_bdaddr_to_appearance",
+    "LE_bdaddr_to_CoD", "LE_bdaddr_to_connect_interval", "LE_bdaddr_to_flags",
+    "LE_bdaddr_to_MSD", "LE_bdaddr_to_name", "LE_bdaddr_to_other_le_bdaddr",
+    "LE_bdaddr_to_public_target_bdaddr", "LE_bdaddr_to_random_target_bdaddr",
+    "LE_bdaddr_to_role", "LE_bdaddr_to_tx_power", "LE_bdaddr_to_URI",
+    "LE_bdaddr_to_UUID128_service_data", "LE_bdaddr_to_UUID128_service_solicit",
+    "LE_bdaddr_to_UUID128s_list", "LE_bdaddr_to_UUID16_service_data",
+    "LE_bdaddr_to_UUID16_service_solicit", "LE_bdaddr_to_UUID16s_list",
+    "LE_bdaddr_to_UUID32_service_data", "LE_bdaddr_to_UUID32_service_solicit",
+    "LE_bdaddr_to_UUID32s_list", "LL_FEATUREs", "LL_LENGTHs", "LL_PHYs", "LL_PINGs",
+    "LL_UNKNOWN_RSP", "LL_VERSION_IND", "LMP_FEATURES_RES", "LMP_FEATURES_RES_EXT",
+    "LMP_NAME_RES_defragmented", "LMP_VERSION_RES", "SDP_Common", "SDP_ERROR_RSP", "SMP_Pairing_Req_Res"
+]
+BDADDR_PRESENCE_BITS = {table: 1 << i for i, table in enumerate(BDADDR_PRESENCE_TABLES)}
+
+# Tables without a bdaddr_random column
+BDADDR_PRESENCE_CLASSIC_TABLES = [table for table in BDADDR_PRESENCE_TABLES if table.startswith(("EIR_", "HCI_", "LMP_", "SDP_"))]
+
+
+def bdaddr_presence_mask(tables):
+    mask = 0
+    for table in tables:
+        mask |= BDADDR_PRESENCE_BITS[table]
+    return mask
+
+
+# Advertisement, LL control and GATT data
+BDADDR_PRESENCE_LE_MASK = bdaddr_presence_mask([table for table in BDADDR_PRESENCE_TABLES if table.startswith(("LE_", "LL_", "GATT_"))])
+# BT Classic EIR, LMP, HCI Remote Name and SDP data
+BDADDR_PRESENCE_CLASSIC_MASK = bdaddr_presence_mask(BDADDR_PRESENCE_CLASSIC_TABLES)
+
+_insert_columns_re = re.compile(r"^\s*INSERT\s+(?:IGNORE\s+)?INTO\s+(?P<table>\w+)\s*\((?P<cols>[^)]*)\)", re.IGNORECASE)
+# single-row INSERT statement -> (table bit, bdaddr value index, bdaddr_random value index or None), or None if the table isn't tracked
+_bdaddr_presence_insert_shapes = {}
+
+# (bdaddr, bdaddr_random) -> table bits not yet written to bdaddr_presence
+_pending_bdaddr_presence = {}
+
+_bdaddr_presence_upsert = (
+    "INSERT INTO bdaddr_presence (bdaddr, bdaddr_random, tables_bitmap) VALUES {placeholders} "
+    "ON DUPLICATE KEY UPDATE tables_bitmap = tables_bitmap | VALUES(tables_bitmap), last_seen = CURRENT_TIMESTAMP"
+)
+
+
+def _bdaddr_presence_insert_shape(query):
+    if query in _bdaddr_presence_insert_shapes:
+        return _bdaddr_presence_insert_shapes[query]
+    shape = None
+    m = _insert_columns_re.match(query)
+    if m and m.group("table") in BDADDR_PRESENCE_BITS:
+        columns = [c.strip() for c in m.group("cols").split(",")]
+        if "bdaddr" in columns:
+            random_i = columns.index("bdaddr_random") if "bdaddr_random" in columns else None
+            shape = (BDADDR_PRESENCE_BITS[m.group("table")], columns.index("bdaddr"), random_i)
+    _bdaddr_presence_insert_shapes[query] = shape
+    return shape
+
+
+def record_bdaddr_presence(table, bdaddr, bdaddr_random=0):
+    if not isinstance(bdaddr, str):
+        return
+    key = (bdaddr, int(bdaddr_random))
+    _pending_bdaddr_presence[key] = _pending_bdaddr_presence.get(key, 0) | BDADDR_PRESENCE_BITS[table]
+    if(len(_pending_bdaddr_presence) >= TME.TME_glob.insert_batch_size):
+        flush_bdaddr_presence()
+
+
+# Mark the bdaddrs of rows that were just written with the single-row INSERT statement query
+def record_inserted_rows_presence(query, rows):
+    shape = _bdaddr_presence_insert_shape(query)
+    if shape is None:
+        return
+    (bit, bdaddr_i, random_i) = shape
+    for row in rows:
+        bdaddr = row[bdaddr_i]
+        if not isinstance(bdaddr, str):
+            continue
+        key = (bdaddr, int(row[random_i]) if random_i is not None else 0)
+        _pending_bdaddr_presence[key] = _pending_bdaddr_presence.get(key, 0) | bit
+    if(len(_pending_bdaddr_presence) >= TME.TME_glob.insert_batch_size):
+        flush_bdaddr_presence()
+
+
+# Errors that only mean this transaction lost out on a lock to a concurrent one: a deadlock
+# (after which InnoDB has already rolled the transaction back) or a lock wait timeout.
+# Sorting the rows doesn't rule deadlocks out, since the gap locks taken for devices that
+# aren't in an index table yet (e.g. by the FOR UPDATE in _write_uuid_index_chunk) can
+# still cross between two BTIDES_to_SQL --workers.
+_retryable_lock_errnos = (1213, 1205) # ER_LOCK_DEADLOCK, ER_LOCK_WAIT_TIMEOUT
+INDEX_FLUSH_LOCK_RETRIES = 5
+
+# Writes rows pending for one of the index tables (bdaddr_presence, bdaddr_to_UUID,
+# device_names), write_chunk(cursor, chunk) at a time, as one transaction. They're
+# sorted so that concurrent BTIDES_to_SQL --workers take the row locks in the same
+# order, and the whole transaction is run again if it loses a lock to one of them anyway.
+# The lookups only read the index tables, so a failed write mustn't just be
+# dropped (leaving devices that are in the database unfindable until the next
+# Backfill_bdaddr_presence.py): the rows are handed back to requeue(), for the next
+# flush to retry, and the error is raised.
+def _flush_index_rows(rows, write_chunk, requeue):
+    rows = sorted(rows)
+    connection = _get_mysql_conn()
+    attempt = 0
+    while True:
+        cursor = connection.cursor()
+        try:
+            batch_size = max(1, TME.TME_glob.insert_batch_size)
+            for i in range(0, len(rows), batch_size):
+                write_chunk(cursor, rows[i:i + batch_size])
+            connection.commit()
+            return
+        except mysql.connector.Error as e:
+            connection.rollback()
+            if(e.errno in _retryable_lock_errnos and attempt < INDEX_FLUSH_LOCK_RETRIES):
+                attempt += 1
+                # Give the transaction that won a moment to commit
+                time.sleep(0.05 * attempt)
+                continue
+            requeue(rows)
+            raise
+        finally:
+            cursor.close()
+
+
+def _write_bdaddr_presence_chunk(cursor, chunk):
+    query = _bdaddr_presence_upsert.format(placeholders=", ".join(["(%s, %s, %s)"] * len(chunk)))
+    params = tuple(v for ((bdaddr, bdaddr_random), bits) in chunk for v in (bdaddr, bdaddr_random, bits))
+    cursor.execute(query, params)
+
+
+def _requeue_bdaddr_presence(rows):
+    for (key, bits) in rows:
+        _pending_bdaddr_presence[key] = _pending_bdaddr_presence.get(key, 0) | bits
+
+
+def flush_bdaddr_presence():
+    global _pending_bdaddr_presence
+    if not _pending_bdaddr_presence:
+        return
+    rows = _pending_bdaddr_presence.items()
+    _pending_bdaddr_presence = {}
+    _flush_index_rows(rows, _write_bdaddr_presence_chunk, _requeue_bdaddr_presence)
+
+
+# Sets the bits for every row already in BDADDR_PRESENCE_TABLES. With rebuild=True
+# bdaddr_presence is emptied first, dropping bits for rows deleted since they were
+# recorded (and resetting first_seen). Returns the number of bdaddr_presence rows.
+def backfill_bdaddr_presence(rebuild=False):
+    flush_bdaddr_presence()
+    connection = _get_mysql_conn()
+    cursor = connection.cursor()
+    try:
+        if(rebuild):
+            cursor.execute("DELETE FROM bdaddr_presence")
+        for table in BDADDR_PRESENCE_TABLES:
+            bdaddr_random = "0" if table in BDADDR_PRESENCE_CLASSIC_TABLES else "bdaddr_random"
+            cursor.execute(
+                "INSERT INTO bdaddr_presence (bdaddr, bdaddr_random, tables_bitmap) "
+                f"SELECT DISTINCT CONVERT(bdaddr USING utf8mb4), {bdaddr_random}, {BDADDR_PRESENCE_BITS[table]} FROM {table} "
+                "ON DUPLICATE KEY UPDATE tables_bitmap = tables_bitmap | VALUES(tables_bitmap)")
+        connection.commit()
+        cursor.execute("SELECT COUNT(*) FROM bdaddr_presence")
+        (count,) = cursor.fetchone()
+    except mysql.connector.Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return count
+
+########################################
+# UUID inverted index
+########################################
+# Advertised / GATT UUIDs are stored per-table, and the advertised ones as
+# comma-joined lists (e.g. str_UUID16s = "180f,180a"), so searching for the
+# devices with a given UUID used to take a REGEXP full scan of 15 tables.
+# The bdaddr_to_UUID table instead holds one row per
+# (bdaddr, bdaddr_random, uuid, source_table), so a UUID search only has to
+# match its regex against the (comparatively few) distinct UUIDs, and can
+# then use the uuid index to get back to the bdaddrs.
+#
+# Kept up to date at insert time and backfilled the same way as
+# bdaddr_presence above (see Backfill_bdaddr_presence.py).
+# UUIDs are stored exactly as they are in source_table (the UUID128s without
+# dashes), and BT Classic rows under bdaddr_random = 0.
+#
+# --UUID16-stats and --UUID128-stats read the UUID_stats summary table instead
+# of counting over the whole index: one row per (source_table, uuid) with the
+# number of devices that have it, the number of rows it was observed in, and
+# when it was first and last seen. UUID_stats_devices holds the number of
+# devices per source_table. Both are updated as rows are added to the index,
+# (with the devices only counted for entries that weren't in the index
+# already), and recomputed from scratch by rebuild_uuid_stats().
+
+# source table -> column holding the UUID(s)
+UUID_INDEX_SOURCES = {
+    "EIR_bdaddr_to_UUID16s": "str_UUID16s",
+    "EIR_bdaddr_to_UUID32s": "str_UUID32s",
+    "EIR_bdaddr_to_UUID128s": "str_UUID128s",
+    "LE_bdaddr_to_UUID16s_list": "str_UUID16s",
+    "LE_bdaddr_to_UUID32s_list": "str_UUID32s",
+    "LE_bdaddr_to_UUID128s_list": "str_UUID128s",
+    "LE_bdaddr_to_UUID16_service_solicit": "str_UUID16s",
+    "LE_bdaddr_to_UUID32_service_solicit": "str_UUID32s",
+    "LE_bdaddr_to_UUID128_service_solicit": "str_UUID128s",
+    "LE_bdaddr_to_UUID16_service_data": "UUID16_hex_str",
+    "LE_bdaddr_to_UUID32_service_data": "UUID32_hex_str",
+    "LE_bdaddr_to_UUID128_service_data": "UUID128_hex_str",
+    "GATT_services": "UUID",
+    "GATT_characteristics": "UUID",
+    "GATT_attribute_handles": "UUID",
+}
+
+# Tables without a bdaddr_random column
+UUID_INDEX_CLASSIC_SOURCES = [table for table in UUID_INDEX_SOURCES if table.startswith("EIR_")]
+
+# single-row INSERT statement -> (source table, bdaddr value index, bdaddr_random value index or None, UUID value index), or None if the table isn't indexed
+_uuid_index_insert_shapes = {}
+
+# (bdaddr, bdaddr_random, uuid, source_table) rows not yet written to bdaddr_to_UUID -> number of newly inserted source rows they were observed in
+_pending_uuid_index = {}
+
+# (The no-op update is so that rows already in the index don't raise 1062 warnings, which raise_on_warnings would turn into exceptions)
+_uuid_index_insert = (
+    "INSERT INTO bdaddr_to_UUID (bdaddr, bdaddr_random, uuid, source_table) VALUES {placeholders} "
+    "ON DUPLICATE KEY UPDATE uuid = uuid"
+)
+
+
+def _uuid_index_insert_shape(query):
+    if query in _uuid_index_insert_shapes:
+        return _uuid_index_insert_shapes[query]
+    shape = None
+    m = _insert_columns_re.match(query)
+    if m and m.group("table") in UUID_INDEX_SOURCES:
+        table = m.group("table")
+        columns = [c.strip() for c in m.group("cols").split(",")]
+        if "bdaddr" in columns and UUID_INDEX_SOURCES[table] in columns:
+            random_i = columns.index("bdaddr_random") if "bdaddr_random" in columns else None
+            shape = (table, columns.index("bdaddr"), random_i, columns.index(UUID_INDEX_SOURCES[table]))
+    _uuid_index_insert_shapes[query] = shape
+    return shape
+
+
+# Queue the individual UUIDs in uuids (a comma-joined list, or a single UUID) for bdaddr_to_UUID.
+# observations is the number of new source rows with this list, to be counted in UUID_stats.observations.
+def record_bdaddr_uuids(table, bdaddr, bdaddr_random, uuids, observations=1):
+    if not isinstance(bdaddr, str) or not isinstance(uuids, str):
+        return
+    for uuid in set(uuids.split(',')):
+        uuid = uuid.strip()
+        if(uuid != ""):
+            key = (bdaddr, int(bdaddr_random), uuid, table)
+            _pending_uuid_index[key] = _pending_uuid_index.get(key, 0) + observations
+    if(len(_pending_uuid_index) >= TME.TME_glob.insert_batch_size):
+        flush_uuid_index()
+
+
+# Index the UUIDs of rows that were just written with the single-row INSERT statement query.
+# observed=False is for rows that were duplicates of ones already in the table.
+def record_inserted_rows_uuids(query, rows, observed=True):
+    shape = _uuid_index_insert_shape(query)
+    if shape is None:
+        return
+    (table, bdaddr_i, random_i, uuid_i) = shape
+    for row in rows:
+        record_bdaddr_uuids(table, row[bdaddr_i], row[random_i] if random_i is not None else 0, row[uuid_i], 1 if observed else 0)
+
+
+# {(bdaddr, bdaddr_random, UUID list): number of rows} in shape's source table,
+# for the devices in rows (written with the INSERT statement shape is for).
+def _uuid_source_row_counts(cursor, shape, rows):
+    (table, bdaddr_i, random_i, uuid_i) = shape
+    column = UUID_INDEX_SOURCES[table]
+    devices = sorted({(row[bdaddr_i], int(row[random_i]) if random_i is not None else 0) for row in rows if isinstance(row[bdaddr_i], str)})
+    counts = {}
+    batch_size = max(1, TME.TME_glob.insert_batch_size)
+    for i in range(0, len(devices), batch_size):
+        chunk = devices[i:i + batch_size]
+        if(random_i is None):
+            cursor.execute(
+                f"SELECT CONVERT(bdaddr USING utf8mb4), 0, {column}, COUNT(*) FROM {table} "
+                f"WHERE {column} IS NOT NULL AND bdaddr IN (" + ", ".join(["%s"] * len(chunk)) + f") GROUP BY bdaddr, {column}",
+                tuple(bdaddr for (bdaddr, _bdaddr_random) in chunk))
+        else:
+            cursor.execute(
+                f"SELECT CONVERT(bdaddr USING utf8mb4), bdaddr_random, {column}, COUNT(*) FROM {table} "
+                f"WHERE {column} IS NOT NULL AND (bdaddr, bdaddr_random) IN (" + ", ".join(["(%s, %s)"] * len(chunk)) + f") "
+                f"GROUP BY bdaddr, bdaddr_random, {column}",
+                tuple(v for device in chunk for v in device))
+        for (bdaddr, bdaddr_random, uuids, count) in cursor.fetchall():
+            counts[(bdaddr, int(bdaddr_random), uuids)] = count
+    return counts
+
+
+_uuid_stats_insert = (
+    "INSERT INTO UUID_stats (source_table, uuid, devices, observations) VALUES {placeholders} "
+    "ON DUPLICATE KEY UPDATE devices = devices + VALUES(devices), observations = observations + VALUES(observations), last_seen = CURRENT_TIMESTAMP"
+)
+
+_uuid_stats_devices_insert = (
+    "INSERT INTO UUID_stats_devices (source_table, devices) VALUES {placeholders} "
+    "ON DUPLICATE KEY UPDATE devices = devices + VALUES(devices)"
+)
+
+
+# Returns the UUID_stats and UUID_stats_devices increments for the
+# ((bdaddr, bdaddr_random, uuid, source_table), observations) entries in chunk,
+# given the (bdaddr, bdaddr_random, uuid, source_table) entries for the same
+# devices that were already in bdaddr_to_UUID:
+# ({(source_table, uuid): [new devices, observations]}, {source_table: new devices})
+def uuid_stats_increments(chunk, existing):
+    existing_device_tables = {(bdaddr, bdaddr_random, table) for (bdaddr, bdaddr_random, _uuid, table) in existing}
+    uuid_increments = {}
+    device_increments = {}
+    for (key, observations) in chunk:
+        (bdaddr, bdaddr_random, uuid, table) = key
+        new_device = key not in existing
+        if not new_device and observations == 0:
+            continue
+        increment = uuid_increments.setdefault((table, uuid), [0, 0])
+        increment[0] += 1 if new_device else 0
+        increment[1] += observations
+        if (bdaddr, bdaddr_random, table) not in existing_device_tables:
+            existing_device_tables.add((bdaddr, bdaddr_random, table))
+            device_increments[table] = device_increments.get(table, 0) + 1
+    return (uuid_increments, device_increments)
+
+
+def _write_uuid_index_chunk(cursor, chunk):
+    # What's already indexed for these devices, so that UUID_stats only counts new devices.
+    # FOR UPDATE locks these devices' index ranges until the commit, so a concurrent
+    # import can't also see one of the same entries as new and count its device twice.
+    devices = sorted({(bdaddr, bdaddr_random) for ((bdaddr, bdaddr_random, _uuid, _table), _observations) in chunk})
+    cursor.execute(
+        "SELECT bdaddr, bdaddr_random, uuid, source_table FROM bdaddr_to_UUID WHERE (bdaddr, bdaddr_random) IN ("
+        + ", ".join(["(%s, %s)"] * len(devices)) + ") FOR UPDATE",
+        tuple(v for device in devices for v in device))
+    existing = {(bdaddr, int(bdaddr_random), uuid, table) for (bdaddr, bdaddr_random, uuid, table) in cursor.fetchall()}
+
+    query = _uuid_index_insert.format(placeholders=", ".join(["(%s, %s, %s, %s)"] * len(chunk)))
+    params = tuple(v for (key, _observations) in chunk for v in key)
+    cursor.execute(query, params)
+
+    (uuid_increments, device_increments) = uuid_stats_increments(chunk, existing)
+    if uuid_increments:
+        increments = sorted(uuid_increments.items())
+        query = _uuid_stats_insert.format(placeholders=", ".join(["(%s, %s, %s, %s)"] * len(increments)))
+        cursor.execute(query, tuple(v for ((table, uuid), (new_devices, observations)) in increments for v in (table, uuid, new_devices, observations)))
+    if device_increments:
+        increments = sorted(device_increments.items())
+        query = _uuid_stats_devices_insert.format(placeholders=", ".join(["(%s, %s)"] * len(increments)))
+        cursor.execute(query, tuple(v for increment in increments for v in increment))
+
+
+def _requeue_uuid_index(rows):
+    for (key, observations) in rows:
+        _pending_uuid_index[key] = _pending_uuid_index.get(key, 0) + observations
+
+
+def flush_uuid_index():
+    global _pending_uuid_index
+    if not _pending_uuid_index:
+        return
+    rows = _pending_uuid_index.items()
+    _pending_uuid_index = {}
+    _flush_index_rows(rows, _write_uuid_index_chunk, _requeue_uuid_index)
+
+
+# Indexes the UUIDs of every row already in UUID_INDEX_SOURCES. With rebuild=True
+# bdaddr_to_UUID is emptied first, dropping entries for rows deleted since they
+# were recorded. Returns the number of bdaddr_to_UUID rows.
+def backfill_uuid_index(rebuild=False, page_size=10000):
+    flush_uuid_index()
+    connection = _get_mysql_conn()
+    cursor = connection.cursor()
+    try:
+        if(rebuild):
+            cursor.execute("DELETE FROM bdaddr_to_UUID")
+            connection.commit()
+        for (table, column) in UUID_INDEX_SOURCES.items():
+            bdaddr_random = "0" if table in UUID_INDEX_CLASSIC_SOURCES else "bdaddr_random"
+            if not column.startswith("str_"):
+                # Single UUID per row, so no splitting needed
+                cursor.execute(
+                    "INSERT INTO bdaddr_to_UUID (bdaddr, bdaddr_random, uuid, source_table) "
+                    f"SELECT DISTINCT CONVERT(bdaddr USING utf8mb4), {bdaddr_random}, {column}, %s FROM {table} "
+                    f"WHERE {column} IS NOT NULL AND {column} != '' "
+                    "ON DUPLICATE KEY UPDATE uuid = uuid", (table,))
+                connection.commit()
+                continue
+            # Comma-joined lists get split up here, a page of rows at a time
+            last_id = 0
+            while True:
+                cursor.execute(f"SELECT id, CONVERT(bdaddr USING utf8mb4), {bdaddr_random}, {column} FROM {table} WHERE id > %s ORDER BY id LIMIT %s", (last_id, page_size))
+                page = cursor.fetchall()
+                if not page:
+                    break
+                for (row_id, bdaddr, row_random, uuids) in page:
+                    record_bdaddr_uuids(table, bdaddr, row_random, uuids)
+                last_id = page[-1][0]
+            flush_uuid_index()
+        cursor.execute("SELECT COUNT(*) FROM bdaddr_to_UUID")
+        (count,) = cursor.fetchone()
+    except mysql.connector.Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return count
+
+
+# Recomputes UUID_stats and UUID_stats_devices from scratch: the devices from
+# bdaddr_to_UUID (so run backfill_uuid_index() first if it's behind), first/last
+# seen from those devices' bdaddr_presence entries, and the observations by
+# counting the source rows with each UUID. Returns the number of UUID_stats rows.
+def rebuild_uuid_stats(page_size=10000):
+    flush_uuid_index()
+    connection = _get_mysql_conn()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("DELETE FROM UUID_stats")
+        cursor.execute("DELETE FROM UUID_stats_devices")
+        cursor.execute(
+            "INSERT INTO UUID_stats (source_table, uuid, devices, observations, first_seen, last_seen) "
+            "SELECT u.source_table, u.uuid, COUNT(*), 0, COALESCE(MIN(p.first_seen), CURRENT_TIMESTAMP), COALESCE(MAX(p.last_seen), CURRENT_TIMESTAMP) "
+            "FROM bdaddr_to_UUID u LEFT JOIN bdaddr_presence p ON p.bdaddr = u.bdaddr AND p.bdaddr_random = u.bdaddr_random "
+            "GROUP BY u.source_table, u.uuid")
+        cursor.execute(
+            "INSERT INTO UUID_stats_devices (source_table, devices) "
+            "SELECT source_table, COUNT(DISTINCT bdaddr, bdaddr_random) FROM bdaddr_to_UUID GROUP BY source_table")
+        connection.commit()
+
+        for (table, column) in UUID_INDEX_SOURCES.items():
+            observations = {}
+            if not column.startswith("str_"):
+                # Single UUID per row, so MySQL can do the counting
+                cursor.execute(f"SELECT {column}, COUNT(*) FROM {table} WHERE {column} IS NOT NULL AND {column} != '' GROUP BY {column}", ())
+                for (uuid, count) in cursor.fetchall():
+                    observations[uuid.strip()] = observations.get(uuid.strip(), 0) + count
+            else:
+                last_id = 0
+                while True:
+                    cursor.execute(f"SELECT id, {column} FROM {table} WHERE id > %s ORDER BY id LIMIT %s", (last_id, page_size))
+                    page = cursor.fetchall()
+                    if not page:
+                        break
+                    for (row_id, uuids) in page:
+                        for uuid in set(uuids.split(',')):
+                            uuid = uuid.strip()
+                            if(uuid != ""):
+                                observations[uuid] = observations.get(uuid, 0) + 1
+                    last_id = page[-1][0]
+            rows = sorted(observations.items())
+            batch_size = max(1, TME.TME_glob.insert_batch_size)
+            for i in range(0, len(rows), batch_size):
+                chunk = rows[i:i + batch_size]
+                cursor.execute(
+                    "INSERT INTO UUID_stats (source_table, uuid, observations) VALUES "
+                    + ", ".join(["(%s, %s, %s)"] * len(chunk))
+                    + " ON DUPLICATE KEY UPDATE observations = VALUES(observations)",
+                    tuple(v for (uuid, count) in chunk for v in (table, uuid, count)))
+            connection.commit()
+        cursor.execute("SELECT COUNT(*) FROM UUID_stats", ())
+        (count,) = cursor.fetchall()[0]
+    except mysql.connector.Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return count
+
+########################################
+# Decoded device name index
+########################################
+# Device names are stored hex-encoded (name_hex_str, or GATT Device Name
+# characteristic byte_values), since they aren't guaranteed to be valid UTF-8,
+# so searching them by regex meant pulling every name row from every table
+# into Python to decode it. The device_names table instead holds each name
+# already decoded (the same way get_utf8_string_from_hex_string() does), plus
+# a casefold()ed copy, so that name searches can narrow down the candidates
+# in SQL (see device_name_regex_prefilter()), and the per-device name lookups
+# (get_device_names()) are a single query.
+#
+# Kept up to date at insert time and backfilled the same way as
+# bdaddr_presence above (see Backfill_bdaddr_presence.py). GATT Device Name
+# (0x2a00) values only become names once both their GATT_characteristics and
+# GATT_characteristics_values rows are in, which can be from different imports,
+# so inserting either one just queues the bdaddr to have its GATT names looked
+# up again when the device names are flushed.
+#
+# BT Classic rows are recorded under bdaddr_random = 0, and le_evt_type is only
+# meaningful for LE_bdaddr_to_name rows (it's 0 for the others).
+
+# In the order that names are listed in for a device
+DEVICE_NAME_SOURCES = ["EIR_bdaddr_to_name", "HCI_bdaddr_to_name", "LE_bdaddr_to_name", "GATT_characteristics_values"]
+DEVICE_NAME_SOURCE_ORDER = {table: i for i, table in enumerate(DEVICE_NAME_SOURCES)}
+
+# Tables without a bdaddr_random column
+DEVICE_NAME_CLASSIC_SOURCES = ["EIR_bdaddr_to_name", "HCI_bdaddr_to_name"]
+
+# GATT Device Name values, with the bdaddr IN (...) list to be filled in
+_gatt_device_name_query = (
+    "SELECT cv.id, CONVERT(cv.bdaddr USING utf8mb4), cv.bdaddr_random, cv.byte_values FROM GATT_characteristics_values AS cv "
+    "JOIN GATT_characteristics AS c ON cv.char_value_handle = c.char_value_handle AND cv.bdaddr_random = c.bdaddr_random AND cv.bdaddr = c.bdaddr "
+    "WHERE c.UUID = '2a00' AND {where}"
+)
+
+# single-row INSERT statement -> (table, bdaddr value index, bdaddr_random value index or None, le_evt_type value index or None, name_hex_str value index or None), or None if the table isn't a name source
+_device_name_insert_shapes = {}
+
+# (bdaddr, bdaddr_random, source_table, le_evt_type, name_hex_str, name, name_casefold) rows not yet written to device_names
+_pending_device_names = set()
+
+# (bdaddr, bdaddr_random) whose GATT Device Name values need to be looked up again
+_pending_gatt_name_bdaddrs = set()
+
+# (The no-op update is so that rows already in the index don't raise 1062 warnings, which raise_on_warnings would turn into exceptions)
+_device_names_insert = (
+    "INSERT INTO device_names (bdaddr, bdaddr_random, source_table, le_evt_type, name_hex_str, name, name_casefold) VALUES {placeholders} "
+    "ON DUPLICATE KEY UPDATE id = id"
+)
+
+
+def _device_name_insert_shape(query):
+    if query in _device_name_insert_shapes:
+        return _device_name_insert_shapes[query]
+    shape = None
+    m = _insert_columns_re.match(query)
+    if m and m.group("table") in ("EIR_bdaddr_to_name", "HCI_bdaddr_to_name", "LE_bdaddr_to_name", "GATT_characteristics", "GATT_characteristics_values"):
+        columns = [c.strip() for c in m.group("cols").split(",")]
+        if "bdaddr" in columns:
+            def index(column):
+                return columns.index(column) if column in columns else None
+            shape = (m.group("table"), columns.index("bdaddr"), index("bdaddr_random"), index("le_evt_type"), index("name_hex_str"))
+    _device_name_insert_shapes[query] = shape
+    return shape
+
+
+def record_device_name(table, bdaddr, bdaddr_random, le_evt_type, name_bytes):
+    if not isinstance(bdaddr, str):
+        return
+    name = bytes(name_bytes).decode('utf-8', 'ignore')
+    _pending_device_names.add((bdaddr, int(bdaddr_random), table, int(le_evt_type), bytes(name_bytes).hex(), name, name.casefold()))
+    if(len(_pending_device_names) >= TME.TME_glob.insert_batch_size):
+        flush_device_names()
+
+
+# Index the names of rows that were just written with the single-row INSERT statement query
+def record_inserted_rows_device_names(query, rows):
+    shape = _device_name_insert_shape(query)
+    if shape is None:
+        return
+    (table, bdaddr_i, random_i, evt_i, hex_i) = shape
+    for row in rows:
+        bdaddr = row[bdaddr_i]
+        if not isinstance(bdaddr, str):
+            continue
+        bdaddr_random = int(row[random_i]) if random_i is not None else 0
+        if(table.startswith("GATT_")):
+            _pending_gatt_name_bdaddrs.add((bdaddr, bdaddr_random))
+            continue
+        try:
+            name_bytes = bytes.fromhex(row[hex_i])
+        except (TypeError, ValueError):
+            continue
+        record_device_name(table, bdaddr, bdaddr_random, row[evt_i] if evt_i is not None else 0, name_bytes)
+    if(len(_pending_gatt_name_bdaddrs) >= TME.TME_glob.insert_batch_size):
+        flush_device_names()
+
+
+def _write_device_names_chunk(cursor, chunk):
+    query = _device_names_insert.format(placeholders=", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * len(chunk)))
+    params = tuple(v for row in chunk for v in row)
+    cursor.execute(query, params)
+
+
+def _requeue_device_names(rows):
+    _pending_device_names.update(rows)
+
+
+def flush_device_names():
+    global _pending_device_names, _pending_gatt_name_bdaddrs
+    if _pending_gatt_name_bdaddrs:
+        gatt_bdaddrs = sorted(_pending_gatt_name_bdaddrs)
+        _pending_gatt_name_bdaddrs = set()
+        cursor = _get_mysql_conn().cursor()
+        try:
+            batch_size = max(1, TME.TME_glob.insert_batch_size)
+            for i in range(0, len(gatt_bdaddrs), batch_size):
+                chunk = gatt_bdaddrs[i:i + batch_size]
+                where = "(cv.bdaddr, cv.bdaddr_random) IN (" + ", ".join(["(%s, %s)"] * len(chunk)) + ")"
+                cursor.execute(_gatt_device_name_query.format(where=where), tuple(v for key in chunk for v in key))
+                for (row_id, bdaddr, bdaddr_random, byte_values) in cursor.fetchall():
+                    _pending_device_names.add(_gatt_device_name_row(bdaddr, bdaddr_random, byte_values))
+        except mysql.connector.Error:
+            _pending_gatt_name_bdaddrs.update(gatt_bdaddrs)
+            raise
+        finally:
+            cursor.close()
+
+    if not _pending_device_names:
+        return
+    rows = _pending_device_names
+    _pending_device_names = set()
+    _flush_index_rows(rows, _write_device_names_chunk, _requeue_device_names)
+
+
+def _gatt_device_name_row(bdaddr, bdaddr_random, byte_values):
+    name = bytes(byte_values).decode('utf-8', 'ignore')
+    return (bdaddr, int(bdaddr_random), "GATT_characteristics_values", 0, bytes(byte_values).hex(), name, name.casefold())
+
+
+# Indexes the names of every row already in DEVICE_NAME_SOURCES. With rebuild=True
+# device_names is emptied first, dropping entries for rows deleted since they
+# were recorded. Returns the number of device_names rows.
+def backfill_device_names(rebuild=False, page_size=10000):
+    flush_device_names()
+    connection = _get_mysql_conn()
+    cursor = connection.cursor()
+    try:
+        if(rebuild):
+            cursor.execute("DELETE FROM device_names")
+            connection.commit()
+        for table in ["EIR_bdaddr_to_name", "HCI_bdaddr_to_name", "LE_bdaddr_to_name"]:
+            bdaddr_random = "0" if table in DEVICE_NAME_CLASSIC_SOURCES else "bdaddr_random"
+            le_evt_type = "le_evt_type" if table == "LE_bdaddr_to_name" else "0"
+            last_id = 0
+            while True:
+                cursor.execute(f"SELECT id, CONVERT(bdaddr USING utf8mb4), {bdaddr_random}, {le_evt_type}, name_hex_str FROM {table} WHERE id > %s ORDER BY id LIMIT %s", (last_id, page_size))
+                page = cursor.fetchall()
+                if not page:
+                    break
+                for (row_id, bdaddr, row_random, row_evt_type, name_hex_str) in page:
+                    try:
+                        record_device_name(table, bdaddr, row_random, row_evt_type, bytes.fromhex(name_hex_str))
+                    except (TypeError, ValueError):
+                        continue
+                last_id = page[-1][0]
+            flush_device_names()
+        last_id = 0
+        while True:
+            cursor.execute(_gatt_device_name_query.format(where="cv.id > %s ORDER BY cv.id LIMIT %s"), (last_id, page_size))
+            page = cursor.fetchall()
+            if not page:
+                break
+            for (row_id, bdaddr, bdaddr_random, byte_values) in page:
+                _pending_device_names.add(_gatt_device_name_row(bdaddr, bdaddr_random, byte_values))
+            last_id = page[-1][0]
+            flush_device_names()
+        cursor.execute("SELECT COUNT(*) FROM device_names")
+        (count,) = cursor.fetchone()
+    except mysql.connector.Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return count
+
+
+# Returns [(source_table, le_evt_type, name), ...] for bdaddr from device_names, in
+# DEVICE_NAME_SOURCES order and then the order they were imported in. bdaddr_random
+# only constrains the LE and GATT names, since the BT Classic tables don't have one.
+def get_device_names(bdaddr, bdaddr_random=None):
+    query = "SELECT id, bdaddr_random, source_table, le_evt_type, name FROM device_names WHERE bdaddr = %s"
+    rows = execute_query(query, (bdaddr,))
+    names = []
+    for (row_id, row_random, source_table, le_evt_type, name) in sorted(rows, key=lambda row: (DEVICE_NAME_SOURCE_ORDER.get(row[2], len(DEVICE_NAME_SOURCES)), row[0])):
+        if(bdaddr_random is not None and source_table not in DEVICE_NAME_CLASSIC_SOURCES and int(row_random) != int(bdaddr_random)):
+            continue
+        names.append((source_table, le_evt_type, name))
+    return names
+
+
+_regex_special_chars = ".^$*+?{}[]()|\\"
+_regex_quantifier_re = re.compile(r"\{\d*(?:,\d*)?\}")
+
+# Returns (literal, ignorecase, anchored) where literal is the longest string
+# that every match of the Python regex has to contain (at the very start of the
+# name if anchored), or None if there isn't one that's easy to be sure of.
+# This is deliberately conservative: anything it doesn't understand (alternation,
+# the contents of groups, escapes like \x41) just ends the current literal run.
+def regex_required_literal(regex):
+    ignorecase = False
+    anchored_start = False
+    m = re.match(r"\(\?([aiLmsux]+)\)", regex)
+    if m:
+        if("x" in m.group(1)):
+            return (None, False, False)
+        ignorecase = "i" in m.group(1)
+        # With MULTILINE, ^ can also match after a newline
+        anchored_start = "m" not in m.group(1)
+        regex = regex[m.end():]
+    else:
+        anchored_start = True
+    if(regex.startswith("^")):
+        regex = regex[1:]
+    else:
+        anchored_start = False
+
+    runs = [] # (literal, starts at the start of the regex)
+    current = []
+    current_at_start = True
+    at_start = True
+    i = 0
+    while i < len(regex):
+        c = regex[i]
+        if(c == "\\"):
+            if(i + 1 >= len(regex)):
+                return (None, False, False)
+            n = regex[i + 1]
+            if(n in _regex_special_chars or (not n.isalnum() and n != "_")):
+                current.append(n)
+                i += 2
+                continue
+            if(n not in "dDwWsSbBAZ"):
+                # E.g. \1, \x41, \N{...}: not worth decoding
+                return (None, False, False)
+            i += 2
+        elif(c == "["):
+            # Skip the character class (a "]" right after "[" or "[^" is a literal)
+            j = i + 1
+            if(j < len(regex) and regex[j] == "^"):
+                j += 1
+            if(j < len(regex) and regex[j] == "]"):
+                j += 1
+            while j < len(regex) and regex[j] != "]":
+                j += 2 if regex[j] == "\\" else 1
+            if(j >= len(regex)):
+                return (None, False, False)
+            i = j + 1
+        elif(c == "("):
+            # Skip the whole group, including any alternation inside it
+            depth = 0
+            j = i
+            while j < len(regex):
+                if(regex[j] == "\\"):
+                    j += 2
+                    continue
+                if(regex[j] == "["):
+                    j += 1
+                    if(j < len(regex) and regex[j] == "^"):
+                        j += 1
+                    if(j < len(regex) and regex[j] == "]"):
+                        j += 1
+                    while j < len(regex) and regex[j] != "]":
+                        j += 2 if regex[j] == "\\" else 1
+                elif(regex[j] == "("):
+                    depth += 1
+                elif(regex[j] == ")"):
+                    depth -= 1
+                    if(depth == 0):
+                        break
+                j += 1
+            if(j >= len(regex)):
+                return (None, False, False)
+            i = j + 1
+        elif(c == "|"):
+            return (None, False, False)
+        elif(c in "*?" or (c == "{" and _regex_quantifier_re.match(regex, i))):
+            # The previous atom is optional, so if it was a literal character it's not required
+            if(current):
+                current.pop()
+            i = _regex_quantifier_re.match(regex, i).end() if c == "{" else i + 1
+        elif(c == "+"):
+            i += 1
+        else:
+            if(c not in ".^$"):
+                current.append(c)
+                i += 1
+                continue
+            i += 1
+        # Anything that isn't a literal character ends the current run
+        if(current):
+            runs.append(("".join(current), current_at_start))
+        current = []
+        current_at_start = False
+        # A quantifier modifier (lazy ? / possessive +) after a quantifier
+        while i < len(regex) and regex[i] in "?+" and i > 0 and regex[i - 1] in "*+?}":
+            i += 1
+    if(current):
+        runs.append(("".join(current), current_at_start))
+    if not runs:
+        return (None, False, False)
+    (literal, at_start) = max(runs, key=lambda run: len(run[0]))
+    return (literal, ignorecase, anchored_start and at_start)
+
+
+# Returns (sql, values) for a device_names WHERE clause that every name matching
+# the Python regex nameregex passes (but not only those), or ("", ()) if there
+# isn't a cheap one. The matching itself is still done by re, on what's left.
+def device_name_regex_prefilter(nameregex):
+    (literal, ignorecase, anchored) = regex_required_literal(nameregex)
+    if literal is None:
+        return ("", ())
+    if(ignorecase):
+        # re's IGNORECASE and str.casefold() only reliably agree for ASCII
+        if not literal.isascii():
+            return ("", ())
+        column = "name_casefold"
+        # ... apart from i/I, which (?i) also matches to U+0130 (İ) and U+0131 (ı), neither of
+        # which casefold()s to "i". So only the longest part of the literal without one is required.
+        parts = literal.casefold().split("i")
+        longest = max(range(len(parts)), key=lambda n: len(parts[n]))
+        if not parts[longest]:
+            return ("", ())
+        literal = parts[longest]
+        anchored = anchored and longest == 0
+    else:
+        column = "name"
+    like = literal.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+    like = f"{like}%" if anchored else f"%{like}%"
+    return (f"{column} LIKE %s ESCAPE '!'", (like,))
+
 ########################################
 # Indexed existence-check helpers
 ########################################
@@ -330,152 +1465,10 @@ def is_bdaddr_classic(bdaddr):
 # Return 0 on a public BDADDR
 # Return 1 on a random BDADDR
 def is_bdaddr_le_and_random(bdaddr):
-
-    # Note: this is a suboptimal query, but it's the first one I could get working and I wanted to move on
-    # It would be better if it returned an error on an empty set, implying we needed to update the tables list
-    values = (bdaddr,) * 33
-
-    query = """
-    SELECT 1
-    FROM LE_bdaddr_to_3d_info
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_appearance
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_CoD
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_connect_interval
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_flags
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_MSD
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_name
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_other_le_bdaddr
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_public_target_bdaddr
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_random_target_bdaddr
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_role
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_tx_power
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_URI
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_UUID128_service_data
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_UUID128_service_solicit
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_UUID128s_list
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_UUID32_service_data
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_UUID32_service_solicit
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_UUID32s_list
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_UUID16_service_data
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_UUID16_service_solicit
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LE_bdaddr_to_UUID16s_list
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LL_FEATUREs
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LL_LENGTHs
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LL_PHYs
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LL_PINGs
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LL_UNKNOWN_RSP
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM LL_VERSION_IND
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM GATT_attribute_handles
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM GATT_characteristics
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM GATT_characteristics_values
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM GATT_attribute_handles
-    WHERE bdaddr = %s and bdaddr_random = 1
-    UNION
-    SELECT 1
-    FROM GATT_services
-    WHERE bdaddr = %s and bdaddr_random = 1;
-    """
-
-    result = execute_query(query, values)
-    if(len(result) == 0):
-        return False
-
-    for (bdaddr_result,) in result:
-        if(bdaddr_result == 1):
-            return True
+    # Any LE advertisement, LL control or GATT data seen with bdaddr_random = 1 (see bdaddr_presence above)
+    query = "SELECT 1 FROM bdaddr_presence WHERE bdaddr = %s AND bdaddr_random = 1 AND (tables_bitmap & %s) != 0"
+    result = execute_query(query, (bdaddr, BDADDR_PRESENCE_LE_MASK))
+    return len(result) > 0
 
 # Special case of random = -1 means the caller doesn't know whether it's random or not, and wants it looked up
 def get_bdaddr_type(bdaddr, random):
@@ -593,6 +1586,160 @@ def print_company_name_from_bdaddr(indent, bdaddr, print_type):
                 qprint(f"{indent}{i1}BDADDR is Bluetooth Low Energy Public")
         # qprint("")
 
+########################################
+# ChipMaker OUI table
+########################################
+# TME_metadata's ChipMaker_names_and_BT_CIDs keys are MySQL regexes over the
+# IEEE OUI company names, and finding their OUIs used to take one REGEXP scan
+# of IEEE_bdaddr_to_company per chip maker, on every invocation. The
+# ChipMaker_OUIs table holds the result instead, as (oui, chipmaker regex,
+# company_name) rows, and ChipMaker_OUIs_source records for each chip maker
+# regex the IEEE_bdaddr_to_company row count and max id it was computed
+# against. So a chip maker only gets recomputed (still by REGEXP, so the
+# matches are exactly what MySQL's collation gives) when it's new, or the OUI
+# import has changed since. translator_fill_IEEE_bdaddr_to_company.sh runs
+# Refresh_ChipMaker_OUIs.py after importing, and TME refreshes anything stale
+# when it starts up.
+
+# Returns (row count, max id) of IEEE_bdaddr_to_company, to detect a changed OUI import
+def _ieee_oui_table_version(cursor):
+    cursor.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM IEEE_bdaddr_to_company", ())
+    (row_count, max_id) = cursor.fetchall()[0]
+    return (int(row_count), int(max_id))
+
+# Bring ChipMaker_OUIs up to date with the chipmakers regex list, recomputing only
+# the chip makers that are new or were computed against a different OUI import,
+# and dropping the ones no longer in the list. rebuild recomputes all of them.
+# Returns the number of chip makers recomputed.
+def refresh_chipmaker_ouis(chipmakers, rebuild=False):
+    chipmakers = list(chipmakers)
+    connection = _get_mysql_conn()
+    cursor = connection.cursor()
+    try:
+        version = _ieee_oui_table_version(cursor)
+        cursor.execute("SELECT chipmaker, IEEE_row_count, IEEE_max_id FROM ChipMaker_OUIs_source", ())
+        computed = {chipmaker: (int(row_count), int(max_id)) for (chipmaker, row_count, max_id) in cursor.fetchall()}
+        stale = [chipmaker for chipmaker in chipmakers if(rebuild or computed.get(chipmaker) != version)]
+        removed = [chipmaker for chipmaker in computed.keys() if chipmaker not in chipmakers]
+        for chipmaker in stale + removed:
+            cursor.execute("DELETE FROM ChipMaker_OUIs WHERE chipmaker = %s", (chipmaker,))
+            cursor.execute("DELETE FROM ChipMaker_OUIs_source WHERE chipmaker = %s", (chipmaker,))
+        for chipmaker in stale:
+            cursor.execute(
+                "INSERT INTO ChipMaker_OUIs (oui, chipmaker, company_name) "
+                "SELECT LOWER(bdaddr), %s, company_name FROM IEEE_bdaddr_to_company WHERE company_name REGEXP %s "
+                "ON DUPLICATE KEY UPDATE oui = oui", (chipmaker, chipmaker))
+            cursor.execute("INSERT INTO ChipMaker_OUIs_source (chipmaker, IEEE_row_count, IEEE_max_id) VALUES (%s, %s, %s)",
+                           (chipmaker, version[0], version[1]))
+        if(stale or removed):
+            connection.commit()
+    except mysql.connector.Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return len(stale)
+
+# Returns {oui: IEEE company name} for every OUI in ChipMaker_OUIs, with lowercase "xx:xx:xx" OUIs
+def load_chipmaker_ouis():
+    query = "SELECT oui, company_name FROM ChipMaker_OUIs"
+    return {oui: company_name for (oui, company_name) in execute_query(query, ())}
+
+# Returns [(oui, company_name), ...] for the IEEE OUIs whose company name matches companyregex
+# (as a MySQL REGEXP), with lowercase OUIs. If companyregex is one of the chip maker regexes
+# in ChipMaker_OUIs it's answered from there, otherwise by scanning IEEE_bdaddr_to_company.
+def get_ouis_by_company_regex(companyregex):
+    values = (companyregex,)
+    if(execute_query("SELECT 1 FROM ChipMaker_OUIs_source WHERE chipmaker = %s", values)):
+        query = "SELECT oui, company_name FROM ChipMaker_OUIs WHERE chipmaker = %s"
+        return list(execute_query(query, values))
+    query = "SELECT bdaddr, company_name FROM IEEE_bdaddr_to_company WHERE company_name REGEXP %s"
+    return [(oui.lower(), company_name) for (oui, company_name) in execute_query(query, values)]
+
+########################################
+# Combined regex matcher
+########################################
+# NamePrint lookups test one name against every NAMEPRINT_*_DB.csv regex (or
+# every Metadata_v2 2thprint_NamePrint regex), so the cost per name grows
+# with the number of NamePrints. build_regex_matcher() instead pulls out the
+# literal string that each regex's matches have to contain (see
+# regex_required_literal()) and puts all those literals into one Aho-Corasick
+# automaton. A single pass over the name then gives the few regexes whose
+# literal occurs in it, and only those (plus any that have no usable literal)
+# get re.search()ed.
+#
+# A matcher is a plain dict, so it can go into the startup cache:
+#   "patterns": the regex strings, in the order they were given
+#   "regexes":  the compiled regexes
+#   "always":   indexes of the regexes that have to be checked for every name
+#   "goto", "fail", "out": the automaton's transitions, failure links, and
+#               the regex indexes whose literal ends at each state
+
+def build_regex_matcher(patterns):
+    goto = [{}]
+    out = [set()]
+    always = []
+    for index, pattern in enumerate(patterns):
+        (literal, ignorecase, anchored) = regex_required_literal(pattern)
+        if literal is None or ignorecase:
+            always.append(index)
+            continue
+        state = 0
+        for c in literal:
+            if c not in goto[state]:
+                goto.append({})
+                out.append(set())
+                goto[state][c] = len(goto) - 1
+            state = goto[state][c]
+        out[state].add(index)
+
+    # Breadth-first, so that each state's failure link is done before its children's
+    fail = [0] * len(goto)
+    queue = list(goto[0].values())
+    for state in queue:
+        for c, child in goto[state].items():
+            queue.append(child)
+            f = fail[state]
+            while f and c not in goto[f]:
+                f = fail[f]
+            fail[child] = goto[f].get(c, 0)
+            out[child] |= out[fail[child]]
+
+    return {
+        "patterns": list(patterns),
+        "regexes": [re.compile(pattern) for pattern in patterns],
+        "always": always,
+        "goto": goto,
+        "fail": fail,
+        "out": [frozenset(indexes) for indexes in out],
+    }
+
+
+# Returns the sorted indexes of every matcher regex that re.search() matches in name
+def regex_matcher_search(matcher, name):
+    goto = matcher["goto"]
+    fail = matcher["fail"]
+    out = matcher["out"]
+    candidates = set(matcher["always"])
+    state = 0
+    for c in name:
+        while state and c not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(c, 0)
+        if out[state]:
+            candidates |= out[state]
+    regexes = matcher["regexes"]
+    return [index for index in sorted(candidates) if regexes[index].search(name)]
+
+
+# regex_matcher_search() for each of names, with each distinct name only searched once
+def regex_matcher_search_names(matcher, names):
+    results = {}
+    for name in names:
+        if name not in results:
+            results[name] = regex_matcher_search(matcher, name)
+    return [results[name] for name in names]
+
 ###################################################################################
 # Ideally should be in TME_names, but I don't want to introduce cyclic dependancies
 ###################################################################################
@@ -601,16 +1748,48 @@ def print_company_name_from_bdaddr(indent, bdaddr, print_type):
 # however, it only matches in Python regex if it's got 1 slash instead of 3. like "^Galaxy Watch3 \([A-F0-9]{4}\)$
 # that leads to failure to match on values from the NAMEPRINT_UNIQUE_DB.csv, even when something could have been looked up by the nameregex
 
+# Compensate for difference in how MySQL regex requires three \ to escape ( whereas python only requires one
+def nameprint_to_python_regex(nameprint):
+    return nameprint.replace('\\\\\\', '\\')
+
+
+# Builds TME.TME_glob.nameprint_matcher (over the NAMEPRINT_*_DB.csv regexes, with
+# their full_nameprint_data keys under "keys") and TME.TME_glob.metadata_v2_nameprint_matcher
+# (over the Metadata_v2 2thprint_NamePrint regexes, with their headings under "headings").
+# Called by TME_import once the NamePrint and Metadata_v2 data is loaded, so that the
+# matchers go into the startup cache with it.
+def build_nameprint_matchers():
+    keys = list(TME.TME_glob.full_nameprint_data.keys())
+    matcher = build_regex_matcher([nameprint_to_python_regex(key) for key in keys])
+    matcher["keys"] = keys
+    TME.TME_glob.nameprint_matcher = matcher
+
+    headings = [heading for heading, metadata in TME.TME_glob.metadata_v2.items() if '2thprint_NamePrint' in metadata.keys()]
+    matcher = build_regex_matcher([nameprint_to_python_regex(TME.TME_glob.metadata_v2[heading]['2thprint_NamePrint']) for heading in headings])
+    matcher["headings"] = headings
+    TME.TME_glob.metadata_v2_nameprint_matcher = matcher
+
+
+# (Rebuilding if the NamePrint data was loaded some other way than through TME_import)
+def get_nameprint_matcher():
+    if(len(TME.TME_glob.nameprint_matcher.get("keys", ())) != len(TME.TME_glob.full_nameprint_data)):
+        build_nameprint_matchers()
+    return TME.TME_glob.nameprint_matcher
+
+
+def get_metadata_v2_nameprint_matcher():
+    if("headings" not in TME.TME_glob.metadata_v2_nameprint_matcher):
+        build_nameprint_matchers()
+    return TME.TME_glob.metadata_v2_nameprint_matcher
+
+
 def find_nameprint_match(name_string):
     found = False
-    for key, value in TME.TME_glob.full_nameprint_data.items():
-        #regex_pattern = key
-        # Compensate for difference in how MySQL regex requires three \ to escape ( whereas python only requires one
-        regex_pattern = key.replace('\\\\\\', '\\')
-        #qprint(f"regex_pattern = {regex_pattern}")
-        if re.search(regex_pattern, name_string):
-            qprint(f"{i3}NamePrint: match found for {key}: {value}")
-            found = True
+    matcher = get_nameprint_matcher()
+    for index in regex_matcher_search(matcher, name_string):
+        key = matcher["keys"][index]
+        qprint(f"{i3}NamePrint: match found for {key}: {TME.TME_glob.full_nameprint_data[key]}")
+        found = True
 
     if(not found and (name_string != "" and name_string != '\x00')):
         qprint(f"{i4}NamePrint: no match found")
@@ -618,12 +1797,9 @@ def find_nameprint_match(name_string):
 
 
 def name_matches_nonunique_nameprint(name_string):
-    for key, value in TME.TME_glob.nonunique_nameprint_data.items():
-        #regex_pattern = key
-        # Compensate for difference in how MySQL regex requires three \ to escape ( whereas python only requires one
-        regex_pattern = key.replace('\\\\\\', '\\')
-        #qprint(f"regex_pattern = {regex_pattern}")
-        if re.search(regex_pattern, name_string):
+    matcher = get_nameprint_matcher()
+    for index in regex_matcher_search(matcher, name_string):
+        if matcher["keys"][index] in TME.TME_glob.nonunique_nameprint_data:
             return True
 
     return False
@@ -631,13 +1807,10 @@ def name_matches_nonunique_nameprint(name_string):
 
 # This is for nameprints which have natural variability and thus are presumed to represent unique names
 def name_matches_presumed_unique_nameprint(name_string):
-    for key, value in TME.TME_glob.presumed_unique_nameprint_data.items():
-        #regex_pattern = key
-        # Compensate for difference in how MySQL regex requires three \ to escape ( whereas python only requires one
-        regex_pattern = key.replace('\\\\\\', '\\')
-        #qprint(f"regex_pattern = {regex_pattern}")
-        if re.search(regex_pattern, name_string):
-            return regex_pattern
+    matcher = get_nameprint_matcher()
+    for index in regex_matcher_search(matcher, name_string):
+        if matcher["keys"][index] in TME.TME_glob.presumed_unique_nameprint_data:
+            return matcher["patterns"][index]
 
     return None
 
@@ -991,33 +2164,9 @@ def return_name_for_UUID16(uuid16):
 
 # For just finding out if we can completely skip this BDADDR
 def bdaddr_found_in_any_table(bdaddr):
-    tables = [
-        "bdaddr_to_GPS", "EIR_bdaddr_to_3d_info", "EIR_bdaddr_to_CoD", "EIR_bdaddr_to_DevID",
-        "EIR_bdaddr_to_flags", "EIR_bdaddr_to_MSD", "EIR_bdaddr_to_name", "EIR_bdaddr_to_PSRM",
-        "EIR_bdaddr_to_tx_power", "EIR_bdaddr_to_URI", "EIR_bdaddr_to_UUID128s",
-        "EIR_bdaddr_to_UUID16s", "EIR_bdaddr_to_UUID32s", "GATT_attribute_handles",
-        "GATT_characteristic_descriptor_values", "GATT_characteristics", "GATT_characteristics_values",
-        "GATT_services", "HCI_bdaddr_to_name", "L2CAP_CONNECTION_PARAMETER_UPDATE_REQ",
-        "L2CAP_CONNECTION_PARAMETER_UPDATE_RSP", "LE_bdaddr_to_3d_info", "LE_bdaddr_to_appearance",
-        "LE_bdaddr_to_CoD", "LE_bdaddr_to_connect_interval", "LE_bdaddr_to_flags",
-        "LE_bdaddr_to_MSD", "LE_bdaddr_to_name", "LE_bdaddr_to_other_le_bdaddr",
-        "LE_bdaddr_to_public_target_bdaddr", "LE_bdaddr_to_random_target_bdaddr",
-        "LE_bdaddr_to_role", "LE_bdaddr_to_tx_power", "LE_bdaddr_to_URI",
-        "LE_bdaddr_to_UUID128_service_data", "LE_bdaddr_to_UUID128_service_solicit",
-        "LE_bdaddr_to_UUID128s_list", "LE_bdaddr_to_UUID16_service_data",
-        "LE_bdaddr_to_UUID16_service_solicit", "LE_bdaddr_to_UUID16s_list",
-        "LE_bdaddr_to_UUID32_service_data", "LE_bdaddr_to_UUID32_service_solicit",
-        "LE_bdaddr_to_UUID32s_list", "LL_FEATUREs", "LL_LENGTHs", "LL_PHYs", "LL_PINGs",
-        "LL_UNKNOWN_RSP", "LL_VERSION_IND", "LMP_FEATURES_RES", "LMP_FEATURES_RES_EXT",
-        "LMP_NAME_RES_defragmented", "LMP_VERSION_RES", "SDP_Common", "SDP_ERROR_RSP", "SMP_Pairing_Req_Res"
-    ]
-
-    query = " UNION ALL ".join([f"SELECT EXISTS(SELECT 1 FROM {table} WHERE bdaddr = %s)" for table in tables])
-    values = (bdaddr,) * len(tables)
-
+    query = "SELECT EXISTS(SELECT 1 FROM bdaddr_presence WHERE bdaddr = %s AND tables_bitmap != 0)"
     try:
-        result = execute_query(query, values)
-        # If any row returned 1, the bdaddr exists in at least one table
+        result = execute_query(query, (bdaddr,))
         return any(row[0] for row in result)
     except Exception as e:
         print(f"Error checking tables: {e}")
@@ -5,8 +5,11 @@
 
 import json
 import csv
+import hashlib
 import os
+import pickle
 import sys
+import time
 import yaml
 import TME.TME_glob
 from TME.TME_helpers import *
@@ -506,4 +509,201 @@ def import_SDP_protocol_identifiers():
         uuid = entry['uuid']
         TME.TME_glob.SDP_protocol_identifiers[uuid] = name
 
-    #qprint(TME.TME_glob.SDP_universal_attribute_names)
\ No newline at end of file
+    #qprint(TME.TME_glob.SDP_universal_attribute_names)
+
+########################################
+# STARTUP CACHE ########################
+########################################
+# Every Tell_Me_Everything.py run used to re-parse ~20 YAML/JSON/CSV files
+# through the import_* functions above before touching the database, with
+# yaml.safe_load() over public/assigned_numbers and the CLUES load dominating.
+# import_all_startup_data() instead pickles every TME_glob dict those
+# functions fill into a single cache file, and on the next run loads that one
+# file back, as long as none of the source files changed.
+#
+# Sources are fingerprinted by (mtime_ns, size, sha1). A source whose mtime
+# changed but whose contents hash the same (e.g. a fresh git checkout) still
+# counts as a hit. Missing optional sources (private overrides, CLUES LLM
+# tiers) are recorded as missing, so creating one later invalidates the
+# cache too. This file is itself a source, so changing the parsing code
+# rebuilds the cache.
+
+STARTUP_CACHE_FILE = './metadata/TME_startup_cache.pickle'
+_STARTUP_CACHE_FORMAT_VERSION = 1
+
+# (label for the timing report, import function, source files it reads)
+_STARTUP_IMPORTS = [
+    ("Metadata_v2.json",                import_metadata_v2,                          ['./metadata/Metadata_v2.json']),
+    ("Metadata_v2_private.json",        import_private_metadata_v2,                  ['./metadata/private/Metadata_v2_private.json']),
+    ("CLUES",                           import_CLUES,                                [p for public_path, private_path, _ in _CLUES_DATA_FILES for p in (public_path, private_path)]),
+    ("Model_Metadata_by_Manufacturer",  import_model_metadata_by_manufacturer,       ['./metadata/Model_Metadata_by_Manufacturer.json']),
+    ("NAMEPRINT_UNIQUE_DB.csv",         import_nameprint_CSV_data,                   ['./metadata/NAMEPRINT_UNIQUE_DB.csv', './metadata/private/NAMEPRINT_UNIQUE_DB_private.csv']),
+    ("NAMEPRINT_NONUNIQUE_DB.csv",      import_nonunique_nameprint_CSV_data,         ['./metadata/NAMEPRINT_NONUNIQUE_DB.csv', './metadata/private/NAMEPRINT_NONUNIQUE_DB_private.csv']),
+    ("class_of_device.yaml",            import_CoD_to_names,                         ['./public/assigned_numbers/core/class_of_device.yaml']),
+    ("formattypes.yaml",                import_bt_format_type_to_descriptions,       ['./public/assigned_numbers/core/formattypes.yaml']),
+    ("units.yaml",                      import_bt_units_to_names,                    ['./public/assigned_numbers/uuids/units.yaml']),
+    ("namespace.yaml",                  import_bt_namespace_descriptions,            ['./public/assigned_numbers/core/namespace.yaml']),
+    ("company_identifiers.yaml",        import_bt_CID_to_names,                      ['./public/assigned_numbers/company_identifiers/company_identifiers.yaml']),
+    ("member_uuids.yaml",               import_bt_member_UUID16s_to_names,           ['./public/assigned_numbers/uuids/member_uuids.yaml']),
+    ("core_version.yaml",               import_bt_spec_version_numbers_to_names,     ['./public/assigned_numbers/core/core_version.yaml']),
+    ("service_class.yaml",              import_uuid16_service_names,                 ['./public/assigned_numbers/uuids/service_class.yaml']),
+    ("sdo_uuids.yaml",                  import_uuid16_standards_organizations_names, ['./public/assigned_numbers/uuids/sdo_uuids.yaml']),
+    ("protocol_identifiers.yaml",       import_uuid16_protocol_names,                ['./public/assigned_numbers/uuids/protocol_identifiers.yaml']),
+    ("service_uuids.yaml",              import_gatt_services_uuid16_names,           ['./public/assigned_numbers/uuids/service_uuids.yaml']),
+    ("declarations.yaml",               import_gatt_declarations_uuid16_names,       ['./public/assigned_numbers/uuids/declarations.yaml']),
+    ("descriptors.yaml",                import_gatt_descriptors_uuid16_names,        ['./public/assigned_numbers/uuids/descriptors.yaml']),
+    ("characteristic_uuids.yaml",       import_gatt_characteristic_uuid16_names,     ['./public/assigned_numbers/uuids/characteristic_uuids.yaml']),
+    ("appearance_values.yaml",          import_appearance_yaml_data,                 ['./public/assigned_numbers/core/appearance_values.yaml']),
+    ("universal_attributes.yaml",       import_SDP_universal_attribute_names,        ['./public/assigned_numbers/service_discovery/attribute_ids/universal_attributes.yaml']),
+    ("protocol_identifiers.yaml (SDP)", import_SDP_protocol_identifiers,             ['./public/assigned_numbers/uuids/protocol_identifiers.yaml']),
+    # Built from the Metadata_v2 and NamePrint data loaded above, so it has no sources of its own
+    ("NamePrint matchers",              build_nameprint_matchers,                    []),
+]
+
+# The TME_glob attributes filled in by the _STARTUP_IMPORTS functions
+_STARTUP_CACHE_GLOBALS = [
+    "metadata_v2", "clues", "clues_regexed", "model_metadata_by_manufacturer",
+    "full_nameprint_data", "presumed_unique_nameprint_data", "nonunique_nameprint_data",
+    "CoD_yaml_data", "bt_format_type_to_description", "bt_units_to_names",
+    "bt_namespace_descriptions", "bt_CID_to_names", "bt_member_UUID16s_to_names",
+    "bt_member_UUID16_as_UUID128_to_names", "bt_spec_version_numbers_to_names",
+    "uuid16_service_names", "uuid16_standards_organizations_names", "uuid16_protocol_names",
+    "gatt_services_uuid16_names", "gatt_declarations_uuid16_names",
+    "gatt_descriptors_uuid16_names", "gatt_characteristic_uuid16_names",
+    "appearance_yaml_data", "SDP_universal_attribute_names", "SDP_protocol_identifiers",
+    "nameprint_matcher", "metadata_v2_nameprint_matcher",
+]
+
+
+def _startup_cache_source_paths():
+    """Every on-disk file the startup imports may read, including this
+    module and TME_helpers (which builds the NamePrint matchers). A logical
+    CLUES path also covers its 16 hex-split shards (<base>_0.json ..
+    <base>_f.json), whichever layout is present."""
+    paths = [os.path.abspath(__file__), os.path.abspath(TME.TME_helpers.__file__)]
+    for _, _, source_paths in _STARTUP_IMPORTS:
+        for path in source_paths:
+            paths.append(path)
+            if os.path.basename(path).startswith('CLUES_data'):
+                base, ext = os.path.splitext(path)
+                paths.extend(f"{base}_{i:x}{ext}" for i in range(16))
+    return sorted(set(paths))
+
+
+def _sha1_file(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _stat_fingerprint(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _startup_cache_fingerprints(paths):
+    fingerprints = {}
+    for path in paths:
+        stat = _stat_fingerprint(path)
+        fingerprints[path] = None if stat is None else stat + (_sha1_file(path),)
+    return fingerprints
+
+
+def _load_startup_cache(paths):
+    """Returns the cache dict if it is present and every source is
+    unchanged, else None. Rewrites the cache's stored mtimes when a source
+    was only touched, so that the hash isn't recomputed on every run."""
+    try:
+        with open(STARTUP_CACHE_FILE, 'rb') as f:
+            cache = pickle.load(f)
+    except (FileNotFoundError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError):
+        return None
+    if not isinstance(cache, dict) or cache.get("version") != _STARTUP_CACHE_FORMAT_VERSION:
+        return None
+
+    fingerprints = cache["fingerprints"]
+    if set(fingerprints.keys()) != set(paths):
+        return None
+    touched = False
+    for path in paths:
+        saved = fingerprints[path]
+        stat = _stat_fingerprint(path)
+        if saved is None or stat is None:
+            if saved is not stat:
+                return None
+            continue
+        if stat == saved[:2]:
+            continue
+        if stat[1] != saved[1] or _sha1_file(path) != saved[2]:
+            return None
+        fingerprints[path] = stat + (saved[2],)
+        touched = True
+    if touched:
+        _save_startup_cache(cache)
+    return cache
+
+
+def _save_startup_cache(cache):
+    # Write-then-rename so a concurrent TME run never sees a partial file
+    tmp_file = f"{STARTUP_CACHE_FILE}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, STARTUP_CACHE_FILE)
+    except OSError as e:
+        vprint(f"Couldn't write startup cache {STARTUP_CACHE_FILE}: {e}")
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+
+
+def print_startup_timing(source_timings, cache_load_time=None):
+    print("Startup data load cost per source (parsing the source files):")
+    for label, seconds in source_timings:
+        print(f"{i1}{label:<34} {seconds * 1000:9.1f} ms")
+    total = sum(seconds for _, seconds in source_timings)
+    print(f"{i1}{'Total':<34} {total * 1000:9.1f} ms")
+    if cache_load_time is not None:
+        print(f"Startup data load cost from {STARTUP_CACHE_FILE} (incl. source checks): {cache_load_time * 1000:.1f} ms")
+
+
+def import_all_startup_data(use_cache=True, timing_report=False):
+    """Fill in all the TME_glob lookup data that the import_* functions
+    produce, from the startup cache when it is valid, else by parsing every
+    source (and then rebuilding the cache).
+
+    `timing_report=True` prints the per-source parse cost (as measured the
+    last time the cache was built, on a cache hit) and the cache load cost.
+    """
+    start = time.perf_counter()
+    paths = _startup_cache_source_paths()
+    if use_cache:
+        cache = _load_startup_cache(paths)
+        if cache is not None:
+            for name, value in cache["globals"].items():
+                setattr(TME.TME_glob, name, value)
+            if timing_report:
+                print_startup_timing(cache["timings"], time.perf_counter() - start)
+            return
+
+    source_timings = []
+    for label, import_function, _ in _STARTUP_IMPORTS:
+        t = time.perf_counter()
+        import_function()
+        source_timings.append((label, time.perf_counter() - t))
+
+    if use_cache:
+        _save_startup_cache({
+            "version": _STARTUP_CACHE_FORMAT_VERSION,
+            "fingerprints": _startup_cache_fingerprints(paths),
+            "timings": source_timings,
+            "globals": {name: getattr(TME.TME_glob, name) for name in _STARTUP_CACHE_GLOBALS},
+        })
+    if timing_report:
+        print_startup_timing(source_timings)
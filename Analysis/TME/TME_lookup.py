@@ -31,67 +31,31 @@ def device_has_LMP_VERSION_RES_info(bdaddr):
 def get_bdaddrs_by_name_regex(nameregex, bdaddr_random):
     vprint(nameregex)
     bdaddr_hash = {} # Use hash to de-duplicate between all results from all tables
-    bdaddrs = []
 
-    # Regex matching done in Python (not MySQL) to tolerate non-UTF-8 byte sequences in stored names
+    # Regex matching done in Python (not MySQL), since MySQL's regex dialect isn't Python's, against
+    # the names already decoded into device_names (see TME_helpers). When every match of the regex has
+    # to contain some literal string, a LIKE on that narrows down which names have to go through re.
     name_pattern = re.compile(nameregex)
-
-    eir_query = "SELECT bdaddr, name_hex_str FROM EIR_bdaddr_to_name"
-    eir_result = execute_query(eir_query, ())
-    eir_matches = 0
-    for (bdaddr, name_hex_str) in eir_result:
-        name = bytes.fromhex(name_hex_str).decode('utf-8', errors='ignore')
-        if name_pattern.search(name):
-            bdaddrs.append((bdaddr,))
-            bdaddr_hash[bdaddr] = 1
-            eir_matches += 1
-    qprint(f"get_bdaddrs_by_name_regex: {eir_matches} results found in DB:EIR_bdaddr_to_name")
-    vprint(f"get_bdaddrs_by_name_regex: bdaddr_hash = {bdaddr_hash}")
-
-    # Query for HCI_bdaddr_to_name table
-    hci_query = "SELECT bdaddr, name_hex_str FROM HCI_bdaddr_to_name"
-    hci_result = execute_query(hci_query, ())
-    hci_matches = 0
-    for (bdaddr, name_hex_str) in hci_result:
-        name = bytes.fromhex(name_hex_str).decode('utf-8', errors='ignore')
-        if name_pattern.search(name):
-            bdaddr_hash[bdaddr] = 1
-            hci_matches += 1
-    qprint(f"get_bdaddrs_by_name_regex: {hci_matches} results found in DB:HCI_bdaddr_to_name")
-    vprint(f"get_bdaddrs_by_name_regex: bdaddr_hash = {bdaddr_hash}")
-
-    # Query for LE_bdaddr_to_name table
+    (prefilter, values) = device_name_regex_prefilter(nameregex)
+    conditions = [prefilter] if prefilter else []
     if(bdaddr_random is not None):
-        le_query = "SELECT bdaddr, name_hex_str FROM LE_bdaddr_to_name WHERE bdaddr_random = %s"
-        le_result = execute_query(le_query, (bdaddr_random,))
-    else:
-        le_query = "SELECT bdaddr, name_hex_str FROM LE_bdaddr_to_name"
-        le_result = execute_query(le_query, ())
-    le_matches = 0
-    for (bdaddr, name_hex_str) in le_result:
-        name = bytes.fromhex(name_hex_str).decode('utf-8', errors='ignore')
+        # The BT Classic tables have no bdaddr_random, so their names always apply
+        placeholders = ", ".join(["%s"] * len(DEVICE_NAME_CLASSIC_SOURCES))
+        conditions.append(f"(bdaddr_random = %s OR source_table IN ({placeholders}))")
+        values = values + (bdaddr_random,) + tuple(DEVICE_NAME_CLASSIC_SOURCES)
+    query = "SELECT DISTINCT bdaddr, source_table, name FROM device_names"
+    if(conditions):
+        query += " WHERE " + " AND ".join(conditions)
+    vprint(f"get_bdaddrs_by_name_regex: {query} {values}")
+    result = execute_query(query, values)
+
+    matches = {source_table: 0 for source_table in DEVICE_NAME_SOURCES}
+    for (bdaddr, source_table, name) in result:
         if name_pattern.search(name):
             bdaddr_hash[bdaddr] = 1
-            le_matches += 1
-    qprint(f"get_bdaddrs_by_name_regex: {le_matches} results found in DB:LE_bdaddr_to_name")
-    vprint(f"get_bdaddrs_by_name_regex: bdaddr_hash = {bdaddr_hash}")
-
-    # Query GATT Characteristic values for Device Name (0x2a00) entries, and then checking regex in python instead of MySQL, because the byte values may not be directly translatable to UTF-8 within MySQL
-    if(bdaddr_random is not None):
-        values = (bdaddr_random, bdaddr_random)
-        chars_query = "SELECT cv.bdaddr, cv.byte_values FROM GATT_characteristics_values AS cv JOIN GATT_characteristics AS c ON cv.char_value_handle = c.char_value_handle AND cv.bdaddr = c.bdaddr WHERE c.bdaddr_random = %s AND cv.bdaddr_random = %s AND c.UUID = '2a00';"
-    else:
-        values = ()
-        chars_query = "SELECT cv.bdaddr, cv.byte_values FROM GATT_characteristics_values AS cv JOIN GATT_characteristics AS c ON cv.char_value_handle = c.char_value_handle AND cv.bdaddr = c.bdaddr WHERE c.UUID = '2a00';"
-    chars_result = execute_query(chars_query, values)
-    if(len(chars_result) > 0):
-        for (bdaddr, byte_values) in chars_result:
-            tmpstr = byte_values.decode('utf-8', 'ignore')
-            #qprint(f"byte_values: {tmpstr}")
-            if name_pattern.search(tmpstr):
-                vprint(f"{nameregex} matched bdaddr = {bdaddr}")
-                bdaddr_hash[bdaddr] = 1
-    qprint(f"get_bdaddrs_by_name_regex: {len(chars_result)} results found in DB:GATT_characteristics_values and DB:GATT_characteristics")
+            matches[source_table] = matches.get(source_table, 0) + 1
+    for (source_table, count) in matches.items():
+        qprint(f"get_bdaddrs_by_name_regex: {count} results found in DB:{source_table}")
     vprint(f"get_bdaddrs_by_name_regex: bdaddr_hash (len = {len(bdaddr_hash)}) = {bdaddr_hash}")
 
     return bdaddr_hash.keys()
@@ -103,234 +67,19 @@ def get_bdaddrs_by_bdaddr_regex(bdaddrregex, bdaddr_random):
     bdaddr_hash = {} # Use hash to de-duplicate between all results from all tables
     bdaddrs = []
 
+    # One row per (bdaddr, bdaddr_random) in bdaddr_presence (see TME_helpers).
+    # The BT Classic tables have no bdaddr_random column, so a bdaddr_random
+    # constraint only applies to the LE/LL/GATT tables.
     if(bdaddr_random is not None):
-        values = (bdaddrregex,) + (bdaddr_random,) * 33
+        values = (bdaddrregex, bdaddr_random, BDADDR_PRESENCE_LE_MASK, BDADDR_PRESENCE_CLASSIC_MASK)
         bdaddr_query = (
-            "SELECT DISTINCT t.bdaddr "
-            "FROM ("
-            "    SELECT %s AS bdaddr_regex "
-            ") AS regex "
-            "CROSS JOIN ("
-            "    SELECT bdaddr FROM LE_bdaddr_to_3d_info WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_appearance WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_CoD WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_connect_interval WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_flags WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_MSD WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_name WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_other_le_bdaddr WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_public_target_bdaddr WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_random_target_bdaddr WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_role WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_tx_power WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_URI WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID128_service_data WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID128_service_solicit WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID128s_list WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID32_service_data WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID32_service_solicit WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID32s_list WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID16_service_data WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID16_service_solicit WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID16s_list WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LL_FEATUREs WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LL_LENGTHs WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LL_PHYs WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LL_PINGs WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LL_UNKNOWN_RSP WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LL_VERSION_IND WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM GATT_attribute_handles WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM GATT_characteristic_descriptor_values WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM GATT_characteristics WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM GATT_characteristics_values WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM GATT_services WHERE bdaddr_random = %s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_3d_info"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_CoD"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_DevID"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_flags"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_MSD"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_name"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_PSRM"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_tx_power"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_URI"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_UUID128s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_UUID16s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_UUID32s"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LMP_FEATURES_RES"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LMP_FEATURES_RES_EXT"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LMP_NAME_RES_defragmented"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LMP_VERSION_RES"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM HCI_bdaddr_to_name"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM SDP_Common"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM SDP_ERROR_RSP"
-            ") AS t "
-            "WHERE t.bdaddr REGEXP regex.bdaddr_regex;"
+            "SELECT DISTINCT bdaddr FROM bdaddr_presence "
+            "WHERE bdaddr REGEXP %s "
+            "AND ((bdaddr_random = %s AND (tables_bitmap & %s) != 0) OR (tables_bitmap & %s) != 0);"
         )
     else:
-        values = (bdaddrregex,)
-        bdaddr_query = (
-            "SELECT DISTINCT t.bdaddr "
-            "FROM ("
-            "    SELECT %s AS bdaddr_regex "
-            ") AS regex "
-            "CROSS JOIN ("
-            "    SELECT bdaddr FROM LE_bdaddr_to_3d_info"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_appearance"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_CoD"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_connect_interval"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_flags"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_MSD"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_name"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_other_le_bdaddr"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_public_target_bdaddr"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_random_target_bdaddr"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_role"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_tx_power"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_URI"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID128_service_data"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID128_service_solicit"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID128s_list"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID32_service_data"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID32_service_solicit"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID32s_list"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID16_service_data"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID16_service_solicit"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM LE_bdaddr_to_UUID16s_list"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LL_FEATUREs"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LL_LENGTHs"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LL_PHYs"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LL_PINGs"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LL_UNKNOWN_RSP"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LL_VERSION_IND"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM GATT_attribute_handles"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM GATT_characteristic_descriptor_values"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM GATT_characteristics"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM GATT_characteristics_values"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM GATT_services"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_3d_info"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_CoD"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_DevID"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_flags"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_MSD"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_name"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_PSRM"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_tx_power"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_URI"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_UUID128s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_UUID16s"
-            "    UNION ALL"
-            "    SELECT bdaddr FROM EIR_bdaddr_to_UUID32s"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LMP_FEATURES_RES"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LMP_FEATURES_RES_EXT"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LMP_NAME_RES_defragmented"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM LMP_VERSION_RES"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM HCI_bdaddr_to_name"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM SDP_Common"
-            "    UNION ALL"
-            "    SELECT CONVERT(bdaddr USING utf8mb4) FROM SDP_ERROR_RSP"
-            ") AS t "
-            "WHERE t.bdaddr REGEXP regex.bdaddr_regex;"
-        )
+        values = (bdaddrregex, BDADDR_PRESENCE_LE_MASK | BDADDR_PRESENCE_CLASSIC_MASK)
+        bdaddr_query = "SELECT DISTINCT bdaddr FROM bdaddr_presence WHERE bdaddr REGEXP %s AND (tables_bitmap & %s) != 0;"
     bdaddr_result = execute_query(bdaddr_query, values)
     for (bdaddr,) in bdaddr_result:
         bdaddr_hash[bdaddr] = 1
@@ -491,10 +240,8 @@ def get_bdaddrs_by_company_regex(companyregex, bdaddr_random):
         ############################################
         # MATCH REGEX TO IEEE OUIS (BDADDR PREFIXES)
         ############################################
-        # Query for IEEE_bdaddr_to_company table
-        values = (companyregex,)
-        oui_query = "SELECT bdaddr, company_name FROM IEEE_bdaddr_to_company WHERE company_name REGEXP %s"
-        oui_result = execute_query(oui_query, values)
+        # From ChipMaker_OUIs if companyregex is a chip maker, otherwise the IEEE_bdaddr_to_company table
+        oui_result = get_ouis_by_company_regex(companyregex)
         for oui, company_name in oui_result:
             bdaddr_prefixes[oui] = company_name
             qprint(f"{companyregex} matched company name {company_name}, with OUI {oui}")
@@ -777,12 +524,10 @@ def get_candidate_bdaddrs_matching_company_regex(companyregex, bdaddr_random, ca
 
     ############################################
     # IEEE OUI path (the hot path for "Apple").
-    # Pull matching OUIs into memory once, then prefix-match candidates locally.
+    # Pull matching OUIs into memory once (from ChipMaker_OUIs for the chip maker
+    # regexes, see get_ouis_by_company_regex()), then prefix-match candidates locally.
     ############################################
-    values = (companyregex,)
-    oui_query = "SELECT bdaddr, company_name FROM IEEE_bdaddr_to_company WHERE company_name REGEXP %s"
-    oui_result = execute_query(oui_query, values)
-    matching_ouis = {oui.lower() for (oui, _company_name) in oui_result}
+    matching_ouis = {oui for (oui, _company_name) in get_ouis_by_company_regex(companyregex)}
     qprint(f"{i1}{len(matching_ouis)} OUIs matched in IEEE_bdaddr_to_company")
     if matching_ouis:
         for bdaddr in list(remaining):
@@ -990,184 +735,35 @@ def get_bdaddrs_by_uuid_regex(uuid_regex, bdaddr_random):
     # We probably shouldn't remove - since it can change the meaning of things like [1-4]...
     #uuid_regex.replace("-", "")
 
-    # It could be argued that I could skip some UUID16 tables if the regex is guaranteed to be
-    # > 4 characters, but that would require fully interpolating the regex.
-    # So I'm just going to do it the simple but inefficient way, and look at all the tables
-    # which contain a UUID, regardless of length.
-
-    values = (uuid_regex,)
-
-    ###################################
-    # Start with UUID128 tables
-    ###################################
-
-    # BR/EDR advertisements
-    eir_query = "SELECT bdaddr FROM EIR_bdaddr_to_UUID128s WHERE str_UUID128s REGEXP %s"
-    eir_result = execute_query(eir_query, values)
-    for (bdaddr,) in eir_result:
-        bdaddr_hash[bdaddr] = 1
-    vprint(f"get_bdaddrs_by_uuid_regex: {len(eir_result)} results found in DB:EIR_bdaddr_to_UUID128s")
-    vprint(f"get_bdaddrs_by_uuid_regex: bdaddr_hash = {bdaddr_hash}")
-
-    # LE advertisements
+    # Every UUID from the UUID16/32/128 advertisement tables and the GATT tables is split out
+    # into its own row in bdaddr_to_UUID (see TME_helpers.py). So rather than REGEXP-scanning
+    # the comma-joined lists in each of those tables, match the regex against just the distinct
+    # UUIDs, and then look up which bdaddrs have the ones that matched.
+    # (Which means that the regex is matched against one UUID at a time, not a whole list.)
+    uuid_query = "SELECT uuid FROM (SELECT DISTINCT uuid FROM bdaddr_to_UUID) AS distinct_uuids WHERE uuid REGEXP %s"
+    uuid_result = execute_query(uuid_query, (uuid_regex,))
+    matched_uuids = [uuid for (uuid,) in uuid_result]
+    vprint(f"get_bdaddrs_by_uuid_regex: {len(matched_uuids)} distinct UUIDs matched = {matched_uuids}")
+    if(len(matched_uuids) == 0):
+        return bdaddr_hash.keys()
+
+    uuid_placeholders = ", ".join(["%s"] * len(matched_uuids))
     if(bdaddr_random is not None):
-        values = (bdaddr_random, uuid_regex)
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID128s_list WHERE bdaddr_random = %s AND str_UUID128s REGEXP %s"
+        # BT Classic (EIR) rows don't have a bdaddr_random, so they're never filtered by it
+        classic_placeholders = ", ".join(["%s"] * len(UUID_INDEX_CLASSIC_SOURCES))
+        values = tuple(matched_uuids) + (bdaddr_random,) + tuple(UUID_INDEX_CLASSIC_SOURCES)
+        bdaddr_query = f"SELECT DISTINCT bdaddr, source_table FROM bdaddr_to_UUID WHERE uuid IN ({uuid_placeholders}) AND (bdaddr_random = %s OR source_table IN ({classic_placeholders}))"
     else:
-        values = (uuid_regex,)
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID128s_list WHERE str_UUID128s REGEXP %s"
-    le_result = execute_query(le_query, values)
-    for (bdaddr,) in le_result:
-        bdaddr_hash[bdaddr] = 1
-    vprint(f"get_bdaddrs_by_uuid_regex: {len(le_result)} results found in DB:LE_bdaddr_to_UUID128s_list")
-    vprint(f"get_bdaddrs_by_uuid_regex: bdaddr_hash = {bdaddr_hash}")
-
-    if(bdaddr_random is not None):
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID128_service_solicit WHERE bdaddr_random = %s AND str_UUID128s REGEXP %s"
-    else:
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID128_service_solicit WHERE str_UUID128s REGEXP %s"
-    le_result = execute_query(le_query, values)
-    for (bdaddr,) in le_result:
-        bdaddr_hash[bdaddr] = 1
-    vprint(f"get_bdaddrs_by_uuid_regex: {len(le_result)} results found in DB:LE_bdaddr_to_UUID128_service_solicit")
-    vprint(f"get_bdaddrs_by_uuid_regex: bdaddr_hash = {bdaddr_hash}")
-
-    if(bdaddr_random is not None):
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID128_service_data WHERE bdaddr_random = %s AND UUID128_hex_str REGEXP %s"
-    else:
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID128_service_data WHERE UUID128_hex_str REGEXP %s"
-    le_result = execute_query(le_query, values)
-    for (bdaddr,) in le_result:
-        bdaddr_hash[bdaddr] = 1
-    vprint(f"get_bdaddrs_by_uuid_regex: {len(le_result)} results found in DB:LE_bdaddr_to_UUID128_service_solicit")
-    vprint(f"get_bdaddrs_by_uuid_regex: bdaddr_hash = {bdaddr_hash}")
-
-    ###################################
-    # Then UUID32 tables
-    ###################################
-
-    # BR/EDR advertisements
-    values = (uuid_regex,)
-    eir_query = "SELECT bdaddr FROM EIR_bdaddr_to_UUID32s WHERE str_UUID32s REGEXP %s"
-    eir_result = execute_query(eir_query, values)
-    for (bdaddr,) in eir_result:
-        bdaddr_hash[bdaddr] = 1
-    vprint(f"get_bdaddrs_by_uuid_regex: {len(eir_result)} results found in DB:EIR_bdaddr_to_UUID32s")
-    vprint(f"get_bdaddrs_by_uuid_regex: bdaddr_hash = {bdaddr_hash}")
-
-    # LE advertisements
-    if(bdaddr_random is not None):
-        values = (bdaddr_random, uuid_regex)
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID32s_list WHERE bdaddr_random = %s AND str_UUID32s REGEXP %s"
-    else:
-        values = (uuid_regex,)
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID32s_list WHERE str_UUID32s REGEXP %s"
-    le_result = execute_query(le_query, values)
-    for (bdaddr,) in le_result:
-        bdaddr_hash[bdaddr] = 1
-    vprint(f"get_bdaddrs_by_uuid_regex: {len(le_result)} results found in DB:LE_bdaddr_to_UUID32s_list")
-    vprint(f"get_bdaddrs_by_uuid_regex: bdaddr_hash = {bdaddr_hash}")
-
-    if(bdaddr_random is not None):
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID32_service_solicit WHERE bdaddr_random = %s AND str_UUID32s REGEXP %s"
-    else:
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID32_service_solicit WHERE str_UUID32s REGEXP %s"
-    le_result = execute_query(le_query, values)
-    for (bdaddr,) in le_result:
-        bdaddr_hash[bdaddr] = 1
-    vprint(f"get_bdaddrs_by_uuid_regex: {len(le_result)} results found in DB:LE_bdaddr_to_UUID32_service_solicit")
-    vprint(f"get_bdaddrs_by_uuid_regex: bdaddr_hash = {bdaddr_hash}")
-
-    if(bdaddr_random is not None):
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID32_service_data WHERE bdaddr_random = %s AND UUID32_hex_str REGEXP %s"
-    else:
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID32_service_data WHERE UUID32_hex_str REGEXP %s"
-    le_result = execute_query(le_query, values)
-    for (bdaddr,) in le_result:
-        bdaddr_hash[bdaddr] = 1
-    vprint(f"get_bdaddrs_by_uuid_regex: {len(le_result)} results found in DB:LE_bdaddr_to_UUID32_service_data")
-    vprint(f"get_bdaddrs_by_uuid_regex: bdaddr_hash = {bdaddr_hash}")
-
-    ###################################
-    # Then UUID16 tables
-    ###################################
-
-    # BR/EDR advertisements
-    values = (uuid_regex,)
-    eir_query = "SELECT bdaddr FROM EIR_bdaddr_to_UUID16s WHERE str_UUID16s REGEXP %s"
-    eir_result = execute_query(eir_query, values)
-    for (bdaddr,) in eir_result:
-        bdaddr_hash[bdaddr] = 1
-    vprint(f"get_bdaddrs_by_uuid_regex: {len(eir_result)} results found in DB:EIR_bdaddr_to_UUID16s")
-    vprint(f"get_bdaddrs_by_uuid_regex: bdaddr_hash = {bdaddr_hash}")
-
-    # LE advertisements
-    if(bdaddr_random is not None):
-        values = (bdaddr_random, uuid_regex)
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID16s_list WHERE bdaddr_random = %s AND str_UUID16s REGEXP %s"
-    else:
-        values = (uuid_regex,)
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID16s_list WHERE str_UUID16s REGEXP %s"
-    le_result = execute_query(le_query, values)
-    for (bdaddr,) in le_result:
-        bdaddr_hash[bdaddr] = 1
-    vprint(f"get_bdaddrs_by_uuid_regex: {len(le_result)} results found in DB:LE_bdaddr_to_UUID16s_list")
-    vprint(f"get_bdaddrs_by_uuid_regex: bdaddr_hash = {bdaddr_hash}")
-
-    if(bdaddr_random is not None):
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID16_service_solicit WHERE bdaddr_random = %s AND str_UUID16s REGEXP %s"
-    else:
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID16_service_solicit WHERE str_UUID16s REGEXP %s"
-    le_result = execute_query(le_query, values)
-    for (bdaddr,) in le_result:
-        bdaddr_hash[bdaddr] = 1
-    vprint(f"get_bdaddrs_by_uuid_regex: {len(le_result)} results found in DB:LE_bdaddr_to_UUID16_service_solicit")
-    vprint(f"get_bdaddrs_by_uuid_regex: bdaddr_hash = {bdaddr_hash}")
-
-    if(bdaddr_random is not None):
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID16_service_data WHERE bdaddr_random = %s AND UUID16_hex_str REGEXP %s"
-    else:
-        le_query = "SELECT bdaddr FROM LE_bdaddr_to_UUID16_service_data WHERE UUID16_hex_str REGEXP %s"
-    le_result = execute_query(le_query, values)
-    for (bdaddr,) in le_result:
-        bdaddr_hash[bdaddr] = 1
-    vprint(f"get_bdaddrs_by_uuid_regex: {len(le_result)} results found in DB:LE_bdaddr_to_UUID16_service_data")
-    vprint(f"get_bdaddrs_by_uuid_regex: bdaddr_hash = {bdaddr_hash}")
-
-    ################################################
-    # Then GATT, which can have UUID16s or UUID128s
-    ################################################
-
-    # GATT (technically LE or BR/EDR but I don't have BR/EDR-based collection)
-
-    if(bdaddr_random is not None):
-        gatt_service_query = "SELECT bdaddr FROM GATT_services WHERE bdaddr_random = %s AND UUID REGEXP %s"
-    else:
-        gatt_service_query = "SELECT bdaddr FROM GATT_services WHERE UUID REGEXP %s"
-    gatt_service_result = execute_query(gatt_service_query, values)
-    for (bdaddr,) in gatt_service_result:
-        bdaddr_hash[bdaddr] = 1
-    vprint(f"get_bdaddrs_by_uuid_regex: {len(gatt_service_result)} results found in GATT_services")
-    vprint(f"get_bdaddrs_by_uuid_regex: bdaddr_hash = {bdaddr_hash}")
-
-    if(bdaddr_random is not None):
-        gatt_char_query = "SELECT bdaddr FROM GATT_characteristics WHERE bdaddr_random = %s AND UUID REGEXP %s"
-    else:
-        gatt_char_query = "SELECT bdaddr FROM GATT_characteristics WHERE UUID REGEXP %s"
-    gatt_char_result = execute_query(gatt_char_query, values)
-    for (bdaddr,) in gatt_char_result:
-        bdaddr_hash[bdaddr] = 1
-    vprint(f"get_bdaddrs_by_uuid_regex: {len(gatt_char_result)} results found in GATT_characteristics")
-    vprint(f"get_bdaddrs_by_uuid_regex: bdaddr_hash = {bdaddr_hash}")
+        values = tuple(matched_uuids)
+        bdaddr_query = f"SELECT DISTINCT bdaddr, source_table FROM bdaddr_to_UUID WHERE uuid IN ({uuid_placeholders})"
+    bdaddr_result = execute_query(bdaddr_query, values)
 
-    if(bdaddr_random is not None):
-        gatt_desc_query = "SELECT bdaddr FROM GATT_attribute_handles WHERE bdaddr_random = %s AND UUID REGEXP %s"
-    else:
-        gatt_desc_query = "SELECT bdaddr FROM GATT_attribute_handles WHERE UUID REGEXP %s"
-    gatt_desc_result = execute_query(gatt_desc_query, values)
-    for (bdaddr,) in gatt_desc_result:
+    source_table_counts = {}
+    for (bdaddr, source_table) in bdaddr_result:
         bdaddr_hash[bdaddr] = 1
-    vprint(f"get_bdaddrs_by_uuid_regex: {len(gatt_desc_result)} results found in GATT_attribute_handles")
+        source_table_counts[source_table] = source_table_counts.get(source_table, 0) + 1
+    for (source_table, count) in sorted(source_table_counts.items()):
+        vprint(f"get_bdaddrs_by_uuid_regex: {count} results found in DB:{source_table}")
     vprint(f"get_bdaddrs_by_uuid_regex: bdaddr_hash len {len(bdaddr_hash)} = {bdaddr_hash}")
 
     ################################################
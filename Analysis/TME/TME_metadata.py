@@ -38,122 +38,68 @@ def lookup_metadata_by_nameprint(bdaddr, bdaddr_random, metadata_type):
         else:
             print_ChipPrint_header_if_needed()
 
-    # First see if we have a name for this device
-    we_have_a_name = False
-
-    # Query for EIR_bdaddr_to_name table
-    values = (bdaddr,)
-    eir_query = "SELECT name_hex_str FROM EIR_bdaddr_to_name WHERE bdaddr = %s"
-    eir_result = execute_query(eir_query, values)
-    if(len(eir_result) > 0): we_have_a_name = True
-
-    # Query for HCI_bdaddr_to_name table
-    hci_query = "SELECT name_hex_str FROM HCI_bdaddr_to_name WHERE bdaddr = %s"
-    hci_result = execute_query(hci_query, values)
-    if(len(hci_result) > 0): we_have_a_name = True
-
-    # Query for LE_bdaddr_to_name table
-    if(bdaddr_random is not None):
-        values = (bdaddr_random, bdaddr)
-        le_query = "SELECT name_hex_str, le_evt_type FROM LE_bdaddr_to_name WHERE bdaddr_random = %s AND bdaddr = %s"
-    else:
-        values = (bdaddr,)
-        le_query = "SELECT name_hex_str, le_evt_type FROM LE_bdaddr_to_name WHERE bdaddr = %s"
-    le_result = execute_query(le_query, values)
-    if(len(le_result) > 0): we_have_a_name = True
-
-    # Query GATT Characteristic values for Device Name (0x2a00) entries, and then checking regex in python instead of MySQL, because the byte values may not be directly translatable to UTF-8 within MySQL
-    if(bdaddr_random is not None):
-        values = (bdaddr_random, bdaddr_random, bdaddr)
-        chars_query = "SELECT cv.byte_values FROM GATT_characteristics_values AS cv JOIN GATT_characteristics AS c ON cv.char_value_handle = c.char_value_handle AND cv.bdaddr_random = c.bdaddr_random AND cv.bdaddr = c.bdaddr WHERE c.UUID = '2a00' AND c.bdaddr_random = %s AND cv.bdaddr_random = %s AND cv.bdaddr = %s;"
-    else:
-        values = (bdaddr,)
-        chars_query = "SELECT cv.byte_values FROM GATT_characteristics_values AS cv JOIN GATT_characteristics AS c ON cv.char_value_handle = c.char_value_handle AND cv.bdaddr = c.bdaddr WHERE c.UUID = '2a00' AND cv.bdaddr = %s;"
-    chars_result = execute_query(chars_query, values)
-    if(len(chars_result) > 0): we_have_a_name = True
-
-    # Query Manufacturer-Specific Data (MSD) to see if there's types like Microsoft's Swift Pair which are known to contain a Device Name
-    ms_msd_name_present = False
+    def name_source_str(source_table, le_evt_type):
+        if(source_table == "LE_bdaddr_to_name"):
+            return f" ({"DB:LE_bdaddr_to_name, " if TME.TME_glob.verbose_print else ""}le_evt_type = {get_le_event_type_string(le_evt_type)})"
+        if(not TME.TME_glob.verbose_print):
+            return ""
+        if(source_table == "GATT_characteristics_values"):
+            return " (DB:GATT_characteristics & DB:GATT_characteristics_values)"
+        return f" (DB:{source_table})"
+
+    # All the names we have for this device, in the order they're tried against each NamePrint, as
+    # (name, where it came from for the returned string, header printing function)
+    names = []
+
+    # Names from EIR_bdaddr_to_name, HCI_bdaddr_to_name, LE_bdaddr_to_name, and GATT Device Name (0x2a00) characteristic values
+    for (source_table, le_evt_type, name) in get_device_names(bdaddr, bdaddr_random):
+        names.append((name, name_source_str(source_table, le_evt_type), print_section_header_if_needed))
+
+    # Query Manufacturer-Specific Data (MSD) to see if there's types like Microsoft's Swift Pair or Beacons which are known to contain a Device Name
+    # (Filtering for those in Python rather than MySQL, so that this is the same query the prefetch cache answers for the other MSD printing)
     if(bdaddr_random is not None):
         values = (bdaddr_random, bdaddr)
-        ms_msd_query = "SELECT le_evt_type, manufacturer_specific_data FROM LE_bdaddr_to_MSD WHERE bdaddr_random = %s AND bdaddr = %s AND device_BT_CID = 0006 AND manufacturer_specific_data REGEXP '^030'"
+        msd_query = "SELECT device_BT_CID, le_evt_type, manufacturer_specific_data FROM LE_bdaddr_to_MSD WHERE bdaddr_random = %s AND bdaddr = %s"
     else:
         values = (bdaddr,)
-        ms_msd_query = "SELECT le_evt_type, manufacturer_specific_data FROM LE_bdaddr_to_MSD WHERE bdaddr = %s AND device_BT_CID = 0006 AND manufacturer_specific_data REGEXP '^030'"
-    ms_msd_result = execute_query(ms_msd_query, values)
-    for (le_evt_type, manufacturer_specific_data) in ms_msd_result:
-        ms_msd_name = extract_ms_msd_name(manufacturer_specific_data)
-        if(len(ms_msd_name) > 0):
-            we_have_a_name = True
-            ms_msd_name_present = True
-
-    # Query Manufacturer-Specific Data (MSD) to see if there's types like Microsoft's Beacons which are known to contain a Device Name
-    ms_msd_name_present2 = False
-    regex = '^01[0-9a-f]{4}0a' # Pulling out so the {4} isn't interpreted as part of the format string
-    if(bdaddr_random is not None):
-        values2 = (bdaddr_random, bdaddr, regex)
-        ms_msd_query2 = "SELECT le_evt_type, manufacturer_specific_data FROM LE_bdaddr_to_MSD WHERE bdaddr_random = %s AND bdaddr = %s AND device_BT_CID = 0006 AND manufacturer_specific_data REGEXP %s"
-    else:
-        values2 = (bdaddr, regex)
-        ms_msd_query2 = "SELECT le_evt_type, manufacturer_specific_data FROM LE_bdaddr_to_MSD WHERE bdaddr = %s AND device_BT_CID = 0006 AND manufacturer_specific_data REGEXP %s"
-    ms_msd_result2 = execute_query(ms_msd_query2, values2)
-    for (le_evt_type, manufacturer_specific_data) in ms_msd_result2:
-        try:
-            ms_msd_name2 = get_utf8_string_from_hex_string(manufacturer_specific_data[20:])
-        except:
-            ms_msd_name2 = ""
-        if(len(ms_msd_name2) > 0):
-            we_have_a_name = True
-            ms_msd_name_present2 = True
-
-    if(we_have_a_name):
+        msd_query = "SELECT device_BT_CID, le_evt_type, manufacturer_specific_data FROM LE_bdaddr_to_MSD WHERE bdaddr = %s"
+    swift_pair_names = []
+    beacon_names = []
+    for (device_BT_CID, le_evt_type, manufacturer_specific_data) in execute_query(msd_query, values):
+        if(device_BT_CID != 0x0006):
+            continue
+        if re.match('030', manufacturer_specific_data, re.IGNORECASE):
+            ms_msd_name = extract_ms_msd_name(manufacturer_specific_data)
+            if(len(ms_msd_name) > 0):
+                swift_pair_names.append((ms_msd_name, f" (Microsoft Swift Pair data{" in DB:LE_bdaddr_to_MSD" if TME.TME_glob.verbose_print else ""})", print_ChipPrint_header_if_needed))
+        if re.match('01[0-9a-f]{4}0a', manufacturer_specific_data, re.IGNORECASE):
+            try:
+                ms_msd_name2 = get_utf8_string_from_hex_string(manufacturer_specific_data[20:])
+            except:
+                ms_msd_name2 = ""
+            if(len(ms_msd_name2) > 0):
+                beacon_names.append((ms_msd_name2, f" (Microsoft Beacon data{" in DB:LE_bdaddr_to_MSD" if TME.TME_glob.verbose_print else ""})", print_ChipPrint_header_if_needed))
+    names += swift_pair_names + beacon_names
+
+    if(len(names) > 0):
         # If we have a name, consult with the metadata_v2 data, and see if any entries have Chip Maker data
-        # and if so, try that nameprint against the name(s) for this device
-        for heading, metadata in TME.TME_glob.metadata_v2.items():
-            if('2thprint_NamePrint' in metadata.keys() and metadata_type in metadata.keys()):
-                # Compensate for difference in how MySQL regex requires three \ to escape ( whereas python only requires one
-                regex_pattern = metadata['2thprint_NamePrint'].replace('\\\\\\', '\\')
-                if(len(eir_result) > 0):
-                    for (name_hex_str,) in eir_result:
-                        name = get_utf8_string_from_hex_string(name_hex_str)
-                        if re.search(regex_pattern, name):
-                            print_section_header_if_needed()
-                            return f"{i2}{metadata[metadata_type]} -> From NamePrint match on {regex_pattern}{" (DB:EIR_bdaddr_to_name)" if TME.TME_glob.verbose_print else ""}"
-                if(len(hci_result) > 0):
-                    for (name_hex_str,) in hci_result:
-                        name = get_utf8_string_from_hex_string(name_hex_str)
-                        if re.search(regex_pattern, name):
-                            print_section_header_if_needed()
-                            return f"{i2}{metadata[metadata_type]} -> From NamePrint match on {regex_pattern}{" (DB:HCI_bdaddr_to_name)" if TME.TME_glob.verbose_print else ""}"
-                if(len(le_result) > 0):
-                    for name_hex_str, le_evt_type in le_result:
-                        name = get_utf8_string_from_hex_string(name_hex_str)
-                        if re.search(regex_pattern, name):
-                            print_section_header_if_needed()
-                            return f"{i2}{metadata[metadata_type]} -> From NamePrint match on {regex_pattern} ({"DB:LE_bdaddr_to_name, " if TME.TME_glob.verbose_print else ""}le_evt_type = {get_le_event_type_string(le_evt_type)})"
-                if(len(chars_result) > 0):
-                    for (byte_values,) in chars_result:
-                        name = byte_values.decode('utf-8', 'ignore',)
-                        if re.search(regex_pattern, name):
-                            print_section_header_if_needed()
-                            return f"{i2}{metadata[metadata_type]} -> From NamePrint match on {regex_pattern}{" (DB:GATT_characteristics & DB:GATT_characteristics_values)" if TME.TME_glob.verbose_print else ""}"
-                if(ms_msd_name_present):
-                    for (le_evt_type, manufacturer_specific_data) in ms_msd_result:
-                        ms_msd_name = extract_ms_msd_name(manufacturer_specific_data)
-                        if(len(ms_msd_name) > 0):
-                            if re.search(regex_pattern, ms_msd_name):
-                                print_ChipPrint_header_if_needed()
-                                return f"{i2}{metadata[metadata_type]} -> From NamePrint match on {regex_pattern} (Microsoft Swift Pair data{" in DB:LE_bdaddr_to_MSD" if TME.TME_glob.verbose_print else ""})"
-                if(ms_msd_name_present2):
-                    for (le_evt_type, manufacturer_specific_data) in ms_msd_result2:
-                        try:
-                            ms_msd_name2 = get_utf8_string_from_hex_string(manufacturer_specific_data[20:])
-                        except:
-                            ms_msd_name2 = ""
-                        if(len(ms_msd_name2) > 0):
-                            if re.search(regex_pattern, ms_msd_name2):
-                                print_ChipPrint_header_if_needed()
-                                return f"{i2}{metadata[metadata_type]} -> From NamePrint match on {regex_pattern} (Microsoft Beacon data{" in DB:LE_bdaddr_to_MSD" if TME.TME_glob.verbose_print else ""})"
+        # and if so, try that nameprint against the name(s) for this device.
+        # All the names go through the combined NamePrint matcher at once, and the result is the first
+        # matching metadata_v2 entry (in file order), for the first of the names that it matched.
+        matcher = get_metadata_v2_nameprint_matcher()
+        best = None
+        for (name_index, matches) in enumerate(regex_matcher_search_names(matcher, [name for (name, _, _) in names])):
+            for index in matches:
+                if(metadata_type in TME.TME_glob.metadata_v2[matcher["headings"][index]].keys()):
+                    if(best is None or (index, name_index) < best):
+                        best = (index, name_index)
+                    break
+        if(best is not None):
+            (index, name_index) = best
+            metadata = TME.TME_glob.metadata_v2[matcher["headings"][index]]
+            (name, source_str, print_header_if_needed) = names[name_index]
+            print_header_if_needed()
+            return f"{i2}{metadata[metadata_type]} -> From NamePrint match on {matcher["patterns"][index]}{source_str}"
 
     # Else return an empty string to indicate we have no name or no match
     return ""
@@ -374,13 +320,15 @@ def lookup_metadata_by_GATTprint(bdaddr, bdaddr_random, metadata_input_type, met
 
 ChipMaker_OUI_hash = {}
 
+# Fills ChipMaker_OUI_hash with {oui: IEEE company name} for every OUI whose company name matches
+# one of the ChipMaker_names_and_BT_CIDs regexes. (The IEEE name is used instead of the company regex
+# since it will generally be longer and more verbose, since I cut down some regexes to match both
+# IEEE OUIs and BT CIDs.) The matches come from the ChipMaker_OUIs table (see TME_helpers.py), which
+# only gets recomputed here if the chip maker list or the IEEE OUI import changed since it was filled.
 def create_ChipMaker_OUI_hash():
-    for company in ChipMaker_names_and_BT_CIDs.keys():
-        values = (company,)
-        oui_query = "SELECT bdaddr, company_name FROM IEEE_bdaddr_to_company WHERE company_name REGEXP %s"
-        oui_result = execute_query(oui_query, values)
-        for (oui,company_name) in oui_result:
-            ChipMaker_OUI_hash[oui.lower()] = company_name # I'm using the IEEE name instead of the company regex since it will generally be longer and more verbose, since I cut down some regexes to match both IEEE OUIs and BT CIDs
+    refresh_chipmaker_ouis(ChipMaker_names_and_BT_CIDs.keys())
+    ChipMaker_OUI_hash.clear()
+    ChipMaker_OUI_hash.update(load_chipmaker_ouis())
 
     #qprint(ChipMaker_OUI_hash)
 
@@ -496,17 +444,17 @@ def print_ChipMakerPrint(bdaddr, bdaddr_random):
     #===============#
     random = False
 
-    oui = bdaddr[0:8]
+    oui = bdaddr[0:8].lower()
     is_classic = is_bdaddr_classic(bdaddr)
     if(is_classic):
-        if(oui in ChipMaker_OUI_hash.keys()):
+        if(oui in ChipMaker_OUI_hash):
             print_ChipMakerPrint_header_if_needed()
             qprint(f"{i2}{string_yellow_bright(ChipMaker_OUI_hash[oui])} -> From IEEE OUI matched with BT Classic address")
             no_results_found = False
     else:
         random = is_bdaddr_le_and_random(bdaddr)
         if(not random):
-            if(oui in ChipMaker_OUI_hash.keys()):
+            if(oui in ChipMaker_OUI_hash):
                 print_ChipMakerPrint_header_if_needed()
                 qprint(f"{i2}{string_yellow_bright(ChipMaker_OUI_hash[oui])} -> From IEEE OUI matched with BLE Public address")
                 no_results_found = False
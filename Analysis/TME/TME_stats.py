@@ -3,6 +3,7 @@
 # Copyright(c) © Dark Mentor LLC 2023-2026
 ########################################
 
+import re
 import TME.TME_glob
 from TME.TME_helpers import *
 
@@ -109,43 +110,78 @@ def _classify_uuid128_for_stats(uuid128_no_dash):
 
     return ("", "unknown")
 
-def get_uuid16_stats(arg):
-    seen_btc_uuid16s_hash = {}
-    seen_le_uuid16s_hash = {}
+# Returns (number of devices, number of distinct UUIDs, [(uuid, devices, observations, first_seen, last_seen), ...])
+# for the UUIDs from source_table, most common first, from the UUID_stats summary tables (see TME_helpers.py),
+# so that nothing has to be counted here. uuids restricts the list to those UUIDs, and top to the first top of them.
+def get_uuid_stats_counts(source_table, uuids=None, top=None):
+    device_result = execute_query("SELECT devices FROM UUID_stats_devices WHERE source_table = %s", (source_table,))
+    device_count = device_result[0][0] if device_result else 0
+    uuid_total = execute_query("SELECT COUNT(*) FROM UUID_stats WHERE source_table = %s", (source_table,))[0][0]
+    if(uuids is not None and len(uuids) == 0):
+        return (device_count, uuid_total, [])
+
+    values = (source_table,)
+    uuid_query = "SELECT uuid, devices, observations, first_seen, last_seen FROM UUID_stats WHERE source_table = %s"
+    if(uuids is not None):
+        uuids = sorted(uuids)
+        uuid_query += f" AND uuid IN ({', '.join(['%s'] * len(uuids))})"
+        values += tuple(uuids)
+    uuid_query += " ORDER BY devices DESC, uuid"
+    if(top is not None):
+        uuid_query += " LIMIT %s"
+        values += (top,)
+    return (device_count, uuid_total, execute_query(uuid_query, values))
+
+
+def format_uuid_stats_row(devices, observations, first_seen, last_seen):
+    return f"{devices} \t {observations} \t {first_seen:%Y-%m-%d} \t {last_seen:%Y-%m-%d}"
+
+
+# Returns the UUID16 strings (as they're stored in UUID_stats) of the member UUID16s whose company matches company_regex (all of them if it's None)
+def get_member_uuid16s(company_regex=None):
+    return {f"{uuid16:04x}" for (uuid16, name) in TME.TME_glob.bt_member_UUID16s_to_names.items()
+            if company_regex is None or re.search(company_regex, name)}
+
+
+# Returns the UUID128s (without dashes) of the CLUES entries, and the SIG-Base aliases of the
+# member UUID16s, whose company matches company_regex
+def get_company_uuid128s(company_regex):
+    uuid128s = {uuid128 for (uuid128, entry) in TME.TME_glob.clues.items() if re.search(company_regex, entry.get('company', ""))}
+    uuid128s |= {f"0000{uuid16}{_SIG_BASE_TAIL_HEX}" for uuid16 in get_member_uuid16s(company_regex)}
+    return uuid128s
+
+
+def print_uuid16_stats(source_table, device_count, uuid_total, uuid_stats, arg):
+    company_uuid_count = 0
+    qprint(f"{device_count} devices with data found in DB:{source_table}")
+    qprint(f"{uuid_total} unique UUID16s found")
+    qprint(f"devices \t observations \t first seen \t last seen \t uuid16 \t company")
+    for (uuid16, devices, observations, first_seen, last_seen) in uuid_stats:
+        try:
+            decimal_uuid16 = int(uuid16,16)
+        except ValueError:
+            if(arg != "quiet"): qprint(f"Skipping '{uuid16}', it can't be converted to an integer")
+            continue
+
+        if(decimal_uuid16 in TME.TME_glob.bt_member_UUID16s_to_names.keys()):
+            qprint(f"{format_uuid_stats_row(devices, observations, first_seen, last_seen)} \t {uuid16} \t {TME.TME_glob.bt_member_UUID16s_to_names[decimal_uuid16]}")
+            company_uuid_count += 1
+    qprint(f"*** {company_uuid_count} UUID16s matched a company name ***")
+
+
+# Only the UUID16s with a company name are printed, so only those are looked up.
+# top limits each section to that many UUIDs, and company_regex to the companies matching it.
+def get_uuid16_stats(arg, top=None, company_regex=None):
+    member_uuid16s = get_member_uuid16s(company_regex)
 
     ################################################
     # Get the data for BTC devices from the database
     ################################################
 
-    eir_uuid16_query = "SELECT str_UUID16s FROM EIR_bdaddr_to_UUID16s"
-    eir_uuid16_result = execute_query(eir_uuid16_query, ())
-    if(len(eir_uuid16_result) != 0):
-        company_uuid_count = 0
-        for (str_UUID16s,) in eir_uuid16_result:
-            uuid16s = str_UUID16s.split(',')
-            for uuid16 in uuid16s:
-                if(uuid16 in seen_btc_uuid16s_hash):
-                    seen_btc_uuid16s_hash[uuid16] += 1
-                else:
-                    seen_btc_uuid16s_hash[uuid16] = 1
-
+    (btc_device_count, btc_uuid_total, btc_uuid_stats) = get_uuid_stats_counts("EIR_bdaddr_to_UUID16s", member_uuid16s, top)
+    if(btc_uuid_total != 0):
         qprint("----= BLUETOOTH CLASSIC RESULTS =----")
-        qprint(f"{len(eir_uuid16_result)} rows of data found in DB:EIR_bdaddr_to_UUID16s")
-        qprint(f"{len(seen_btc_uuid16s_hash)} unique UUID16s found")
-        sorted_items = sorted(seen_btc_uuid16s_hash.items(), key=lambda item: item[1], reverse=True)
-        qprint(f"count \t uuid16 \t company")
-        for item in sorted_items:
-            (uuid16,count) = item
-            try:
-                decimal_uuid16 = int(uuid16,16)
-            except ValueError:
-                if(arg != "quiet"): qprint(f"Skipping '{uuid16}', it can't be converted to an integer")
-                continue
-
-            if(decimal_uuid16 in TME.TME_glob.bt_member_UUID16s_to_names.keys()):
-                qprint(f"{count} \t {uuid16} \t {TME.TME_glob.bt_member_UUID16s_to_names[int(uuid16,16)]}")
-                company_uuid_count += 1
-        qprint(f"*** {company_uuid_count} UUID16s matched a company name ***")
+        print_uuid16_stats("EIR_bdaddr_to_UUID16s", btc_device_count, btc_uuid_total, btc_uuid_stats, arg)
 
     ################################################
     # Get the data for LE devices from the database.
@@ -156,83 +192,49 @@ def get_uuid16_stats(arg):
     # silently skipped for LE-only datasets.
     ################################################
 
-    le_uuid16_query = "SELECT str_UUID16s FROM LE_bdaddr_to_UUID16s_list"
-    le_uuid16_result = execute_query(le_uuid16_query, ())
-    if(len(le_uuid16_result) != 0):
-        company_uuid_count = 0
-        for (str_UUID16s,) in le_uuid16_result:
-            if(isinstance(str_UUID16s, str)):
-                uuid16s = str_UUID16s.split(',')
-                for uuid16 in uuid16s:
-                    if(uuid16 in seen_le_uuid16s_hash):
-                        seen_le_uuid16s_hash[uuid16] += 1
-                    else:
-                        seen_le_uuid16s_hash[uuid16] = 1
-
+    (le_device_count, le_uuid_total, le_uuid_stats) = get_uuid_stats_counts("LE_bdaddr_to_UUID16s_list", member_uuid16s, top)
+    if(le_uuid_total != 0):
         qprint("")
         qprint("----= BLUETOOTH LOW ENERGY RESULTS =----")
-        qprint(f"{len(le_uuid16_result)} rows of data found in DB:LE_bdaddr_to_UUID16s_list")
-        qprint(f"{len(seen_le_uuid16s_hash)} unique UUID16s found")
-        sorted_items = sorted(seen_le_uuid16s_hash.items(), key=lambda item: item[1], reverse=True)
-        qprint(f"count \t uuid16 \t company")
-        for item in sorted_items:
-            (uuid16,count) = item
-            try:
-                decimal_uuid16 = int(uuid16,16)
-            except ValueError:
-                if(arg != "quiet"): qprint(f"Skipping '{uuid16}', it can't be converted to an integer")
-                continue
-            if(decimal_uuid16 in TME.TME_glob.bt_member_UUID16s_to_names.keys()):
-                qprint(f"{count} \t {uuid16} \t {TME.TME_glob.bt_member_UUID16s_to_names[int(uuid16,16)]}")
-                company_uuid_count += 1
-
-        qprint(f"*** {company_uuid_count} UUID16s matched a company name ***")
-
-
-def get_uuid128_stats(arg):
-    seen_btc_uuid128s_hash = {}
-    seen_le_uuid128s_hash = {}
+        print_uuid16_stats("LE_bdaddr_to_UUID16s_list", le_device_count, le_uuid_total, le_uuid_stats, arg)
+
+
+def print_uuid128_stats(source_table, device_count, uuid_total, uuid_stats):
+    clues_count = 0
+    sig_alias_resolved_count = 0
+    sig_alias_unknown_count = 0
+    qprint(f"{device_count} devices with data found in DB:{source_table}")
+    qprint(f"{uuid_total} unique UUID128s found")
+    qprint(f"devices \t observations \t first seen \t last seen \t uuid128 {i4} known info")
+    for (uuid128, devices, observations, first_seen, last_seen) in uuid_stats:
+        known_info, classification = _classify_uuid128_for_stats(uuid128)
+        if classification == "clues":
+            clues_count += 1
+        elif classification == "sig_alias":
+            sig_alias_resolved_count += 1
+        elif classification == "sig_alias_unknown":
+            sig_alias_unknown_count += 1
+        qprint(f"{format_uuid_stats_row(devices, observations, first_seen, last_seen)} \t {uuid128} \t {known_info}")
+
+    qprint(f"*** {clues_count} UUID128s are in the CLUES database ***")
+    qprint(f"*** {sig_alias_resolved_count} UUID128s are SIG-Base aliases resolved to an assigned 16-bit name ***")
+    if sig_alias_unknown_count:
+        qprint(f"*** {sig_alias_unknown_count} UUID128s are SIG-Base aliases with no SIG-table match (likely 32-bit alias or newer than the local public/ checkout) ***")
+
+
+# top limits each section to that many UUIDs, and company_regex to the UUID128s
+# whose CLUES company (or SIG-Base alias member company) matches it.
+def get_uuid128_stats(arg, top=None, company_regex=None):
+    company_uuid128s = get_company_uuid128s(company_regex) if company_regex is not None else None
 
     ################################################
     # Get the data for BTC devices from the database
     ################################################
 
-    eir_uuid128_query = "SELECT str_UUID128s FROM EIR_bdaddr_to_UUID128s"
-    eir_uuid128_result = execute_query(eir_uuid128_query, ())
-    if(len(eir_uuid128_result) != 0):
-        clues_count = 0
-        sig_alias_resolved_count = 0
-        sig_alias_unknown_count = 0
-        for (str_UUID128s,) in eir_uuid128_result:
-            if(str_UUID128s == ''):
-                continue
-            uuid128s = str_UUID128s.split(',')
-            for uuid128 in uuid128s:
-                if(uuid128 in seen_btc_uuid128s_hash):
-                    seen_btc_uuid128s_hash[uuid128] += 1
-                else:
-                    seen_btc_uuid128s_hash[uuid128] = 1
-
+    (btc_device_count, btc_uuid_total, btc_uuid_stats) = get_uuid_stats_counts("EIR_bdaddr_to_UUID128s", company_uuid128s, top)
+    if(btc_uuid_total != 0):
         qprint("----= BLUETOOTH CLASSIC RESULTS =----")
-        qprint(f"{len(eir_uuid128_result)} rows of data found in DB:EIR_bdaddr_to_UUID128s")
-        qprint(f"{len(seen_btc_uuid128s_hash)} unique UUID128s found")
-        sorted_items = sorted(seen_btc_uuid128s_hash.items(), key=lambda item: item[1], reverse=True)
-        qprint(f"count \t uuid128 {i4} known info")
-        for item in sorted_items:
-            (uuid128, count) = item
-            known_info, classification = _classify_uuid128_for_stats(uuid128)
-            if classification == "clues":
-                clues_count += 1
-            elif classification == "sig_alias":
-                sig_alias_resolved_count += 1
-            elif classification == "sig_alias_unknown":
-                sig_alias_unknown_count += 1
-            qprint(f"{count} \t {uuid128} \t {known_info}")
-
-        qprint(f"*** {clues_count} UUID128s are in the CLUES database ***")
-        qprint(f"*** {sig_alias_resolved_count} UUID128s are SIG-Base aliases resolved to an assigned 16-bit name ***")
-        if sig_alias_unknown_count:
-            qprint(f"*** {sig_alias_unknown_count} UUID128s are SIG-Base aliases with no SIG-table match (likely 32-bit alias or newer than the local public/ checkout) ***")
+        print_uuid128_stats("EIR_bdaddr_to_UUID128s", btc_device_count, btc_uuid_total, btc_uuid_stats)
 
     ################################################
     # Get the data for LE devices from the database.
@@ -243,41 +245,8 @@ def get_uuid128_stats(arg):
     # silently skipped for LE-only datasets.
     ################################################
 
-    le_uuid128_query = "SELECT str_UUID128s FROM LE_bdaddr_to_UUID128s_list"
-    le_uuid128_result = execute_query(le_uuid128_query, ())
-    if(len(le_uuid128_result) != 0):
-        clues_count = 0
-        sig_alias_resolved_count = 0
-        sig_alias_unknown_count = 0
-        for (str_UUID128s,) in le_uuid128_result:
-            if(str_UUID128s == ''):
-                continue
-            if(isinstance(str_UUID128s, str)):
-                uuid128s = str_UUID128s.split(',')
-                for uuid128 in uuid128s:
-                    if(uuid128 in seen_le_uuid128s_hash):
-                        seen_le_uuid128s_hash[uuid128] += 1
-                    else:
-                        seen_le_uuid128s_hash[uuid128] = 1
-
+    (le_device_count, le_uuid_total, le_uuid_stats) = get_uuid_stats_counts("LE_bdaddr_to_UUID128s_list", company_uuid128s, top)
+    if(le_uuid_total != 0):
         qprint("")
         qprint("----= BLUETOOTH LOW ENERGY RESULTS =----")
-        qprint(f"{len(le_uuid128_result)} rows of data found in DB:LE_bdaddr_to_UUID128s_list")
-        qprint(f"{len(seen_le_uuid128s_hash)} unique UUID128s found")
-        sorted_items = sorted(seen_le_uuid128s_hash.items(), key=lambda item: item[1], reverse=True)
-        qprint(f"count \t uuid128 {i4} known info")
-        for item in sorted_items:
-            (uuid128, count) = item
-            known_info, classification = _classify_uuid128_for_stats(uuid128)
-            if classification == "clues":
-                clues_count += 1
-            elif classification == "sig_alias":
-                sig_alias_resolved_count += 1
-            elif classification == "sig_alias_unknown":
-                sig_alias_unknown_count += 1
-            qprint(f"{count} \t {uuid128} \t {known_info}")
-
-        qprint(f"*** {clues_count} UUID128s are in the CLUES database ***")
-        qprint(f"*** {sig_alias_resolved_count} UUID128s are SIG-Base aliases resolved to an assigned 16-bit name ***")
-        if sig_alias_unknown_count:
-            qprint(f"*** {sig_alias_unknown_count} UUID128s are SIG-Base aliases with no SIG-table match (likely 32-bit alias or newer than the local public/ checkout) ***")
+        print_uuid128_stats("LE_bdaddr_to_UUID128s_list", le_device_count, le_uuid_total, le_uuid_stats)
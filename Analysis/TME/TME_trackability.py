@@ -283,58 +283,19 @@ def print_UniqueIDReport(bdaddr, bdaddr_random):
 
     # Don't bother giving a less-preceise match if a more-precise match was already found.
     if(NamePrint_match == False):
-        values = (bdaddr,)
-        eir_query = "SELECT name_hex_str FROM EIR_bdaddr_to_name WHERE bdaddr = %s"
-        eir_result = execute_query(eir_query, values)
-        name_source = "Bluetooth Classic Extended Inquiry Responses"
-        for (name_hex_str,) in eir_result:
-            name = get_utf8_string_from_hex_string(name_hex_str)
-            if(check_name_for_most_specific_match(f"{i3}", name, bdaddr, name_source)):
-                continue
-            print_possible_unique_ID_warning(f"{i3}", name, name_source)
-            TME.TME_glob.privacy_report_no_results_found = False
-
-        hci_query = "SELECT name_hex_str FROM HCI_bdaddr_to_name WHERE bdaddr = %s"
-        hci_result = execute_query(hci_query, values)
-        name_source = "Bluetooth Low Energy Scan Responses"
-        for (name_hex_str,) in hci_result:
-            name = get_utf8_string_from_hex_string(name_hex_str)
+        name_sources = {
+            "EIR_bdaddr_to_name": "Bluetooth Classic Extended Inquiry Responses",
+            "HCI_bdaddr_to_name": "Bluetooth Low Energy Scan Responses",
+            "LE_bdaddr_to_name": "Bluetooth Low Energy Advertisements",
+            "GATT_characteristics_values": "GATT",
+        }
+        for (source_table, le_evt_type, name) in get_device_names(bdaddr, bdaddr_random):
+            name_source = name_sources[source_table]
             if(check_name_for_most_specific_match(f"{i3}", name, bdaddr, name_source)):
                 continue
             print_possible_unique_ID_warning(f"{i3}", name, name_source)
             TME.TME_glob.privacy_report_no_results_found = False
 
-        if(bdaddr_random is not None):
-            values = (bdaddr_random, bdaddr)
-            le_query = "SELECT name_hex_str, le_evt_type FROM LE_bdaddr_to_name WHERE bdaddr_random = %s AND bdaddr = %s"
-        else:
-            values = (bdaddr,)
-            le_query = "SELECT name_hex_str, le_evt_type FROM LE_bdaddr_to_name WHERE bdaddr = %s"
-        le_result = execute_query(le_query, values)
-        name_source = "Bluetooth Low Energy Advertisements"
-        for name_hex_str, le_evt_type in le_result:
-            name = get_utf8_string_from_hex_string(name_hex_str)
-            if(check_name_for_most_specific_match(f"{i3}", name, bdaddr, name_source)):
-                continue
-            print_possible_unique_ID_warning(f"{i3}", name, name_source)
-            TME.TME_glob.privacy_report_no_results_found = False
-
-        if(bdaddr_random is not None):
-            values = (bdaddr_random, bdaddr_random, bdaddr)
-            chars_query = "SELECT cv.bdaddr, cv.byte_values FROM GATT_characteristics_values AS cv JOIN GATT_characteristics AS c ON cv.char_value_handle = c.char_value_handle AND cv.bdaddr = c.bdaddr WHERE c.UUID = '2a00' AND c.bdaddr_random = %s AND cv.bdaddr_random = %s AND cv.bdaddr = %s;"
-        else:
-            values = (bdaddr,)
-            chars_query = "SELECT cv.bdaddr, cv.byte_values FROM GATT_characteristics_values AS cv JOIN GATT_characteristics AS c ON cv.char_value_handle = c.char_value_handle AND cv.bdaddr = c.bdaddr WHERE c.UUID = '2a00' AND cv.bdaddr = %s;"
-        chars_result = execute_query(chars_query, values)
-        name_source = "GATT"
-        if(len(chars_result) > 0):
-            for (bdaddr, byte_values) in chars_result:
-                name = byte_values.decode('utf-8', 'ignore')
-                if(check_name_for_most_specific_match(f"{i3}", name, bdaddr, name_source)):
-                    continue
-                print_possible_unique_ID_warning(f"{i3}", name, name_source)
-                TME.TME_glob.privacy_report_no_results_found = False
-
         if(bdaddr_random is not None):
             values = (bdaddr_random, bdaddr)
             ms_msd_query = "SELECT le_evt_type, manufacturer_specific_data FROM LE_bdaddr_to_MSD WHERE bdaddr_random = %s AND bdaddr = %s AND device_BT_CID = 0006 AND manufacturer_specific_data REGEXP '^030';"
@@ -16,13 +16,18 @@ activate_venv()
 # into the deep `BrokenPipeError` traceback Python's default handler
 # would otherwise produce on the next print. Wrapped because SIGPIPE
 # doesn't exist on Windows and can't be set off the main thread.
+# Only when run as a script: Server_BTIDALPOOL.py imports this module, and
+# must keep getting BrokenPipeError rather than being killed when a client
+# disconnects early.
 import signal
-try:
-    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
-except (AttributeError, ValueError):
-    pass
+if __name__ == "__main__":
+    try:
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    except (AttributeError, ValueError):
+        pass
 
 import argparse
+import traceback
 # Import from my files
 from TME.TME_helpers import *
 from TME.TME_import import *
@@ -59,9 +64,9 @@ def validate_bdaddr(value):
     return value
 
 
-# Main function to handle command line arguments
-def main():
-    global verbose_print, verbose_BTIDES, use_test_db
+# Built separately from main() so that the BTIDALPOOL server can parse its
+# query arguments exactly the way the CLI does (see query_BTIDES())
+def build_arg_parser():
     parser = argparse.ArgumentParser(description='Lookup and print information about Bluetooth devices from your local database or the BTIDALPOOL crowdsourced db!')
     # Output arguments
     printout_group = parser.add_argument_group('Print verbosity arguments')
@@ -98,9 +103,11 @@ def main():
     device_group.add_argument('--NOT-name-regex', action='append', required=False, help='Find the bdaddrs corresponding to the name regexp, the same as with --name-regex, and then remove them from the final results. May be passed multiple times.')
     device_group.add_argument('--company-regex', action='append', required=False, help='Value for REGEXP match against company name, in IEEE OUIs, or BT Company IDs, or BT Company UUID16s. May be passed multiple times.')
     device_group.add_argument('--NOT-company-regex', action='append', required=False, help='Find the bdaddrs corresponding to the regexp, the same as with --company-regex, and then remove them from the final results. May be passed multiple times.')
-    device_group.add_argument('--UUID-regex', action='append', required=False, help='Value for REGEXP match against UUID, in any location UUIDs can appear. NOTE: make sure to remove dashes from UUID128s because dashes will be interpreted per their regex meaning! May be passed multiple times.')
+    device_group.add_argument('--UUID-regex', action='append', required=False, help='Value for REGEXP match against UUID, in any location UUIDs can appear. Each UUID is matched on its own (so e.g. ^ and $ anchor to the start and end of a single UUID). NOTE: make sure to remove dashes from UUID128s because dashes will be interpreted per their regex meaning! May be passed multiple times.')
     device_group.add_argument('--NOT-UUID-regex', action='append', required=False, help='Find the bdaddrs corresponding to the regexp, the same as with --UUID-regex, and then remove them from the final results. May be passed multiple times.')
     device_group.add_argument('--MSD-regex', action='append', required=False, help='Value for REGEXP match against Manufacturer-Specific Data (MSD). May be passed multiple times.')
+    device_group.add_argument('--GPS-include-upper-left', type=str, required=False, help='The coordinate for the upper left corner of a bounding box, in \"(lat,lon)\" format, to select every device with a GPS coordinate inside it. E.g. \"(39.171951,-77.615936)\"')
+    device_group.add_argument('--GPS-include-lower-right', type=str, required=False, help='The coordinate for the lower right corner of the bounding box for --GPS-include-upper-left, in \"(lat,lon)\" format. E.g. \"(38.568929,-76.385467)\"')
     device_group.add_argument('--LL_VERSION_IND', type=str, default='', help='Value for LL_VERSION_IND search, given as AA:BBBB:CCCC where AA is the version, BBBB is the big-endian company ID, and CCCC is the big-endian sub-version.')
     device_group.add_argument('--LMP_VERSION_RES', type=str, default='', help='Value for LMP_VERSION_RES search, given as AA:BBBB:CCCC where AA is the version, BBBB is the big-endian company ID, and CCCC is the big-endian sub-version.')
 
@@ -108,6 +115,8 @@ def main():
     stats_group = parser.add_argument_group('Database statistics arguments')
     stats_group.add_argument('--UUID128-stats', action='store_true', help='Parse the UUID128 data, and output statistics about the most common entries (Only shows local database statistics, not BTIDALPOOL data).')
     stats_group.add_argument('--UUID16-stats', action='store_true', help='Parse the UUID16 data, and output statistics about the most common entries (Only shows local database statistics, not BTIDALPOOL data).')
+    stats_group.add_argument('--UUID-stats-top', type=int, required=False, help='Only output the N most common UUIDs in each section of --UUID16-stats / --UUID128-stats.')
+    stats_group.add_argument('--UUID-stats-company', type=str, required=False, help='Only output the UUIDs in --UUID16-stats / --UUID128-stats whose company name (from member_uuids.yaml, or CLUES for UUID128s) matches this regex.')
 
     # Requirement arguments
     requirement_group = parser.add_argument_group('Arguments which specify that a particular type of data is required in the printed out / exported data.')
@@ -123,8 +132,346 @@ def main():
     # Testing arguments
     testing_group = parser.add_argument_group('Arguments for testing (mostly for developers)')
     testing_group.add_argument('--use-test-db', action='store_true', required=False, help='This will store to / query from an alternate database, used for testing.')
+    testing_group.add_argument('--no-startup-cache', action='store_true', required=False, help='Parse all the metadata/CLUES/assigned numbers source files instead of loading them from the startup cache (and don\'t write the cache).')
+    testing_group.add_argument('--startup-timing', action='store_true', required=False, help='Print how long each metadata/CLUES/assigned numbers source takes to parse, and how long loading the startup cache took.')
+    return parser
+
+
+# Parse a pair of GPS bounding box corner arguments, where kind is "exclude" or "include" for the error messages.
+# Returns (ok, upper_left_tuple, lower_right_tuple)
+def parse_GPS_box(upper_left, lower_right, kind):
+    if(upper_left and not lower_right or lower_right and not upper_left):
+        print(f"Error: If you specify either GPS {kind} option, you must specify both.")
+        return (False, None, None)
+
+    upper_left_tuple = None
+    lower_right_tuple = None
+    if(upper_left and lower_right):
+        upper_left_tuple = tuple(map(float, upper_left.strip('()').split(',')))
+        lower_right_tuple = tuple(map(float, lower_right.strip('()').split(',')))
+        if(len(upper_left_tuple) != 2 or len(lower_right_tuple) != 2):
+            print(f"Error: GPS {kind} coordinates must be in the form of \"(lat,lon)\".")
+            return (False, None, None)
+    return (True, upper_left_tuple, lower_right_tuple)
+
+# Parse the --GPS-exclude-* arguments. Returns (ok, upper_left_tuple, lower_right_tuple)
+def parse_GPS_exclusion_box(args):
+    return parse_GPS_box(args.GPS_exclude_upper_left, args.GPS_exclude_lower_right, "exclude")
+
+# Parse the --GPS-include-* arguments. Returns (ok, upper_left_tuple, lower_right_tuple)
+def parse_GPS_inclusion_box(args):
+    return parse_GPS_box(args.GPS_include_upper_left, args.GPS_include_lower_right, "include")
+
+
+# Apply all the search options in args (from build_arg_parser()) to the
+# starting bdaddrs list (e.g. from --bdaddr or --input-*), then the --NOT-*
+# removals and --require-* filters. Returns the filtered, size-limited list.
+def select_bdaddrs(args, bdaddrs, upper_left_tuple=None, lower_right_tuple=None):
+    bdaddrs = list(bdaddrs)
+
+    #######################################################
+    # Options to search based on specific values or regexes
+    #######################################################
+
+    if(args.bdaddr_regex != None):
+        for entry in args.bdaddr_regex:
+            bdaddrs_tmp = get_bdaddrs_by_bdaddr_regex(entry, args.bdaddr_type)
+            if(bdaddrs_tmp is not None):
+                bdaddrs += bdaddrs_tmp
+            qprint(f"{len(bdaddrs)} bdaddrs after --bdaddr-regex processing")
+            vprint(f"{bdaddrs}")
+
+    if(args.name_regex != None):
+        for entry in args.name_regex:
+            bdaddrs_tmp = get_bdaddrs_by_name_regex(entry, args.bdaddr_type)
+            if(bdaddrs_tmp is not None):
+                bdaddrs += bdaddrs_tmp
+            print(f"{len(bdaddrs)} bdaddrs after --name-regex processing")
+            vprint(f"{bdaddrs}")
+
+    if(args.company_regex != None):
+        for entry in args.company_regex:
+            bdaddrs_tmp = get_bdaddrs_by_company_regex(entry, args.bdaddr_type)
+            if(bdaddrs_tmp is not None):
+                bdaddrs += bdaddrs_tmp
+            qprint(f"{len(bdaddrs)} bdaddrs after --company-regex processing")
+            vprint(f"{bdaddrs}")
+
+    if(args.UUID_regex != None):
+        for entry in args.UUID_regex:
+            if(sanity_check_UUID_regex(entry)):
+                entry = entry.replace("-", "")
+            bdaddrs_tmp = get_bdaddrs_by_uuid_regex(entry, args.bdaddr_type)
+            qprint(f"bdaddrs_tmp = {bdaddrs_tmp}")
+            if(bdaddrs_tmp is not None):
+                bdaddrs += bdaddrs_tmp
+            qprint(f"{len(bdaddrs)} bdaddrs after --UUID-regex processing")
+            vprint(f"{bdaddrs}")
+
+    if(args.GPS_include_upper_left):
+        (_, include_upper_left_tuple, include_lower_right_tuple) = parse_GPS_inclusion_box(args)
+        bdaddrs += sorted(get_bdaddrs_in_GPS_box(include_upper_left_tuple, include_lower_right_tuple, args.bdaddr_type))
+        qprint(f"{len(bdaddrs)} bdaddrs after --GPS-include-* processing")
+        vprint(f"{bdaddrs}")
+
+    if(args.MSD_regex != None):
+        for entry in args.MSD_regex:
+            bdaddrs_tmp = get_bdaddrs_by_msd_regex(entry, args.bdaddr_type)
+            qprint(f"bdaddrs_tmp = {bdaddrs_tmp}")
+            if(bdaddrs_tmp is not None):
+                bdaddrs += bdaddrs_tmp
+            qprint(f"{len(bdaddrs)} bdaddrs after --MSD-regex processing")
+            vprint(f"{bdaddrs}")
+
+    if(args.LL_VERSION_IND != ""):
+        (version, company_id, subversion) = args.LL_VERSION_IND.split(":")
+        version = int(version, 16)
+        if(version < 0 or version > 255):
+            print("Version must be a single byte value (0-FF)")
+            exit(1)
+        company_id = int(company_id, 16)
+        if(version < 0 or company_id > 65535):
+            print("Company ID must be a two byte hex value (0000-FFFF)")
+            exit(1)
+        subversion = int(subversion, 16)
+        if(version < 0 or subversion > 65535):
+            print("Sub-version must be a two byte hex value (0000-FFFF)")
+            exit(1)
+        bdaddrs_tmp = get_bdaddrs_by_LL_VERSION_IND(version, company_id, subversion, args.bdaddr_type)
+        qprint(f"bdaddrs_tmp = {bdaddrs_tmp}")
+        if(bdaddrs_tmp is not None):
+            bdaddrs += bdaddrs_tmp
+        qprint(f"{len(bdaddrs)} bdaddrs after --LL_VERSION_IND processing")
+        vprint(f"{bdaddrs}")
+
+    if(args.LMP_VERSION_RES != ""):
+        (version, company_id, subversion) = args.LMP_VERSION_RES.split(":")
+        version = int(version, 16)
+        if(version < 0 or version > 255):
+            print("Version must be a single byte value (0-FF)")
+            exit(1)
+        company_id = int(company_id, 16)
+        if(version < 0 or company_id > 65535):
+            print("Company ID must be a two byte hex value (0000-FFFF)")
+            exit(1)
+        subversion = int(subversion, 16)
+        if(version < 0 or subversion > 65535):
+            print("Sub-version must be a two byte hex value (0000-FFFF)")
+            exit(1)
+        bdaddrs_tmp = get_bdaddrs_by_LMP_VERSION_RES(version, company_id, subversion)
+        qprint(f"bdaddrs_tmp = {bdaddrs_tmp}")
+        if(bdaddrs_tmp is not None):
+            bdaddrs += bdaddrs_tmp
+        qprint(f"{len(bdaddrs)} bdaddrs after --LMP_VERSION_RES processing")
+        vprint(f"{bdaddrs}")
+
+    # Process CLI arguments that remove BDADDRs from the list.
+    # bdaddrs_to_remove is a set so membership checks are O(1). We also skip all
+    # --NOT-*-regex database work when there are no candidates to filter.
+    bdaddrs_to_remove = set()
+
+    if(args.NOT_bdaddr != None):
+        # Not taking the shortcut of just doing "bdaddrs_to_remove = args.NOT_bdaddr",
+        # just in case the code gets rearranged later
+        for entry in args.NOT_bdaddr:
+            bdaddrs_to_remove.add(f"{entry}")
+
+    if(bdaddrs):
+        if(args.NOT_bdaddr_regex != None):
+            for entry in args.NOT_bdaddr_regex:
+                bdaddrs_to_remove.update(get_bdaddrs_by_bdaddr_regex(entry, args.bdaddr_type))
+
+        if(args.NOT_name_regex != None):
+            for entry in args.NOT_name_regex:
+                bdaddrs_to_remove.update(get_bdaddrs_by_name_regex(entry, args.bdaddr_type))
+
+        if(args.NOT_company_regex != None):
+            for entry in args.NOT_company_regex:
+                bdaddrs_to_remove.update(
+                    get_candidate_bdaddrs_matching_company_regex(entry, args.bdaddr_type, bdaddrs)
+                )
+
+        if(args.NOT_UUID_regex != None):
+            for entry in args.NOT_UUID_regex:
+                bdaddrs_to_remove.update(get_bdaddrs_by_uuid_regex(entry, args.bdaddr_type))
+
+    # Now that we have all the bdaddrs_to_remove, loop through the bdaddrs list and remove them
+    qprint(f"{len(bdaddrs_to_remove)} bdaddrs_to_remove")
+    vprint(f"bdaddrs_to_remove = {bdaddrs_to_remove}")
+    updated_bdaddrs = []
+    for value in bdaddrs:
+        if(value in bdaddrs_to_remove):
+            continue
+        else:
+            updated_bdaddrs.append(value)
 
-    args = parser.parse_args()
+    qprint(f"updated_bdaddrs after removals is of length {len(updated_bdaddrs)} compared to original length of bdaddrs = {len(bdaddrs)}")
+    bdaddrs = updated_bdaddrs;
+
+    # One query for every device with a coordinate in the exclusion box, rather than checking each device's coordinates
+    GPS_excluded_bdaddrs = set()
+    if(args.GPS_exclude_upper_left and bdaddrs):
+        GPS_excluded_bdaddrs = {bdaddr.lower() for bdaddr in get_bdaddrs_in_GPS_box(upper_left_tuple, lower_right_tuple)}
+
+    filtered_bdaddrs = []
+    for bdaddr in bdaddrs:
+        if(args.require_GPS):
+            if(not device_has_GPS(bdaddr)):
+                continue
+        if(bdaddr.lower() in GPS_excluded_bdaddrs):
+            continue
+        if(args.require_GATT_any):
+            if(not device_has_GATT_any(bdaddr, args.bdaddr_type)):
+                continue
+        if(args.require_GATT_values):
+            if(not device_has_GATT_values(bdaddr, args.bdaddr_type)):
+                continue
+        if(args.require_SMP):
+            if(not device_has_SMP_info(bdaddr, args.bdaddr_type)):
+                continue
+        if(args.require_SMP_legacy_pairing):
+            if(not device_SMP_legacy_pairing(bdaddr, args.bdaddr_type)):
+                continue
+        if(args.require_SDP):
+            if(not device_has_SDP_info(bdaddr)):
+                continue
+        if(args.require_LL_VERSION_IND):
+            if(not device_has_LL_VERSION_IND_info(bdaddr, args.bdaddr_type)):
+                continue
+        if(args.require_LMP_VERSION_RES):
+            if(not device_has_LMP_VERSION_RES_info(bdaddr)):
+                continue
+        # Check if we have no information in any table for this BDADDR
+        # and if so, continue to the next BDADDR (if any)
+        if(not bdaddr_found_in_any_table(bdaddr)):
+            vprint(f"No information was found for {bdaddr}.")
+            continue
+        # If we got here, then we have a bdaddr that matches all the requirements
+        # so we should keep track of it for future use
+        filtered_bdaddrs.append(bdaddr)
+
+    # Limit the number of records output to args.max_records_output
+    if(len(filtered_bdaddrs) > args.max_records_output):
+        filtered_bdaddrs = filtered_bdaddrs[:args.max_records_output]
+
+    return filtered_bdaddrs
+
+
+# Print everything we know about each bdaddr, which also fills in
+# TME.TME_glob.BTIDES_JSON with the BTIDES export of the same data.
+# Works through bdaddrs in blocks, so that the print_* functions' per-device
+# SELECTs are served from one bulk query per table per block
+# (see "Per-bdaddr prefetch cache" in TME_helpers.py).
+def export_bdaddrs(bdaddrs, bdaddr_type):
+    block_size = TME.TME_glob.prefetch_block_size
+    try:
+        for block_start in range(0, len(bdaddrs), block_size):
+            block = bdaddrs[block_start:block_start + block_size]
+            set_prefetch_bdaddrs(block)
+            for bdaddr in block:
+                export_bdaddr(bdaddr, bdaddr_type)
+    finally:
+        clear_prefetch_bdaddrs()
+
+
+def export_bdaddr(bdaddr, bdaddr_type):
+    qprint("================================================================================")
+    reset_per_bdaddr_globals()
+    qprint(f"For bdaddr = {bdaddr}:")
+    print_company_name_from_bdaddr(f"{i1}", bdaddr, True)
+    print("")
+    print_ChipPrint(bdaddr, bdaddr_type)
+    print_ChipMakerPrint(bdaddr, bdaddr_type)           # Includes BTIDES export
+    print_classic_EIR_CID_info(bdaddr)                  # Includes BTIDES export
+    print_all_advdata(bdaddr, bdaddr_type)              # Includes BTIDES export
+    print_GATT_info(bdaddr, bdaddr_type)                # Includes BTIDES export
+    print_SMP_info(bdaddr, bdaddr_type)                 # Includes BTIDES export
+    print_LLCP_info(bdaddr, bdaddr_type)                # Includes BTIDES export
+    print_LMP_info(bdaddr)                              # Includes BTIDES export
+    print_SDP_info(bdaddr)                              # Includes BTIDES export
+    print_L2CAP_info(bdaddr, bdaddr_type)               # Includes BTIDES export
+    print_GPS(bdaddr, bdaddr_type)
+    print_UniqueIDReport(bdaddr, bdaddr_type)           # Includes BTIDES export
+
+
+# In-process equivalent of running
+#   Tell_Me_Everything.py <args> --output <file>
+# against the local database, and then reading <file> back: runs the search
+# and export for args (from build_arg_parser().parse_args()) and returns the
+# BTIDES list in memory. Only the database search options are honored (no
+# --input-*, BTIDALPOOL, or stats options).
+# Expects the startup data (import_all_startup_data() and
+# create_ChipMaker_OUI_hash()) to already be loaded, so that a long-lived
+# caller pays for that once rather than per query.
+# Resets all the per-query TME_glob state first, so consecutive queries in
+# the same process don't see each other's results.
+def query_BTIDES(args):
+    TME.TME_glob.verbose_print = args.verbose_print
+    TME.TME_glob.quiet_print = args.quiet_print
+    TME.TME_glob.verbose_BTIDES = args.verbose_BTIDES
+    TME.TME_glob.hide_android_data = args.hide_android_data
+    if(TME.TME_glob.use_test_db != args.use_test_db):
+        TME.TME_glob.use_test_db = args.use_test_db
+        close_mysql_conn() # The connection is bound to the other database
+    else:
+        start_new_mysql_snapshot()
+    TME.TME_glob.BTIDES_JSON = []
+    rebuild_SingleBDADDR_index()
+    reset_per_bdaddr_globals()
+
+    (GPS_args_ok, upper_left_tuple, lower_right_tuple) = parse_GPS_exclusion_box(args)
+    if(not GPS_args_ok or not parse_GPS_inclusion_box(args)[0]):
+        return None
+
+    bdaddrs = []
+    if(args.bdaddr is not None):
+        bdaddrs = [args.bdaddr]
+    bdaddrs = select_bdaddrs(args, bdaddrs, upper_left_tuple, lower_right_tuple)
+    export_bdaddrs(bdaddrs, args.bdaddr_type)
+
+    BTIDES_JSON = TME.TME_glob.BTIDES_JSON
+    TME.TME_glob.BTIDES_JSON = []
+    rebuild_SingleBDADDR_index()
+    return BTIDES_JSON
+
+
+# multiprocessing.Pool initializer for a long-lived query_BTIDES() worker
+# process (see Server_BTIDALPOOL.py): loads the startup data once, and sends
+# the (large amount of) per-bdaddr printing to /dev/null.
+def init_query_worker():
+    # In case the worker was fork()ed from a process with a MySQL connection open,
+    # that connection is the parent's, and this worker has to open its own
+    reset_mysql_state_after_fork()
+    sys.stdout = open(os.devnull, 'w')
+    import_all_startup_data()
+    create_ChipMaker_OUI_hash()
+
+
+# multiprocessing.Pool task for a query_BTIDES() worker process.
+# args_array is the same Tell_Me_Everything.py command line arguments that
+# would be passed to the script. Returns the BTIDES list, or None on error.
+def run_query_worker(args_array):
+    try:
+        args = build_arg_parser().parse_args(args_array)
+        return query_BTIDES(args)
+    except SystemExit:
+        # argparse errors and invalid --LL_VERSION_IND style values exit(), which
+        # must not take down the (reusable) worker process
+        return None
+    except Exception:
+        # Nor must a bug or a lost database connection, which would otherwise come back
+        # out of query_pool.apply() in the server's request thread instead of a 500.
+        # (stdout is /dev/null in the worker, so this goes to stderr.)
+        traceback.print_exc()
+        # The connection may be mid-transaction or dead, so the next query gets a fresh one
+        close_mysql_conn()
+        return None
+
+
+# Main function to handle command line arguments
+def main():
+    global verbose_print, verbose_BTIDES, use_test_db
+    args = build_arg_parser().parse_args()
     out_filename = args.output
     if args.to_BTIDALPOOL and not out_filename:
         # Create a default temporary filename if people provide the --to-BTIDALPOOL flag without a --output filename
@@ -149,19 +496,10 @@ def main():
 
     bdaddrs = []
 
-    if(args.GPS_exclude_upper_left and not args.GPS_exclude_lower_right or args.GPS_exclude_lower_right and not args.GPS_exclude_upper_left):
-        print("Error: If you specify either GPS exclude option, you must specify both.")
+    (GPS_args_ok, upper_left_tuple, lower_right_tuple) = parse_GPS_exclusion_box(args)
+    if(not GPS_args_ok or not parse_GPS_inclusion_box(args)[0]):
         return
 
-    upper_left_tuple = None
-    lower_right_tuple = None
-    if(args.GPS_exclude_upper_left and args.GPS_exclude_lower_right):
-        upper_left_tuple = tuple(map(float, args.GPS_exclude_upper_left.strip('()').split(',')))
-        lower_right_tuple = tuple(map(float, args.GPS_exclude_lower_right.strip('()').split(',')))
-        if(len(upper_left_tuple) != 2 or len(lower_right_tuple) != 2):
-            print("Error: GPS exclude coordinates must be in the form of \"(lat,lon)\".")
-            return
-
     #######################################################
     # If given an input file, convert it to BTIDES JSON
     # and import it into the local database,
@@ -258,6 +596,9 @@ def main():
         if args.GPS_exclude_upper_left:
             query_object["GPS_exclude_upper_left"] = args.GPS_exclude_upper_left
             query_object["GPS_exclude_lower_right"] = args.GPS_exclude_lower_right
+        if args.GPS_include_upper_left:
+            query_object["GPS_include_upper_left"] = args.GPS_include_upper_left
+            query_object["GPS_include_lower_right"] = args.GPS_include_lower_right
         if args.require_GPS:
             query_object["require_GPS"] = True
         if args.require_GATT_any:
@@ -314,46 +655,12 @@ def main():
             if output_filename:
                 b2s_args = btides_to_sql_args(input=[output_filename], use_test_db=args.use_test_db, quiet_print=args.quiet_print, verbose_print=args.verbose_print)
                 btides_to_sql(b2s_args)
-            # For debugging
-            write_BTIDES("/tmp/a.btides")
-
-    # Import metadata v2
-    import_metadata_v2()
-    import_private_metadata_v2()
-
-    # Import CLUES
-    import_CLUES()
-    import_private_CLUES()
-
-    # Import other JSON
-    import_model_metadata_by_manufacturer()
-
-    # Import any data from CSV files as necessary
-    import_nameprint_CSV_data()
-    import_nonunique_nameprint_CSV_data()
-
-    # Fill in dictionaries based on standard BT assigned numbers YAML files
-    import_CoD_to_names()
-    import_bt_format_type_to_descriptions()
-    import_bt_units_to_names()
-    import_bt_namespace_descriptions()
-    import_bt_CID_to_names()
-    import_bt_member_UUID16s_to_names()
-    import_bt_spec_version_numbers_to_names()
-    import_uuid16_service_names()
-    import_uuid16_standards_organizations_names()
-    import_uuid16_protocol_names()
-    import_gatt_services_uuid16_names()
-    import_gatt_declarations_uuid16_names()
-    import_gatt_descriptors_uuid16_names()
-    import_gatt_characteristic_uuid16_names()
-    import_appearance_yaml_data()
-    import_SDP_universal_attribute_names()
-    import_SDP_protocol_identifiers()
-
-    # It could be argued that the ChipMaker_OUI_hash should be pulled out and made static and just read from file.
-    # But I'd consider that premature optimization for now.
-    # TODO: consider doing this in the future if it adds too much overhead to every invocation
+
+    # Import metadata v2, CLUES, NamePrint CSVs, and the standard BT assigned numbers YAML files.
+    # These come from the startup cache (see TME_import.py) unless a source file changed.
+    import_all_startup_data(use_cache=not args.no_startup_cache, timing_report=args.startup_timing)
+
+    # The ChipMaker OUIs are read from the ChipMaker_OUIs table, which is only recomputed if it's out of date
     create_ChipMaker_OUI_hash()
 
     # Note: passing the --bdaddr argument will override any bdaddrs collected from the BTIDALPOOL or from the input files
@@ -365,210 +672,17 @@ def main():
     ######################################################
 
     if(args.UUID16_stats):
-        get_uuid16_stats(args.UUID16_stats)
+        get_uuid16_stats(args.UUID16_stats, top=args.UUID_stats_top, company_regex=args.UUID_stats_company)
         quit() # Don't do anything other than print the stats and exit
 
     if(args.UUID128_stats):
-        get_uuid128_stats(args.UUID128_stats)
+        get_uuid128_stats(args.UUID128_stats, top=args.UUID_stats_top, company_regex=args.UUID_stats_company)
         quit() # Don't do anything other than print the stats and exit
 
     vprint(bdaddrs)
 
-    #######################################################
-    # Options to search based on specific values or regexes
-    #######################################################
-
-    if(args.bdaddr_regex != None):
-        for entry in args.bdaddr_regex:
-            bdaddrs_tmp = get_bdaddrs_by_bdaddr_regex(entry, args.bdaddr_type)
-            if(bdaddrs_tmp is not None):
-                bdaddrs += bdaddrs_tmp
-            qprint(f"{len(bdaddrs)} bdaddrs after --bdaddr-regex processing")
-            vprint(f"{bdaddrs}")
-
-    if(args.name_regex != None):
-        for entry in args.name_regex:
-            bdaddrs_tmp = get_bdaddrs_by_name_regex(entry, args.bdaddr_type)
-            if(bdaddrs_tmp is not None):
-                bdaddrs += bdaddrs_tmp
-            print(f"{len(bdaddrs)} bdaddrs after --name-regex processing")
-            vprint(f"{bdaddrs}")
-
-    if(args.company_regex != None):
-        for entry in args.company_regex:
-            bdaddrs_tmp = get_bdaddrs_by_company_regex(entry, args.bdaddr_type)
-            if(bdaddrs_tmp is not None):
-                bdaddrs += bdaddrs_tmp
-            qprint(f"{len(bdaddrs)} bdaddrs after --company-regex processing")
-            vprint(f"{bdaddrs}")
-
-    if(args.UUID_regex != None):
-        for entry in args.UUID_regex:
-            if(sanity_check_UUID_regex(entry)):
-                entry = entry.replace("-", "")
-            bdaddrs_tmp = get_bdaddrs_by_uuid_regex(entry, args.bdaddr_type)
-            qprint(f"bdaddrs_tmp = {bdaddrs_tmp}")
-            if(bdaddrs_tmp is not None):
-                bdaddrs += bdaddrs_tmp
-            qprint(f"{len(bdaddrs)} bdaddrs after --UUID-regex processing")
-            vprint(f"{bdaddrs}")
-
-    if(args.MSD_regex != None):
-        for entry in args.MSD_regex:
-            bdaddrs_tmp = get_bdaddrs_by_msd_regex(entry, args.bdaddr_type)
-            qprint(f"bdaddrs_tmp = {bdaddrs_tmp}")
-            if(bdaddrs_tmp is not None):
-                bdaddrs += bdaddrs_tmp
-            qprint(f"{len(bdaddrs)} bdaddrs after --MSD-regex processing")
-            vprint(f"{bdaddrs}")
-
-    if(args.LL_VERSION_IND != ""):
-        (version, company_id, subversion) = args.LL_VERSION_IND.split(":")
-        version = int(version, 16)
-        if(version < 0 or version > 255):
-            print("Version must be a single byte value (0-FF)")
-            exit(1)
-        company_id = int(company_id, 16)
-        if(version < 0 or company_id > 65535):
-            print("Company ID must be a two byte hex value (0000-FFFF)")
-            exit(1)
-        subversion = int(subversion, 16)
-        if(version < 0 or subversion > 65535):
-            print("Sub-version must be a two byte hex value (0000-FFFF)")
-            exit(1)
-        bdaddrs_tmp = get_bdaddrs_by_LL_VERSION_IND(version, company_id, subversion, args.bdaddr_type)
-        qprint(f"bdaddrs_tmp = {bdaddrs_tmp}")
-        if(bdaddrs_tmp is not None):
-            bdaddrs += bdaddrs_tmp
-        qprint(f"{len(bdaddrs)} bdaddrs after --LL_VERSION_IND processing")
-        vprint(f"{bdaddrs}")
-
-    if(args.LMP_VERSION_RES != ""):
-        (version, company_id, subversion) = args.LMP_VERSION_RES.split(":")
-        version = int(version, 16)
-        if(version < 0 or version > 255):
-            print("Version must be a single byte value (0-FF)")
-            exit(1)
-        company_id = int(company_id, 16)
-        if(version < 0 or company_id > 65535):
-            print("Company ID must be a two byte hex value (0000-FFFF)")
-            exit(1)
-        subversion = int(subversion, 16)
-        if(version < 0 or subversion > 65535):
-            print("Sub-version must be a two byte hex value (0000-FFFF)")
-            exit(1)
-        bdaddrs_tmp = get_bdaddrs_by_LMP_VERSION_RES(version, company_id, subversion)
-        qprint(f"bdaddrs_tmp = {bdaddrs_tmp}")
-        if(bdaddrs_tmp is not None):
-            bdaddrs += bdaddrs_tmp
-        qprint(f"{len(bdaddrs)} bdaddrs after --LMP_VERSION_RES processing")
-        vprint(f"{bdaddrs}")
-
-    # Process CLI arguments that remove BDADDRs from the list.
-    # bdaddrs_to_remove is a set so membership checks are O(1). We also skip all
-    # --NOT-*-regex database work when there are no candidates to filter.
-    bdaddrs_to_remove = set()
-
-    if(args.NOT_bdaddr != None):
-        # Not taking the shortcut of just doing "bdaddrs_to_remove = args.NOT_bdaddr",
-        # just in case the code gets rearranged later
-        for entry in args.NOT_bdaddr:
-            bdaddrs_to_remove.add(f"{entry}")
-
-    if(bdaddrs):
-        if(args.NOT_bdaddr_regex != None):
-            for entry in args.NOT_bdaddr_regex:
-                bdaddrs_to_remove.update(get_bdaddrs_by_bdaddr_regex(entry, args.bdaddr_type))
-
-        if(args.NOT_name_regex != None):
-            for entry in args.NOT_name_regex:
-                bdaddrs_to_remove.update(get_bdaddrs_by_name_regex(entry, args.bdaddr_type))
-
-        if(args.NOT_company_regex != None):
-            for entry in args.NOT_company_regex:
-                bdaddrs_to_remove.update(
-                    get_candidate_bdaddrs_matching_company_regex(entry, args.bdaddr_type, bdaddrs)
-                )
-
-        if(args.NOT_UUID_regex != None):
-            for entry in args.NOT_UUID_regex:
-                bdaddrs_to_remove.update(get_bdaddrs_by_uuid_regex(entry, args.bdaddr_type))
-
-    # Now that we have all the bdaddrs_to_remove, loop through the bdaddrs list and remove them
-    qprint(f"{len(bdaddrs_to_remove)} bdaddrs_to_remove")
-    vprint(f"bdaddrs_to_remove = {bdaddrs_to_remove}")
-    updated_bdaddrs = []
-    for value in bdaddrs:
-        if(value in bdaddrs_to_remove):
-            continue
-        else:
-            updated_bdaddrs.append(value)
-
-    qprint(f"updated_bdaddrs after removals is of length {len(updated_bdaddrs)} compared to original length of bdaddrs = {len(bdaddrs)}")
-    bdaddrs = updated_bdaddrs;
-
-    filtered_bdaddrs = []
-    for bdaddr in bdaddrs:
-        if(args.require_GPS):
-            if(not device_has_GPS(bdaddr)):
-                continue
-        if(args.GPS_exclude_upper_left and device_has_GPS(bdaddr)):
-            if(is_GPS_coordinate_within_exclusion_box(bdaddr, upper_left_tuple, lower_right_tuple)):
-                continue
-        if(args.require_GATT_any):
-            if(not device_has_GATT_any(bdaddr, args.bdaddr_type)):
-                continue
-        if(args.require_GATT_values):
-            if(not device_has_GATT_values(bdaddr, args.bdaddr_type)):
-                continue
-        if(args.require_SMP):
-            if(not device_has_SMP_info(bdaddr, args.bdaddr_type)):
-                continue
-        if(args.require_SMP_legacy_pairing):
-            if(not device_SMP_legacy_pairing(bdaddr, args.bdaddr_type)):
-                continue
-        if(args.require_SDP):
-            if(not device_has_SDP_info(bdaddr)):
-                continue
-        if(args.require_LL_VERSION_IND):
-            if(not device_has_LL_VERSION_IND_info(bdaddr, args.bdaddr_type)):
-                continue
-        if(args.require_LMP_VERSION_RES):
-            if(not device_has_LMP_VERSION_RES_info(bdaddr)):
-                continue
-        # Check if we have no information in any table for this BDADDR
-        # and if so, continue to the next BDADDR (if any)
-        if(not bdaddr_found_in_any_table(bdaddr)):
-            vprint(f"No information was found for {bdaddr}.")
-            continue
-        # If we got here, then we have a bdaddr that matches all the requirements
-        # so we should keep track of it for future use
-        filtered_bdaddrs.append(bdaddr)
-
-    # Limit the number of records output to args.max_records_output
-    if(len(filtered_bdaddrs) > args.max_records_output):
-        filtered_bdaddrs = filtered_bdaddrs[:args.max_records_output]
-
-    # Start again with the now filtered and size-limited bdaddrs
-    bdaddrs = filtered_bdaddrs
-    for bdaddr in bdaddrs:
-        qprint("================================================================================")
-        reset_per_bdaddr_globals()
-        qprint(f"For bdaddr = {bdaddr}:")
-        print_company_name_from_bdaddr(f"{i1}", bdaddr, True)
-        print("")
-        print_ChipPrint(bdaddr, args.bdaddr_type)
-        print_ChipMakerPrint(bdaddr, args.bdaddr_type)      # Includes BTIDES export
-        print_classic_EIR_CID_info(bdaddr)                  # Includes BTIDES export
-        print_all_advdata(bdaddr, args.bdaddr_type)         # Includes BTIDES export
-        print_GATT_info(bdaddr, args.bdaddr_type)           # Includes BTIDES export
-        print_SMP_info(bdaddr, args.bdaddr_type)            # Includes BTIDES export
-        print_LLCP_info(bdaddr, args.bdaddr_type)           # Includes BTIDES export
-        print_LMP_info(bdaddr)                              # Includes BTIDES export
-        print_SDP_info(bdaddr)                              # Includes BTIDES export
-        print_L2CAP_info(bdaddr, args.bdaddr_type)          # Includes BTIDES export
-        print_GPS(bdaddr, args.bdaddr_type)
-        print_UniqueIDReport(bdaddr, args.bdaddr_type)      # Includes BTIDES export
+    bdaddrs = select_bdaddrs(args, bdaddrs, upper_left_tuple, lower_right_tuple)
+    export_bdaddrs(bdaddrs, args.bdaddr_type)
 
     if(out_filename != None and out_filename != ""):
         write_BTIDES(out_filename)
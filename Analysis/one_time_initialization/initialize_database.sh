@@ -156,10 +156,28 @@ mysql -u user -pa --database='bt2' --execute="CREATE TABLE LMP_POWER_CONTROL_RES
 echo "Creating other helper tables"
 mysql -u user -pa --database='bt2' --execute="CREATE TABLE IEEE_bdaddr_to_company (id INT NOT NULL AUTO_INCREMENT, bdaddr VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, company_name VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, PRIMARY KEY (id), UNIQUE KEY uni_name (bdaddr, company_name)) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
 
+# The IEEE OUIs whose company_name matches each of the ChipMaker_names_and_BT_CIDs regexes in TME_metadata.py (with lowercase OUIs), and the IEEE_bdaddr_to_company row count and max id each chip maker was computed against, so they're only recomputed when the OUI import or the chip maker list changes (see refresh_chipmaker_ouis() in TME_helpers.py). Filled by Refresh_ChipMaker_OUIs.py, or by Tell_Me_Everything.py at startup if stale.
+mysql -u user -pa --database='bt2' --execute="CREATE TABLE ChipMaker_OUIs (oui CHAR(8) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, chipmaker VARCHAR(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL, company_name VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, PRIMARY KEY (oui, chipmaker), KEY chipmaker_key (chipmaker)) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
+mysql -u user -pa --database='bt2' --execute="CREATE TABLE ChipMaker_OUIs_source (chipmaker VARCHAR(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL, IEEE_row_count INT UNSIGNED NOT NULL, IEEE_max_id INT UNSIGNED NOT NULL, PRIMARY KEY (chipmaker)) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
+
 mysql -u user -pa --database='bt2' --execute="CREATE TABLE UUID16_to_company (id INT NOT NULL AUTO_INCREMENT, str_UUID16_CID VARCHAR(6) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, company_name VARCHAR(255) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, PRIMARY KEY (id), UNIQUE KEY uni_name (str_UUID16_CID, company_name)) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
 
 # uuid_type 1 is a service, uuid_type 2 is a characteristic. Note that this is using "str_UUID128" not "str_UUID128s", because each entry will be a single UUID128
 mysql -u user -pa --database='bt2' --execute="CREATE TABLE BLEScope_UUID128s (id INT NOT NULL AUTO_INCREMENT, android_pkg_name VARCHAR(100) NOT NULL, uuid_type TINYINT NOT NULL, str_UUID128 VARCHAR(37) NOT NULL, PRIMARY KEY (id), UNIQUE KEY uni_name (android_pkg_name, uuid_type, str_UUID128)) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
 
 # Because MySQL doesn't treat a NULL value as a unique value, for purposes of ignoring duplicate insertions, we will need to set rssi to 0 instead of NULL
-mysql -u user -pa --database='bt2' --execute="CREATE TABLE bdaddr_to_GPS (id INT NOT NULL AUTO_INCREMENT, bdaddr CHAR(18) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, bdaddr_random BOOLEAN NOT NULL, time BIGINT UNSIGNED NOT NULL, time_type TINYINT UNSIGNED NOT NULL, rssi TINYINT NOT NULL, lat DOUBLE NOT NULL, lon DOUBLE NOT NULL, PRIMARY KEY (id), UNIQUE KEY uni_name (bdaddr, bdaddr_random, time, time_type, rssi, lat, lon)) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
+# gps_cell numbers the 0.1 degree grid cell of each coordinate, for the bounding box searches (see TME_GPS.py)
+mysql -u user -pa --database='bt2' --execute="CREATE TABLE bdaddr_to_GPS (id INT NOT NULL AUTO_INCREMENT, bdaddr CHAR(18) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, bdaddr_random BOOLEAN NOT NULL, time BIGINT UNSIGNED NOT NULL, time_type TINYINT UNSIGNED NOT NULL, rssi TINYINT NOT NULL, lat DOUBLE NOT NULL, lon DOUBLE NOT NULL, gps_cell INT AS ((FLOOR(lat * 10) + 900) * 3601 + (FLOOR(lon * 10) + 1800)) STORED, PRIMARY KEY (id), UNIQUE KEY uni_name (bdaddr, bdaddr_random, time, time_type, rssi, lat, lon), KEY gps_cell_key (gps_cell, lat, lon, bdaddr)) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
+
+# Index of which of the per-device tables have rows for each (bdaddr, bdaddr_random), one bit per table in tables_bitmap (see BDADDR_PRESENCE_TABLES in TME_helpers.py). BT Classic tables are recorded under bdaddr_random = 0. Maintained by BTIDES_to_SQL.py; Backfill_bdaddr_presence.py fills it in for existing data.
+mysql -u user -pa --database='bt2' --execute="CREATE TABLE bdaddr_presence (bdaddr CHAR(18) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, bdaddr_random BOOLEAN NOT NULL, tables_bitmap BIGINT UNSIGNED NOT NULL DEFAULT 0, first_seen DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, last_seen DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (bdaddr, bdaddr_random)) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
+
+# One row per UUID advertised or exposed over GATT by each (bdaddr, bdaddr_random), split out of the comma-joined UUID lists, with the table it came from (see UUID_INDEX_SOURCES in TME_helpers.py). BT Classic tables are recorded under bdaddr_random = 0. Maintained by BTIDES_to_SQL.py; Backfill_bdaddr_presence.py fills it in for existing data.
+mysql -u user -pa --database='bt2' --execute="CREATE TABLE bdaddr_to_UUID (bdaddr CHAR(18) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, bdaddr_random BOOLEAN NOT NULL, uuid VARCHAR(36) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, source_table VARCHAR(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, PRIMARY KEY (bdaddr, bdaddr_random, uuid, source_table), KEY uuid_source (uuid, source_table), KEY source_uuid (source_table, uuid)) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
+
+# Per-UUID summary of bdaddr_to_UUID for --UUID16-stats / --UUID128-stats: the number of devices with each (source_table, uuid), the number of source rows it was observed in, and when it was first and last seen, plus the number of devices per source_table. Updated by BTIDES_to_SQL.py as it imports; Backfill_bdaddr_presence.py recomputes them.
+mysql -u user -pa --database='bt2' --execute="CREATE TABLE UUID_stats (source_table VARCHAR(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, uuid VARCHAR(36) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, devices INT UNSIGNED NOT NULL DEFAULT 0, observations BIGINT UNSIGNED NOT NULL DEFAULT 0, first_seen DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, last_seen DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (source_table, uuid), KEY source_devices (source_table, devices, uuid)) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
+mysql -u user -pa --database='bt2' --execute="CREATE TABLE UUID_stats_devices (source_table VARCHAR(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, devices INT UNSIGNED NOT NULL DEFAULT 0, PRIMARY KEY (source_table)) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
+
+# One row per device name seen for each (bdaddr, bdaddr_random), decoded from the hex in the name table it came from (or the GATT Device Name characteristic value), plus a casefold()ed copy for case-insensitive searches (see DEVICE_NAME_SOURCES in TME_helpers.py). BT Classic tables are recorded under bdaddr_random = 0, and le_evt_type is 0 for everything except LE_bdaddr_to_name. Maintained by BTIDES_to_SQL.py; Backfill_bdaddr_presence.py fills it in for existing data.
+mysql -u user -pa --database='bt2' --execute="CREATE TABLE device_names (id INT NOT NULL AUTO_INCREMENT, bdaddr CHAR(18) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, bdaddr_random BOOLEAN NOT NULL, source_table VARCHAR(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL, le_evt_type TINYINT UNSIGNED NOT NULL, name_hex_str VARCHAR(1024) CHARACTER SET ascii NOT NULL, name VARCHAR(512) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL, name_casefold VARCHAR(1536) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL, PRIMARY KEY (id), UNIQUE KEY uni_name (bdaddr, bdaddr_random, source_table, le_evt_type, name_hex_str), KEY name_key (name(64)), KEY name_casefold_key (name_casefold(64))) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;"
@@ -11,3 +11,7 @@ sed 's/m//g' /tmp/fixme.txt > /tmp/d1.txt
 echo "Importing IEEE OUIs into IEEE_bdaddr_to_company"bdaddr
 mysql -u user -pa --database='bt2' --execute="LOAD DATA INFILE '/tmp/d1.txt'  IGNORE INTO TABLE IEEE_bdaddr_to_company FIELDS TERMINATED BY ',' ENCLOSED BY '\"' LINES TERMINATED BY '\n' (bdaddr, company_name);"
 mysql -u user -pa --database='bttest' --execute="LOAD DATA INFILE '/tmp/d1.txt'  IGNORE INTO TABLE IEEE_bdaddr_to_company FIELDS TERMINATED BY ',' ENCLOSED BY '\"' LINES TERMINATED BY '\n' (bdaddr, company_name);"
+# Recompute the IEEE OUIs that belong to each chip maker now that the OUIs have changed
+echo "Refreshing ChipMaker_OUIs"
+python3 "$(dirname "$0")/../Refresh_ChipMaker_OUIs.py"
+python3 "$(dirname "$0")/../Refresh_ChipMaker_OUIs.py" --use-test-db
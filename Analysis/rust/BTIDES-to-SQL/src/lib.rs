@@ -21,7 +21,7 @@ use mysql::{Opts, OptsBuilder, Row, Value};
 use once_cell::sync::Lazy;
 use regex::Regex;
 use serde_json::Value as J;
-use std::collections::{BTreeMap, HashMap, HashSet};
+use std::collections::{BTreeMap, BTreeSet, HashMap, HashSet};
 use std::fs::File;
 use std::io::BufReader;
 use std::time::Instant;
@@ -2489,6 +2489,13 @@ fn apply_gps_batch(conn: &mut mysql::PooledConn, b: &Buffers) -> mysql::Result<(
         }
     }
 
+    let gps_bit = presence_bit("bdaddr_to_GPS").unwrap_or(0);
+    let mut presence = Presence::new();
+    for r in &inserts {
+        *presence.entry((r.0.clone().into_bytes(), r.1)).or_insert(0) |= gps_bit;
+    }
+    upsert_bdaddr_presence(conn, &presence)?;
+
     Ok((update_count, insert_count))
 }
 
@@ -2538,6 +2545,517 @@ fn bulk_insert(
     Ok(affected)
 }
 
+// --------------------------- bdaddr presence --------------------------------
+//
+// Mirrors the bdaddr_presence upkeep in TME_helpers.py: one row per
+// (bdaddr, bdaddr_random), with bit N of tables_bitmap set when
+// BDADDR_PRESENCE_TABLES[N] has a row for it. Tell_Me_Everything's bdaddr
+// lookups query it instead of every per-device table. The bits are stored in
+// the database, so this list must match the Python one exactly (append only).
+// Tables without a bdaddr_random column are recorded under bdaddr_random = 0.
+
+const BDADDR_PRESENCE_TABLES: [&str; 56] = [
+    "bdaddr_to_GPS", "EIR_bdaddr_to_3d_info", "EIR_bdaddr_to_CoD", "EIR_bdaddr_to_DevID",
+    "EIR_bdaddr_to_flags", "EIR_bdaddr_to_MSD", "EIR_bdaddr_to_name", "EIR_bdaddr_to_PSRM",
+    "EIR_bdaddr_to_tx_power", "EIR_bdaddr_to_URI", "EIR_bdaddr_to_UUID128s",
+    "EIR_bdaddr_to_UUID16s", "EIR_bdaddr_to_UUID32s", "GATT_attribute_handles",
+    "GATT_characteristic_descriptor_values", "GATT_characteristics",
+    "GATT_characteristics_values", "GATT_services", "HCI_bdaddr_to_name",
+    "L2CAP_CONNECTION_PARAMETER_UPDATE_REQ", "L2CAP_CONNECTION_PARAMETER_UPDATE_RSP",
+    "LE_bdaddr_to_3d_info", "LE_bdaddr_to_appearance", "LE_bdaddr_to_CoD",
+    "LE_bdaddr_to_connect_interval", "LE_bdaddr_to_flags", "LE_bdaddr_to_MSD",
+    "LE_bdaddr_to_name", "LE_bdaddr_to_other_le_bdaddr", "LE_bdaddr_to_public_target_bdaddr",
+    "LE_bdaddr_to_random_target_bdaddr", "LE_bdaddr_to_role", "LE_bdaddr_to_tx_power",
+    "LE_bdaddr_to_URI", "LE_bdaddr_to_UUID128_service_data",
+    "LE_bdaddr_to_UUID128_service_solicit", "LE_bdaddr_to_UUID128s_list",
+    "LE_bdaddr_to_UUID16_service_data", "LE_bdaddr_to_UUID16_service_solicit",
+    "LE_bdaddr_to_UUID16s_list", "LE_bdaddr_to_UUID32_service_data",
+    "LE_bdaddr_to_UUID32_service_solicit", "LE_bdaddr_to_UUID32s_list", "LL_FEATUREs",
+    "LL_LENGTHs", "LL_PHYs", "LL_PINGs", "LL_UNKNOWN_RSP", "LL_VERSION_IND",
+    "LMP_FEATURES_RES", "LMP_FEATURES_RES_EXT", "LMP_NAME_RES_defragmented", "LMP_VERSION_RES",
+    "SDP_Common", "SDP_ERROR_RSP", "SMP_Pairing_Req_Res",
+];
+
+// (bdaddr, bdaddr_random) -> OR of the table bits. Ordered, so that
+// concurrent writers take the bdaddr_presence row locks in the same order.
+type Presence = BTreeMap<(Vec<u8>, i64), u64>;
+
+fn presence_bit(table: &str) -> Option<u64> {
+    BDADDR_PRESENCE_TABLES
+        .iter()
+        .position(|t| *t == table)
+        .map(|i| 1u64 << i)
+}
+
+fn value_i64(v: &Value) -> i64 {
+    match v {
+        Value::Int(i) => *i,
+        Value::UInt(u) => *u as i64,
+        _ => 0,
+    }
+}
+
+// "(bdaddr, bdaddr_random, ...)" -> ["bdaddr", "bdaddr_random", ...]
+fn column_names(columns: &str) -> Vec<&str> {
+    columns
+        .trim_matches(|c| c == '(' || c == ')')
+        .split(',')
+        .map(|c| c.trim())
+        .collect()
+}
+
+fn accumulate_presence(acc: &mut Presence, table: &str, columns: &str, rows: &[Vec<Value>]) {
+    let bit = match presence_bit(table) {
+        Some(bit) => bit,
+        None => return,
+    };
+    // Every per-device column list starts with bdaddr, then bdaddr_random if the table has one.
+    let has_random = columns.starts_with("(bdaddr, bdaddr_random,");
+    for row in rows {
+        let bdaddr = match row.first() {
+            Some(Value::Bytes(bytes)) => bytes.clone(),
+            _ => continue,
+        };
+        let bdaddr_random = if has_random {
+            row.get(1).map(value_i64).unwrap_or(0)
+        } else {
+            0
+        };
+        *acc.entry((bdaddr, bdaddr_random)).or_insert(0) |= bit;
+    }
+}
+
+fn upsert_bdaddr_presence(conn: &mut mysql::PooledConn, acc: &Presence) -> mysql::Result<()> {
+    const CHUNK: usize = 200;
+    let entries: Vec<(&(Vec<u8>, i64), &u64)> = acc.iter().collect();
+    for chunk in entries.chunks(CHUNK) {
+        let placeholders = vec!["(?, ?, ?)"; chunk.len()].join(",");
+        let q = format!(
+            "INSERT INTO bdaddr_presence (bdaddr, bdaddr_random, tables_bitmap) VALUES {} \
+             ON DUPLICATE KEY UPDATE tables_bitmap = tables_bitmap | VALUES(tables_bitmap), \
+             last_seen = CURRENT_TIMESTAMP",
+            placeholders
+        );
+        let mut params: Vec<Value> = Vec::with_capacity(chunk.len() * 3);
+        for ((bdaddr, bdaddr_random), bits) in chunk {
+            params.push(Value::Bytes(bdaddr.clone()));
+            params.push((*bdaddr_random).into());
+            params.push((**bits).into());
+        }
+        conn.exec_drop(q, params)?;
+    }
+    Ok(())
+}
+
+// ------------------------------ UUID index -----------------------------------
+//
+// Mirrors the bdaddr_to_UUID upkeep in TME_helpers.py: one row per
+// (bdaddr, bdaddr_random, uuid, source_table), with the comma-joined UUID
+// lists split up, so that Tell_Me_Everything's UUID searches and
+// --UUID16-stats / --UUID128-stats don't have to scan the lists themselves.
+// Tables without a bdaddr_random column are recorded under bdaddr_random = 0.
+
+const UUID_INDEX_SOURCES: [(&str, &str); 15] = [
+    ("EIR_bdaddr_to_UUID16s", "str_UUID16s"),
+    ("EIR_bdaddr_to_UUID32s", "str_UUID32s"),
+    ("EIR_bdaddr_to_UUID128s", "str_UUID128s"),
+    ("LE_bdaddr_to_UUID16s_list", "str_UUID16s"),
+    ("LE_bdaddr_to_UUID32s_list", "str_UUID32s"),
+    ("LE_bdaddr_to_UUID128s_list", "str_UUID128s"),
+    ("LE_bdaddr_to_UUID16_service_solicit", "str_UUID16s"),
+    ("LE_bdaddr_to_UUID32_service_solicit", "str_UUID32s"),
+    ("LE_bdaddr_to_UUID128_service_solicit", "str_UUID128s"),
+    ("LE_bdaddr_to_UUID16_service_data", "UUID16_hex_str"),
+    ("LE_bdaddr_to_UUID32_service_data", "UUID32_hex_str"),
+    ("LE_bdaddr_to_UUID128_service_data", "UUID128_hex_str"),
+    ("GATT_services", "UUID"),
+    ("GATT_characteristics", "UUID"),
+    ("GATT_attribute_handles", "UUID"),
+];
+
+// (bdaddr, bdaddr_random, uuid, source_table) -> number of newly inserted source rows it was observed in.
+// Ordered, so that concurrent writers take the bdaddr_to_UUID row locks in the same order.
+type UuidIndex = BTreeMap<(Vec<u8>, i64, Vec<u8>, &'static str), u64>;
+
+// Where a UUID_INDEX_SOURCES table keeps its UUIDs: (column, its index in
+// columns, whether the rows have a bdaddr_random).
+fn uuid_index_shape(table: &str, columns: &str) -> Option<(&'static str, usize, bool)> {
+    let column = UUID_INDEX_SOURCES.iter().find(|(t, _)| *t == table)?.1;
+    let names = column_names(columns);
+    let uuid_i = names.iter().position(|c| *c == column)?;
+    Some((column, uuid_i, names.get(1) == Some(&"bdaddr_random")))
+}
+
+// Adds the individual UUIDs in uuids (a comma-joined list, or a single UUID),
+// with the number of new source rows they were observed in.
+fn add_uuid_list(acc: &mut UuidIndex, table: &'static str, bdaddr: &[u8], bdaddr_random: i64, uuids: &[u8], observations: u64) {
+    let row_uuids: BTreeSet<&[u8]> = uuids
+        .split(|b| *b == b',')
+        .map(|uuid| uuid.trim_ascii())
+        .filter(|uuid| !uuid.is_empty())
+        .collect();
+    for uuid in row_uuids {
+        *acc.entry((bdaddr.to_vec(), bdaddr_random, uuid.to_vec(), table)).or_insert(0) += observations;
+    }
+}
+
+// observed is false for rows that were duplicates of ones already in the table,
+// so that re-importing a file doesn't add to UUID_stats.observations.
+fn accumulate_uuid_index(acc: &mut UuidIndex, table: &'static str, columns: &str, rows: &[Vec<Value>], observed: bool) {
+    let (_, uuid_i, has_random) = match uuid_index_shape(table, columns) {
+        Some(shape) => shape,
+        None => return,
+    };
+    for row in rows {
+        let bdaddr = match row.first() {
+            Some(Value::Bytes(bytes)) => bytes,
+            _ => continue,
+        };
+        let bdaddr_random = if has_random {
+            row.get(1).map(value_i64).unwrap_or(0)
+        } else {
+            0
+        };
+        let uuids = match row.get(uuid_i) {
+            Some(Value::Bytes(bytes)) => bytes,
+            _ => continue,
+        };
+        add_uuid_list(acc, table, bdaddr, bdaddr_random, uuids, observed as u64);
+    }
+}
+
+// Mirrors TME_helpers._uuid_source_row_counts(): the number of rows per
+// (bdaddr, bdaddr_random, UUID list) in a UUID_INDEX_SOURCES table, for the
+// devices in rows.
+fn uuid_source_row_counts(
+    conn: &mut mysql::PooledConn,
+    table: &str,
+    column: &str,
+    has_random: bool,
+    rows: &[Vec<Value>],
+) -> mysql::Result<HashMap<(Vec<u8>, i64, Vec<u8>), u64>> {
+    const CHUNK: usize = 200;
+    let devices: Vec<(Vec<u8>, i64)> = rows
+        .iter()
+        .filter_map(|row| match row.first() {
+            Some(Value::Bytes(bdaddr)) => {
+                let bdaddr_random = if has_random { row.get(1).map(value_i64).unwrap_or(0) } else { 0 };
+                Some((bdaddr.clone(), bdaddr_random))
+            }
+            _ => None,
+        })
+        .collect::<BTreeSet<_>>()
+        .into_iter()
+        .collect();
+    let mut counts = HashMap::new();
+    for chunk in devices.chunks(CHUNK) {
+        let (q, params): (String, Vec<Value>) = if has_random {
+            (
+                format!(
+                    "SELECT bdaddr, bdaddr_random, {column}, COUNT(*) FROM {table} \
+                     WHERE {column} IS NOT NULL AND (bdaddr, bdaddr_random) IN ({}) \
+                     GROUP BY bdaddr, bdaddr_random, {column}",
+                    vec!["(?, ?)"; chunk.len()].join(",")
+                ),
+                chunk
+                    .iter()
+                    .flat_map(|(bdaddr, bdaddr_random)| [Value::Bytes(bdaddr.clone()), (*bdaddr_random).into()])
+                    .collect(),
+            )
+        } else {
+            (
+                format!(
+                    "SELECT bdaddr, 0, {column}, COUNT(*) FROM {table} \
+                     WHERE {column} IS NOT NULL AND bdaddr IN ({}) GROUP BY bdaddr, {column}",
+                    vec!["?"; chunk.len()].join(",")
+                ),
+                chunk.iter().map(|(bdaddr, _)| Value::Bytes(bdaddr.clone())).collect(),
+            )
+        };
+        for (bdaddr, bdaddr_random, uuids, count) in conn.exec::<(Vec<u8>, i64, Vec<u8>, u64), _, _>(q, params)? {
+            counts.insert((bdaddr, bdaddr_random, uuids), count);
+        }
+    }
+    Ok(counts)
+}
+
+// bulk_insert(), accumulating the bdaddr_to_UUID entries for the rows if the
+// table is one of UUID_INDEX_SOURCES. Like TME_helpers.flush_insert_batch(),
+// only the rows that were actually new count as observations: if just some of
+// them were, the table's rows for the same devices before and after tell which,
+// so UUID_stats.observations doesn't depend on how the rows were batched.
+fn bulk_insert_uuid_indexed(
+    conn: &mut mysql::PooledConn,
+    spec: &TableSpec,
+    rows: &Vec<Vec<Value>>,
+    chunk_rows: usize,
+    acc: &mut UuidIndex,
+) -> mysql::Result<u64> {
+    let (column, _, has_random) = match uuid_index_shape(spec.name, spec.columns) {
+        Some(shape) if !rows.is_empty() => shape,
+        _ => return bulk_insert(conn, spec, rows, chunk_rows),
+    };
+    let before = uuid_source_row_counts(conn, spec.name, column, has_random, rows)?;
+    let affected = bulk_insert(conn, spec, rows, chunk_rows)?;
+    if affected == 0 || affected >= rows.len() as u64 {
+        accumulate_uuid_index(acc, spec.name, spec.columns, rows, affected != 0);
+        return Ok(affected);
+    }
+    accumulate_uuid_index(acc, spec.name, spec.columns, rows, false);
+    let after = uuid_source_row_counts(conn, spec.name, column, has_random, rows)?;
+    for ((bdaddr, bdaddr_random, uuids), count) in after {
+        let new_rows = count.saturating_sub(before.get(&(bdaddr.clone(), bdaddr_random, uuids.clone())).copied().unwrap_or(0));
+        if new_rows > 0 {
+            add_uuid_list(acc, spec.name, &bdaddr, bdaddr_random, &uuids, new_rows);
+        }
+    }
+    Ok(affected)
+}
+
+// Mirrors TME_helpers.uuid_stats_increments(): the UUID_stats increments
+// ((source_table, uuid) -> (new devices, observations)) and UUID_stats_devices
+// increments (source_table -> new devices) for the entries in chunk, given the
+// entries for the same devices that were already in bdaddr_to_UUID.
+#[allow(clippy::type_complexity)]
+fn uuid_stats_increments(
+    chunk: &[(&(Vec<u8>, i64, Vec<u8>, &'static str), &u64)],
+    existing: &HashSet<(Vec<u8>, i64, Vec<u8>, String)>,
+) -> (BTreeMap<(&'static str, Vec<u8>), (u64, u64)>, BTreeMap<&'static str, u64>) {
+    let mut existing_device_tables: HashSet<(Vec<u8>, i64, String)> = existing
+        .iter()
+        .map(|(bdaddr, bdaddr_random, _, table)| (bdaddr.clone(), *bdaddr_random, table.clone()))
+        .collect();
+    let mut uuid_increments: BTreeMap<(&'static str, Vec<u8>), (u64, u64)> = BTreeMap::new();
+    let mut device_increments: BTreeMap<&'static str, u64> = BTreeMap::new();
+    for ((bdaddr, bdaddr_random, uuid, table), observations) in chunk {
+        let new_device = !existing.contains(&(bdaddr.clone(), *bdaddr_random, uuid.clone(), table.to_string()));
+        if !new_device && **observations == 0 {
+            continue;
+        }
+        let increment = uuid_increments.entry((*table, uuid.clone())).or_insert((0, 0));
+        increment.0 += new_device as u64;
+        increment.1 += **observations;
+        if existing_device_tables.insert((bdaddr.clone(), *bdaddr_random, table.to_string())) {
+            *device_increments.entry(*table).or_insert(0) += 1;
+        }
+    }
+    (uuid_increments, device_increments)
+}
+
+fn insert_uuid_index(conn: &mut mysql::PooledConn, acc: &UuidIndex) -> mysql::Result<()> {
+    const CHUNK: usize = 200;
+    let entries: Vec<(&(Vec<u8>, i64, Vec<u8>, &'static str), &u64)> = acc.iter().collect();
+    for chunk in entries.chunks(CHUNK) {
+        // What's already indexed for these devices, so that UUID_stats only counts new devices.
+        // FOR UPDATE locks these devices' index ranges until the caller's COMMIT, so a concurrent
+        // import can't also see one of the same entries as new and count its device twice.
+        let devices: BTreeSet<(&Vec<u8>, i64)> = chunk
+            .iter()
+            .map(|((bdaddr, bdaddr_random, _, _), _)| (bdaddr, *bdaddr_random))
+            .collect();
+        let q = format!(
+            "SELECT bdaddr, bdaddr_random, uuid, source_table FROM bdaddr_to_UUID WHERE (bdaddr, bdaddr_random) IN ({}) FOR UPDATE",
+            vec!["(?, ?)"; devices.len()].join(",")
+        );
+        let mut params: Vec<Value> = Vec::with_capacity(devices.len() * 2);
+        for (bdaddr, bdaddr_random) in &devices {
+            params.push(Value::Bytes((*bdaddr).clone()));
+            params.push((*bdaddr_random).into());
+        }
+        let existing: HashSet<(Vec<u8>, i64, Vec<u8>, String)> = conn
+            .exec::<(Vec<u8>, i64, Vec<u8>, String), _, _>(q, params)?
+            .into_iter()
+            .collect();
+
+        let placeholders = vec!["(?, ?, ?, ?)"; chunk.len()].join(",");
+        // The no-op update keeps rows that are already indexed from raising duplicate-key warnings
+        let q = format!(
+            "INSERT INTO bdaddr_to_UUID (bdaddr, bdaddr_random, uuid, source_table) VALUES {} \
+             ON DUPLICATE KEY UPDATE uuid = uuid",
+            placeholders
+        );
+        let mut params: Vec<Value> = Vec::with_capacity(chunk.len() * 4);
+        for ((bdaddr, bdaddr_random, uuid, table), _) in chunk {
+            params.push(Value::Bytes(bdaddr.clone()));
+            params.push((*bdaddr_random).into());
+            params.push(Value::Bytes(uuid.clone()));
+            params.push((*table).into());
+        }
+        conn.exec_drop(q, params)?;
+
+        let (uuid_increments, device_increments) = uuid_stats_increments(chunk, &existing);
+        if !uuid_increments.is_empty() {
+            let q = format!(
+                "INSERT INTO UUID_stats (source_table, uuid, devices, observations) VALUES {} \
+                 ON DUPLICATE KEY UPDATE devices = devices + VALUES(devices), \
+                 observations = observations + VALUES(observations), last_seen = CURRENT_TIMESTAMP",
+                vec!["(?, ?, ?, ?)"; uuid_increments.len()].join(",")
+            );
+            let mut params: Vec<Value> = Vec::with_capacity(uuid_increments.len() * 4);
+            for ((table, uuid), (new_devices, observations)) in uuid_increments {
+                params.push(table.into());
+                params.push(Value::Bytes(uuid));
+                params.push(new_devices.into());
+                params.push(observations.into());
+            }
+            conn.exec_drop(q, params)?;
+        }
+        if !device_increments.is_empty() {
+            let q = format!(
+                "INSERT INTO UUID_stats_devices (source_table, devices) VALUES {} \
+                 ON DUPLICATE KEY UPDATE devices = devices + VALUES(devices)",
+                vec!["(?, ?)"; device_increments.len()].join(",")
+            );
+            let mut params: Vec<Value> = Vec::with_capacity(device_increments.len() * 2);
+            for (table, new_devices) in device_increments {
+                params.push(table.into());
+                params.push(new_devices.into());
+            }
+            conn.exec_drop(q, params)?;
+        }
+    }
+    Ok(())
+}
+
+// ---------------------------- Device names -----------------------------------
+//
+// Mirrors the device_names upkeep in TME_helpers.py: one row per name seen for
+// each (bdaddr, bdaddr_random), decoded from its hex the same way Python's
+// bytes.decode('utf-8', 'ignore') does, plus a case-folded copy, so that
+// Tell_Me_Everything's name searches and NamePrint lookups don't have to pull
+// and decode every name themselves. GATT Device Name (0x2a00) values only
+// become names once both their GATT_characteristics and
+// GATT_characteristics_values rows are committed, so for those the touched
+// bdaddrs are looked up again afterwards. Tables without a bdaddr_random
+// column are recorded under bdaddr_random = 0, and le_evt_type is 0 for
+// everything but LE_bdaddr_to_name.
+
+const DEVICE_NAME_HEX_SOURCES: [&str; 3] = ["EIR_bdaddr_to_name", "HCI_bdaddr_to_name", "LE_bdaddr_to_name"];
+
+// (bdaddr, bdaddr_random, source_table, le_evt_type, name bytes).
+// Ordered, so that concurrent writers take the device_names row locks in the same order.
+type DeviceNames = BTreeSet<(Vec<u8>, i64, &'static str, i64, Vec<u8>)>;
+
+// (bdaddr, bdaddr_random) whose GATT Device Name values need to be looked up again
+type GattNameBdaddrs = BTreeSet<(Vec<u8>, i64)>;
+
+fn decode_utf8_ignore(bytes: &[u8]) -> String {
+    bytes.utf8_chunks().map(|chunk| chunk.valid()).collect()
+}
+
+// Python's str.casefold() for the characters where it differs from
+// to_lowercase() in a way that matters to re.IGNORECASE matching of ASCII
+// (which is all that TME_helpers.device_name_regex_prefilter() looks for).
+fn casefold(name: &str) -> String {
+    let mut folded = String::with_capacity(name.len());
+    for c in name.chars() {
+        match c {
+            'ß' | 'ẞ' => folded.push_str("ss"),
+            'ſ' => folded.push('s'),
+            _ => folded.extend(c.to_lowercase()),
+        }
+    }
+    folded
+}
+
+fn accumulate_device_names(acc: &mut DeviceNames, table: &'static str, columns: &str, rows: &[Vec<Value>]) {
+    if !DEVICE_NAME_HEX_SOURCES.contains(&table) {
+        return;
+    }
+    let names = column_names(columns);
+    let has_random = names.get(1) == Some(&"bdaddr_random");
+    let evt_i = names.iter().position(|c| *c == "le_evt_type");
+    let hex_i = match names.iter().position(|c| *c == "name_hex_str") {
+        Some(i) => i,
+        None => return,
+    };
+    for row in rows {
+        let bdaddr = match row.first() {
+            Some(Value::Bytes(bytes)) => bytes,
+            _ => continue,
+        };
+        let bdaddr_random = if has_random {
+            row.get(1).map(value_i64).unwrap_or(0)
+        } else {
+            0
+        };
+        let name = match row.get(hex_i) {
+            Some(Value::Bytes(hex_str)) => match hex::decode(hex_str) {
+                Ok(name) => name,
+                Err(_) => continue,
+            },
+            _ => continue,
+        };
+        let le_evt_type = evt_i.and_then(|i| row.get(i)).map(value_i64).unwrap_or(0);
+        acc.insert((bdaddr.clone(), bdaddr_random, table, le_evt_type, name));
+    }
+}
+
+fn accumulate_gatt_name_bdaddrs(acc: &mut GattNameBdaddrs, table: &str, rows: &[Vec<Value>]) {
+    if table != "GATT_characteristics" && table != "GATT_characteristics_values" {
+        return;
+    }
+    // Both tables' column lists start with (bdaddr, bdaddr_random, ...)
+    for row in rows {
+        if let Some(Value::Bytes(bdaddr)) = row.first() {
+            acc.insert((bdaddr.clone(), row.get(1).map(value_i64).unwrap_or(0)));
+        }
+    }
+}
+
+fn insert_device_names(conn: &mut mysql::PooledConn, acc: &DeviceNames) -> mysql::Result<()> {
+    const CHUNK: usize = 200;
+    let entries: Vec<&(Vec<u8>, i64, &'static str, i64, Vec<u8>)> = acc.iter().collect();
+    for chunk in entries.chunks(CHUNK) {
+        let placeholders = vec!["(?, ?, ?, ?, ?, ?, ?)"; chunk.len()].join(",");
+        // The no-op update keeps rows that are already indexed from raising duplicate-key warnings
+        let q = format!(
+            "INSERT INTO device_names (bdaddr, bdaddr_random, source_table, le_evt_type, name_hex_str, name, name_casefold) VALUES {} \
+             ON DUPLICATE KEY UPDATE id = id",
+            placeholders
+        );
+        let mut params: Vec<Value> = Vec::with_capacity(chunk.len() * 7);
+        for (bdaddr, bdaddr_random, table, le_evt_type, name) in chunk {
+            let decoded = decode_utf8_ignore(name);
+            let folded = casefold(&decoded);
+            params.push(Value::Bytes(bdaddr.clone()));
+            params.push((*bdaddr_random).into());
+            params.push((*table).into());
+            params.push((*le_evt_type).into());
+            params.push(hex::encode(name).into());
+            params.push(decoded.into());
+            params.push(folded.into());
+        }
+        conn.exec_drop(q, params)?;
+    }
+    Ok(())
+}
+
+fn refresh_gatt_device_names(conn: &mut mysql::PooledConn, gatt: &GattNameBdaddrs) -> mysql::Result<()> {
+    const CHUNK: usize = 200;
+    let entries: Vec<&(Vec<u8>, i64)> = gatt.iter().collect();
+    let mut acc = DeviceNames::new();
+    for chunk in entries.chunks(CHUNK) {
+        let placeholders = vec!["(?, ?)"; chunk.len()].join(",");
+        let q = format!(
+            "SELECT cv.bdaddr, cv.bdaddr_random, cv.byte_values FROM GATT_characteristics_values AS cv \
+             JOIN GATT_characteristics AS c ON cv.char_value_handle = c.char_value_handle AND cv.bdaddr_random = c.bdaddr_random AND cv.bdaddr = c.bdaddr \
+             WHERE c.UUID = '2a00' AND (cv.bdaddr, cv.bdaddr_random) IN ({})",
+            placeholders
+        );
+        let mut params: Vec<Value> = Vec::with_capacity(chunk.len() * 2);
+        for (bdaddr, bdaddr_random) in chunk {
+            params.push(Value::Bytes(bdaddr.clone()));
+            params.push((*bdaddr_random).into());
+        }
+        let rows: Vec<(Vec<u8>, i64, Vec<u8>)> = conn.exec(q, params)?;
+        for (bdaddr, bdaddr_random, byte_values) in rows {
+            acc.insert((bdaddr, bdaddr_random, "GATT_characteristics_values", 0, byte_values));
+        }
+    }
+    insert_device_names(conn, &acc)
+}
+
 // Owning version of TableSpec + rows used by the parallel writer; the
 // borrowed-references shape used by flush_all() can't cross thread boundaries
 // because Rust can't prove the Buffers stays alive long enough.
@@ -2689,6 +3207,12 @@ fn flush_parallel_with_retry(
     max_retries: usize,
 ) -> (u64, u64) {
     const CHUNK: usize = 200;
+    // GATT_characteristics and GATT_characteristics_values can land in different
+    // lanes, so GATT Device Names are looked up once all the lanes are committed.
+    let mut gatt_names = GattNameBdaddrs::new();
+    for t in &tables {
+        accumulate_gatt_name_bdaddrs(&mut gatt_names, t.name, &t.rows);
+    }
     let mut by_size = tables;
     by_size.sort_by(|a, b| b.rows.len().cmp(&a.rows.len()));
     let mut lanes: Vec<(u64, Vec<OwnedTable>)> =
@@ -2715,6 +3239,9 @@ fn flush_parallel_with_retry(
                     let mut attempted = 0u64;
                     let mut inserted = 0u64;
                     let mut log = Vec::new();
+                    let mut presence = Presence::new();
+                    let mut uuid_index = UuidIndex::new();
+                    let mut device_names = DeviceNames::new();
                     for t in &lane_tables {
                         let attempted_t = t.rows.len() as u64;
                         let spec = TableSpec {
@@ -2725,7 +3252,9 @@ fn flush_parallel_with_retry(
                         // On deadlock partway through the lane's tables, the
                         // outer retry rolls back and replays. INSERT IGNORE
                         // makes that re-execution safe.
-                        let inserted_t = bulk_insert(&mut conn, &spec, &t.rows, CHUNK)?;
+                        let inserted_t = bulk_insert_uuid_indexed(&mut conn, &spec, &t.rows, CHUNK, &mut uuid_index)?;
+                        accumulate_presence(&mut presence, t.name, t.columns, &t.rows);
+                        accumulate_device_names(&mut device_names, t.name, t.columns, &t.rows);
                         attempted += attempted_t;
                         inserted += inserted_t;
                         if verbose && attempted_t > 0 {
@@ -2735,6 +3264,9 @@ fn flush_parallel_with_retry(
                             ));
                         }
                     }
+                    upsert_bdaddr_presence(&mut conn, &presence)?;
+                    insert_uuid_index(&mut conn, &uuid_index)?;
+                    insert_device_names(&mut conn, &device_names)?;
                     conn.query_drop("COMMIT")?;
                     Ok((attempted, inserted, log))
                 });
@@ -2765,6 +3297,16 @@ fn flush_parallel_with_retry(
             Err(e) => eprintln!("lane panic: {:?}", e),
         }
     }
+    if !gatt_names.is_empty() {
+        let res = retry_on_deadlock("GATT device names", max_retries, || {
+            let mut conn = pool.get_conn()?;
+            refresh_gatt_device_names(&mut conn, &gatt_names)
+        });
+        if let Err(e) = res {
+            // Backfill_bdaddr_presence.py can catch device_names up
+            eprintln!("GATT device names failed after retries: {}", e);
+        }
+    }
     (total_a, total_i)
 }
 
@@ -2864,9 +3406,16 @@ fn flush_all(conn: &mut mysql::PooledConn, b: &Buffers, verbose: bool) -> mysql:
 
     let mut total_rows: u64 = 0;
     let mut total_affected: u64 = 0;
+    let mut presence = Presence::new();
+    let mut uuid_index = UuidIndex::new();
+    let mut device_names = DeviceNames::new();
+    let mut gatt_names = GattNameBdaddrs::new();
     for (spec, rows) in tables {
         let attempted = rows.len() as u64;
-        let affected = bulk_insert(conn, spec, rows, CHUNK)?;
+        let affected = bulk_insert_uuid_indexed(conn, spec, rows, CHUNK, &mut uuid_index)?;
+        accumulate_presence(&mut presence, spec.name, spec.columns, rows);
+        accumulate_device_names(&mut device_names, spec.name, spec.columns, rows);
+        accumulate_gatt_name_bdaddrs(&mut gatt_names, spec.name, rows);
         total_rows += attempted;
         total_affected += affected;
         if verbose && attempted > 0 {
@@ -2879,6 +3428,10 @@ fn flush_all(conn: &mut mysql::PooledConn, b: &Buffers, verbose: bool) -> mysql:
             );
         }
     }
+    upsert_bdaddr_presence(conn, &presence)?;
+    insert_uuid_index(conn, &uuid_index)?;
+    insert_device_names(conn, &device_names)?;
+    refresh_gatt_device_names(conn, &gatt_names)?;
     Ok((total_rows, total_affected))
 }
 
@@ -23,7 +23,8 @@ TEST_DB = "bttest"
 # Tables containing device observations — wiped between sessions and re-seeded
 # from seed.sql. Lookup tables (IEEE_bdaddr_to_company, UUID16_to_company,
 # USB_CID_to_company, BLEScope_UUID128s) are populated by separate translator
-# scripts and are intentionally NOT touched here.
+# scripts and are intentionally NOT touched here, and neither is ChipMaker_OUIs,
+# which is derived from IEEE_bdaddr_to_company.
 DEVICE_DATA_TABLES = [
     "EIR_bdaddr_to_3d_info", "EIR_bdaddr_to_CoD", "EIR_bdaddr_to_DevID",
     "EIR_bdaddr_to_MSD", "EIR_bdaddr_to_PSRM", "EIR_bdaddr_to_URI",
@@ -80,9 +81,21 @@ def _load_seed():
         )
 
 
+# seed.sql (like the other .sql fixtures) goes straight into the device
+# tables, bypassing BTIDES_to_SQL's upkeep of the bdaddr_presence,
+# bdaddr_to_UUID, and device_names indexes that the bdaddr / UUID / name
+# lookups use, so rebuild them after loading one.
+def _backfill_bdaddr_presence():
+    subprocess.run(
+        [sys.executable, "Backfill_bdaddr_presence.py", "--use-test-db", "--rebuild", "--quiet-print"],
+        cwd=str(ANALYSIS_DIR), check=True, capture_output=True,
+    )
+
+
 def _reset_test_db():
     _truncate_device_tables()
     _load_seed()
+    _backfill_bdaddr_presence()
 
 
 @pytest.fixture(scope="session")
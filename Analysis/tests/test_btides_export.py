@@ -165,3 +165,30 @@ def test_quiet_print_suppresses_stdout(run_tme, tmp_path):
     # the device-rendering "For bdaddr =" sections are absent.
     assert "For bdaddr" not in result.stdout, \
         f"Expected no per-device output with --quiet-print; got:\n{result.stdout}"
+
+
+def test_in_process_query_matches_output_file(run_tme, tmp_path, monkeypatch):
+    """Tell_Me_Everything.query_BTIDES() (used by the BTIDALPOOL server's warm
+    query workers) returns the same BTIDES list that --output writes, and
+    back-to-back queries in one process don't leak into each other."""
+    analysis_dir = Path(__file__).resolve().parent.parent
+    monkeypatch.chdir(analysis_dir)
+    monkeypatch.syspath_prepend(str(analysis_dir))
+    import TME.TME_glob
+    from Tell_Me_Everything import (build_arg_parser, query_BTIDES, run_query_worker,
+                                    import_all_startup_data, create_ChipMaker_OUI_hash)
+    monkeypatch.setattr(TME.TME_glob, "use_test_db", True)
+    import_all_startup_data()
+    create_ChipMaker_OUI_hash()
+
+    for query in (["--bdaddr-regex", "AA:BB:CC"], ["--bdaddr", "AA:BB:CC:11:22:01"]):
+        out = tmp_path / "out.btides"
+        run_tme(*query, "--output", str(out), "--quiet-print")
+        with open(out) as f:
+            expected = json.load(f)
+        args = build_arg_parser().parse_args(["--use-test-db", "--quiet-print", *query])
+        assert query_BTIDES(args) == expected
+        assert TME.TME_glob.BTIDES_JSON == []
+
+    # Bad arguments come back as None rather than exiting the worker
+    assert run_query_worker(["--use-test-db", "--bdaddr", "not-a-bdaddr"]) is None
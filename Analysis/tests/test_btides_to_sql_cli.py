@@ -9,6 +9,8 @@ test_full_coverage_round_trip.py:
 - --skip-invalid
 - --rename
 - --verbose-print
+- --insert-batch-size
+- --workers (including concurrent workers indexing the same UUIDs)
 
 The first two are currently xfail-strict because of bugs in the script
 itself (qprint() called with two args; args.input being a list rather than
@@ -170,3 +172,121 @@ def test_rename_renames_input_to_processed(db_clean, tmp_path):
         f"Expected {processed} to exist after --rename; got: {list(tmp_path.iterdir())}"
     assert not in_file.exists(), \
         f"Original {in_file} should have been renamed away."
+
+
+# ---------------------------------------------------------------------------
+# --insert-batch-size
+# ---------------------------------------------------------------------------
+
+def _batch_size_entries():
+    """Three devices with a mix of AdvData, LL and duplicate rows, so that a
+    small batch size splits at least one table across several flushes and
+    the in-batch INSERT IGNORE dedup gets exercised."""
+    entries = []
+    for i in range(3):
+        name = f"Batch{i}".encode().hex()
+        entries.append({
+            "bdaddr": f"aa:bb:cc:99:88:1{i}",
+            "bdaddr_rand": 0,
+            "AdvChanArray": [{
+                "type": 0,
+                "AdvDataArray": [
+                    {"type": 9, "length": 1 + len(name) // 2, "name_hex_str": name},
+                    {"type": 10, "length": 2, "tx_power": i},
+                ],
+            }, {
+                # Same name again -> duplicate row for the same batch
+                "type": 0,
+                "AdvDataArray": [
+                    {"type": 9, "length": 1 + len(name) // 2, "name_hex_str": name},
+                ],
+            }],
+            "LLArray": [
+                {"direction": 1, "opcode": 12, "version": 11,
+                 "company_id": 13, "subversion": 0x1000 + i},
+            ],
+        })
+    return entries
+
+
+def _batch_size_row_counts():
+    return (
+        _count("SELECT COUNT(*) FROM LE_bdaddr_to_name WHERE bdaddr LIKE 'aa:bb:cc:99:88:1%'"),
+        _count("SELECT COUNT(*) FROM LE_bdaddr_to_tx_power WHERE bdaddr LIKE 'aa:bb:cc:99:88:1%'"),
+        _count("SELECT COUNT(*) FROM LL_VERSION_IND WHERE bdaddr LIKE 'aa:bb:cc:99:88:1%'"),
+    )
+
+
+@pytest.mark.parametrize("batch_size", ["1", "2", "1000"])
+def test_insert_batch_size_produces_same_rows(db_clean, tmp_path, batch_size):
+    """Batching only changes how rows are sent, never which rows land. Every
+    batch size must produce the same row set, and re-importing the same file
+    must insert nothing new."""
+    in_file = tmp_path / "batched.btides"
+    _write_btides(in_file, _batch_size_entries())
+
+    result = _run_b2s("--use-test-db", "--input", str(in_file),
+                      "--insert-batch-size", batch_size)
+    assert result.returncode == 0, f"import failed:\n{result.stderr}"
+    assert _batch_size_row_counts() == (3, 3, 3)
+    assert "New db records inserted: 9" in result.stdout
+    assert "Duplicate db records ignored: 3" in result.stdout
+
+    again = _run_b2s("--use-test-db", "--input", str(in_file),
+                     "--insert-batch-size", batch_size)
+    assert again.returncode == 0, f"re-import failed:\n{again.stderr}"
+    assert _batch_size_row_counts() == (3, 3, 3)
+    assert "New db records inserted: 0" in again.stdout
+
+
+# ---------------------------------------------------------------------------
+# --workers
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("workers", ["2", "4"])
+def test_workers_produce_same_rows_as_serial(db_clean, tmp_path, workers):
+    """Sharding the import across worker processes must land exactly the
+    same rows, with the same merged insert/duplicate totals, as the serial
+    path."""
+    in_file = tmp_path / "sharded.btides"
+    _write_btides(in_file, _batch_size_entries())
+
+    result = _run_b2s("--use-test-db", "--input", str(in_file),
+                      "--workers", workers)
+    assert result.returncode == 0, f"--workers import failed:\n{result.stderr}"
+    assert _batch_size_row_counts() == (3, 3, 3)
+    assert "New db records inserted: 9" in result.stdout
+    assert "Duplicate db records ignored: 3" in result.stdout
+    assert "100% done" in result.stdout
+
+
+def _overlapping_uuid_entries(devices=40):
+    """Every device advertises the same two UUID16s (plus one of its own), so
+    that the --workers all add new devices to the same bdaddr_to_UUID and
+    UUID_stats rows at once."""
+    return [{
+        "bdaddr": f"aa:bb:cc:99:89:{i:02x}",
+        "bdaddr_rand": 0,
+        "AdvChanArray": [{
+            "type": 0,
+            "AdvDataArray": [
+                {"type": 3, "length": 7, "UUID16List": ["fe01", "fe02", f"fd{i:02x}"]},
+            ],
+        }],
+    } for i in range(devices)]
+
+
+def test_workers_index_overlapping_uuids(db_clean, tmp_path):
+    """Concurrent workers counting new devices for the same UUIDs can deadlock
+    on each other's index locks. That has to be retried, not fail the import,
+    and each device still has to be counted exactly once."""
+    in_file = tmp_path / "overlapping_uuids.btides"
+    _write_btides(in_file, _overlapping_uuid_entries())
+
+    result = _run_b2s("--use-test-db", "--input", str(in_file),
+                      "--workers", "2", "--insert-batch-size", "1")
+    assert result.returncode == 0, f"--workers import failed:\n{result.stderr}"
+    for uuid in ("fe01", "fe02"):
+        where = f"uuid = '{uuid}' AND source_table = 'LE_bdaddr_to_UUID16s_list'"
+        assert _count(f"SELECT COUNT(*) FROM bdaddr_to_UUID WHERE {where} AND bdaddr LIKE 'aa:bb:cc:99:89:%'") == 40
+        assert _count(f"SELECT devices FROM UUID_stats WHERE {where}") == _count(f"SELECT COUNT(*) FROM bdaddr_to_UUID WHERE {where}")
@@ -203,8 +203,10 @@ def full_coverage_db(test_db):
     """Wipe and load fixtures/full_coverage.sql; restore seed.sql afterwards
     so subsequent tests in the session see the same baseline as the rest of
     the suite."""
+    from conftest import _backfill_bdaddr_presence
     _truncate_round_trip_tables()
     _load_full_coverage_fixture()
+    _backfill_bdaddr_presence()
     try:
         yield
     finally:
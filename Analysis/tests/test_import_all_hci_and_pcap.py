@@ -19,8 +19,10 @@ Coverage:
 - --pcaps-folder pointing at a non-folder: errors
 - --to-SQL --use-test-db: rows actually land in bttest
 - --rename --to-SQL: the .btides files end up renamed to .btides.processed
+- --workers N: the same .btides as a single process, and rows in bttest
 """
 
+import json
 import shutil
 import subprocess
 import sys
@@ -211,21 +213,28 @@ def test_overwrite_existing_BTIDES_redoes_conversion(tmp_input_folder):
 # --to-SQL / --rename
 # ---------------------------------------------------------------------------
 
-def test_to_SQL_imports_into_bttest(db_clean, tmp_input_folder):
-    """--to-SQL --use-test-db drops imported pcap rows into bttest."""
-    # Sum across LE-side adv-data tables that the pcap fixture exercises.
-    counted_tables = [
-        "LE_bdaddr_to_flags",
-        "LE_bdaddr_to_MSD",
-        "LE_bdaddr_to_UUID16s_list",
-        "LE_bdaddr_to_UUID128s_list",
-        "LE_bdaddr_to_tx_power",
-    ]
+# LE-side adv-data tables that the pcap fixture exercises
+COUNTED_TABLES = [
+    "LE_bdaddr_to_flags",
+    "LE_bdaddr_to_MSD",
+    "LE_bdaddr_to_UUID16s_list",
+    "LE_bdaddr_to_UUID128s_list",
+    "LE_bdaddr_to_tx_power",
+]
+
+
+def _imported_row_count():
+    """Rows across COUNTED_TABLES that didn't come from the seed data."""
     union = " UNION ALL ".join(
         f"SELECT COUNT(*) FROM {t} WHERE bdaddr NOT LIKE 'aa:bb:cc:%'"
-        for t in counted_tables
+        for t in COUNTED_TABLES
     )
-    pre = _count(f"SELECT SUM(c) FROM ({union}) x(c);")
+    return _count(f"SELECT SUM(c) FROM ({union}) x(c);")
+
+
+def test_to_SQL_imports_into_bttest(db_clean, tmp_input_folder):
+    """--to-SQL --use-test-db drops imported pcap rows into bttest."""
+    pre = _imported_row_count()
     assert pre == 0, "db_clean should leave the imported-data row count at 0"
 
     result = _run_importer(
@@ -238,9 +247,9 @@ def test_to_SQL_imports_into_bttest(db_clean, tmp_input_folder):
         f"stderr:\n{result.stderr}"
     )
 
-    post = _count(f"SELECT SUM(c) FROM ({union}) x(c);")
+    post = _imported_row_count()
     assert post > 0, (
-        f"Expected --to-SQL to add at least one row to {counted_tables}; "
+        f"Expected --to-SQL to add at least one row to {COUNTED_TABLES}; "
         f"got {post}"
     )
 
@@ -268,3 +277,50 @@ def test_rename_renames_btides_to_processed(db_clean, tmp_input_folder):
         )
         assert not plain.exists(), \
             f"Original {plain} should have been renamed away."
+
+
+# ---------------------------------------------------------------------------
+# --workers
+# ---------------------------------------------------------------------------
+
+def test_workers_match_a_single_process(tmp_path, tmp_input_folder):
+    """Each file is converted from a clean slate however the files are spread
+    across worker processes, so --workers 3 writes the same .btides as the
+    default single process."""
+    parallel_folder = tmp_path / "in_parallel"
+    shutil.copytree(tmp_input_folder, parallel_folder)
+    for (folder, workers) in [(tmp_input_folder, "1"), (parallel_folder, "3")]:
+        result = _run_importer(
+            "--pcaps-folder", str(folder),
+            "--HCI-logs-folder", str(folder),
+            "--HCI-logs-suffix", ".snoop",
+            "--workers", workers,
+            "--quiet-print",
+        )
+        assert result.returncode == 0, (
+            f"--workers {workers} run failed (exit {result.returncode}):\n"
+            f"stderr:\n{result.stderr}"
+        )
+    for btides in ["a.btides", "sub/b.btides", "c.btides"]:
+        with open(tmp_input_folder / btides) as f:
+            single = json.load(f)
+        with open(parallel_folder / btides) as f:
+            parallel = json.load(f)
+        assert parallel == single, f"{btides} differs between --workers 1 and --workers 3"
+
+
+def test_workers_to_SQL_imports_into_bttest(db_clean, tmp_input_folder):
+    """--workers 2 --to-SQL: each worker imports over its own connection."""
+    result = _run_importer(
+        "--pcaps-folder", str(tmp_input_folder),
+        "--HCI-logs-folder", str(tmp_input_folder),
+        "--HCI-logs-suffix", ".snoop",
+        "--workers", "2",
+        "--to-SQL", "--use-test-db",
+        "--quiet-print",
+    )
+    assert result.returncode == 0, (
+        f"--workers 2 --to-SQL run failed (exit {result.returncode}):\n"
+        f"stderr:\n{result.stderr}"
+    )
+    assert _imported_row_count() > 0
@@ -365,3 +365,38 @@ def test_GPS_exclude_does_not_affect_devices_without_gps(run_tme):
         "--GPS-exclude-lower-right", "(-90.0,180.0)",
     )
     assert "aa:bb:cc:11:22:01" in rendered_bdaddrs(result.stdout)
+
+
+# ---------------------------------------------------------------------------
+# --GPS-include-upper-left / --GPS-include-lower-right
+# ---------------------------------------------------------------------------
+# Same box semantics as --GPS-exclude-*, but selects the devices with a GPS
+# coordinate inside the box instead of removing them.
+
+def test_GPS_include_box_around_device2_finds_only_it(run_tme):
+    result = run_tme(
+        "--GPS-include-upper-left", "(39.5,-78.0)",
+        "--GPS-include-lower-right", "(38.0,-76.0)",
+    )
+    assert rendered_bdaddrs(result.stdout) == {"aa:bb:cc:11:22:02"}
+
+
+def test_GPS_include_box_honours_bdaddr_type(run_tme):
+    # device2's coordinate was recorded with bdaddr_random = 1
+    args = ("--GPS-include-upper-left", "(39.5,-78.0)", "--GPS-include-lower-right", "(38.0,-76.0)")
+    assert rendered_bdaddrs(run_tme(*args, "--bdaddr-type", "1").stdout) == {"aa:bb:cc:11:22:02"}
+    assert rendered_bdaddrs(run_tme(*args, "--bdaddr-type", "0").stdout) == set()
+
+
+def test_GPS_include_box_far_away_finds_nothing(run_tme):
+    result = run_tme(
+        "--GPS-include-upper-left", "(37.5,-123.0)",
+        "--GPS-include-lower-right", "(37.0,-121.0)",
+    )
+    assert rendered_bdaddrs(result.stdout) == set()
+
+
+def test_GPS_include_only_upper_left_errors(run_tme):
+    result = run_tme("--GPS-include-upper-left", "(39.5,-78.0)")
+    assert "If you specify either GPS include option, you must specify both." in result.stdout
+    assert rendered_bdaddrs(result.stdout) == set()
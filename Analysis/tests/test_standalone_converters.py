@@ -163,6 +163,23 @@ def test_pcap_to_btides_verbose_BTIDES_adds_type_str(tmp_path):
         "Verbose BTIDES output missing type_str"
 
 
+@pytest.mark.parametrize("extra_args", [[], ["--verbose-BTIDES"]])
+def test_pcap_to_btides_fast_path_matches_scapy(tmp_path, extra_args):
+    """The raw-struct advertisement fast path must produce exactly the same
+    BTIDES as running every packet through scapy (--no-fast-path)."""
+    out_fast = tmp_path / "fast.btides"
+    out_scapy = tmp_path / "scapy.btides"
+    _run_converter("PCAP_to_BTIDES.py", "--input", str(PCAP_FIXTURE),
+                   "--output", str(out_fast), "--quiet-print", *extra_args)
+    _run_converter("PCAP_to_BTIDES.py", "--input", str(PCAP_FIXTURE),
+                   "--output", str(out_scapy), "--no-fast-path", "--quiet-print", *extra_args)
+    with open(out_fast) as f:
+        fast = json.load(f)
+    with open(out_scapy) as f:
+        scapy = json.load(f)
+    assert fast == scapy
+
+
 # ---------------------------------------------------------------------------
 # HCI_to_BTIDES.py
 # ---------------------------------------------------------------------------
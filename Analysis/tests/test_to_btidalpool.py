@@ -45,6 +45,8 @@ from pathlib import Path
 
 import pytest
 
+from conftest import _backfill_bdaddr_presence
+
 
 ANALYSIS_DIR = Path(__file__).resolve().parent.parent
 DEFAULT_TOKEN_FILE = ANALYSIS_DIR / "tf"
@@ -119,6 +121,7 @@ def test_to_btidalpool_round_trip(db_clean, run_tme, tmp_path):
 
     # Step 1: synthesize the device in local bttest.
     _seed_synthetic_device(bdaddr, name, company_id_int, msd_payload_hex)
+    _backfill_bdaddr_presence()
     pre_local = _count(
         f"SELECT COUNT(*) FROM LE_bdaddr_to_name WHERE bdaddr='{bdaddr}'"
     )
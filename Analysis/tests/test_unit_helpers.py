@@ -119,6 +119,72 @@ class TestWriteBTIDESVersionGate:
         assert (tmp_path / "out.btides").exists()
 
 
+class TestBTIDESValidationPolicy:
+    """write_BTIDES() validates with process-wide cached validators, honoring
+    the TME_glob.BTIDES_validate policy and the changed_entries shortcut.
+    """
+
+    _valid = {"bdaddr": "aa:bb:cc:dd:ee:ff", "bdaddr_rand": 0}
+    _invalid = {"bdaddr_rand": 0}  # no bdaddr
+
+    @pytest.fixture
+    def staged(self, tmp_path, schema_dir, monkeypatch):
+        import TME.TME_glob
+        import TME.TME_BTIDES_base
+        real_version = json.loads((schema_dir / "BTIDES_base.json").read_text())["version"]
+        staged = TestWriteBTIDESVersionGate._stage_schema_dir(tmp_path, schema_dir, real_version)
+        monkeypatch.setattr(TME.TME_BTIDES_base, "_BTIDES_SCHEMA_DIR", str(staged))
+        monkeypatch.setattr(TME.TME_glob, "BTIDES_validate", "full")
+        monkeypatch.setattr(TME.TME_glob, "BTIDES_validated_count", 0)
+        monkeypatch.setattr(TME.TME_glob, "BTIDES_validation_time", 0.0)
+        return staged
+
+    def test_validators_built_once(self, tmp_path, staged):
+        import TME.TME_glob
+        import TME.TME_BTIDES_base
+        first = TME.TME_BTIDES_base.get_BTIDES_validators()
+        # With the schema files gone, only the cached validators can work
+        shutil.rmtree(staged)
+        assert TME.TME_BTIDES_base.get_BTIDES_validators() is first
+        TME.TME_glob.BTIDES_JSON = [dict(self._valid)]
+        TME.TME_BTIDES_base.write_BTIDES(str(tmp_path / "out.btides"))
+        assert TME.TME_glob.BTIDES_validated_count == 1
+
+    def test_full_rejects_invalid_entry(self, tmp_path, staged):
+        import TME.TME_glob
+        import TME.TME_BTIDES_base
+        TME.TME_glob.BTIDES_JSON = [dict(self._valid), dict(self._invalid)]
+        with pytest.raises(SystemExit):
+            TME.TME_BTIDES_base.write_BTIDES(str(tmp_path / "out.btides"))
+
+    def test_off_skips_validation(self, tmp_path, staged, monkeypatch):
+        import TME.TME_glob
+        import TME.TME_BTIDES_base
+        monkeypatch.setattr(TME.TME_glob, "BTIDES_validate", "off")
+        TME.TME_glob.BTIDES_JSON = [dict(self._invalid)]
+        TME.TME_BTIDES_base.write_BTIDES(str(tmp_path / "out.btides"))
+        assert TME.TME_glob.BTIDES_validated_count == 0
+        assert json.loads((tmp_path / "out.btides").read_text()) == [self._invalid]
+
+    def test_sample_validates_at_most_sample_size(self, tmp_path, staged, monkeypatch):
+        import TME.TME_glob
+        import TME.TME_BTIDES_base
+        monkeypatch.setattr(TME.TME_glob, "BTIDES_validate", "sample")
+        monkeypatch.setattr(TME.TME_glob, "BTIDES_validate_sample_size", 2)
+        TME.TME_glob.BTIDES_JSON = [dict(self._valid, bdaddr=f"aa:bb:cc:dd:ee:0{i}") for i in range(5)]
+        TME.TME_BTIDES_base.write_BTIDES(str(tmp_path / "out.btides"))
+        assert TME.TME_glob.BTIDES_validated_count == 2
+
+    def test_changed_entries_only_validates_those(self, tmp_path, staged):
+        import TME.TME_glob
+        import TME.TME_BTIDES_base
+        changed = dict(self._valid)
+        TME.TME_glob.BTIDES_JSON = [dict(self._invalid), changed]
+        TME.TME_BTIDES_base.write_BTIDES(str(tmp_path / "out.btides"), changed_entries=[changed])
+        assert TME.TME_glob.BTIDES_validated_count == 1
+        assert "schema validation (full): 1 entries" in TME.TME_BTIDES_base.BTIDES_validation_summary()
+
+
 # Small valid-shape CLUES entries used to exercise the loader. The
 # loader itself only cares about UUID + optional "regex" key; the other
 # fields are present so the records look like real CLUES data and so
@@ -325,3 +391,801 @@ class TestTMECluesLoading:
         regex_key = _UUID_BUCKET_F.replace("-", "")
         assert plain_key in clues and plain_key not in clues_regexed
         assert regex_key in clues and regex_key in clues_regexed
+
+
+class TestIterBTIDESEntries:
+    """iter_BTIDES_entries() streams a BTIDES file one top-level entry at a
+    time. It has to produce exactly what json.load() would, regardless of
+    how the entries fall across read-chunk boundaries."""
+
+    @staticmethod
+    def _entries():
+        return [
+            {"bdaddr": f"aa:bb:cc:00:00:{i:02x}", "bdaddr_rand": i % 2,
+             "AdvChanArray": [{"type": 0, "AdvDataArray": [
+                 {"type": 9, "length": 1 + i, "name_hex_str": "c3a9" * i},
+             ]}]}
+            for i in range(40)
+        ]
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 64, 1024 * 1024])
+    @pytest.mark.parametrize("indent", [None, 2])
+    def test_matches_json_load(self, chunk_size, indent):
+        import io
+        from TME.TME_BTIDES_base import iter_BTIDES_entries
+        raw = json.dumps(self._entries(), indent=indent).encode("utf-8")
+        progress = [0]
+        streamed = list(iter_BTIDES_entries(io.BytesIO(raw), chunk_size=chunk_size, progress=progress))
+        assert streamed == json.loads(raw)
+        assert progress[0] == len(raw)
+
+    def test_empty_array(self):
+        import io
+        from TME.TME_BTIDES_base import iter_BTIDES_entries
+        assert list(iter_BTIDES_entries(io.BytesIO(b" [ ]\n"))) == []
+
+    @pytest.mark.parametrize("bad", [b"", b"{}", b"[{}", b"[{} {}]", b"[{}]x", b'[{"a": 1},]'])
+    def test_rejects_malformed(self, bad):
+        import io
+        from TME.TME_BTIDES_base import iter_BTIDES_entries
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_BTIDES_entries(io.BytesIO(bad), chunk_size=2))
+
+
+class TestStartupCache:
+    """import_all_startup_data() must reload the cached TME_glob data only
+    while every source file is unchanged, and re-parse otherwise."""
+
+    @pytest.fixture
+    def startup(self, tmp_path, monkeypatch):
+        import TME.TME_glob as g
+        import TME.TME_import as ti
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "metadata").mkdir()
+        source = tmp_path / "metadata" / "Metadata_v2.json"
+        source.write_text('{"a": 1}')
+        calls = []
+
+        def fake_import():
+            calls.append(1)
+            with open(source) as f:
+                g.metadata_v2 = json.load(f)
+
+        monkeypatch.setattr(ti, "_STARTUP_IMPORTS",
+                            [("Metadata_v2.json", fake_import, ["./metadata/Metadata_v2.json"])])
+        monkeypatch.setattr(ti, "_STARTUP_CACHE_GLOBALS", ["metadata_v2"])
+        monkeypatch.setattr(g, "metadata_v2", {})
+        return ti, g, source, calls
+
+    def test_hit_skips_parsing(self, startup):
+        ti, g, _, calls = startup
+        ti.import_all_startup_data()
+        g.metadata_v2 = {}
+        ti.import_all_startup_data()
+        assert calls == [1]
+        assert g.metadata_v2 == {"a": 1}
+
+    def test_touched_but_unchanged_source_is_a_hit(self, startup):
+        ti, _, source, calls = startup
+        ti.import_all_startup_data()
+        os.utime(source, ns=(0, 0))
+        ti.import_all_startup_data()
+        assert calls == [1]
+
+    def test_changed_source_reparses(self, startup):
+        ti, g, source, calls = startup
+        ti.import_all_startup_data()
+        source.write_text('{"b": 22}')
+        ti.import_all_startup_data()
+        assert calls == [1, 1]
+        assert g.metadata_v2 == {"b": 22}
+
+    def test_no_cache_always_parses(self, startup):
+        ti, _, _, calls = startup
+        ti.import_all_startup_data(use_cache=False)
+        ti.import_all_startup_data(use_cache=False)
+        assert calls == [1, 1]
+        assert not os.path.exists(ti.STARTUP_CACHE_FILE)
+
+
+class TestPrefetchCache:
+    """While a block of bdaddrs is set, execute_query() answers the per-device
+    `WHERE bdaddr = %s [AND bdaddr_random = %s]` SELECTs from one bulk
+    `bdaddr IN (...)` query per table, with the same rows MySQL would return."""
+
+    ROWS = [
+        (1, "aa:bb:cc:00:00:01", 0, 0, 9, "4142"),
+        (2, "aa:bb:cc:00:00:01", 1, 4, 9, "4344"),
+        (3, "aa:bb:cc:00:00:02", 0, 0, 8, "4546"),
+    ]
+    COLUMNS = ("id", "bdaddr", "bdaddr_random", "le_evt_type", "device_name_type", "name_hex_str")
+
+    @pytest.fixture
+    def helpers(self, monkeypatch):
+        import TME.TME_helpers as h
+        executed = []
+        rows, columns = self.ROWS, self.COLUMNS
+
+        class FakeCursor:
+            column_names = columns
+            def execute(self, query, values):
+                executed.append(query)
+                self.result = [r for r in rows if r[1] in [v.lower() for v in values]]
+            def fetchall(self):
+                return self.result
+            def close(self):
+                pass
+
+        class FakeConn:
+            def cursor(self):
+                return FakeCursor()
+
+        monkeypatch.setattr(h, "_get_mysql_conn", lambda: FakeConn())
+        yield h, executed
+        h.clear_prefetch_bdaddrs()
+
+    def test_one_bulk_query_per_table(self, helpers):
+        h, executed = helpers
+        h.set_prefetch_bdaddrs(["AA:BB:CC:00:00:01", "aa:bb:cc:00:00:02"])
+        q = "SELECT bdaddr_random, le_evt_type, device_name_type, name_hex_str FROM LE_bdaddr_to_name WHERE bdaddr = %s"
+        assert h.execute_query(q, ("AA:BB:CC:00:00:01",)) == [(0, 0, 9, "4142"), (1, 4, 9, "4344")]
+        assert h.execute_query(q, ("aa:bb:cc:00:00:02",)) == [(0, 0, 8, "4546")]
+        q_rand = "SELECT name_hex_str FROM LE_bdaddr_to_name WHERE bdaddr_random = %s AND bdaddr = %s"
+        assert h.execute_query(q_rand, (1, "aa:bb:cc:00:00:01")) == [("4344",)]
+        assert len(executed) == 1
+        assert "IN (%s, %s)" in executed[0]
+
+    def test_other_shapes_and_bdaddrs_go_to_mysql(self, helpers):
+        h, executed = helpers
+        h.set_prefetch_bdaddrs(["aa:bb:cc:00:00:01"])
+        h.execute_query("SELECT name_hex_str FROM LE_bdaddr_to_name WHERE bdaddr = %s", ("aa:bb:cc:00:00:02",))
+        h.execute_query("SELECT 1 FROM LE_bdaddr_to_name WHERE bdaddr = %s LIMIT 1", ("aa:bb:cc:00:00:01",))
+        assert len(executed) == 2
+        assert not any("IN (" in q for q in executed)
+
+
+@pytest.fixture
+def select_results():
+    # Row lists for the fake cursor's fetchall()s to return, in order
+    return []
+
+
+@pytest.fixture
+def insert_rowcounts():
+    # Affected row counts for the fake cursor's INSERT IGNOREs to report, in order (default: every row)
+    return []
+
+
+@pytest.fixture
+def insert_errors():
+    # Values that make the fake cursor's execute() fail (with no warnings, i.e. a real error)
+    return set()
+
+
+@pytest.fixture
+def insert_helpers(monkeypatch, select_results, insert_rowcounts, insert_errors):
+    import mysql.connector
+    import TME.TME_glob
+    import TME.TME_helpers as h
+    executed = []
+
+    class FakeCursor:
+        rowcount = 0
+        def execute(self, query, values):
+            if insert_errors.intersection(values):
+                raise mysql.connector.Error("Data too long for column")
+            executed.append((query, values))
+            self.rowcount = query.count("(%s")
+            if query.startswith("INSERT IGNORE") and insert_rowcounts:
+                self.rowcount = insert_rowcounts.pop(0)
+        def fetchall(self):
+            return select_results.pop(0) if select_results else []
+        def fetchwarnings(self):
+            return []
+        def close(self):
+            pass
+
+    class FakeConn:
+        def cursor(self):
+            return FakeCursor()
+        def commit(self):
+            pass
+        def rollback(self):
+            pass
+
+    monkeypatch.setattr(h, "_get_mysql_conn", lambda: FakeConn())
+    monkeypatch.setattr(TME.TME_glob, "insert_batch_size", 1000)
+    monkeypatch.setattr(h, "_pending_insert_batches", {})
+    monkeypatch.setattr(h, "_pending_bdaddr_presence", {})
+    monkeypatch.setattr(h, "_pending_uuid_index", {})
+    monkeypatch.setattr(h, "_pending_device_names", set())
+    monkeypatch.setattr(h, "_pending_gatt_name_bdaddrs", set())
+    yield h, executed
+
+
+class TestBdaddrPresence:
+    """Rows written through queue_insert() mark their (bdaddr, bdaddr_random)
+    in bdaddr_presence with one OR-ed bit per table, which is what the bdaddr
+    lookups query instead of UNIONing every per-device table."""
+
+    @staticmethod
+    def _presence(executed):
+        rows = {}
+        for query, values in executed:
+            if query.startswith("INSERT INTO bdaddr_presence"):
+                for i in range(0, len(values), 3):
+                    rows[(values[i], values[i + 1])] = values[i + 2]
+        return rows
+
+    def test_inserted_rows_set_table_bits(self, insert_helpers):
+        h, executed = insert_helpers
+        le_name = "INSERT IGNORE INTO LE_bdaddr_to_name (bdaddr, bdaddr_random, le_evt_type, device_name_type, name_hex_str) VALUES (%s, %s, %s, %s, %s);"
+        ll_version = "INSERT IGNORE INTO LL_VERSION_IND (bdaddr, bdaddr_random, ll_version, device_BT_CID, ll_sub_version) VALUES (%s, %s, %s, %s, %s);"
+        eir_name = "INSERT IGNORE INTO EIR_bdaddr_to_name (bdaddr, device_name_type, name_hex_str) VALUES (%s, %s, %s);"
+        h.queue_insert(le_name, ("aa:bb:cc:00:00:01", 1, 0, 9, "41"))
+        h.queue_insert(ll_version, ("aa:bb:cc:00:00:01", 1, 12, 76, 1))
+        h.queue_insert(le_name, ("aa:bb:cc:00:00:02", 0, 0, 9, "42"))
+        h.queue_insert(eir_name, ("aa:bb:cc:00:00:02", 9, "43"))
+        h.flush_all_insert_batches()
+
+        bits = h.BDADDR_PRESENCE_BITS
+        assert self._presence(executed) == {
+            ("aa:bb:cc:00:00:01", 1): bits["LE_bdaddr_to_name"] | bits["LL_VERSION_IND"],
+            ("aa:bb:cc:00:00:02", 0): bits["LE_bdaddr_to_name"] | bits["EIR_bdaddr_to_name"],
+        }
+        # Written once, after the data batches
+        presence = [i for i, (q, _) in enumerate(executed) if "bdaddr_presence" in q]
+        assert len(presence) == 1
+        assert not any(q.startswith("INSERT IGNORE") for q, _ in executed[presence[0]:])
+
+    def test_failed_batch_only_loses_bad_rows(self, insert_helpers, insert_errors, monkeypatch):
+        import TME.TME_glob
+        h, executed = insert_helpers
+        monkeypatch.setattr(TME.TME_glob, "insert_count", 0)
+        le_name = "INSERT IGNORE INTO LE_bdaddr_to_name (bdaddr, bdaddr_random, le_evt_type, device_name_type, name_hex_str) VALUES (%s, %s, %s, %s, %s);"
+        insert_errors.add("41" * 300)
+        h.queue_insert(le_name, ("aa:bb:cc:00:00:01", 1, 0, 9, "41"))
+        h.queue_insert(le_name, ("aa:bb:cc:00:00:02", 1, 0, 9, "41" * 300))
+        h.queue_insert(le_name, ("aa:bb:cc:00:00:03", 1, 0, 9, "43"))
+        h.flush_all_insert_batches()
+
+        assert [values for query, values in executed if query == le_name] == [
+            ("aa:bb:cc:00:00:01", 1, 0, 9, "41"),
+            ("aa:bb:cc:00:00:03", 1, 0, 9, "43"),
+        ]
+        assert TME.TME_glob.insert_count == 2
+        assert set(self._presence(executed)) == {("aa:bb:cc:00:00:01", 1), ("aa:bb:cc:00:00:03", 1)}
+
+    def test_untracked_tables_are_ignored(self, insert_helpers):
+        h, executed = insert_helpers
+        h.queue_insert("INSERT IGNORE INTO UUID16_to_company (str_UUID16_CID, company_name) VALUES (%s, %s);", ("0x004c", "Apple"))
+        h.flush_all_insert_batches()
+        assert self._presence(executed) == {}
+
+    def test_failed_flush_requeues_and_raises(self, insert_helpers, monkeypatch):
+        import mysql.connector
+        h, executed = insert_helpers
+        rolled_back = []
+
+        class FailingCursor:
+            def execute(self, query, values):
+                raise mysql.connector.Error("lock wait timeout")
+            def close(self):
+                pass
+
+        class FailingConn:
+            def cursor(self):
+                return FailingCursor()
+            def rollback(self):
+                rolled_back.append(True)
+
+        h.record_bdaddr_presence("LE_bdaddr_to_name", "aa:bb:cc:00:00:01", 1)
+        monkeypatch.setattr(h, "_get_mysql_conn", lambda: FailingConn())
+        with pytest.raises(mysql.connector.Error):
+            h.flush_bdaddr_presence()
+        assert rolled_back == [True]
+        # ... and kept for the next flush
+        assert h._pending_bdaddr_presence == {("aa:bb:cc:00:00:01", 1): h.BDADDR_PRESENCE_BITS["LE_bdaddr_to_name"]}
+
+    def test_flush_retries_after_a_deadlock(self, insert_helpers, monkeypatch):
+        import mysql.connector
+        h, executed = insert_helpers
+        monkeypatch.setattr(h.time, "sleep", lambda seconds: None)
+        deadlocks = [mysql.connector.Error("Deadlock found when trying to get lock", errno=1213)] * 2
+        (committed, rolled_back) = ([], [])
+
+        class DeadlockingCursor:
+            def execute(self, query, values):
+                if deadlocks:
+                    raise deadlocks.pop()
+                executed.append((query, values))
+            def close(self):
+                pass
+
+        class DeadlockingConn:
+            def cursor(self):
+                return DeadlockingCursor()
+            def commit(self):
+                committed.append(True)
+            def rollback(self):
+                rolled_back.append(True)
+
+        h.record_bdaddr_presence("LE_bdaddr_to_name", "aa:bb:cc:00:00:01", 1)
+        monkeypatch.setattr(h, "_get_mysql_conn", lambda: DeadlockingConn())
+        h.flush_bdaddr_presence()
+        assert (len(rolled_back), len(committed)) == (2, 1)
+        assert TestBdaddrPresence._presence(executed) == {("aa:bb:cc:00:00:01", 1): h.BDADDR_PRESENCE_BITS["LE_bdaddr_to_name"]}
+        assert h._pending_bdaddr_presence == {}
+
+    def test_masks_cover_each_table_once(self, insert_helpers):
+        h, _ = insert_helpers
+        assert len(h.BDADDR_PRESENCE_TABLES) == len(set(h.BDADDR_PRESENCE_TABLES)) <= 64
+        assert h.BDADDR_PRESENCE_LE_MASK & h.BDADDR_PRESENCE_CLASSIC_MASK == 0
+
+
+class TestUUIDIndex:
+    """Rows written through queue_insert() to the UUID tables have their UUID
+    lists split into bdaddr_to_UUID rows, and get_bdaddrs_by_uuid_regex()
+    searches the distinct UUIDs there before going back to the bdaddrs."""
+
+    @staticmethod
+    def _uuid_index(executed):
+        rows = set()
+        for query, values in executed:
+            if query.startswith("INSERT INTO bdaddr_to_UUID"):
+                for i in range(0, len(values), 4):
+                    rows.add(tuple(values[i:i + 4]))
+        return rows
+
+    def test_inserted_uuid_lists_are_split(self, insert_helpers):
+        h, executed = insert_helpers
+        le_list = "INSERT IGNORE INTO LE_bdaddr_to_UUID16s_list (bdaddr, bdaddr_random, le_evt_type, list_type, str_UUID16s) VALUES (%s, %s, %s, %s, %s);"
+        eir_list = "INSERT IGNORE INTO EIR_bdaddr_to_UUID128s (bdaddr, list_type, str_UUID128s) VALUES (%s, %s, %s);"
+        gatt = "INSERT IGNORE INTO GATT_services (bdaddr, bdaddr_random, service_type, begin_handle, end_handle, UUID) VALUES (%s, %s, %s, %s, %s, %s);"
+        h.queue_insert(le_list, ("aa:bb:cc:00:00:01", 1, 0, 3, "180f,180a"))
+        h.queue_insert(le_list, ("aa:bb:cc:00:00:01", 1, 4, 3, "180a"))
+        h.queue_insert(eir_list, ("aa:bb:cc:00:00:02", 7, ""))
+        h.queue_insert(eir_list, ("aa:bb:cc:00:00:02", 7, "0000110100001000800000805f9b34fb"))
+        h.queue_insert(gatt, ("aa:bb:cc:00:00:01", 1, 0, 1, 5, "1800"))
+        h.flush_all_insert_batches()
+
+        assert self._uuid_index(executed) == {
+            ("aa:bb:cc:00:00:01", 1, "180a", "LE_bdaddr_to_UUID16s_list"),
+            ("aa:bb:cc:00:00:01", 1, "180f", "LE_bdaddr_to_UUID16s_list"),
+            ("aa:bb:cc:00:00:02", 0, "0000110100001000800000805f9b34fb", "EIR_bdaddr_to_UUID128s"),
+            ("aa:bb:cc:00:00:01", 1, "1800", "GATT_services"),
+        }
+
+    def test_uuid_stats_only_count_new_devices(self, insert_helpers, select_results):
+        h, executed = insert_helpers
+        le_list = "INSERT IGNORE INTO LE_bdaddr_to_UUID16s_list (bdaddr, bdaddr_random, le_evt_type, list_type, str_UUID16s) VALUES (%s, %s, %s, %s, %s);"
+        # No rows in the source table yet, but device 1 already has 180a indexed
+        select_results.append([])
+        select_results.append([("aa:bb:cc:00:00:01", 1, "180a", "LE_bdaddr_to_UUID16s_list")])
+        h.queue_insert(le_list, ("aa:bb:cc:00:00:01", 1, 0, 3, "180f,180a"))
+        h.queue_insert(le_list, ("aa:bb:cc:00:00:01", 1, 4, 3, "180a"))
+        h.queue_insert(le_list, ("aa:bb:cc:00:00:02", 0, 0, 3, "180a,180a"))
+        h.flush_all_insert_batches()
+
+        (stats,) = [values for query, values in executed if query.startswith("INSERT INTO UUID_stats ")]
+        assert [tuple(stats[i:i + 4]) for i in range(0, len(stats), 4)] == [
+            ("LE_bdaddr_to_UUID16s_list", "180a", 1, 3),
+            ("LE_bdaddr_to_UUID16s_list", "180f", 1, 1),
+        ]
+        (devices,) = [values for query, values in executed if query.startswith("INSERT INTO UUID_stats_devices")]
+        assert devices == ("LE_bdaddr_to_UUID16s_list", 1)
+        # ... with the existing entries locked until the increments are committed
+        (existing,) = [query for query, values in executed if "FROM bdaddr_to_UUID WHERE" in query]
+        assert existing.endswith(" FOR UPDATE")
+
+    def test_uuid_stats_observations_count_only_new_rows(self, insert_helpers, select_results, insert_rowcounts):
+        h, executed = insert_helpers
+        le_list = "INSERT IGNORE INTO LE_bdaddr_to_UUID16s_list (bdaddr, bdaddr_random, le_evt_type, list_type, str_UUID16s) VALUES (%s, %s, %s, %s, %s);"
+        # Of a batch of 3, only the "180f,180a" row is new: the "180a" ones were both already there
+        select_results.append([("aa:bb:cc:00:00:01", 1, "180a", 2)])
+        insert_rowcounts.append(1)
+        select_results.append([("aa:bb:cc:00:00:01", 1, "180a", 2), ("aa:bb:cc:00:00:01", 1, "180f,180a", 1)])
+        select_results.append([("aa:bb:cc:00:00:01", 1, "180a", "LE_bdaddr_to_UUID16s_list")])
+        h.queue_insert(le_list, ("aa:bb:cc:00:00:01", 1, 0, 3, "180a"))
+        h.queue_insert(le_list, ("aa:bb:cc:00:00:01", 1, 0, 3, "180f,180a"))
+        h.queue_insert(le_list, ("aa:bb:cc:00:00:01", 1, 4, 3, "180a"))
+        h.flush_all_insert_batches()
+
+        (stats,) = [values for query, values in executed if query.startswith("INSERT INTO UUID_stats ")]
+        assert [tuple(stats[i:i + 4]) for i in range(0, len(stats), 4)] == [
+            ("LE_bdaddr_to_UUID16s_list", "180a", 0, 1),
+            ("LE_bdaddr_to_UUID16s_list", "180f", 1, 1),
+        ]
+
+    def test_uuid_stats_are_read_with_filter_and_limit(self, monkeypatch):
+        import TME.TME_stats as stats
+        queries = []
+
+        def fake_execute_query(query, values):
+            queries.append((query, values))
+            return [(2,)]
+
+        monkeypatch.setattr(stats, "execute_query", fake_execute_query)
+        stats.get_uuid_stats_counts("LE_bdaddr_to_UUID16s_list", {"feaa", "fe35"}, 10)
+        (query, values) = queries[-1]
+        assert "FROM UUID_stats WHERE source_table = %s AND uuid IN (%s, %s)" in query
+        assert query.endswith("ORDER BY devices DESC, uuid LIMIT %s")
+        assert values == ("LE_bdaddr_to_UUID16s_list", "fe35", "feaa", 10)
+        assert not any("bdaddr_to_UUID" in q for (q, _) in queries)
+
+    def test_regex_is_matched_against_distinct_uuids(self, monkeypatch):
+        import TME.TME_lookup as lookup
+        queries = []
+
+        def fake_execute_query(query, values):
+            queries.append((query, values))
+            if "REGEXP" in query:
+                return [("180f",), ("180a",)]
+            return [("aa:bb:cc:00:00:01", "LE_bdaddr_to_UUID16s_list"), ("aa:bb:cc:00:00:01", "GATT_services"), ("aa:bb:cc:00:00:02", "EIR_bdaddr_to_UUID16s")]
+
+        monkeypatch.setattr(lookup, "execute_query", fake_execute_query)
+        bdaddrs = lookup.get_bdaddrs_by_uuid_regex("^180", 1)
+        assert sorted(bdaddrs) == ["aa:bb:cc:00:00:01", "aa:bb:cc:00:00:02"]
+        assert len(queries) == 2
+        assert "SELECT DISTINCT uuid FROM bdaddr_to_UUID" in queries[0][0]
+        # The matched UUIDs, then bdaddr_random, then the BT Classic tables that aren't filtered by it
+        assert queries[1][1][:3] == ("180f", "180a", 1)
+        assert "EIR_bdaddr_to_UUID16s" in queries[1][1]
+
+    def test_no_matching_uuids_skips_bdaddr_query(self, monkeypatch):
+        import TME.TME_lookup as lookup
+        queries = []
+
+        def fake_execute_query(query, values):
+            queries.append(query)
+            return []
+
+        monkeypatch.setattr(lookup, "execute_query", fake_execute_query)
+        assert list(lookup.get_bdaddrs_by_uuid_regex("^dead", None)) == []
+        assert len(queries) == 1
+
+
+class TestDeviceNames:
+    """Rows written through queue_insert() to the name tables are decoded into
+    device_names, and get_bdaddrs_by_name_regex() narrows the names it runs
+    the regex over with a LIKE on a literal that every match has to contain."""
+
+    @staticmethod
+    def _device_names(executed):
+        rows = set()
+        for query, values in executed:
+            if query.startswith("INSERT INTO device_names"):
+                for i in range(0, len(values), 7):
+                    rows.add(tuple(values[i:i + 7]))
+        return rows
+
+    def test_inserted_names_are_decoded(self, insert_helpers, select_results):
+        h, executed = insert_helpers
+        le_name = "INSERT IGNORE INTO LE_bdaddr_to_name (bdaddr, bdaddr_random, le_evt_type, device_name_type, name_hex_str) VALUES (%s, %s, %s, %s, %s);"
+        eir_name = "INSERT IGNORE INTO EIR_bdaddr_to_name (bdaddr, device_name_type, name_hex_str) VALUES (%s, %s, %s);"
+        gatt_value = "INSERT IGNORE INTO GATT_characteristics_values (bdaddr, bdaddr_random, char_value_handle, byte_values) VALUES (%s, %s, %s, %s);"
+        h.queue_insert(le_name, ("aa:bb:cc:00:00:01", 1, 4, 9, "537472c3a46765"))
+        # Invalid UTF-8 is dropped, the same as get_utf8_string_from_hex_string() does
+        h.queue_insert(eir_name, ("aa:bb:cc:00:00:02", 9, "4142ff43"))
+        h.queue_insert(gatt_value, ("aa:bb:cc:00:00:01", 1, 3, b"Gatt"))
+        # The GATT Device Name join, run for the bdaddr whose characteristic value was inserted
+        select_results.append([(1, "aa:bb:cc:00:00:01", 1, b"Gatt")])
+        h.flush_all_insert_batches()
+
+        gatt_query = [values for query, values in executed if "JOIN GATT_characteristics" in query]
+        assert gatt_query == [("aa:bb:cc:00:00:01", 1)]
+        assert self._device_names(executed) == {
+            ("aa:bb:cc:00:00:01", 1, "LE_bdaddr_to_name", 4, "537472c3a46765", "Sträge", "sträge"),
+            ("aa:bb:cc:00:00:02", 0, "EIR_bdaddr_to_name", 0, "4142ff43", "ABC", "abc"),
+            ("aa:bb:cc:00:00:01", 1, "GATT_characteristics_values", 0, "47617474", "Gatt", "gatt"),
+        }
+
+    @pytest.mark.parametrize("regex, expected", [
+        ("iPhone", ("iPhone", False, False)),
+        ("^Galaxy S\\d+", ("Galaxy S", False, True)),
+        ("(?i)^airpods", ("airpods", True, True)),
+        ("abc?de", ("ab", False, False)),
+        ("a(b|c)defg", ("defg", False, False)),
+        ("[Jj]abra Elite", ("abra Elite", False, False)),
+        ("Tile\\.x{2,}y", ("Tile.", False, False)),
+        ("foo|bar", (None, False, False)),
+        ("\\x41BC", (None, False, False)),
+        (".*", (None, False, False)),
+    ])
+    def test_regex_required_literal(self, regex, expected):
+        from TME.TME_helpers import regex_required_literal
+        assert regex_required_literal(regex) == expected
+
+    @pytest.mark.parametrize("regex, expected", [
+        ("^Pixel \\d", ("name LIKE %s ESCAPE '!'", ("Pixel %",))),
+        ("(?i)^galaxy 5", ("name_casefold LIKE %s ESCAPE '!'", ("galaxy 5%",))),
+        ("100%_done", ("name LIKE %s ESCAPE '!'", ("%100!%!_done%",))),
+        # (?i)i also matches ı and İ, whose casefold()s aren't "i"
+        ("(?i)^airpods pro", ("name_casefold LIKE %s ESCAPE '!'", ("%rpods pro%",))),
+        ("(?i)^ipod", ("name_casefold LIKE %s ESCAPE '!'", ("%pod%",))),
+        ("(?i)ii", ("", ())),
+        ("(?i)sträge", ("", ())),
+    ])
+    def test_name_prefilter(self, regex, expected):
+        from TME.TME_helpers import device_name_regex_prefilter
+        assert device_name_regex_prefilter(regex) == expected
+
+    def test_name_prefilter_keeps_dotless_and_dotted_i(self):
+        import re
+        from TME.TME_helpers import device_name_regex_prefilter
+        (_, (like,)) = device_name_regex_prefilter("(?i)^airpods pro")
+        for name in ("AİRPODS PRO", "aırpods pro"):
+            assert re.search("(?i)^airpods pro", name)
+            assert like.strip("%") in name.casefold()
+
+    def test_regex_is_prefiltered_then_checked(self, monkeypatch):
+        import TME.TME_lookup as lookup
+        queries = []
+
+        def fake_execute_query(query, values):
+            queries.append((query, values))
+            # The LIKE lets through names the regex itself doesn't match
+            return [("aa:bb:cc:00:00:01", "LE_bdaddr_to_name", "Pixel 7"), ("aa:bb:cc:00:00:02", "EIR_bdaddr_to_name", "Pixel"), ("aa:bb:cc:00:00:03", "GATT_characteristics_values", "Pixel 8a")]
+
+        monkeypatch.setattr(lookup, "execute_query", fake_execute_query)
+        bdaddrs = lookup.get_bdaddrs_by_name_regex("^Pixel \\d", 1)
+        assert sorted(bdaddrs) == ["aa:bb:cc:00:00:01", "aa:bb:cc:00:00:03"]
+        assert len(queries) == 1
+        assert "name LIKE %s" in queries[0][0]
+        # The LIKE pattern, then bdaddr_random, then the BT Classic tables that aren't filtered by it
+        assert queries[0][1][:2] == ("Pixel %", 1)
+        assert "EIR_bdaddr_to_name" in queries[0][1]
+
+
+class TestChipMakerOUIs:
+    """ChipMaker_OUIs is only recomputed (by REGEXP) for the chip makers that
+    are new or were computed against a different IEEE OUI import, and the chip
+    maker regexes are then answered from it without a REGEXP scan."""
+
+    def test_only_stale_chipmakers_are_recomputed(self, insert_helpers, select_results):
+        h, executed = insert_helpers
+        select_results.append([(100, 200)])
+        select_results.append([("^Apple", 100, 200), ("Broadcom", 90, 180), ("Removed", 100, 200)])
+        assert h.refresh_chipmaker_ouis(["^Apple", "Broadcom", "Nordic Semiconductor"]) == 2
+
+        recomputed = [values[0] for query, values in executed if query.startswith("INSERT INTO ChipMaker_OUIs ")]
+        assert recomputed == ["Broadcom", "Nordic Semiconductor"]
+        deleted = {values[0] for query, values in executed if query.startswith("DELETE FROM ChipMaker_OUIs ")}
+        assert deleted == {"Broadcom", "Nordic Semiconductor", "Removed"}
+        sources = [values for query, values in executed if query.startswith("INSERT INTO ChipMaker_OUIs_source")]
+        assert sources == [("Broadcom", 100, 200), ("Nordic Semiconductor", 100, 200)]
+
+    def test_up_to_date_table_is_left_alone(self, insert_helpers, select_results):
+        h, executed = insert_helpers
+        select_results.append([(100, 200)])
+        select_results.append([("^Apple", 100, 200)])
+        assert h.refresh_chipmaker_ouis(["^Apple"]) == 0
+        assert all(query.startswith("SELECT") for query, _ in executed)
+
+    def test_chipmaker_regex_skips_ieee_scan(self, monkeypatch):
+        import TME.TME_helpers as h
+        queries = []
+
+        def fake_execute_query(query, values):
+            queries.append(query)
+            if "ChipMaker_OUIs_source" in query:
+                return [(1,)] if values == ("^Apple",) else []
+            if "ChipMaker_OUIs" in query:
+                return [("f0:99:b6", "Apple, Inc.")]
+            return [("F0:99:B6", "Apple, Inc.")]
+
+        monkeypatch.setattr(h, "execute_query", fake_execute_query)
+        assert h.get_ouis_by_company_regex("^Apple") == [("f0:99:b6", "Apple, Inc.")]
+        assert not any("REGEXP" in q for q in queries)
+        assert h.get_ouis_by_company_regex("Apple") == [("f0:99:b6", "Apple, Inc.")]
+        assert "REGEXP" in queries[-1]
+
+
+class TestGPSBox:
+    """GPS bounding boxes are searched through the gps_cell grid column, one
+    gps_cell range per row of 0.1 degree cells, plus the exact lat/lon test."""
+
+    @staticmethod
+    def _cell(lat, lon):
+        import math
+        return (math.floor(lat * 10) + 900) * 3601 + (math.floor(lon * 10) + 1800)
+
+    def test_cell_ranges_cover_the_box(self):
+        import TME.TME_GPS as gps
+        upper_left, lower_right = (38.95, -77.05), (38.85, -76.95)
+        ranges = gps.gps_cell_ranges(upper_left, lower_right)
+        assert len(ranges) == 2
+        for lat in (38.85, 38.9072, 38.95):
+            for lon in (-77.05, -77.0369, -76.95):
+                cell = self._cell(lat, lon)
+                assert any(first <= cell <= last for (first, last) in ranges)
+        assert not any(first <= self._cell(38.9072, -76.85) <= last for (first, last) in ranges)
+
+    def test_large_box_skips_the_cells(self):
+        import TME.TME_GPS as gps
+        (condition, values) = gps.gps_box_condition((80.0, -170.0), (-80.0, 170.0))
+        assert "gps_cell" not in condition
+        assert values == (-80.0, 80.0, -170.0, 170.0)
+
+    def test_box_is_one_query(self, monkeypatch):
+        import TME.TME_GPS as gps
+        queries = []
+
+        def fake_execute_query(query, values):
+            queries.append((query, values))
+            return [("aa:bb:cc:11:22:02",)]
+
+        monkeypatch.setattr(gps, "execute_query", fake_execute_query)
+        assert gps.get_bdaddrs_in_GPS_box((39.5, -78.0), (38.0, -76.0)) == {"aa:bb:cc:11:22:02"}
+        (query, values) = queries[0]
+        assert query.count("gps_cell BETWEEN") == 16
+        assert values[-4:] == (38.0, 39.5, -78.0, -76.0)
+
+    def test_box_filters_by_bdaddr_random(self, monkeypatch):
+        import TME.TME_GPS as gps
+        queries = []
+
+        def fake_execute_query(query, values):
+            queries.append((query, values))
+            return []
+
+        monkeypatch.setattr(gps, "execute_query", fake_execute_query)
+        gps.get_bdaddrs_in_GPS_box((39.5, -78.0), (38.0, -76.0), 1)
+        (query, values) = queries[0]
+        assert "WHERE bdaddr_random = %s AND " in query
+        assert values[0] == 1
+
+
+class TestNamePrintMatcher:
+    """The combined NamePrint matcher finds exactly the regexes that
+    re.search()ing each one in turn would, and lookup_metadata_by_nameprint()
+    still returns the first matching Metadata_v2 entry."""
+
+    PATTERNS = ["^Galaxy Watch3 \\([A-F0-9]{4}\\)$", "Buds", "^Galaxy", "[0-9]{3}$", "(?i)pixel", "Galaxy Buds"]
+
+    @pytest.mark.parametrize("name", ["Galaxy Watch3 (0A1F)", "Galaxy Buds Pro", "My Buds 123", "PIXEL 7", "Pixel", "", "Galax"])
+    def test_same_matches_as_searching_each_regex(self, name):
+        import re
+        from TME.TME_helpers import build_regex_matcher, regex_matcher_search
+        matcher = build_regex_matcher(self.PATTERNS)
+        expected = [i for i, pattern in enumerate(self.PATTERNS) if re.search(pattern, name)]
+        assert regex_matcher_search(matcher, name) == expected
+
+    def test_search_names(self):
+        from TME.TME_helpers import build_regex_matcher, regex_matcher_search_names
+        matcher = build_regex_matcher(self.PATTERNS)
+        assert regex_matcher_search_names(matcher, ["Galaxy Buds", "x", "Galaxy Buds"]) == [[1, 2, 5], [], [1, 2, 5]]
+
+    def test_unique_and_nonunique_nameprints(self, monkeypatch):
+        import TME.TME_glob as g
+        import TME.TME_helpers as h
+        monkeypatch.setattr(g, "presumed_unique_nameprint_data", {"^Echo Buds [A-Z0-9]{4}$": "Echo Buds"})
+        monkeypatch.setattr(g, "nonunique_nameprint_data", {"^Apple Pencil$": "Apple Pencil"})
+        monkeypatch.setattr(g, "full_nameprint_data", {**g.presumed_unique_nameprint_data, **g.nonunique_nameprint_data})
+        # Not built by TME_import here, so it gets built on first use
+        monkeypatch.setattr(g, "nameprint_matcher", {})
+        monkeypatch.setattr(g, "metadata_v2", {})
+        assert h.name_matches_presumed_unique_nameprint("Echo Buds 1A2B") == "^Echo Buds [A-Z0-9]{4}$"
+        assert h.name_matches_presumed_unique_nameprint("Apple Pencil") is None
+        assert h.name_matches_nonunique_nameprint("Apple Pencil")
+        assert not h.name_matches_nonunique_nameprint("Echo Buds 1A2B")
+
+    def test_metadata_lookup_takes_first_entry_in_file_order(self, monkeypatch):
+        import TME.TME_glob as g
+        import TME.TME_metadata as md
+        monkeypatch.setattr(g, "metadata_v2", {
+            "Other": {"2thprint_NamePrint": "^Watch", "2thprint_Chip": "Other chip"},
+            "No chip": {"2thprint_NamePrint": "Galaxy"},
+            "Galaxy": {"2thprint_NamePrint": "^Galaxy", "2thprint_Chip": "Galaxy chip"},
+        })
+        monkeypatch.setattr(g, "metadata_v2_nameprint_matcher", {})
+        monkeypatch.setattr(g, "verbose_print", False)
+        monkeypatch.setattr(md, "get_device_names", lambda bdaddr, bdaddr_random: [("EIR_bdaddr_to_name", 0, "Galaxy Watch"), ("LE_bdaddr_to_name", 0, "Watch")])
+        monkeypatch.setattr(md, "execute_query", lambda query, values: [])
+        monkeypatch.setattr(md, "print_ChipPrint_header_if_needed", lambda: None)
+        result = md.lookup_metadata_by_nameprint("aa:bb:cc:dd:ee:ff", 0, "2thprint_Chip")
+        # "Other" is first in the file, and only the second name matches it
+        assert result.endswith("Other chip -> From NamePrint match on ^Watch (le_evt_type = Connectable Undirected Advertising (ADV_IND))")
+
+
+class TestBTIDESBuilderIndexes:
+    """The DualBDADDR, sub-array and GATT handle indexes behind the BTIDES
+    insertion helpers return the same entries the old linear searches did."""
+
+    BDADDR = "aa:bb:cc:dd:ee:ff"
+
+    @pytest.fixture
+    def btides(self, monkeypatch):
+        import TME.TME_glob
+        import TME.TME_BTIDES_base as base
+        import TME.TME_BTIDES_GATT as gatt
+        # Force the sub-arrays in these tests onto the indexed path
+        monkeypatch.setattr(base, "BTIDES_subarray_index_min_len", 0)
+        TME.TME_glob.BTIDES_JSON = []
+        base.rebuild_SingleBDADDR_index()
+        yield TME.TME_glob, base, gatt
+        TME.TME_glob.BTIDES_JSON = []
+        base.rebuild_SingleBDADDR_index()
+
+    def test_dual_bdaddr_lookup_and_rebuild(self, btides):
+        g, base, _ = btides
+        ci = {"central_bdaddr": "11:22:33:44:55:66", "peripheral_bdaddr": self.BDADDR, "access_address": 1}
+        base.generic_DualBDADDR_insertion_into_BTIDES_first_level_array(dict(ci), {"opcode": 1}, "LLArray")
+        base.generic_DualBDADDR_insertion_into_BTIDES_first_level_array(dict(ci), {"opcode": 1}, "LLArray")
+        base.generic_DualBDADDR_insertion_into_BTIDES_first_level_array(dict(ci), {"opcode": 2}, "LLArray")
+        assert g.BTIDES_JSON == [{"CONNECT_IND": ci, "LLArray": [{"opcode": 1}, {"opcode": 2}]}]
+
+        g.BTIDES_JSON = [{"CONNECT_IND": dict(ci)}]
+        base.rebuild_SingleBDADDR_index()
+        assert base.lookup_DualBDADDR_base_entry(ci) is g.BTIDES_JSON[0]
+        assert base.lookup_DualBDADDR_base_entry(dict(ci, access_address=2)) is None
+
+    def test_subarray_dedup_sees_direct_appends(self, btides):
+        g, base, _ = btides
+        adv_data = {"type": 255, "length": 5, "msd_hex_str": "01"}
+        adv = {"type": 0, "AdvDataArray": [adv_data]}
+        base.generic_SingleBDADDR_insertion_into_BTIDES_second_level_array(self.BDADDR, 0, adv, "AdvChanArray", adv_data, "AdvDataArray")
+        # Appended without going through the insertion helpers
+        chan = g.BTIDES_JSON[0]["AdvChanArray"][0]
+        chan["AdvDataArray"].append({"type": 255, "length": 5, "msd_hex_str": "02"})
+        for msd in ("01", "02", "03", "03"):
+            data = {"type": 255, "length": 5, "msd_hex_str": msd}
+            base.generic_SingleBDADDR_insertion_into_BTIDES_second_level_array(self.BDADDR, 0, {"type": 0, "AdvDataArray": [data]}, "AdvChanArray", data, "AdvDataArray")
+        assert [d["msd_hex_str"] for d in chan["AdvDataArray"]] == ["01", "02", "03"]
+        assert len(g.BTIDES_JSON[0]["AdvChanArray"]) == 1
+
+    @pytest.mark.parametrize("index_min_len", [0, 1000], ids=["indexed", "linear"])
+    def test_shallow_lookup_skips_non_primitive_fields(self, btides, monkeypatch, index_min_len):
+        _, base, _ = btides
+        # The index has to give the same answers as the linear search
+        monkeypatch.setattr(base, "BTIDES_subarray_index_min_len", index_min_len)
+        array = [{"k": i, "v": None} for i in range(40)]
+        assert base.find_in_BTIDES_subarray(array, {"k": 3, "v": 7}, "shallow") is array[3]
+        assert base.find_in_BTIDES_subarray(array, {"k": 3, "v": [1]}, "shallow") is array[3]
+        assert base.find_in_BTIDES_subarray(array, {"k": 3, "v": None}, "exact") is array[3]
+        assert base.find_in_BTIDES_subarray(array, {"k": 3, "v": 7}, "exact") is None
+        array = [{"k": i, "v": "x"} for i in range(40)] + [{"k": 3, "v": None}]
+        assert base.find_in_BTIDES_subarray(array, {"k": 3, "v": None}, "shallow") is array[3]
+        assert base.find_in_BTIDES_subarray(array, {"k": 3, "v": None}, "exact") is array[-1]
+        assert base.find_in_BTIDES_subarray(array, {"k": 3, "w": None}, "shallow") is None
+
+    def test_service_still_matches_after_gaining_characteristics(self, btides):
+        g, _, gatt = btides
+        gatt.BTIDES_export_GATT_Service(bdaddr=self.BDADDR, random=0, data={"utype": "2800", "begin_handle": 1, "end_handle": 5, "UUID": "1800"})
+        char = {"handle": 2, "properties": 2, "value_handle": 3, "value_uuid": "2a00"}
+        gatt.BTIDES_export_GATT_Characteristic(bdaddr=self.BDADDR, random=0, data=dict(char))
+        gatt.BTIDES_export_GATT_Characteristic(bdaddr=self.BDADDR, random=0, data=dict(char))
+        gatt.BTIDES_export_GATT_Characteristic(bdaddr=self.BDADDR, random=0, data=dict(char, handle=4, value_handle=5))
+        services = g.BTIDES_JSON[0]["GATTArray"]
+        assert len(services) == 1
+        assert [c["handle"] for c in services[0]["characteristics"]] == [2, 4]
+
+    def test_handle_lookups_return_first_in_order(self, btides):
+        g, base, gatt = btides
+        placeholder = {"utype": "2800", "begin_handle": 1, "end_handle": 0xFFFF, "UUID": "FFFF", "characteristics": []}
+        g.BTIDES_JSON = [{"bdaddr": self.BDADDR, "bdaddr_rand": 0, "GATTArray": [
+            {"utype": "2800", "begin_handle": 10, "end_handle": 20, "UUID": "1800", "characteristics": [{"handle": 11, "value_handle": 12}]},
+        ]}]
+        base.rebuild_SingleBDADDR_index()
+
+        def find_service(handle):
+            return gatt.find_service_with_target_handle_in_range(bdaddr=self.BDADDR, random=0, target_handle=handle)
+
+        def find_char(**kwargs):
+            return gatt.find_characteristic_by_handle(bdaddr=self.BDADDR, random=0, **kwargs)
+
+        services = g.BTIDES_JSON[0]["GATTArray"]
+        assert find_service(15) is services[0]
+        assert find_service(30) is None
+        assert find_char(value_handle=40) is None
+
+        services.append(placeholder)
+        placeholder["characteristics"].append({"handle": 39, "value_handle": 40})
+        assert find_service(15) is services[0]
+        assert find_service(30) is placeholder
+        assert find_char(value_handle=40) is placeholder["characteristics"][0]
+
+        # A later characteristic with the same handle in an earlier service wins, as it would in a linear search
+        services[0]["characteristics"].append({"handle": 39, "value_handle": 41})
+        assert find_char(handle=39) is services[0]["characteristics"][1]
+        assert find_char(handle=11) is services[0]["characteristics"][0]
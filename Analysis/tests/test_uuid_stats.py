@@ -21,6 +21,8 @@ from pathlib import Path
 
 import pytest
 
+from conftest import _backfill_bdaddr_presence
+
 ANALYSIS_DIR = Path(__file__).resolve().parent.parent
 MYSQL_USER = "user"
 MYSQL_PASS = "a"
@@ -72,7 +74,7 @@ def test_uuid16_stats_use_test_db_le_section(run_tme):
     """The LE section of --UUID16-stats must render whenever
     LE_bdaddr_to_UUID16s_list has at least one row. seed.sql device 1
     contributes one row (UUID16 '180d' = Heart Rate), so we assert on the
-    section header, the row count, and the company-match footer.
+    section header, the device count, and the company-match footer.
 
     Note: the command's per-row print loop only emits a line when the
     UUID16 is in `bt_member_UUID16s_to_names` (member_uuids.yaml). 0x180d
@@ -83,7 +85,7 @@ def test_uuid16_stats_use_test_db_le_section(run_tme):
     assert "Traceback" not in result.stderr
     assert "----= BLUETOOTH LOW ENERGY RESULTS =----" in result.stdout, \
         f"Expected LE section header missing:\n{result.stdout}"
-    assert "1 rows of data found in DB:LE_bdaddr_to_UUID16s_list" in result.stdout
+    assert "1 devices with data found in DB:LE_bdaddr_to_UUID16s_list" in result.stdout
     assert "*** 0 UUID16s matched a company name ***" in result.stdout, \
         f"Expected the 'matched a company name' footer:\n{result.stdout}"
 
@@ -104,6 +106,7 @@ def test_uuid16_stats_use_test_db_vendor_match_renders_company_name(run_tme):
          "VALUES ('aa:bb:cc:11:22:97', 2, 'feaa');"],
         check=True, capture_output=True,
     )
+    _backfill_bdaddr_presence()
     try:
         result = run_tme("--UUID16-stats")
         assert "Traceback" not in result.stderr
@@ -126,6 +129,7 @@ def test_uuid16_stats_use_test_db_vendor_match_renders_company_name(run_tme):
              "DELETE FROM EIR_bdaddr_to_UUID16s WHERE bdaddr = 'aa:bb:cc:11:22:97';"],
             check=False, capture_output=True,
         )
+        _backfill_bdaddr_presence()
 
 
 @_BT2_SKIP_UUID16
@@ -181,6 +185,7 @@ def _seed_uuid128_rows():
          + rows_sql + ";"],
         check=True, capture_output=True,
     )
+    _backfill_bdaddr_presence()
 
 
 def _cleanup_uuid128_rows():
@@ -190,6 +195,7 @@ def _cleanup_uuid128_rows():
          "WHERE bdaddr LIKE 'aa:bb:cc:11:22:9_';"],
         check=False, capture_output=True,
     )
+    _backfill_bdaddr_presence()
 
 
 def test_uuid128_stats_use_test_db_resolves_sig_aliases(run_tme):
@@ -16,13 +16,20 @@ opcode_ATT_READ_BY_TYPE_REQ = 0x08
 opcode_ATT_READ_BY_TYPE_RSP = 0x09
 opcode_ATT_READ_REQ = 0x0A
 opcode_ATT_READ_RSP = 0x0B
+opcode_ATT_READ_BLOB_REQ = 0x0C
+opcode_ATT_READ_BLOB_RSP = 0x0D
+opcode_ATT_READ_MULTIPLE_REQ = 0x0E
+opcode_ATT_READ_MULTIPLE_RSP = 0x0F
 opcode_ATT_READ_BY_GROUP_TYPE_REQ = 0x10
 opcode_ATT_READ_BY_GROUP_TYPE_RSP = 0x11
+opcode_ATT_READ_MULTIPLE_VARIABLE_REQ = 0x20
+opcode_ATT_READ_MULTIPLE_VARIABLE_RSP = 0x21
 
 # Error codes that I expect to encounter
 errorcode_01_ATT_Invalid_Handle = 0x01
 errorcode_02_ATT_Read_Not_Permitted = 0x02
 errorcode_05_ATT_Insufficient_Authentication = 0x05
+errorcode_06_ATT_Request_Not_Supported = 0x06
 errorcode_08_ATT_Insufficient_Authorization = 0x08
 errorcode_10_ATT_Unsupported_Group_Type = 0x10
 errorcode_0A_ATT_Attribute_Not_Found = 0x0A
@@ -115,6 +122,41 @@ def send_ATT_READ_REQ(begin_handle):
     write_outbound_pkt(2, payload_len_bytes + globals.ATT_CID_bytes + payload_bytes)
     vprint(f"Sent read request for handle 0x{begin_handle:04x}")
 
+def send_ATT_READ_BLOB_REQ(handle, offset):
+    # LLID = 2 (L2CAP w/o fragmentation)
+    # L2CAP length = 0x0005 (1 byte opcode + 2 byte handle + 2 byte offset)
+    # CID = 0x0004 (ATT)
+    # Opcode = 0x0C (Read blob request - ATT_READ_BLOB_REQ)
+    # Handle = handle (e.g. 0x0001)
+    # Value Offset = offset (e.g. 0x0016 to continue after a 22 byte ATT_READ_RSP)
+    payload_bytes = v1b(opcode_ATT_READ_BLOB_REQ) + v2b(handle) + v2b(offset)
+    payload_len_bytes = v2b(len(payload_bytes))
+    write_outbound_pkt(2, payload_len_bytes + globals.ATT_CID_bytes + payload_bytes)
+    vprint(f"Sent read blob request for handle 0x{handle:04x} at offset 0x{offset:04x}")
+
+def send_ATT_READ_MULTIPLE_REQ(handles):
+    # LLID = 2 (L2CAP w/o fragmentation)
+    # L2CAP length = 1 byte opcode + 2 bytes per handle
+    # CID = 0x0004 (ATT)
+    # Opcode = 0x0E (Read multiple request - ATT_READ_MULTIPLE_REQ)
+    # Set Of Handles = handles (at least 2)
+    payload_bytes = v1b(opcode_ATT_READ_MULTIPLE_REQ) + b''.join(v2b(handle) for handle in handles)
+    payload_len_bytes = v2b(len(payload_bytes))
+    write_outbound_pkt(2, payload_len_bytes + globals.ATT_CID_bytes + payload_bytes)
+    vprint(f"Sent read multiple request for handles {', '.join(f'0x{handle:04x}' for handle in handles)}")
+
+def send_ATT_READ_MULTIPLE_VARIABLE_REQ(handles):
+    # LLID = 2 (L2CAP w/o fragmentation)
+    # L2CAP length = 1 byte opcode + 2 bytes per handle
+    # CID = 0x0004 (ATT)
+    # Opcode = 0x20 (Read multiple variable request - ATT_READ_MULTIPLE_VARIABLE_REQ)
+    # NOTE: Added in spec 5.2
+    # Set Of Handles = handles (at least 2)
+    payload_bytes = v1b(opcode_ATT_READ_MULTIPLE_VARIABLE_REQ) + b''.join(v2b(handle) for handle in handles)
+    payload_len_bytes = v2b(len(payload_bytes))
+    write_outbound_pkt(2, payload_len_bytes + globals.ATT_CID_bytes + payload_bytes)
+    vprint(f"Sent read multiple variable request for handles {', '.join(f'0x{handle:04x}' for handle in handles)}")
+
 def send_ATT_FIND_BY_TYPE_VALUE_REQ_0x2A29_Apple():
     # LLID = 2 (L2CAP w/o fragmentation)
     # CID = 0x0004 (ATT)
@@ -132,61 +174,21 @@ def send_ATT_FIND_BY_TYPE_VALUE_REQ_0x2A29_Apple():
 
 #########
 
-def helper_skip_service_handles(test_handle):
-    global received_handles
-#        print(f"XENO: globals.received_handles = {globals.received_handles}")
-    UUID_bytes = globals.received_handles[test_handle]
-    # If the test_handle is already in the globals.received_handles,
-    # then check if it's a Primary (0x2800) or Secondary (0x2801) service handle, and if so, skip to the next one
-    if(len(UUID_bytes) == 2):
-        UUID16 = int.from_bytes(UUID_bytes, byteorder='little')
-        if(UUID16 == 0x2800 or UUID16 == 0x2801):
-            vprint(f"get_next_handle_to_att_read: Skipping service at handle 0x{test_handle:04x} (because we already know its UUID).")
-            if(test_handle+1 in globals.received_handles.keys()):
-                # It's highly unlikely unless dealing with a messed up or intentionally malicious GATT Server,
-                # but it's possible the next UUID after a 0x2800/1 could be another 0x2800/1. So to avoid that case, recurse
-                return helper_skip_service_handles(test_handle+1)
-            else:
-                # If it's not in the globals.received_handles then we must be at the end, or there's a gap before the next handle range
-                return -1
-        else:
-            return test_handle
-    elif(len(UUID_bytes) == 16):
-#        print(UUID_bytes)
-        vprint("get_next_handle_to_att_read: UUID_bytes != 2 bytes")
-        return test_handle
-    # Should only have UUID16s and UUID128s
-    else:
-        return -1
-
 # For now we intentionally don't want this to be aware of Characteristic read/write permissions, and to just attempt to read everything possible
+# Skips any Primary (0x2800) or Secondary (0x2801) Service handles, because we already know their UUIDs,
+# as well as any gaps in the handles (e.g. between handle ranges, or from a messed up or malicious GATT Server)
 def get_next_handle_to_att_read(last_read_handle):
     global received_handles
     global all_handles_read
     vprint(f"get_next_handle_to_att_read: got {last_read_handle}")
-    next_handle_assumption = last_read_handle + 1
-
-    # First just check if the next_handle_assumption is in the globals.received_handles
-    if(next_handle_assumption in globals.received_handles.keys()):
-        returned_handle = helper_skip_service_handles(next_handle_assumption)
-        if(returned_handle != -1):
-            return returned_handle
-        # else fall through and try another way to find a higher handle
-
-    # If the common case of last_read_handle + 1 is not in the globals.received_handles then check if there's a gap and a higher handle later
-    sorted_handles = sorted(list(globals.received_handles.keys()))
-    for h in sorted_handles:
-        if(h > last_read_handle):
-            # Found a higher handle. Now check if we need to skip it because it's a Service
-            returned_handle = helper_skip_service_handles(h)
-            if(returned_handle == -1):
-                # It's very unlikely, but again if we're dealing with a messed up GATT Server, it could be that this returned -1
-                # because there was a 0x2800 with no characteristics immediately after it, or a gap before the next characteristic
-                # So rather than failing out immediately here, let's keep trying for higher values in the sorted_handles
-                continue
-            else:
-                # But if it returned anything other than -1 then it's a success
-                return returned_handle
+    next_handle = globals.received_handles.next_readable_handle(last_read_handle)
+    # Also skip any Characteristic declarations we already have from the GATT Database Hash cache
+    while(next_handle is not None and next_handle in globals.gatt_db_hash_cached_handles):
+        next_handle = globals.received_handles.next_readable_handle(next_handle)
+    if(next_handle is not None):
+        if(next_handle != last_read_handle + 1):
+            vprint(f"get_next_handle_to_att_read: Skipping from handle 0x{last_read_handle:04x} to 0x{next_handle:04x} (past service handles or a gap).")
+        return next_handle
 
     # If we get here, there must be no higher handle, so we're truly done
     globals.all_handles_read = True
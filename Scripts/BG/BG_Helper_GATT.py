@@ -3,6 +3,7 @@
 
 import globals
 from BG_Helper_All import *
+from BG_Helper_Session import *
 from BG_Helper_ATT import *
 from BG_Helper_Output import *
 
@@ -37,6 +38,99 @@ def detect_Apple_by_GATT_Manufacturer_Name(actual_body_len, dpkt):
 
     return False
 
+####################################################################################
+# GATT Database Hash (0x2B2A) cache lookup
+# Fleets of identical products have identical GATT databases, and many of them expose
+# a Database Hash. With --gatt-hash-cache, read the hash before service discovery, and
+# if a previous run (or Analysis/Export_GATT_DB_hash_cache.py) has already recorded the
+# GATT structure for it, take the handles, services, and characteristics from the
+# cache, and skip straight to reading the values (or past that too, by policy).
+####################################################################################
+def outgoing_GATT_DB_hash_lookup(actual_body_len, dpkt):
+    # Don't start until after ATT negotiation
+    if(globals.gatt_db_hash_cache_path is None or globals.gatt_db_hash_lookup_done or not globals.att_MTU_negotiated):
+        return
+
+    if(not globals.gatt_db_hash_req_sent_time):
+        send_ATT_READ_BY_TYPE_REQ(1, 0xffff, 0x2B2A)
+        globals.gatt_db_hash_req_sent_time = time.time_ns()
+    elif(globals.retry_enabled):
+        time_elapsed = (time.time_ns() - globals.gatt_db_hash_req_sent_time)
+        if(time_elapsed > globals.retry_timeout):
+            globals.gatt_db_hash_req_retry_count += 1
+            if(globals.gatt_db_hash_req_retry_count == globals.gatt_db_hash_req_max_retries):
+                # Not worth holding up the normal enumeration for any longer
+                globals.gatt_db_hash_lookup_done = True
+            else:
+                send_ATT_READ_BY_TYPE_REQ(1, 0xffff, 0x2B2A)
+                globals.gatt_db_hash_req_sent_time = time.time_ns()
+
+# Take the GATT structure from a cache entry (see BG_Helper_Output.py for the format),
+# as if it had just been discovered, and mark all the discovery phases done
+def apply_GATT_DB_hash_cache_entry(entry):
+    if(entry is None or len(entry["handles"]) == 0):
+        return False
+
+    for (handle, UUID) in entry["handles"]:
+        globals.received_handles[handle] = BTIDES_UUID_str_to_bytes(UUID)
+    for (begin_handle, UUID) in entry["services"]:
+        globals.all_handles_received_values[begin_handle] = BTIDES_UUID_str_to_bytes(UUID)
+    for (handle, char_properties, char_value_handle, UUID) in entry["characteristics"]:
+        globals.all_handles_received_values[handle] = v1b(char_properties) + v2b(char_value_handle) + BTIDES_UUID_str_to_bytes(UUID)
+        # Which means there's no need to read the declaration again
+        globals.gatt_db_hash_cached_handles.add(handle)
+    globals.final_handle = max(globals.received_handles.keys())
+
+    globals.primary_services_all_recv = True
+    globals.secondary_services_all_recv = True
+    globals.all_info_handles_recv = True
+    globals.characteristic_read_by_type_req_all_received = True
+    if(not globals.gatt_db_hash_cache_read_values):
+        globals.all_handles_read = True
+    globals.gatt_db_hash_cache_hit = True
+    return True
+
+def process_ATT_READ_BY_TYPE_RSP_for_GATT_DB_hash(actual_body_len, dpkt):
+    (matched, actual_body_len, header_ACID, ll_len_ACID, l2cap_len_ACID, cid_ACID, att_opcode) = is_packet_ATT_type(opcode_ATT_READ_BY_TYPE_RSP, dpkt)
+    if(matched and actual_body_len >= 8):
+        entry_len_ACID, = unpack("<B", dpkt.body[7:8])
+        vmultiprint(actual_body_len, header_ACID, ll_len_ACID, l2cap_len_ACID, cid_ACID, att_opcode, entry_len_ACID)
+        # The Database Hash is 128 bits, so the (only) entry is the handle + 16 bytes
+        if(entry_len_ACID == 18 and actual_body_len >= 26):
+            handle, = unpack("<H", dpkt.body[8:10])
+            globals.gatt_db_hash = bytes(dpkt.body[10:26])
+            globals.all_handles_received_values[handle] = globals.gatt_db_hash
+            if(apply_GATT_DB_hash_cache_entry(globals.gatt_db_hash_cache.get(globals.gatt_db_hash.hex()))):
+                print(f"---> GATT Database Hash {globals.gatt_db_hash.hex()} found in the cache, skipping GATT discovery")
+            else:
+                print(f"---> GATT Database Hash {globals.gatt_db_hash.hex()} not in the cache, moving to next phase")
+        globals.gatt_db_hash_lookup_done = True
+        return True
+    return False
+
+def process_ATT_ERROR_RSP_for_GATT_DB_hash(actual_body_len, dpkt):
+    (matched, actual_body_len, header_ACID, ll_len_ACID, l2cap_len_ACID, cid_ACID, att_opcode) = is_packet_ATT_type(opcode_ATT_ERROR_RSP, dpkt)
+    if(matched and actual_body_len >= 11):
+        req_opcode_in_error, handle_in_error, error_code = unpack("<BHB", dpkt.body[7:11])
+        vmultiprint(req_opcode_in_error, handle_in_error)
+        # Most likely Attribute Not Found (no Database Hash), but e.g. Insufficient Authentication means the same to us
+        if(req_opcode_in_error == opcode_ATT_READ_BY_TYPE_REQ and handle_in_error == 0x0001):
+            vprint(f"error_code = 0x{error_code:02x} = {globals.att_errorcode_to_str[error_code]}")
+            globals.gatt_db_hash_lookup_done = True
+            print(f"---> No readable GATT Database Hash, moving to next phase")
+            return True
+    return False
+
+def incoming_GATT_DB_hash_lookup(actual_body_len, dpkt):
+    if(not globals.gatt_db_hash_req_sent_time or globals.gatt_db_hash_lookup_done):
+        return False
+
+    if(process_ATT_READ_BY_TYPE_RSP_for_GATT_DB_hash(actual_body_len, dpkt)):
+        return True
+    elif(process_ATT_ERROR_RSP_for_GATT_DB_hash(actual_body_len, dpkt)):
+        return True
+    return False
+
 ####################################################################################
 # Send ATT_READ_BY_GROUP_TYPE_REQ for Primary (0x2800) Services
 ####################################################################################
@@ -49,6 +143,11 @@ def outgoing_service_discovery(actual_body_len, dpkt):
     if(not globals.att_MTU_negotiated):
         return
 
+    # Nor until the GATT Database Hash has been looked up, if it's going to be,
+    # and not at all if the services came from the cache
+    if(globals.gatt_db_hash_cache_path is not None and (not globals.gatt_db_hash_lookup_done or globals.gatt_db_hash_cache_hit)):
+        return
+
     if (not globals.primary_services_read_req_sent_time):
         send_ATT_READ_BY_GROUP_TYPE_REQ(1, 0x2800)
         globals.last_requested_service_type = "primary"
@@ -312,12 +411,22 @@ def outgoing_read_all_handles(actual_body_len, dpkt):
     global all_info_handles_recv
     global handle_read_last_sent_handle
 
-    if(not globals.characteristic_read_by_type_req_all_received):
+    # all_handles_read can already be set if there's nothing to read (see apply_GATT_DB_hash_cache_entry())
+    if(not globals.characteristic_read_by_type_req_all_received or globals.all_handles_read):
+        return
+
+    if(globals.batched_reads_enabled):
+        outgoing_batched_read_all_handles(actual_body_len, dpkt)
         return
 
     if(globals.all_info_handles_recv and not globals.handle_read_req_sent_time):
         # Skip any initial 0x2800/1 Primary/Secondary Service handle(s) (even though it's unlikely for there to be more than 1 consecutive...)
-        globals.handle_read_last_sent_handle = get_next_handle_to_att_read(1)
+        if(globals.gatt_db_hash_cache_hit):
+            # Except that with the declarations from the GATT Database Hash cache, the first
+            # handle left to read is already a value (e.g. the Device Name), so don't skip it
+            globals.handle_read_last_sent_handle = 1
+        else:
+            globals.handle_read_last_sent_handle = get_next_handle_to_att_read(1)
         vprint(f"Sending first ATT REQ w/ handle = {globals.handle_read_last_sent_handle}")
         send_next_ATT_READ_REQ_if_applicable(globals.handle_read_last_sent_handle)
         globals.handle_read_req_sent_time = time.time_ns()
@@ -375,6 +484,9 @@ def process_ATT_ERROR_RSP_for_ATT_READ_RSP(actual_body_len, dpkt):
                 print_and_exit()
 
 def incoming_read_all_handles(actual_body_len, dpkt):
+    if(globals.batched_reads_enabled):
+        return incoming_batched_read_all_handles(actual_body_len, dpkt)
+
     # Don't bother with incoming if outgoing hasn't stated yet, or if everything's complete
     if(not globals.handle_read_req_sent_time or globals.all_handles_read):
         return False
@@ -385,16 +497,326 @@ def incoming_read_all_handles(actual_body_len, dpkt):
         return True
     return False
 
+################################################################################
+# Read all values with batched ATT requests (see --batched-reads)
+# An ATT_READ_REQ per handle costs a round trip (one or two connection events) per
+# handle. Instead, read each attribute type that occurs more than once (e.g. the
+# Characteristic declarations, or the CCCDs) with ATT_READ_BY_TYPE_REQs over its
+# handle range, and everything else several handles at a time with
+# ATT_READ_MULTIPLE_VARIABLE_REQs. If the peer doesn't support those, values of a
+# known length can still go in ATT_READ_MULTIPLE_REQs. Whatever gets an ATT error
+# falls back to an ATT_READ_REQ per handle, and only values that didn't fit in the
+# response are finished off with ATT_READ_BLOB_REQs.
+#
+# Each read is a tuple:
+#   ("by_type", begin_handle, end_handle, UUID16, range_begin_handle)
+#   ("multiple_variable", [handles])
+#   ("multiple", [handles])
+#   ("single", handle)
+#   ("blob", handle, offset)
+################################################################################
+
+# Descriptors whose values have a fixed length, so they can be split back out of an ATT_READ_MULTIPLE_RSP
+fixed_length_UUID16_values = {0x2900: 2, 0x2902: 2, 0x2903: 2, 0x2904: 7}
+
+# An attribute value can't be longer than this (Vol 3, Part F, 3.2.9)
+max_attribute_value_len = 512
+
+def fixed_value_len(handle):
+    UUID_bytes = globals.received_handles[handle]
+    if(len(UUID_bytes) != 2):
+        return None
+    return fixed_length_UUID16_values.get(unpack("<H", UUID_bytes)[0])
+
+# Returns the reads that will get the values of a list of handles that don't share a type,
+# as batched as what the peer has said it supports allows
+def batched_reads_for_handles(handles):
+    reads = []
+    max_handles = max(2, (globals.att_mtu - 1) // 2) # Each handle is 2 bytes of the request
+    if(globals.read_multiple_variable_supported and len(handles) > 1):
+        for i in range(0, len(handles), max_handles):
+            chunk = handles[i:i+max_handles]
+            if(len(chunk) > 1):
+                reads.append(("multiple_variable", chunk))
+            else:
+                reads.append(("single", chunk[0]))
+        return reads
+
+    chunk = []
+    chunk_len = 0
+    for handle in handles:
+        value_len = fixed_value_len(handle) if globals.read_multiple_supported else None
+        if(value_len is None):
+            reads.append(("single", handle))
+            continue
+        # The whole response has to fit in one ATT_READ_MULTIPLE_RSP
+        if(len(chunk) == max_handles or chunk_len + value_len > globals.att_mtu - 1):
+            reads.append(("multiple", chunk) if len(chunk) > 1 else ("single", chunk[0]))
+            chunk = []
+            chunk_len = 0
+        chunk.append(handle)
+        chunk_len += value_len
+    if(len(chunk) > 0):
+        reads.append(("multiple", chunk) if len(chunk) > 1 else ("single", chunk[0]))
+    return reads
+
+def plan_batched_reads():
+    handles_by_type = {}
+    handle = globals.received_handles.next_readable_handle(0)
+    while(handle is not None):
+        if(handle not in globals.gatt_db_hash_cached_handles):
+            handles_by_type.setdefault(globals.received_handles[handle], []).append(handle)
+        handle = globals.received_handles.next_readable_handle(handle)
+
+    reads = []
+    other_handles = []
+    for UUID_bytes, handles in handles_by_type.items():
+        # Only UUID16s, because that's all send_ATT_READ_BY_TYPE_REQ() does, and they're what repeats anyway
+        if(len(UUID_bytes) == 2 and len(handles) > 1):
+            reads.append(("by_type", handles[0], handles[-1], unpack("<H", UUID_bytes)[0], handles[0]))
+        else:
+            other_handles += handles
+    reads += batched_reads_for_handles(sorted(other_handles))
+    return reads
+
+def store_read_value(handle, value):
+    if(len(value) == 0):
+        # Like the AirPods Pro's empty ATT_READ_RSPs (see process_ATT_READ_RSP())
+        value = "No data"
+    globals.all_handles_received_values[handle] = value
+    vprint(f"Handle 0x{handle:04x} data raw = {value}")
+
+# The same as the ATT_READ_REQ path records errors
+def store_read_error(handle, error_code):
+    globals.handles_with_error_rsp[handle] = error_code
+    globals.all_handles_received_values[handle] = f"error_code 0x{error_code:02x} = {globals.att_errorcode_to_str[error_code]}"
+
+def send_batched_read(read):
+    if(read[0] == "by_type"):
+        send_ATT_READ_BY_TYPE_REQ(read[1], read[2], read[3])
+    elif(read[0] == "multiple_variable"):
+        send_ATT_READ_MULTIPLE_VARIABLE_REQ(read[1])
+    elif(read[0] == "multiple"):
+        send_ATT_READ_MULTIPLE_REQ(read[1])
+    elif(read[0] == "blob"):
+        send_ATT_READ_BLOB_REQ(read[1], read[2])
+    else:
+        send_ATT_READ_REQ(read[1])
+    globals.batched_read_sent_time = time.time_ns()
+
+def send_next_batched_read():
+    while(len(globals.batched_read_queue) > 0):
+        read = globals.batched_read_queue.pop(0)
+        # If the peer turned out not to support them since this was queued
+        if(read[0] == "multiple_variable" and not globals.read_multiple_variable_supported):
+            globals.batched_read_queue[0:0] = batched_reads_for_handles(read[1])
+            continue
+        globals.batched_read_outstanding = read
+        globals.batched_read_retry_count = 0
+        send_batched_read(read)
+        return
+
+    globals.batched_read_outstanding = None
+    globals.all_handles_read = True
+    print(f"-------> ATT_READ* phase done, moving to next phase")
+
+def outgoing_batched_read_all_handles(actual_body_len, dpkt):
+    if(globals.batched_read_queue is None):
+        globals.batched_read_queue = plan_batched_reads()
+        send_next_batched_read()
+    elif(globals.retry_enabled and globals.batched_read_outstanding is not None):
+        time_elapsed = time.time_ns() - globals.batched_read_sent_time
+        if(time_elapsed > globals.retry_timeout):
+            globals.batched_read_retry_count += 1
+            if(globals.batched_read_retry_count == globals.batched_read_max_retries):
+                # We're done trying, move on without this one
+                send_next_batched_read()
+            else:
+                send_batched_read(globals.batched_read_outstanding)
+
+# Handles of the type in the range that got neither a value nor an error (e.g. because the peer
+# cut a response short in some non-standard way) get read one at a time
+def finish_by_type_range(read):
+    (_, begin_handle, end_handle, UUID16, range_begin_handle) = read
+    UUID_bytes = v2b(UUID16)
+    missing_handles = [handle for handle in range(range_begin_handle, end_handle+1)
+                       if(globals.received_handles.get(handle) == UUID_bytes and handle not in globals.all_handles_received_values)]
+    return [("single", handle) for handle in missing_handles]
+
+def process_batched_read_by_type(read, actual_body_len, dpkt):
+    (_, begin_handle, end_handle, UUID16, range_begin_handle) = read
+    (matched, actual_body_len, header_ACID, ll_len_ACID, l2cap_len_ACID, cid_ACID, att_opcode) = is_packet_ATT_type(opcode_ATT_READ_BY_TYPE_RSP, dpkt)
+    if(matched and actual_body_len >= 8):
+        entry_len_ACID, = unpack("<B", dpkt.body[7:8])
+        # The values get cut off at ATT_MTU-4 (or 253, for the 1 byte length to fit)
+        full_len = min(globals.att_mtu - 4, 253)
+        next_reads = []
+        last_handle = None
+        processed_bytes = 8
+        while(entry_len_ACID >= 2 and processed_bytes + entry_len_ACID <= actual_body_len): # Careful not to exceed!
+            handle, = unpack("<H", dpkt.body[processed_bytes:processed_bytes+2])
+            value = bytes(dpkt.body[processed_bytes+2:processed_bytes+entry_len_ACID])
+            store_read_value(handle, value)
+            if(len(value) == full_len):
+                next_reads.append(("blob", handle, len(value)))
+            last_handle = handle
+            processed_bytes += entry_len_ACID
+        if(last_handle is not None and last_handle < end_handle):
+            next_reads.append(("by_type", last_handle+1, end_handle, UUID16, range_begin_handle))
+        else:
+            next_reads += finish_by_type_range(read)
+        return next_reads
+
+    (matched, actual_body_len, header_ACID, ll_len_ACID, l2cap_len_ACID, cid_ACID, att_opcode) = is_packet_ATT_type(opcode_ATT_ERROR_RSP, dpkt)
+    if(matched and actual_body_len >= 11):
+        req_opcode_in_error, handle_in_error, error_code = unpack("<BHB", dpkt.body[7:11])
+        if(req_opcode_in_error != opcode_ATT_READ_BY_TYPE_REQ):
+            return None
+        if(error_code == errorcode_0A_ATT_Attribute_Not_Found or error_code == errorcode_06_ATT_Request_Not_Supported or
+           handle_in_error < begin_handle or handle_in_error > end_handle):
+            return finish_by_type_range(read)
+        # The first handle left in the range can't be read (e.g. Read Not Permitted), so carry on after it
+        if(globals.received_handles.get(handle_in_error) == v2b(UUID16)):
+            store_read_error(handle_in_error, error_code)
+        if(handle_in_error < end_handle):
+            return [("by_type", handle_in_error+1, end_handle, UUID16, range_begin_handle)]
+        return finish_by_type_range(read)
+    return None
+
+# An ATT_READ_MULTIPLE*_REQ fails as a whole, with the first handle that couldn't be read in the
+# ATT_ERROR_RSP. So record that one's error, and ask for the rest again without it.
+def retry_multiple_read_without_error_handle(handles, handle_in_error, error_code):
+    if(handle_in_error not in handles):
+        # Not telling us which one, so find out one by one
+        return [("single", handle) for handle in handles]
+    store_read_error(handle_in_error, error_code)
+    return batched_reads_for_handles([handle for handle in handles if handle != handle_in_error])
+
+def process_batched_read_multiple_variable(read, actual_body_len, dpkt):
+    handles = read[1]
+    (matched, actual_body_len, header_ACID, ll_len_ACID, l2cap_len_ACID, cid_ACID, att_opcode) = is_packet_ATT_type(opcode_ATT_READ_MULTIPLE_VARIABLE_RSP, dpkt)
+    if(matched):
+        next_reads = []
+        data = bytes(dpkt.body[7:actual_body_len])
+        processed_bytes = 0
+        i = 0
+        while(i < len(handles) and processed_bytes + 2 <= len(data)):
+            value_len, = unpack("<H", data[processed_bytes:processed_bytes+2])
+            value = data[processed_bytes+2:processed_bytes+2+value_len]
+            processed_bytes += 2 + len(value)
+            store_read_value(handles[i], value)
+            # The Length is of the whole value, even when the value itself got cut short
+            if(len(value) < value_len):
+                next_reads.append(("blob", handles[i], len(value)))
+            i += 1
+        if(i == 0):
+            # Nothing usable came back, so don't keep asking the same way
+            return [("single", handle) for handle in handles]
+        # Whatever didn't fit in this response
+        return next_reads + batched_reads_for_handles(handles[i:])
+
+    (matched, actual_body_len, header_ACID, ll_len_ACID, l2cap_len_ACID, cid_ACID, att_opcode) = is_packet_ATT_type(opcode_ATT_ERROR_RSP, dpkt)
+    if(matched and actual_body_len >= 11):
+        req_opcode_in_error, handle_in_error, error_code = unpack("<BHB", dpkt.body[7:11])
+        if(req_opcode_in_error != opcode_ATT_READ_MULTIPLE_VARIABLE_REQ):
+            return None
+        if(error_code == errorcode_06_ATT_Request_Not_Supported):
+            print(f"Peer doesn't support ATT_READ_MULTIPLE_VARIABLE_REQ, falling back")
+            globals.read_multiple_variable_supported = False
+            return batched_reads_for_handles(handles)
+        return retry_multiple_read_without_error_handle(handles, handle_in_error, error_code)
+    return None
+
+def process_batched_read_multiple(read, actual_body_len, dpkt):
+    handles = read[1]
+    (matched, actual_body_len, header_ACID, ll_len_ACID, l2cap_len_ACID, cid_ACID, att_opcode) = is_packet_ATT_type(opcode_ATT_READ_MULTIPLE_RSP, dpkt)
+    if(matched):
+        data = bytes(dpkt.body[7:actual_body_len])
+        value_lens = [fixed_value_len(handle) for handle in handles]
+        if(len(data) != sum(value_lens)):
+            # Some value wasn't the length it should have been, so there's no telling where it ends
+            return [("single", handle) for handle in handles]
+        processed_bytes = 0
+        for handle, value_len in zip(handles, value_lens):
+            store_read_value(handle, data[processed_bytes:processed_bytes+value_len])
+            processed_bytes += value_len
+        return []
+
+    (matched, actual_body_len, header_ACID, ll_len_ACID, l2cap_len_ACID, cid_ACID, att_opcode) = is_packet_ATT_type(opcode_ATT_ERROR_RSP, dpkt)
+    if(matched and actual_body_len >= 11):
+        req_opcode_in_error, handle_in_error, error_code = unpack("<BHB", dpkt.body[7:11])
+        if(req_opcode_in_error != opcode_ATT_READ_MULTIPLE_REQ):
+            return None
+        if(error_code == errorcode_06_ATT_Request_Not_Supported):
+            print(f"Peer doesn't support ATT_READ_MULTIPLE_REQ, falling back")
+            globals.read_multiple_supported = False
+            return [("single", handle) for handle in handles]
+        return retry_multiple_read_without_error_handle(handles, handle_in_error, error_code)
+    return None
+
+def process_batched_read_single_or_blob(read, actual_body_len, dpkt):
+    handle = read[1]
+    if(read[0] == "blob"):
+        (rsp_opcode, req_opcode) = (opcode_ATT_READ_BLOB_RSP, opcode_ATT_READ_BLOB_REQ)
+    else:
+        (rsp_opcode, req_opcode) = (opcode_ATT_READ_RSP, opcode_ATT_READ_REQ)
+    (matched, actual_body_len, header_ACID, ll_len_ACID, l2cap_len_ACID, cid_ACID, att_opcode) = is_packet_ATT_type(rsp_opcode, dpkt)
+    if(matched):
+        part = bytes(dpkt.body[7:actual_body_len])
+        if(read[0] == "blob"):
+            value = globals.all_handles_received_values[handle] + part
+        else:
+            value = part
+        store_read_value(handle, value)
+        # Either way, only ATT_MTU-1 bytes of the value fit in the response, so if it's full there may be more
+        if(len(part) == globals.att_mtu - 1 and len(value) < max_attribute_value_len):
+            return [("blob", handle, len(value))]
+        return []
+
+    (matched, actual_body_len, header_ACID, ll_len_ACID, l2cap_len_ACID, cid_ACID, att_opcode) = is_packet_ATT_type(opcode_ATT_ERROR_RSP, dpkt)
+    if(matched and actual_body_len >= 11):
+        req_opcode_in_error, handle_in_error, error_code = unpack("<BHB", dpkt.body[7:11])
+        if(req_opcode_in_error != req_opcode):
+            return None
+        # For ATT_READ_BLOB_REQ (e.g. Attribute Not Long), just keep what we've already got
+        if(read[0] == "single"):
+            store_read_error(handle, error_code)
+        return []
+    return None
+
+def incoming_batched_read_all_handles(actual_body_len, dpkt):
+    read = globals.batched_read_outstanding
+    if(read is None or globals.all_handles_read):
+        return False
+
+    if(read[0] == "by_type"):
+        next_reads = process_batched_read_by_type(read, actual_body_len, dpkt)
+    elif(read[0] == "multiple_variable"):
+        next_reads = process_batched_read_multiple_variable(read, actual_body_len, dpkt)
+    elif(read[0] == "multiple"):
+        next_reads = process_batched_read_multiple(read, actual_body_len, dpkt)
+    else:
+        next_reads = process_batched_read_single_or_blob(read, actual_body_len, dpkt)
+    if(next_reads is None):
+        # Not a response to this read
+        return False
+
+    # Finish off whatever this read started (e.g. blobs, or the rest of a range) before moving on
+    globals.batched_read_queue[0:0] = next_reads
+    send_next_batched_read()
+    return True
+
 ##############################################################################################################
 # Function to call all the sub-functions to meet all the prerequisites of various devices to GET ALL THE GATT!
 ##############################################################################################################
+@session_handler
 def stateful_GATT_getter(actual_body_len, dpkt):
 
     if(globals.skip_apple):
         # See if we can get the GATT ManufacturerName (0x2a29), and if it's set to Apple, and if so
         if(detect_Apple_by_GATT_Manufacturer_Name(actual_body_len, dpkt)):
             vprint("Apple device detected based on GATT Manufacturer Name, exiting!")
-            exit(0x0A)
+            end_connection(0x0A)
 
     # ATT type doesn't matter here, we just want to check if it's ATT
     if(actual_body_len >= 7):
@@ -413,6 +835,11 @@ def stateful_GATT_getter(actual_body_len, dpkt):
             ####################################################################################
             manage_peripheral_info_requests(actual_body_len, dpkt)
 
+            ####################################################################################
+            # Process the ATT_READ_BY_TYPE_RSP for the GATT Database Hash (0x2B2A), if we asked
+            ####################################################################################
+            incoming_GATT_DB_hash_lookup(actual_body_len, dpkt)
+
             ####################################################################################
             # Process opcode_ATT_READ_BY_GROUP_TYPE_RSP for either primary of secondary services
             ####################################################################################
@@ -440,6 +867,11 @@ def stateful_GATT_getter(actual_body_len, dpkt):
         ####################################################################################
         outgoing_ATT_EXCHANGE_MTUs(actual_body_len, dpkt)
 
+        ####################################################################################
+        # Read the GATT Database Hash (0x2B2A), to see if we can skip the discovery phases
+        ####################################################################################
+        outgoing_GATT_DB_hash_lookup(actual_body_len, dpkt)
+
         ####################################################################################
         # Request all primary services
         ####################################################################################
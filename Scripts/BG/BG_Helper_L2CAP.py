@@ -4,6 +4,7 @@
 
 import globals
 from BG_Helper_All import *
+from BG_Helper_Session import *
 
 # Define opcodes and error codes we might need
 opcode_L2CAP_COMMAND_REJECT                     = 0x01
@@ -108,6 +109,7 @@ def is_packet_L2CAP_signalling_channel_type(actual_body_len, dpkt, type):
 # Functions for sending and receiving L2CAP Signaling Channel (CID = 0x0005) packets
 ##############################################################################################################
 
+@session_handler
 def stateful_incoming_L2CAP_handler(actual_body_len, dpkt):
     global L2CAP_connection_parameters_update_final_state
 
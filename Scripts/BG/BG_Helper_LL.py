@@ -3,6 +3,7 @@
 
 import globals
 from BG_Helper_All import *
+from BG_Helper_Session import *
 
 # Define opcodes and error codes we might need
 opcode_LL_TERMINATE_IND             = 0x02
@@ -416,7 +417,7 @@ def incoming_LL_VERSION_IND(actual_body_len, dpkt):
                 # TODO: in the future check known Broadcom IDs if they're known to be exclusive to Apple
                 if (globals.skip_apple and (company_id == 0x004C or company_id == 0x4C00)):
                     vprint("Apple device detected based on LL_VERSION_IND, exiting!")
-                    exit(0x0A)
+                    end_connection(0x0A)
 
                 globals.ll_version_ind_recv = True
                 print(f"--> LL_VERSION_IND phase done, moving to next phase")
@@ -491,6 +492,7 @@ def incoming_LL_POWER_CONTROL_REQ(actual_body_len, dpkt):
 #################################################################################################################
 # Function to call all the sub-functions to meet all the prerequisites of various devices to GET ALL THE LL CTRL!
 #################################################################################################################
+@session_handler
 def stateful_LL_CTRL_incoming_handler(actual_body_len, ll_ctl_opcode, dpkt):
     ####################################################################################
     # LL_FEATURE_REQ/RSP due to some devices requiring it
@@ -545,6 +547,7 @@ def stateful_LL_CTRL_incoming_handler(actual_body_len, ll_ctl_opcode, dpkt):
         send_LL_REJECT_EXT_IND(ll_ctl_opcode, 0x0C) # 0x0C = "The Command Disallowed error code indicates that the command requested cannot be executed because the Controller is in a state where it cannot process this command at this time."
 
 
+@session_handler
 def stateful_LL_CTRL_outgoing_handler():
     # Need to wait for the first packet to be sent
     if(globals.current_ll_ctrl_state.last_sent_ll_ctrl_pkt_time):
@@ -1,8 +1,51 @@
 # Written by Xeno Kovah
 # Copyright(c) © Dark Mentor LLC 2023-2026
 
+import os
+import json
+import fcntl
 import globals
+from contextlib import contextmanager
 from BG_Helper_All import *
+from BG_Helper_Session import *
+
+######################################################################################
+# Per-connection output session
+# Every row of a GATT enumeration used to cost an append-mode open/write/close of
+# /tmp/GATTPRINT_<bdaddr>.csv on the Pi's SD card, right before the LL_TERMINATE_IND.
+# Instead the store_*() functions below buffer the rows in the connection's
+# output_session, and flush_output() writes them all out at once from print_and_exit(),
+# or from run_target() if the connection ends any other way (e.g. a SIGINT abort).
+#
+# The session can also write the same data as a BTIDES file (see --btides-output),
+# so that it doesn't have to be re-derived from the pcap later.
+######################################################################################
+
+type_ATT_READ_RSP = 0x0B
+
+class output_session:
+    def __init__(self, bdaddr, bdaddr_type_public, btides_path=None):
+        self.bdaddr = bdaddr
+        self.bdaddr_type_public = bdaddr_type_public
+        self.csv_path = f"/tmp/GATTPRINT_{bdaddr.replace(':','_')}.csv"
+        self.btides_path = btides_path
+        self.rows = []
+        # What the rows hold, kept as-is for building the BTIDES output
+        self.services = []          # (utype, begin_handle, end_handle, UUID128)
+        self.handles = []           # (handle, UUID128)
+        self.characteristics = []   # (handle, char_properties, char_value_handle, UUID128)
+        self.values = []            # (handle, hex_byte_str)
+
+    def has_output(self):
+        return len(self.rows) > 0
+
+# Returns the current connection's output_session, starting one if there isn't one yet
+def get_output_session():
+    session = globals.output_session
+    if(session is None or session.bdaddr != globals.target_bdaddr):
+        session = output_session(globals.target_bdaddr, globals.target_bdaddr_type_public, globals.btides_output_path)
+        globals.output_session = session
+    return session
 
 def append_common(tokens):
     if(globals.target_bdaddr_type_public):
@@ -12,12 +55,162 @@ def append_common(tokens):
     tokens.append(f"{globals.target_bdaddr}")
 
 def write_to_csv(tokens):
-    global target_bdaddr
-    with open(f"/tmp/GATTPRINT_{globals.target_bdaddr.replace(':','_')}.csv", 'a', newline='\n') as csvfile:
+    get_output_session().rows.append(tokens)
+
+# BTIDES stores UUID16s as 4 hex digits, and other UUID128s as 32 hex digits without dashes
+# (the same as convert_UUID128_to_UUID16_if_possible() in Analysis/TME/TME_BTIDES_base.py)
+def BTIDES_UUID_str(UUID128):
+    UUID128 = UUID128.lower().replace('-','')
+    if(UUID128.startswith("0000") and UUID128.endswith("00001000800000805f9b34fb")):
+        return UUID128[4:8]
+    return UUID128
+
+# Build a single-entry BTIDES document for the session's data: a GATTArray with the services,
+# their characteristics and values, and an ATTArray with the ATT handle enumeration
+def build_BTIDES(session):
+    entry = {"bdaddr": session.bdaddr.lower(), "bdaddr_rand": 0 if session.bdaddr_type_public else 1}
+
+    GATTArray = []
+    for (utype, begin_handle, end_handle, UUID128) in session.services:
+        GATTArray.append({"utype": utype, "begin_handle": begin_handle, "end_handle": end_handle, "UUID": BTIDES_UUID_str(UUID128)})
+
+    def find_service(handle):
+        for service in GATTArray:
+            if(service["begin_handle"] < handle and service["end_handle"] >= handle):
+                return service
+        return None
+
+    # Values are attached to the characteristic with the matching value handle. Like
+    # BTIDES_export_GATT_Characteristic_Value() in Analysis/TME/TME_BTIDES_GATT.py,
+    # values for any other handles (e.g. descriptors) go into placeholder entries.
+    values = dict(session.values)
+    for (handle, char_properties, char_value_handle, UUID128) in session.characteristics:
+        value_uuid = BTIDES_UUID_str(UUID128)
+        char = {"handle": handle, "properties": char_properties, "value_handle": char_value_handle, "value_uuid": value_uuid,
+                "char_value": {"handle": char_value_handle, "value_uuid": value_uuid}}
+        if(char_value_handle in values):
+            char["char_value"]["io_array"] = [ {"io_type": type_ATT_READ_RSP, "value_hex_str": values.pop(char_value_handle)} ]
+        service = find_service(handle)
+        if(service is None):
+            service = {"placeholder_entry": True, "utype": "2800", "begin_handle": 1, "end_handle": 0xFFFF, "UUID": "FFFF"}
+            GATTArray.append(service)
+        service.setdefault("characteristics", []).append(char)
+
+    for handle, hex_byte_str in values.items():
+        char = {"placeholder_entry": True, "utype": "2803", "handle": 0xFFFE, "properties": 0xFF, "value_handle": handle, "value_uuid": "FFFF",
+                "char_value": {"handle": handle, "io_array": [ {"io_type": type_ATT_READ_RSP, "value_hex_str": hex_byte_str} ]}}
+        service = find_service(handle)
+        if(service is None):
+            service = {"placeholder_entry": True, "utype": "2800", "begin_handle": 1, "end_handle": 0xFFFF, "UUID": "FFFF"}
+            GATTArray.append(service)
+        service.setdefault("characteristics", []).append(char)
+
+    if(len(GATTArray) > 0):
+        entry["GATTArray"] = GATTArray
+    if(len(session.handles) > 0):
+        entry["ATTArray"] = [ {"ATT_handle_enumeration": [ {"handle": handle, "UUID": BTIDES_UUID_str(UUID128)} for (handle, UUID128) in session.handles ]} ]
+    return [ entry ]
+
+# Write out everything buffered in the current output_session. Safe to call more than once.
+def flush_output():
+    session = globals.output_session
+    if(session is None or not session.has_output()):
+        return
+    with open(session.csv_path, 'a', newline='\n') as csvfile:
         csvwriter = csv.writer(csvfile, quoting=csv.QUOTE_ALL, lineterminator="\n")
-        csvwriter.writerow(tokens)
+        csvwriter.writerows(session.rows)
+    if(session.btides_path is not None):
+        with open(session.btides_path, 'w') as btides_file:
+            json.dump(build_BTIDES(session), btides_file, indent=2)
+    globals.output_session = None
+
+######################################################################################
+# GATT Database Hash cache (see --gatt-hash-cache)
+# A JSON file mapping each GATT Database Hash (0x2B2A) value, as a hex string, to the
+# GATT structure that was enumerated for it:
+#   {"<hash>": {"bdaddr": "<where it came from>",
+#               "handles": [[handle, UUID], ...],
+#               "services": [[begin_handle, UUID], ...],
+#               "characteristics": [[handle, properties, value_handle, value_UUID], ...]}}
+# UUIDs are in BTIDES form (see BTIDES_UUID_str()), so that the entries can just as
+# well come from the database, via Analysis/Export_GATT_DB_hash_cache.py.
+######################################################################################
+
+# The inverse of BTIDES_UUID_str(), back to the little-endian bytes that received_handles holds
+def BTIDES_UUID_str_to_bytes(UUID):
+    return bytes.fromhex(UUID)[::-1]
+
+def load_GATT_DB_hash_cache(path):
+    try:
+        with open(path, 'r') as cache_file:
+            return json.load(cache_file)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        print(f"Ignoring unreadable GATT Database Hash cache {path}")
+        return {}
+
+# Build the cache entry for what this connection enumerated
+def build_GATT_DB_hash_cache_entry():
+    entry = {"bdaddr": globals.target_bdaddr, "handles": [], "services": [], "characteristics": []}
+    for handle in sorted(globals.received_handles.keys()):
+        UUID_bytes = globals.received_handles[handle]
+        entry["handles"].append([handle, BTIDES_UUID_str(convert_bytes_to_UUID128_str(UUID_bytes))])
+        value = globals.all_handles_received_values.get(handle)
+        if(not isinstance(value, bytes)):
+            continue
+        if((UUID_bytes == b'\x00\x28' or UUID_bytes == b'\x01\x28') and (len(value) == 2 or len(value) == 16)):
+            entry["services"].append([handle, BTIDES_UUID_str(convert_bytes_to_UUID128_str(value))])
+        elif(UUID_bytes == b'\x03\x28' and (len(value) == 5 or len(value) == 19)):
+            char_properties, char_value_handle = unpack("<BH", value[:3])
+            entry["characteristics"].append([handle, char_properties, char_value_handle, BTIDES_UUID_str(convert_bytes_to_UUID128_str(value[3:]))])
+    return entry
+
+# Only a complete enumeration is worth handing to every other device with the same hash,
+# so not one where some discovery phase ran out of retries and was just declared done
+def GATT_discovery_completed():
+    if(not globals.all_info_handles_recv or not globals.characteristic_read_by_type_req_all_received or len(globals.received_handles) == 0):
+        return False
+    return (globals.primary_service_request_retry_count < globals.primary_service_request_max_retries and
+            globals.secondary_service_request_retry_count < globals.secondary_service_request_max_retries and
+            globals.info_req_sent_retry_count < globals.primary_service_request_max_retries and
+            globals.characteristic_read_by_type_req_sent_retry_count < globals.characteristic_read_by_type_req_sent_max_retries)
+
+# Hold an exclusive lock on the cache (via a sidecar lock file, since the cache itself is
+# replaced rather than written in place) until the with block ends. Anything that does a
+# read-modify-write of the cache must hold it, or two writers (e.g. the BGs on two dongles,
+# or Analysis/Export_GATT_DB_hash_cache.py) can each drop the other's new entries.
+@contextmanager
+def GATT_DB_hash_cache_locked(path):
+    with open(f"{path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# Add this connection's GATT structure to the cache, if it had a Database Hash that wasn't in it yet
+def save_GATT_DB_hash_cache_entry():
+    if(globals.gatt_db_hash_cache_path is None or globals.gatt_db_hash is None or globals.gatt_db_hash_cache_hit):
+        return
+    if(not GATT_discovery_completed()):
+        return
+    hash_str = globals.gatt_db_hash.hex()
+    entry = build_GATT_DB_hash_cache_entry()
+    # Re-read the file rather than using globals.gatt_db_hash_cache, because the BG on another
+    # dongle may have added to it in the meantime. Write it to the side and rename it into
+    # place, so that no BG ever loads a half-written file.
+    with GATT_DB_hash_cache_locked(globals.gatt_db_hash_cache_path):
+        cache = load_GATT_DB_hash_cache(globals.gatt_db_hash_cache_path)
+        cache[hash_str] = entry
+        tmp_path = f"{globals.gatt_db_hash_cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(tmp_path, globals.gatt_db_hash_cache_path)
+    globals.gatt_db_hash_cache[hash_str] = entry
+    print(f"Added GATT Database Hash {hash_str} to {globals.gatt_db_hash_cache_path}")
 
-def store_services_in_existing_format_expectations(begin_handle, end_handle, UUID128):
+def store_services_in_existing_format_expectations(begin_handle, end_handle, UUID128, utype="2800"):
     tokens = ["GATTPRINT:SERVICE"]
     append_common(tokens)
     tokens.append(f"0x{begin_handle:04x}")
@@ -25,6 +218,7 @@ def store_services_in_existing_format_expectations(begin_handle, end_handle, UUI
     tokens.append(f"{UUID128}")
     vprint(tokens)
     write_to_csv(tokens)
+    get_output_session().services.append((utype, begin_handle, end_handle, UUID128))
 
 def store_descriptors_in_existing_format_expectations(handle, UUID128):
     tokens = ["GATTPRINT:HANDLE_UUID"]
@@ -33,6 +227,7 @@ def store_descriptors_in_existing_format_expectations(handle, UUID128):
     tokens.append(f"{UUID128}")
     vprint(tokens)
     write_to_csv(tokens)
+    get_output_session().handles.append((handle, UUID128))
 
 def store_characteristic_values_in_existing_format_expectations(handle, hex_byte_str):
     tokens = ["GATTPRINT:CHAR_VALUE"]
@@ -41,6 +236,7 @@ def store_characteristic_values_in_existing_format_expectations(handle, hex_byte
     tokens.append(f"{hex_byte_str}")
     vprint(tokens)
     write_to_csv(tokens)
+    get_output_session().values.append((handle, hex_byte_str))
 
 def store_characteristics_in_existing_format_expectations(handle, char_properties, char_value_handle, hex_byte_str):
     tokens = ["GATTPRINT:CHAR_DESC"]
@@ -51,6 +247,7 @@ def store_characteristics_in_existing_format_expectations(handle, char_propertie
     tokens.append(f"{hex_byte_str}")
     vprint(tokens)
     write_to_csv(tokens)
+    get_output_session().characteristics.append((handle, char_properties, char_value_handle, hex_byte_str))
 
 def convert_bytes_to_UUID128_str(b):
     if(len(b) == 2):
@@ -60,7 +257,7 @@ def convert_bytes_to_UUID128_str(b):
         return f"{b[15]:02x}{b[14]:02x}{b[13]:02x}{b[12]:02x}-{b[11]:02x}{b[10]:02x}-{b[9]:02x}{b[8]:02x}-{b[7]:02x}{b[6]:02x}-{b[5]:02x}{b[4]:02x}{b[3]:02x}{b[2]:02x}{b[1]:02x}{b[0]:02x}"
     else:
        vprint(b)
-       exit()
+       end_connection()
 
 def print_all_info():
     verbose2 = True
@@ -121,7 +318,8 @@ def print_all_info():
 
         UUID128 = convert_bytes_to_UUID128_str(globals.service_received_handles[begin_handle])
         if(verbose2): print(f"Service {i+1} handles 0x{begin_handle:04x}-0x{end_handle:04x} = UUID 0x{UUID128}")
-        store_services_in_existing_format_expectations(begin_handle, end_handle, UUID128)
+        utype = "2801" if globals.received_handles.get(begin_handle) == b'\x01\x28' else "2800"
+        store_services_in_existing_format_expectations(begin_handle, end_handle, UUID128, utype)
         i += 1
 
 def print_and_exit():
@@ -129,5 +327,8 @@ def print_and_exit():
     # Tear down with an LL_TERMINATE_IND
     # 0x13 = error code "Remote user terminated connection"
     write_outbound_pkt(3, b'\x02\x13')
+    # Only touch the SD card once the LL_TERMINATE_IND is on its way
+    flush_output()
+    save_GATT_DB_hash_cache_entry()
     time.sleep(.1)
-    exit()
+    end_connection()
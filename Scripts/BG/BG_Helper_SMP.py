@@ -3,6 +3,7 @@
 
 import globals
 from BG_Helper_All import *
+from BG_Helper_Session import *
 
 opcode_SMP_Pairing_Req = 0x01
 opcode_SMP_Pairing_Rsp = 0x02
@@ -37,6 +38,7 @@ def send_SMP_Pairing_Request(io_cap, oob_data, auth_req, max_key_size, init_key_
 # Try to pair w/ Legacy Just Works to see if the device supports that
 ###############################################################################################################
 # TODO! This hasn't actually been fully fleshed out yet
+@session_handler
 def handle_SMP_Pairing(actual_body_len, dpkt, max_key_size=0x10):
     global handles_with_error_rsp
     global smp_legacy_pairing_req_sent, smp_legacy_pairing_rsp_recv
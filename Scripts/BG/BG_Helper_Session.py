@@ -0,0 +1,101 @@
+# Written by Xeno Kovah
+# Copyright(c) © Dark Mentor LLC 2023-2026
+
+import types
+import functools
+import importlib.util
+from contextlib import contextmanager
+import globals
+
+######################################################################################
+# Per-connection sessions
+# globals.py holds the state of exactly one connection, which is why a BG process could
+# only drive one connection (with one dongle), and had to exit or reload globals.py to
+# start on the next target. A BG_session holds its own copy of all that state, including
+# its own sniffer in hw. Giving one to a stateful_*() handler as session= swaps its state
+# into globals.py for the duration of the call, so one process (e.g. an asyncio loop with
+# a dongle per session) can interleave packets from several connections. Without a
+# session, everything just uses what's in globals.py, exactly as before.
+######################################################################################
+
+# The names globals.py declares, with their just-imported values. The modules and
+# classes it declares aren't connection state, so they're left out (and stay shared).
+def fresh_connection_state():
+    module = importlib.util.module_from_spec(globals.__spec__)
+    globals.__spec__.loader.exec_module(module)
+    return {name: value for name, value in vars(module).items()
+            if(not name.startswith("__") and not isinstance(value, (types.ModuleType, type)))}
+
+# How a connection ends (e.g. print_and_exit() once everything has been collected),
+# instead of calling exit() directly. It's a SystemExit with the same code, so without
+# a session BG still exits with the codes it always has. Given to a handler with a
+# session, it only ends that session (see session_handler()) rather than the process,
+# and with it every other session in it.
+class SessionFinished(SystemExit):
+    pass
+
+def end_connection(code=None):
+    raise SessionFinished(code)
+
+class BG_session:
+    def __init__(self, hw=None):
+        self.state = fresh_connection_state()
+        self.state["hw"] = hw
+        self.active = False
+        # Set once a handler has ended the session's connection, with the exit code
+        # a standalone BG run would have returned
+        self.finished = False
+        self.exit_code = None
+
+    # Read-only access to the session's state (e.g. session.all_handles_received_values),
+    # wherever it currently lives. To change it, activate the session and use globals.
+    def __getattr__(self, name):
+        if(name in ("state", "active", "finished", "exit_code")):
+            raise AttributeError(name)
+        if(self.active):
+            return getattr(globals, name)
+        if(name not in self.state):
+            raise AttributeError(name)
+        return self.state[name]
+
+# Swap session's state into globals.py until the with block ends (even by exit()),
+# then swap back whatever was there before. Nested activations of the same session
+# (e.g. print_packet() calling the stateful_*() handlers) don't swap again.
+@contextmanager
+def activated_session(session):
+    if(session is None or session.active):
+        yield
+        return
+
+    module_state = vars(globals)
+    outer_names = set(module_state)
+    outer_state = {name: module_state[name] for name in session.state if name in module_state}
+    module_state.update(session.state)
+    session.active = True
+    try:
+        yield
+    finally:
+        # Anything set that globals.py doesn't declare belongs to the session too, rather than leaking
+        for name in set(module_state) - outer_names:
+            session.state[name] = module_state.pop(name)
+        for name in session.state:
+            if(name in module_state):
+                session.state[name] = module_state[name]
+        module_state.update(outer_state)
+        session.active = False
+
+# Lets a handler be given the session its packet belongs to, as session=. If the
+# handler ends the connection, the session is marked finished and None is returned.
+def session_handler(handler):
+    @functools.wraps(handler)
+    def wrapper(*args, session=None, **kwargs):
+        if(session is None):
+            return handler(*args, **kwargs)
+        try:
+            with activated_session(session):
+                return handler(*args, **kwargs)
+        except SessionFinished as e:
+            session.finished = True
+            session.exit_code = e.code
+            return None
+    return wrapper
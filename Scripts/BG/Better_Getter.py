@@ -14,9 +14,13 @@
 # - Writing per-BDADDR logs, instead of a single global log file
 # - SMP data collection
 
+import os
 import re
+import json
 import math
+from contextlib import contextmanager
 import globals
+from sniffle.decoder_state import SniffleDecoderState
 from BG_Helper_All import *
 from BG_Helper_LL import *
 from BG_Helper_L2CAP import *
@@ -24,11 +28,9 @@ from BG_Helper_ATT import *
 from BG_Helper_GATT import *
 from BG_Helper_SMP import *
 from BG_Helper_Output import *
+from BG_Helper_Session import *
 
-def main():
-    global target_bdaddr, target_bdaddr_type_public, verbose
-    global hw, _aa, pcwriter
-
+def build_arg_parser():
     aparse = argparse.ArgumentParser(description="Code to enumerate public GATT information")
     aparse.add_argument("-s", "--serport", default=None, help="Sniffer serial port name")
     aparse.add_argument("-c", "--advchan", default=37, choices=[37, 38, 39], type=int, help="Advertising channel to listen on")
@@ -36,18 +38,59 @@ def main():
     aparse.add_argument("-l", "--longrange", action="store_const", default=False, const=True, help="Use long range (coded) PHY for primary advertising")
     aparse.add_argument("-P", "--public", action="store_const", default=False, const=True, help="Supplied BDADDR address is public")
     aparse.add_argument("-o", "--output", default=None, help="PCAP output file name")
+    aparse.add_argument("--btides-output", default=None, help="Also write the GATT/ATT enumeration results to this BTIDES file")
     aparse.add_argument("-q", "--quiet", action="store_true", help="Don't display empty packets")
     aparse.add_argument("-2", "--attempt-2M-PHY-update", action="store_true", help="Attempt to negotiate 2M PHY")
     aparse.add_argument("-A", "--skip-apple", action="store_true", help="Skip Apple devices")
+    aparse.add_argument("--batched-reads", action="store_true", help="Read the GATT values with ATT_READ_BY_TYPE_REQs over handle ranges and ATT_READ_MULTIPLE(_VARIABLE)_REQs, instead of an ATT_READ_REQ per handle. (The values end up in the GATTPRINT CSV and --btides-output, but the pcap will no longer have an ATT_READ_REQ/RSP pair per handle)")
+    aparse.add_argument("--gatt-hash-cache", default=None, help="GATT Database Hash cache file. Read the target's GATT Database Hash (0x2B2A) first, and if it's in the cache, take the GATT structure from there instead of enumerating it. Newly-enumerated structures are added to the cache")
+    aparse.add_argument("--gatt-hash-cache-policy", default="values", choices=["values", "none"], help="On a --gatt-hash-cache hit, still read all the values ('values', the default), or read nothing at all ('none')")
+    aparse.add_argument("--stdout-log", default=None, help="Append this run's stdout to this file")
+    aparse.add_argument("--worker-fd", default=None, type=int, help="Run as a persistent worker that keeps the sniffer open: read one JSON list of the above arguments per target from stdin, and write each target's exit code as a line to this file descriptor")
+    return aparse
+
+def main():
+    aparse = build_arg_parser()
     args = aparse.parse_args()
 
     globals.hw = SniffleHW(args.serport)
 
+    if(args.worker_fd is not None):
+        worker_main(aparse, args)
+        return
+
     targ_specs = bool(args.bdaddr)
     if targ_specs < 1:
         print("Must specify target BDADDR address", file=sys.stderr)
         return
 
+    with stdout_appended_to(args.stdout_log):
+        configure_hw(args)
+        run_target(args)
+
+# Point fd 1 (and with it print(), and anything else writing to stdout) at the end of
+# path until the with block ends, then put back whatever stdout was before.
+# A worker's stdout is fixed when the launcher spawns it, so this is how each target's
+# output still ends up in the log the launcher picked for it.
+@contextmanager
+def stdout_appended_to(path):
+    if(path is None):
+        yield
+        return
+    sys.stdout.flush()
+    log_fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    saved_fd = os.dup(1)
+    os.dup2(log_fd, 1)
+    os.close(log_fd)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved_fd, 1)
+        os.close(saved_fd)
+
+# Put the sniffer back into advertisement-sniffing mode with the settings a fresh run expects
+def configure_hw(args):
     # set the advertising channel (and return to ad-sniffing mode)
     globals.hw.cmd_chan_aa_phy(args.advchan, BLE_ADV_AA, 2 if args.longrange else 0)
 
@@ -66,6 +109,9 @@ def main():
     # initiator doesn't care about this setting, it always accepts aux
     globals.hw.cmd_auxadv(True)
 
+# Connect to args.bdaddr and enumerate it. Like the rest of BG, this ends via end_connection()
+# (i.e. a SystemExit) with the same exit codes the standalone script has always returned.
+def run_target(args):
     if(args.quiet):
         globals.verbose = False
 
@@ -78,6 +124,15 @@ def main():
     if(args.skip_apple):
         globals.skip_apple = True
 
+    if(args.batched_reads):
+        globals.batched_reads_enabled = True
+
+    if(args.gatt_hash_cache):
+        globals.gatt_db_hash_cache_path = args.gatt_hash_cache
+        globals.gatt_db_hash_cache_read_values = (args.gatt_hash_cache_policy == "values")
+        # Load it now, rather than while the connection is up
+        globals.gatt_db_hash_cache = load_GATT_DB_hash_cache(args.gatt_hash_cache)
+
     if args.bdaddr:
         try:
             bdaddr_bytes = [int(h, 16) for h in reversed(args.bdaddr.split(":"))]
@@ -90,6 +145,7 @@ def main():
 
         globals.target_bdaddr = args.bdaddr
         globals.target_bdaddr_type_public = args.public
+        globals.btides_output_path = args.btides_output
 
     # initiator/Central needs a BDADDR
     central_bdaddr_bytes = bytes(globals.hw.random_addr())
@@ -124,7 +180,7 @@ def main():
                     linux_retry_count += 1
                     if(linux_retry_count == 4):
                         print("Connect timeout... you will need to restart the script")
-                        exit(-2)
+                        end_connection(-2)
                     else:
                         time.sleep(1)
                         print(f"Connect timeout... restart attempt {linux_retry_count} of 3")
@@ -139,7 +195,84 @@ def main():
         send_LL_TERMINATE_IND()
         time.sleep(.1)
 
-        exit(-1)
+        end_connection(-1)
+    finally:
+        # Normally print_and_exit() has already written everything out, but don't lose
+        # anything that was buffered when the connection ended some other way
+        flush_output()
+
+######################################################################################
+# Persistent worker mode (--worker-fd)
+# central_app_launcher.py used to pay for a python3 cold start, every BG module import,
+# and a serial port open for every single BLE target. In worker mode one process stays
+# alive per dongle and is fed targets over stdin instead.
+######################################################################################
+
+# What the exit status of a standalone run would have been for a given SystemExit code,
+# e.g. exit(-1) is seen by the parent as 255
+def exit_status(code):
+    if(code is None):
+        return 0
+    if(isinstance(code, int)):
+        return code & 0xFF
+    return 1
+
+# Each target gets a fresh BG_session (see BG_Helper_Session.py) with the open sniffer,
+# so nothing of the last target's connection state carries over, and the worker's own
+# globals.py is left as it was.
+def run_worker_target(args):
+    globals.hw.decoder_state = SniffleDecoderState()
+    session = BG_session(globals.hw)
+    rc = 0
+    try:
+        with stdout_appended_to(args.stdout_log), activated_session(session):
+            configure_hw(args)
+            run_target(args)
+    except SystemExit as e:
+        rc = exit_status(e.code)
+    except KeyboardInterrupt:
+        # The launcher aborts a target that hit its timeout with SIGINT. Inside the
+        # recv loop that is handled (LL_TERMINATE_IND + end_connection(-1)) by run_target itself.
+        rc = exit_status(-1)
+    finally:
+        if(session.pcwriter is not None):
+            session.pcwriter.close()
+    return rc
+
+# Any exception other than SystemExit (e.g. a serial I/O error) is left to kill the worker,
+# so the launcher sees the same non-zero exit it would have seen from a standalone run,
+# and starts a fresh worker (and serial port open) for the next target.
+def worker_main(aparse, worker_args):
+    results = os.fdopen(worker_args.worker_fd, "w", buffering=1)
+    # Keep the command stream to ourselves, and leave anything that still closes sys.stdin
+    # on its way out (like the exit() builtin) something harmless to close.
+    commands = sys.stdin
+    sys.stdin = open(os.devnull)
+    while True:
+        try:
+            line = commands.readline()
+        except KeyboardInterrupt:
+            # An abort that arrived after the target had already finished
+            continue
+        if not line:
+            break
+        try:
+            args = aparse.parse_args(json.loads(line))
+        except SystemExit as e:
+            # argparse has already printed the usage error
+            results.write(f"{exit_status(e.code)}\n")
+            continue
+        except ValueError:
+            print(f"Ignoring malformed worker target line: {line.strip()}", file=sys.stderr)
+            results.write(f"{exit_status(2)}\n")
+            continue
+        # The sniffer was opened once, by the worker itself
+        args.serport = worker_args.serport
+        if not args.bdaddr:
+            print("Must specify target BDADDR address", file=sys.stderr)
+            results.write("0\n")
+            continue
+        results.write(f"{run_worker_target(args)}\n")
 
 # Check for Apple Advertisements:
 # Of course this can have a false positive due to iBeacons (e.g. like Tesla uses),
@@ -166,6 +299,8 @@ def apple_advertisement(dpkt, actual_body_len):
 
     return False
 
+# Given a session (see BG_Helper_Session.py), msg is handled as part of that session's connection
+@session_handler
 def print_sniffle_message_or_packet(msg, quiet):
     global hw
     global connEventCount
@@ -184,7 +319,7 @@ def print_sniffle_message_or_packet(msg, quiet):
             #exit(-2)
     vprint("")
 
-msg_ctr = 0
+@session_handler
 def print_packet(dpkt, quiet):
     global current_ll_ctrl_state
     if not (quiet and isinstance(dpkt, DataMessage) and dpkt.data_length == 0 and globals.verbose):
@@ -206,7 +341,7 @@ def print_packet(dpkt, quiet):
     if(globals.skip_apple):
         if(apple_advertisement(dpkt, actual_body_len)):
             vprint("Apple device detected based on Advertisement Company ID, exiting!")
-            exit(0x0A)
+            end_connection(0x0A)
 
     if(actual_body_len >= 3):
         header_ACID, ll_len_ACID, ll_ctl_opcode = unpack("<BBB", dpkt.body[:3])
@@ -1,4 +1,5 @@
 import time
+import bisect
 
 # Written by Xeno Kovah
 # Copyright(c) © Dark Mentor LLC 2023-2026
@@ -14,6 +15,10 @@ _aa = 0
 # global variable for pcap writer
 pcwriter = None
 
+# The current connection's BG_Helper_Output.output_session, and where (if anywhere) it should write a BTIDES file
+output_session = None
+btides_output_path = None
+
 # global variable for args I will need later for formatting printing
 target_bdaddr = ""
 target_bdaddr_type_public = False
@@ -202,7 +207,47 @@ att_errorcode_to_str = {
 # Storage for the data returned from the GATT client so it can be output at the end
 ######################################################################################
 
-received_handles = {}
+# received_handles maps each handle to its attribute type UUID (as little-endian bytes).
+# Reading all the handle values walks through it in handle order, skipping the Primary
+# and Secondary Service declarations (whose UUIDs we already have). That used to re-sort
+# all the keys for every ATT_READ_REQ, so every write also keeps a sorted list of the
+# handles that are worth reading, and next_readable_handle() is just a bisect.
+class sorted_handles_dict(dict):
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.readable_handles = []
+        for handle, UUID_bytes in dict(*args, **kwargs).items():
+            self[handle] = UUID_bytes
+
+    # UUID16s other than 0x2800/0x2801, and all UUID128s. (Any other length is bogus, so skip it.)
+    @staticmethod
+    def is_readable(UUID_bytes):
+        if(len(UUID_bytes) == 2):
+            return UUID_bytes != b'\x00\x28' and UUID_bytes != b'\x01\x28'
+        return len(UUID_bytes) == 16
+
+    def __setitem__(self, handle, UUID_bytes):
+        was_readable = handle in self and self.is_readable(self[handle])
+        super().__setitem__(handle, UUID_bytes)
+        if(self.is_readable(UUID_bytes)):
+            if(not was_readable):
+                bisect.insort(self.readable_handles, handle)
+        elif(was_readable):
+            self.readable_handles.pop(bisect.bisect_left(self.readable_handles, handle))
+
+    def __delitem__(self, handle):
+        if(self.is_readable(self[handle])):
+            self.readable_handles.pop(bisect.bisect_left(self.readable_handles, handle))
+        super().__delitem__(handle)
+
+    # Returns the lowest readable handle greater than handle, or None if there isn't one
+    def next_readable_handle(self, handle):
+        index = bisect.bisect_right(self.readable_handles, handle)
+        if(index == len(self.readable_handles)):
+            return None
+        return self.readable_handles[index]
+
+received_handles = sorted_handles_dict()
 service_received_handles = {}
 all_handles_received_values = {}
 characteristic_descriptor_handles = {}
@@ -215,6 +260,16 @@ all_handles_read = False
 handle_read_req_sent_time = None
 handle_read_last_sent_handle = 1
 
+# Reading all the values with batched ATT requests instead of an ATT_READ_REQ per handle (see --batched-reads)
+batched_reads_enabled = False
+batched_read_queue = None # List of the reads still to send, as tuples (see plan_batched_reads()), built once discovery is done
+batched_read_outstanding = None # The read we're waiting on the response to
+batched_read_sent_time = None
+batched_read_retry_count = 0
+batched_read_max_retries = 4
+read_multiple_variable_supported = True # Until the peer says otherwise
+read_multiple_supported = True
+
 # GATT state
 last_requested_service_type = None
 # Reading all primary services via ATT_READ_BY_GROUP_TYPE_REQ
@@ -254,6 +309,19 @@ characteristic_read_by_type_req_sent_max_retries = 4
 characteristic_read_by_type_req_all_received = False
 characteristic_last_read_requested_handle = 2
 
+# Reading the GATT Database Hash (0x2B2A) via ATT_READ_BY_TYPE_REQ, to look it up in the
+# GATT Database Hash cache (see --gatt-hash-cache). Nothing is sent if the path is None.
+gatt_db_hash_cache_path = None
+gatt_db_hash_cache_read_values = True # False = on a cache hit, don't read any values either
+gatt_db_hash_cache = {}
+gatt_db_hash_req_sent_time = None
+gatt_db_hash_req_retry_count = 0
+gatt_db_hash_req_max_retries = 2
+gatt_db_hash_lookup_done = False
+gatt_db_hash = None
+gatt_db_hash_cache_hit = False
+gatt_db_hash_cached_handles = set() # Characteristic declaration handles whose values came from the cache
+
 # SMP state
 SMP_CID_bytes = b'\x06\x00'
 smp_pairing_request_attempt_count = 0
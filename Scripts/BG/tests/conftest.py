@@ -213,3 +213,40 @@ def ll_ctrl_body():
 @pytest.fixture
 def l2cap_body():
     return build_l2cap_body
+
+
+def legacy_next_handle_to_att_read(received_handles, last_read_handle):
+    """The original BG_Helper_ATT.get_next_handle_to_att_read() walk — try
+    last_read_handle + 1, recursively skip contiguous 0x2800/0x2801 service
+    declarations, else re-sort every key and scan upwards — minus its
+    `all_handles_read` side effect. Kept as the reference that the
+    sorted_handles_dict bisect must agree with."""
+
+    def skip_service_handles(test_handle):
+        UUID_bytes = received_handles[test_handle]
+        if len(UUID_bytes) == 2:
+            UUID16 = int.from_bytes(UUID_bytes, byteorder="little")
+            if UUID16 == 0x2800 or UUID16 == 0x2801:
+                if test_handle + 1 in received_handles:
+                    return skip_service_handles(test_handle + 1)
+                return -1
+            return test_handle
+        elif len(UUID_bytes) == 16:
+            return test_handle
+        return -1
+
+    if last_read_handle + 1 in received_handles:
+        returned_handle = skip_service_handles(last_read_handle + 1)
+        if returned_handle != -1:
+            return returned_handle
+    for h in sorted(received_handles):
+        if h > last_read_handle:
+            returned_handle = skip_service_handles(h)
+            if returned_handle != -1:
+                return returned_handle
+    return -1
+
+
+@pytest.fixture
+def legacy_next_handle():
+    return legacy_next_handle_to_att_read
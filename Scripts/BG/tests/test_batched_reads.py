@@ -0,0 +1,290 @@
+########################################
+# Created by Xeno Kovah
+# Copyright(c) © Dark Mentor LLC 2023-2026
+########################################
+
+"""Tests for reading all the GATT values with batched ATT requests
+(`--batched-reads`): ATT_READ_BY_TYPE_REQ over the handle range of each
+repeated attribute type, ATT_READ_MULTIPLE_VARIABLE_REQ (or
+ATT_READ_MULTIPLE_REQ for known-length values) for the rest, per-handle
+ATT_READ_REQ fallback on ATT errors, and ATT_READ_BLOB_REQ for values that
+don't fit.
+
+The reads are answered by a simulated ATT server. Its databases are either
+small hand-built ones, or the ones BG enumerated when replaying the capture
+fixtures. That second kind lets the tests compare the number of request /
+response round trips the reads take each way."""
+
+from struct import pack, unpack
+
+import pytest
+
+from BG_Helper_ATT import (
+    errorcode_02_ATT_Read_Not_Permitted,
+    errorcode_05_ATT_Insufficient_Authentication,
+    errorcode_06_ATT_Request_Not_Supported,
+    errorcode_0A_ATT_Attribute_Not_Found,
+    opcode_ATT_ERROR_RSP,
+    opcode_ATT_READ_BLOB_REQ,
+    opcode_ATT_READ_BLOB_RSP,
+    opcode_ATT_READ_BY_TYPE_REQ,
+    opcode_ATT_READ_BY_TYPE_RSP,
+    opcode_ATT_READ_MULTIPLE_REQ,
+    opcode_ATT_READ_MULTIPLE_RSP,
+    opcode_ATT_READ_MULTIPLE_VARIABLE_REQ,
+    opcode_ATT_READ_MULTIPLE_VARIABLE_RSP,
+    opcode_ATT_READ_REQ,
+    opcode_ATT_READ_RSP,
+)
+from BG_Helper_GATT import (
+    incoming_read_all_handles,
+    outgoing_read_all_handles,
+    plan_batched_reads,
+)
+
+errorcode_07_ATT_Invalid_Offset = 0x07
+
+
+class _SimulatedATTServer:
+    """Answers BG's outbound ATT read requests from a database of
+    handle -> UUID (little-endian bytes), handle -> value, and
+    handle -> ATT error code, following the spec's truncation rules for
+    the given ATT_MTU."""
+
+    def __init__(self, handles, values, errors, mtu, read_multiple_variable=True, read_multiple=True):
+        self.handles = handles
+        self.values = values
+        self.errors = errors
+        self.mtu = mtu
+        self.read_multiple_variable = read_multiple_variable
+        self.read_multiple = read_multiple
+        self.requests = []
+
+    @staticmethod
+    def _pdu(opcode, payload):
+        l2cap_payload = bytes([opcode]) + payload
+        body = pack("<HH", len(l2cap_payload), 0x0004) + l2cap_payload
+        return bytes([0x02, len(body)]) + body
+
+    def _error(self, req_opcode, handle, error_code):
+        return self._pdu(opcode_ATT_ERROR_RSP, pack("<BHB", req_opcode, handle, error_code))
+
+    def respond(self, body):
+        opcode = body[4]
+        params = body[5:]
+        self.requests.append(opcode)
+        if opcode == opcode_ATT_READ_REQ:
+            (handle,) = unpack("<H", params)
+            if handle in self.errors:
+                return self._error(opcode, handle, self.errors[handle])
+            return self._pdu(opcode_ATT_READ_RSP, self.values.get(handle, b"")[:self.mtu - 1])
+        if opcode == opcode_ATT_READ_BLOB_REQ:
+            (handle, offset) = unpack("<HH", params)
+            value = self.values.get(handle, b"")
+            if offset > len(value):
+                return self._error(opcode, handle, errorcode_07_ATT_Invalid_Offset)
+            return self._pdu(opcode_ATT_READ_BLOB_RSP, value[offset:offset + self.mtu - 1])
+        if opcode == opcode_ATT_READ_BY_TYPE_REQ:
+            (begin, end, UUID16) = unpack("<HHH", params)
+            entries = []
+            entry_len = None
+            for handle in sorted(self.handles):
+                if handle < begin or handle > end or self.handles[handle] != pack("<H", UUID16):
+                    continue
+                if handle in self.errors:
+                    if not entries:
+                        return self._error(opcode, handle, self.errors[handle])
+                    break
+                value = self.values.get(handle, b"")[:min(self.mtu - 4, 253)]
+                if entry_len is None:
+                    entry_len = 2 + len(value)
+                elif 2 + len(value) != entry_len or 2 + (len(entries) + 1) * entry_len > self.mtu:
+                    break
+                entries.append(pack("<H", handle) + value)
+            if not entries:
+                return self._error(opcode, begin, errorcode_0A_ATT_Attribute_Not_Found)
+            return self._pdu(opcode_ATT_READ_BY_TYPE_RSP, bytes([entry_len]) + b"".join(entries))
+        if opcode in (opcode_ATT_READ_MULTIPLE_REQ, opcode_ATT_READ_MULTIPLE_VARIABLE_REQ):
+            handles = [handle for (handle,) in (unpack("<H", params[i:i + 2]) for i in range(0, len(params), 2))]
+            variable = opcode == opcode_ATT_READ_MULTIPLE_VARIABLE_REQ
+            if not (self.read_multiple_variable if variable else self.read_multiple):
+                return self._error(opcode, handles[0], errorcode_06_ATT_Request_Not_Supported)
+            data = b""
+            for handle in handles:
+                if handle in self.errors:
+                    return self._error(opcode, handle, self.errors[handle])
+                value = self.values.get(handle, b"")
+                data += (pack("<H", len(value)) + value) if variable else value
+            rsp_opcode = opcode_ATT_READ_MULTIPLE_VARIABLE_RSP if variable else opcode_ATT_READ_MULTIPLE_RSP
+            return self._pdu(rsp_opcode, data[:self.mtu - 1])
+        raise AssertionError(f"Unexpected ATT request opcode 0x{opcode:02x}")
+
+
+def _set_up_discovered_database(g, handles, service_values, mtu, batched):
+    """Put globals into the state BG is in once discovery has finished."""
+    g.received_handles = g.sorted_handles_dict(handles)
+    g.all_handles_received_values.update(service_values)
+    g.final_handle = max(handles)
+    g.att_mtu = mtu
+    g.att_MTU_negotiated = True
+    g.primary_services_all_recv = True
+    g.secondary_services_all_recv = True
+    g.all_info_handles_recv = True
+    g.characteristic_read_by_type_req_all_received = True
+    g.batched_reads_enabled = batched
+
+
+def _drive_reads(mock_hw, make_dpkt, server):
+    """Feed each outbound request to the server and its response back to BG
+    until BG stops sending. Returns the number of round trips."""
+    sent = 0
+    outgoing_read_all_handles(2, None)
+    while sent < len(mock_hw.transmitted) and sent < 5000:
+        rsp = server.respond(mock_hw.transmitted[sent][1])
+        sent += 1
+        try:
+            incoming_read_all_handles(len(rsp), make_dpkt(body=rsp))
+        except SystemExit:
+            # The ATT_READ_REQ path can end with print_and_exit()
+            break
+    return len(server.requests)
+
+
+def _read_values(g, handles):
+    return {handle: g.all_handles_received_values[handle] for handle in handles if handle in g.all_handles_received_values}
+
+
+# A small database: GAP (1-5), a vendor service with two characteristics,
+# each with a CCCD, and a long UUID128 value (6-13)
+VENDOR_UUID = bytes(range(16))
+HANDLES = {
+    1: b"\x00\x28", 2: b"\x03\x28", 3: b"\x00\x2a", 4: b"\x03\x28", 5: b"\x01\x2a",
+    6: b"\x00\x28", 7: b"\x03\x28", 8: b"\x37\x2a", 9: b"\x02\x29",
+    10: b"\x03\x28", 11: VENDOR_UUID, 12: b"\x02\x29", 13: b"\x04\x29",
+}
+VALUES = {
+    2: b"\x02\x03\x00\x00\x2a", 3: b"Blue2thprinting test device",
+    4: b"\x02\x05\x00\x01\x2a", 5: b"\x00\x00",
+    7: b"\x12\x08\x00\x37\x2a", 8: b"\x01\x02\x03", 9: b"\x00\x00",
+    10: b"\x1a\x0b\x00" + VENDOR_UUID, 11: bytes(range(100)), 12: b"\x01\x00",
+    13: b"\x04\x00\xad\x27\x01\x00\x00",
+}
+SERVICE_VALUES = {1: b"\x00\x18", 6: b"\xf0\xff"}
+READABLE = [h for h in HANDLES if HANDLES[h] not in (b"\x00\x28", b"\x01\x28")]
+
+
+@pytest.fixture
+def batched(clean_globals, mock_hw):
+    _set_up_discovered_database(clean_globals, HANDLES, SERVICE_VALUES, 23, batched=True)
+    return clean_globals
+
+
+class TestPlan:
+    def test_repeated_UUID16s_read_by_type_and_rest_read_multiple(self, batched):
+        reads = plan_batched_reads()
+        assert ("by_type", 2, 10, 0x2803, 2) in reads
+        assert ("by_type", 9, 12, 0x2902, 9) in reads
+        multiple = [read for read in reads if read[0] == "multiple_variable"]
+        assert sorted(h for read in multiple for h in read[1]) == [3, 5, 8, 11, 13]
+
+    def test_cached_declarations_not_read(self, batched):
+        batched.gatt_db_hash_cached_handles.update({2, 4, 7, 10})
+        reads = plan_batched_reads()
+        assert not any(read[0] == "by_type" and read[3] == 0x2803 for read in reads)
+
+
+class TestBatchedReads:
+    def test_reads_every_value_in_full(self, batched, mock_hw, make_dpkt):
+        server = _SimulatedATTServer(HANDLES, VALUES, {}, 23)
+        _drive_reads(mock_hw, make_dpkt, server)
+        assert batched.all_handles_read is True
+        assert _read_values(batched, READABLE) == {h: VALUES[h] for h in READABLE}
+        # The device name and the 100 byte value don't fit in ATT_MTU-1 bytes. (The UUID128
+        # characteristic declaration exactly fills the ATT_READ_BY_TYPE_RSP entry, so it's
+        # checked with a blob too.)
+        blob_handles = [unpack("<H", body[5:7])[0] for (_, body) in mock_hw.transmitted if body[4] == opcode_ATT_READ_BLOB_REQ]
+        assert set(blob_handles) == {3, 10, 11}
+
+    def test_fewer_round_trips_than_one_read_per_handle(self, clean_globals, mock_hw, make_dpkt):
+        # The ATT_READ_REQ walk doesn't read past the first ATT_MTU-1 bytes, so only short values
+        values = {h: v[:16] for (h, v) in VALUES.items()}
+        _set_up_discovered_database(clean_globals, HANDLES, SERVICE_VALUES, 23, batched=False)
+        single = _drive_reads(mock_hw, make_dpkt, _SimulatedATTServer(HANDLES, values, {}, 23))
+        mock_hw.transmitted.clear()
+        clean_globals.all_handles_received_values.clear()
+        clean_globals.all_handles_read = False
+        _set_up_discovered_database(clean_globals, HANDLES, SERVICE_VALUES, 23, batched=True)
+        batched_count = _drive_reads(mock_hw, make_dpkt, _SimulatedATTServer(HANDLES, values, {}, 23))
+        assert batched_count < single
+
+    def test_falls_back_to_read_multiple_then_single_reads(self, batched, mock_hw, make_dpkt):
+        server = _SimulatedATTServer(HANDLES, VALUES, {}, 23, read_multiple_variable=False)
+        _drive_reads(mock_hw, make_dpkt, server)
+        assert batched.read_multiple_variable_supported is False
+        assert _read_values(batched, READABLE) == {h: VALUES[h] for h in READABLE}
+        assert opcode_ATT_READ_REQ in server.requests
+
+    def test_no_read_multiple_at_all(self, batched, mock_hw, make_dpkt):
+        server = _SimulatedATTServer(HANDLES, VALUES, {}, 23, read_multiple_variable=False, read_multiple=False)
+        _drive_reads(mock_hw, make_dpkt, server)
+        assert _read_values(batched, READABLE) == {h: VALUES[h] for h in READABLE}
+
+    def test_errors_fall_back_per_handle(self, batched, mock_hw, make_dpkt):
+        errors = {8: errorcode_05_ATT_Insufficient_Authentication, 9: errorcode_02_ATT_Read_Not_Permitted}
+        server = _SimulatedATTServer(HANDLES, VALUES, errors, 23)
+        _drive_reads(mock_hw, make_dpkt, server)
+        assert batched.handles_with_error_rsp == errors
+        assert batched.all_handles_received_values[8].startswith("error_code 0x05")
+        # ... without losing anything around them
+        expected = {h: VALUES[h] for h in READABLE if h not in errors}
+        assert {h: v for (h, v) in _read_values(batched, READABLE).items() if h not in errors} == expected
+
+    def test_long_values_read_by_type_finished_with_blobs(self, clean_globals, mock_hw, make_dpkt):
+        handles = {1: b"\x00\x28", 2: b"\x01\x29", 3: b"\x01\x29"}
+        values = {2: b"A" * 40, 3: b"B" * 40}
+        _set_up_discovered_database(clean_globals, handles, {1: b"\x00\x18"}, 23, batched=True)
+        _drive_reads(mock_hw, make_dpkt, _SimulatedATTServer(handles, values, {}, 23))
+        assert _read_values(clean_globals, [2, 3]) == values
+
+
+@pytest.mark.parametrize("pcap_fixture", ["cafe_pcap_path", "public_pcap_path"])
+def test_replayed_databases_read_identically_in_fewer_round_trips(pcap_fixture, request, mock_hw, clean_globals, make_dpkt):
+    """Serve the database BG enumerated from each capture fixture, and read
+    it both ways. The batched reads must get the same values and errors
+    in fewer round trips. (The ATT_READ_REQ walk never reads the first
+    readable handle, so it's left out of the comparison.)"""
+    import importlib
+    from test_pcap_replay import _replay_pcap
+
+    _replay_pcap(request.getfixturevalue(pcap_fixture), mock_hw, clean_globals)
+    handles = dict(clean_globals.received_handles)
+    service_handles = [h for h in handles if handles[h] in (b"\x00\x28", b"\x01\x28")]
+    service_values = {h: clean_globals.all_handles_received_values[h] for h in service_handles if h in clean_globals.all_handles_received_values}
+    values = {h: v for (h, v) in clean_globals.all_handles_received_values.items() if isinstance(v, bytes) and h not in service_handles}
+    errors = {h: e for (h, e) in clean_globals.handles_with_error_rsp.items() if h in handles}
+    # The handles BG never got to read still need values for the server to give
+    for h in handles:
+        if(h not in service_handles and h not in values and h not in errors):
+            if(handles[h] == b"\x03\x28" and h + 1 in handles):
+                values[h] = b"\x02" + pack("<H", h + 1) + handles[h + 1]
+            else:
+                values[h] = b"\x00"
+    mtu = clean_globals.att_mtu
+
+    results = {}
+    for strategy in (False, True):
+        importlib.reload(clean_globals)
+        clean_globals.hw = mock_hw
+        mock_hw.transmitted.clear()
+        _set_up_discovered_database(clean_globals, handles, service_values, mtu, batched=strategy)
+        server = _SimulatedATTServer(handles, values, errors, mtu)
+        round_trips = _drive_reads(mock_hw, make_dpkt, server)
+        results[strategy] = (round_trips, dict(clean_globals.all_handles_received_values), dict(clean_globals.handles_with_error_rsp))
+
+    (single_round_trips, single_values, single_errors) = results[False]
+    (batched_round_trips, batched_values, batched_errors) = results[True]
+    assert batched_round_trips < single_round_trips
+    first_readable = clean_globals.received_handles.next_readable_handle(1)
+    assert {h: v for (h, v) in batched_values.items() if h in single_values} == single_values
+    assert set(batched_values) - set(single_values) <= {first_readable}
+    assert {h: e for (h, e) in batched_errors.items() if h != first_readable} == single_errors
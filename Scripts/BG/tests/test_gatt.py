@@ -24,7 +24,6 @@ from BG_Helper_ATT import (
     errorcode_0A_ATT_Attribute_Not_Found,
     errorcode_10_ATT_Unsupported_Group_Type,
     get_next_handle_to_att_read,
-    helper_skip_service_handles,
     incoming_ATT_EXCHANGE_MTUs,
     is_packet_ATT_type,
     manage_peripheral_info_requests,
@@ -484,44 +483,74 @@ class TestGetNextHandleToAttRead:
         # Characteristic decl (0x2803). After reading handle 1, the next
         # readable handle is 2 — but get_next_handle_to_att_read should
         # skip 1's "service" UUID and return 2.
-        clean_globals.received_handles = {
+        clean_globals.received_handles = clean_globals.sorted_handles_dict({
             0x0001: bytes([0x00, 0x28]),
             0x0002: bytes([0x03, 0x28]),
             0x0003: bytes([0x05, 0x2A]),
-        }
+        })
         # After reading "handle 0" (nothing) the next candidate is 1, which
         # is the Primary Service — should skip.
         assert get_next_handle_to_att_read(0) == 0x0002
 
     def test_skips_consecutive_service_handles(self, clean_globals):
         # Two consecutive Primary Services then a Characteristic.
-        clean_globals.received_handles = {
+        clean_globals.received_handles = clean_globals.sorted_handles_dict({
             0x0001: bytes([0x00, 0x28]),
             0x0002: bytes([0x00, 0x28]),
             0x0003: bytes([0x03, 0x28]),
-        }
+        })
         assert get_next_handle_to_att_read(0) == 0x0003
 
     def test_skips_secondary_service_handle(self, clean_globals):
-        clean_globals.received_handles = {
+        clean_globals.received_handles = clean_globals.sorted_handles_dict({
             0x0010: bytes([0x01, 0x28]),  # Secondary Service
             0x0011: bytes([0x03, 0x28]),  # Characteristic
-        }
+        })
         assert get_next_handle_to_att_read(0x000F) == 0x0011
 
     def test_no_higher_handle_returns_negative_and_sets_all_read(
             self, clean_globals):
-        clean_globals.received_handles = {0x0005: bytes([0x00, 0x28])}
+        clean_globals.received_handles = clean_globals.sorted_handles_dict({0x0005: bytes([0x00, 0x28])})
         assert get_next_handle_to_att_read(0x0005) == -1
         assert clean_globals.all_handles_read is True
 
     def test_returns_uuid128_handle_unchanged(self, clean_globals):
-        clean_globals.received_handles = {
+        clean_globals.received_handles = clean_globals.sorted_handles_dict({
             0x0001: bytes([0x00, 0x28]),
             0x0002: b"\xaa" * 16,
-        }
+        })
         assert get_next_handle_to_att_read(0x0001) == 0x0002
 
+    def test_matches_legacy_walk_on_random_databases(self, clean_globals, legacy_next_handle):
+        import random
+        rng = random.Random(0x2800)
+        uuids = [b"\x00\x28", b"\x01\x28", b"\x03\x28", b"\x00\x2a", b"\x02\x29", b"\xaa" * 16, b"\x01"]
+        for _ in range(200):
+            handles = rng.sample(range(1, 80), rng.randint(0, 40))
+            db = {h: rng.choice(uuids) for h in handles}
+            clean_globals.received_handles = clean_globals.sorted_handles_dict(db)
+            for last in range(0, 82):
+                assert get_next_handle_to_att_read(last) == legacy_next_handle(db, last), (db, last)
+
+    def test_index_follows_uuid_overwrites(self, clean_globals, legacy_next_handle):
+        # Characteristic discovery (process_ATT_READ_BY_TYPE_RSP) overwrites
+        # entries learned from ATT_FIND_INFORMATION_RSP, and a bogus server
+        # could turn a readable handle into a service declaration.
+        handles = clean_globals.sorted_handles_dict({
+            0x0001: bytes([0x00, 0x28]),
+            0x0002: bytes([0x03, 0x28]),
+            0x0003: bytes([0x05, 0x2A]),
+        })
+        clean_globals.received_handles = handles
+        handles[0x0003] = bytes([0x01, 0x28])
+        handles[0x0005] = b"\xaa" * 16
+        handles[0x0002] = bytes([0x03, 0x28])
+        assert handles.readable_handles == [0x0002, 0x0005]
+        for last in range(0, 6):
+            assert get_next_handle_to_att_read(last) == legacy_next_handle(dict(handles), last)
+        del handles[0x0005]
+        assert get_next_handle_to_att_read(0x0002) == -1
+
 
 # ---------------------------------------------------------------------------
 # manage_peripheral_info_requests — reject Peripheral-side enumeration
@@ -0,0 +1,275 @@
+########################################
+# Created by Xeno Kovah
+# Copyright(c) © Dark Mentor LLC 2023-2026
+########################################
+
+"""Tests for the GATT Database Hash (0x2B2A) cache (`--gatt-hash-cache`):
+
+ * the ATT_READ_BY_TYPE_REQ for the hash is only sent when a cache is
+   configured, and holds service discovery back until it's answered
+ * a miss (unknown hash, or an ATT_ERROR_RSP) falls through to the normal
+   enumeration
+ * a hit takes the structure from the cache, skips every discovery phase,
+   and then reads only the values (or nothing, by policy)
+ * saving holds the cache's sidecar lock, so it keeps what another writer
+   added in the meantime
+ * an entry saved from a replay of the CA:FE capture produces the same
+   GATTPRINT structure rows when applied to a fresh connection"""
+
+import json
+import threading
+from struct import pack
+
+import pytest
+
+from BG_Helper_ATT import (
+    errorcode_0A_ATT_Attribute_Not_Found,
+    opcode_ATT_ERROR_RSP,
+    opcode_ATT_READ_BY_GROUP_TYPE_REQ,
+    opcode_ATT_READ_BY_TYPE_REQ,
+    opcode_ATT_READ_BY_TYPE_RSP,
+    opcode_ATT_READ_REQ,
+    send_next_ATT_READ_REQ_if_applicable,
+)
+from BG_Helper_GATT import (
+    incoming_GATT_DB_hash_lookup,
+    outgoing_GATT_DB_hash_lookup,
+    outgoing_read_all_handles,
+    outgoing_service_discovery,
+)
+from BG_Helper_Output import (
+    GATT_DB_hash_cache_locked,
+    build_GATT_DB_hash_cache_entry,
+    get_output_session,
+    load_GATT_DB_hash_cache,
+    print_all_info,
+    save_GATT_DB_hash_cache_entry,
+)
+
+DB_HASH = bytes(range(0xA0, 0xB0))
+
+# A small database: GAP service (handles 1-5) and a vendor service with a
+# UUID128 characteristic and its CCCD (handles 6-9)
+VENDOR_UUID = "0000fff0aaaa4bbb8ccc0123456789ab"
+CACHE_ENTRY = {
+    "bdaddr": "ca:fe:13:37:00:01",
+    "handles": [[1, "2800"], [2, "2803"], [3, "2a00"], [4, "2803"], [5, "2b2a"],
+                [6, "2800"], [7, "2803"], [8, VENDOR_UUID], [9, "2902"]],
+    "services": [[1, "1800"], [6, "fff0"]],
+    "characteristics": [[2, 0x02, 3, "2a00"], [4, 0x02, 5, "2b2a"], [7, 0x12, 8, VENDOR_UUID]],
+}
+
+
+def _att_pdu(opcode, payload):
+    l2cap_payload = bytes([opcode]) + payload
+    body = pack("<HH", len(l2cap_payload), 0x0004) + l2cap_payload
+    return bytes([0x02, len(body)]) + body
+
+
+def _hash_rsp(handle=5, db_hash=DB_HASH):
+    return _att_pdu(opcode_ATT_READ_BY_TYPE_RSP, bytes([18]) + pack("<H", handle) + db_hash)
+
+
+def _error_rsp(req_opcode, handle, error_code):
+    return _att_pdu(opcode_ATT_ERROR_RSP, pack("<BHB", req_opcode, handle, error_code))
+
+
+def _sent_opcodes(mock_hw):
+    return [body[4] for (_, body) in mock_hw.transmitted]
+
+
+@pytest.fixture
+def cache_enabled(clean_globals, mock_hw, tmp_path):
+    clean_globals.gatt_db_hash_cache_path = str(tmp_path / "GATT_DB_hash_cache.json")
+    clean_globals.gatt_db_hash_cache = {DB_HASH.hex(): CACHE_ENTRY}
+    clean_globals.att_MTU_negotiated = True
+    return clean_globals
+
+
+class TestGATTDBHashRequest:
+    def test_nothing_sent_without_a_cache(self, clean_globals, mock_hw):
+        clean_globals.att_MTU_negotiated = True
+        outgoing_GATT_DB_hash_lookup(2, None)
+        outgoing_service_discovery(2, None)
+        assert _sent_opcodes(mock_hw) == [opcode_ATT_READ_BY_GROUP_TYPE_REQ]
+
+    def test_waits_for_MTU_negotiation(self, cache_enabled, mock_hw):
+        cache_enabled.att_MTU_negotiated = False
+        outgoing_GATT_DB_hash_lookup(2, None)
+        assert mock_hw.transmitted == []
+
+    def test_reads_hash_by_type_before_service_discovery(self, cache_enabled, mock_hw):
+        outgoing_GATT_DB_hash_lookup(2, None)
+        outgoing_service_discovery(2, None)
+        assert len(mock_hw.transmitted) == 1
+        body = mock_hw.transmitted[0][1]
+        assert body[4] == opcode_ATT_READ_BY_TYPE_REQ
+        assert body[5:11] == b"\x01\x00\xff\xff\x2a\x2b"
+
+    def test_gives_up_after_retries(self, cache_enabled, mock_hw):
+        outgoing_GATT_DB_hash_lookup(2, None)
+        for _ in range(cache_enabled.gatt_db_hash_req_max_retries):
+            cache_enabled.gatt_db_hash_req_sent_time = 1
+            outgoing_GATT_DB_hash_lookup(2, None)
+        assert cache_enabled.gatt_db_hash_lookup_done is True
+        assert cache_enabled.gatt_db_hash_cache_hit is False
+
+
+class TestGATTDBHashMiss:
+    def test_unknown_hash_continues_to_service_discovery(self, cache_enabled, mock_hw, make_dpkt):
+        cache_enabled.gatt_db_hash_cache = {}
+        outgoing_GATT_DB_hash_lookup(2, None)
+        body = _hash_rsp()
+        assert incoming_GATT_DB_hash_lookup(len(body), make_dpkt(body=body)) is True
+        assert cache_enabled.gatt_db_hash == DB_HASH
+        assert cache_enabled.gatt_db_hash_cache_hit is False
+        assert cache_enabled.primary_services_all_recv is False
+        outgoing_service_discovery(2, None)
+        assert _sent_opcodes(mock_hw)[-1] == opcode_ATT_READ_BY_GROUP_TYPE_REQ
+
+    def test_attribute_not_found_continues_to_service_discovery(self, cache_enabled, mock_hw, make_dpkt):
+        outgoing_GATT_DB_hash_lookup(2, None)
+        body = _error_rsp(opcode_ATT_READ_BY_TYPE_REQ, 0x0001, errorcode_0A_ATT_Attribute_Not_Found)
+        assert incoming_GATT_DB_hash_lookup(len(body), make_dpkt(body=body)) is True
+        assert cache_enabled.gatt_db_hash is None
+        assert cache_enabled.gatt_db_hash_lookup_done is True
+        outgoing_service_discovery(2, None)
+        assert _sent_opcodes(mock_hw)[-1] == opcode_ATT_READ_BY_GROUP_TYPE_REQ
+
+    def test_ignores_responses_when_not_asked(self, clean_globals, make_dpkt):
+        body = _hash_rsp()
+        assert incoming_GATT_DB_hash_lookup(len(body), make_dpkt(body=body)) is False
+        assert clean_globals.gatt_db_hash is None
+
+
+class TestGATTDBHashHit:
+    def _hit(self, cache_enabled, make_dpkt):
+        outgoing_GATT_DB_hash_lookup(2, None)
+        body = _hash_rsp()
+        incoming_GATT_DB_hash_lookup(len(body), make_dpkt(body=body))
+
+    def test_structure_taken_from_cache(self, cache_enabled, mock_hw, make_dpkt):
+        self._hit(cache_enabled, make_dpkt)
+        g = cache_enabled
+        assert g.gatt_db_hash_cache_hit is True
+        assert g.primary_services_all_recv and g.secondary_services_all_recv
+        assert g.all_info_handles_recv and g.characteristic_read_by_type_req_all_received
+        assert g.received_handles[8] == bytes.fromhex(VENDOR_UUID)[::-1]
+        assert g.all_handles_received_values[6] == b"\xf0\xff"
+        assert g.all_handles_received_values[7] == b"\x12\x08\x00" + bytes.fromhex(VENDOR_UUID)[::-1]
+        assert g.final_handle == 9
+        # No service discovery after a hit
+        outgoing_service_discovery(2, None)
+        assert _sent_opcodes(mock_hw) == [opcode_ATT_READ_BY_TYPE_REQ]
+
+    def test_reads_only_values(self, cache_enabled, mock_hw, make_dpkt):
+        self._hit(cache_enabled, make_dpkt)
+        read_handles = []
+        outgoing_read_all_handles(2, None)
+        while not cache_enabled.all_handles_read and len(read_handles) < 20:
+            body = mock_hw.transmitted[-1][1]
+            assert body[4] == opcode_ATT_READ_REQ
+            read_handles.append(body[5] | (body[6] << 8))
+            before = len(mock_hw.transmitted)
+            send_next_ATT_READ_REQ_if_applicable(cache_enabled.handle_read_last_sent_handle)
+            if len(mock_hw.transmitted) == before:
+                break
+        # Service (1, 6) and characteristic declarations (2, 4, 7) are all cached
+        assert read_handles == [3, 5, 8, 9]
+
+    def test_policy_none_reads_nothing(self, cache_enabled, mock_hw, make_dpkt):
+        cache_enabled.gatt_db_hash_cache_read_values = False
+        self._hit(cache_enabled, make_dpkt)
+        assert cache_enabled.all_handles_read is True
+        outgoing_read_all_handles(2, None)
+        assert _sent_opcodes(mock_hw) == [opcode_ATT_READ_BY_TYPE_REQ]
+
+    def test_cached_structure_recorded_in_output(self, cache_enabled, make_dpkt):
+        cache_enabled.target_bdaddr = "11:22:33:44:55:66"
+        cache_enabled.gatt_db_hash_cache_read_values = False
+        self._hit(cache_enabled, make_dpkt)
+        print_all_info()
+        session = get_output_session()
+        assert [(s[1], s[2]) for s in session.services] == [(1, 5), (6, 9)]
+        assert [c[0] for c in session.characteristics] == [2, 4, 7]
+        assert len(session.handles) == 9
+        # The hash itself was read on the way
+        assert session.values == [(5, DB_HASH.hex())]
+        # ... and isn't saved back into the cache again
+        save_GATT_DB_hash_cache_entry()
+        assert load_GATT_DB_hash_cache(cache_enabled.gatt_db_hash_cache_path) == {}
+
+
+class TestGATTDBHashCacheFile:
+    def test_missing_file_is_empty_cache(self, tmp_path):
+        assert load_GATT_DB_hash_cache(str(tmp_path / "nope.json")) == {}
+
+    def test_unreadable_file_is_empty_cache(self, tmp_path):
+        path = tmp_path / "bad.json"
+        path.write_text("{not json")
+        assert load_GATT_DB_hash_cache(str(path)) == {}
+
+    def test_incomplete_enumeration_not_saved(self, cache_enabled):
+        cache_enabled.gatt_db_hash = DB_HASH
+        cache_enabled.received_handles[1] = b"\x00\x28"
+        cache_enabled.all_info_handles_recv = True
+        cache_enabled.characteristic_read_by_type_req_all_received = True
+        cache_enabled.info_req_sent_retry_count = cache_enabled.primary_service_request_max_retries
+        save_GATT_DB_hash_cache_entry()
+        assert load_GATT_DB_hash_cache(cache_enabled.gatt_db_hash_cache_path) == {}
+
+    def test_save_waits_for_another_writer(self, cache_enabled, monkeypatch):
+        import BG_Helper_Output
+        monkeypatch.setattr(BG_Helper_Output, "GATT_discovery_completed", lambda: True)
+        monkeypatch.setattr(BG_Helper_Output, "build_GATT_DB_hash_cache_entry", lambda: CACHE_ENTRY)
+        cache_enabled.gatt_db_hash = DB_HASH
+        cache_enabled.gatt_db_hash_cache = {}
+        path = cache_enabled.gatt_db_hash_cache_path
+        other_hash = bytes(16).hex()
+        with GATT_DB_hash_cache_locked(path):
+            saver = threading.Thread(target=save_GATT_DB_hash_cache_entry)
+            saver.start()
+            saver.join(0.2)
+            assert saver.is_alive()
+            # e.g. the BG on another dongle, finishing its own read-modify-write first
+            with open(path, 'w') as f:
+                json.dump({other_hash: CACHE_ENTRY}, f)
+        saver.join()
+        assert load_GATT_DB_hash_cache(path) == {other_hash: CACHE_ENTRY, DB_HASH.hex(): CACHE_ENTRY}
+
+
+def test_replayed_enumeration_round_trips_through_cache(cafe_pcap_path, mock_hw, clean_globals, tmp_path):
+    """Save the structure BG enumerated from the CA:FE capture, then apply
+    it to a fresh connection: print_all_info() must produce the same
+    service, handle, and characteristic rows."""
+    import importlib
+    from test_pcap_replay import _replay_pcap
+    from BG_Helper_GATT import apply_GATT_DB_hash_cache_entry
+
+    def structure_rows():
+        clean_globals.output_session = None
+        clean_globals.service_received_handles = {}
+        print_all_info()
+        session = get_output_session()
+        rows = (sorted(session.services), sorted(session.handles), sorted(session.characteristics))
+        clean_globals.output_session = None
+        return rows
+
+    clean_globals.target_bdaddr = "ca:fe:13:37:00:01"
+    _replay_pcap(cafe_pcap_path, mock_hw, clean_globals)
+    replayed_rows = structure_rows()
+
+    cache_path = str(tmp_path / "GATT_DB_hash_cache.json")
+    clean_globals.gatt_db_hash_cache_path = cache_path
+    clean_globals.gatt_db_hash = DB_HASH
+    save_GATT_DB_hash_cache_entry()
+    cache = load_GATT_DB_hash_cache(cache_path)
+    assert list(cache.keys()) == [DB_HASH.hex()]
+    assert cache[DB_HASH.hex()] == json.loads(json.dumps(build_GATT_DB_hash_cache_entry()))
+
+    importlib.reload(clean_globals)
+    clean_globals.hw = mock_hw
+    clean_globals.target_bdaddr = "ca:fe:13:37:00:02"
+    assert apply_GATT_DB_hash_cache_entry(cache[DB_HASH.hex()]) is True
+    clean_globals.target_bdaddr = "ca:fe:13:37:00:01"
+    assert structure_rows() == replayed_rows
@@ -7,6 +7,7 @@
 conversion, per-token row formatting, and the CSV emission path."""
 
 import csv
+import json
 from pathlib import Path
 
 import pytest
@@ -14,6 +15,8 @@ import pytest
 from BG_Helper_Output import (
     append_common,
     convert_bytes_to_UUID128_str,
+    flush_output,
+    print_all_info,
     store_characteristic_values_in_existing_format_expectations,
     store_characteristics_in_existing_format_expectations,
     store_descriptors_in_existing_format_expectations,
@@ -103,6 +106,7 @@ def temp_gattprint(tmp_path, monkeypatch, clean_globals):
         if isinstance(path, str) and path.startswith("/tmp/GATTPRINT_"):
             new_path = tmp_path / Path(path).name
             captured["path"] = str(new_path)
+            captured["opens"] = captured.get("opens", 0) + 1
             return real_open(str(new_path), *args, **kwargs)
         return real_open(path, *args, **kwargs)
 
@@ -117,6 +121,7 @@ class TestStoreFormatters:
         store_services_in_existing_format_expectations(
             0x0001, 0x0008, "00001800-0000-1000-8000-00805f9b34fb"
         )
+        flush_output()
 
         rows = list(csv.reader(open(temp_gattprint["path"])))
         assert rows == [[
@@ -130,6 +135,7 @@ class TestStoreFormatters:
         store_descriptors_in_existing_format_expectations(
             0x0003, "00002a05-0000-1000-8000-00805f9b34fb"
         )
+        flush_output()
 
         rows = list(csv.reader(open(temp_gattprint["path"])))
         assert rows == [[
@@ -143,6 +149,7 @@ class TestStoreFormatters:
         # Real value from the CA:FE pcap for handle 0x000B (Device Name) =
         # "UVP01" → ASCII 55 56 50 30 31.
         store_characteristic_values_in_existing_format_expectations(0x000B, "5556503031")
+        flush_output()
 
         rows = list(csv.reader(open(temp_gattprint["path"])))
         assert rows == [[
@@ -157,6 +164,7 @@ class TestStoreFormatters:
         store_characteristics_in_existing_format_expectations(
             0x0007, 0x0a, 0x0008, "00002b2a-0000-1000-8000-00805f9b34fb"
         )
+        flush_output()
 
         rows = list(csv.reader(open(temp_gattprint["path"])))
         assert rows == [[
@@ -173,8 +181,101 @@ class TestStoreFormatters:
         store_descriptors_in_existing_format_expectations(
             0x0002, "00002803-0000-1000-8000-00805f9b34fb"
         )
+        flush_output()
 
         rows = list(csv.reader(open(temp_gattprint["path"])))
         assert len(rows) == 2
         assert rows[0][3] == "0x0001"
         assert rows[1][3] == "0x0002"
+
+
+# ---------------------------------------------------------------------------
+# output_session buffering + BTIDES output
+# ---------------------------------------------------------------------------
+def _load_small_gatt_db(g):
+    """A Generic Access service (0x0001-0x0003) with a readable Device Name
+    characteristic, plus a secondary service at 0x0004 with a CCCD."""
+    g.target_bdaddr = "ca:fe:13:37:00:01"
+    g.target_bdaddr_type_public = False
+    g.received_handles = g.sorted_handles_dict({
+        0x0001: b"\x00\x28",  # Primary Service
+        0x0002: b"\x03\x28",  # Characteristic
+        0x0003: b"\x00\x2a",  # Device Name
+        0x0004: b"\x01\x28",  # Secondary Service
+        0x0005: b"\x02\x29",  # CCCD
+    })
+    g.all_handles_received_values = {
+        0x0001: b"\x00\x18",
+        0x0002: b"\x02\x03\x00\x00\x2a",
+        0x0003: b"UVP01",
+        0x0004: b"\x0f\x18",
+        0x0005: b"\x00\x00",
+    }
+
+
+class TestOutputSession:
+    def test_rows_are_buffered_until_flush(self, temp_gattprint, clean_globals):
+        clean_globals.target_bdaddr = "ca:fe:13:37:00:01"
+        store_descriptors_in_existing_format_expectations(
+            0x0001, "00002800-0000-1000-8000-00805f9b34fb"
+        )
+        store_characteristic_values_in_existing_format_expectations(0x000B, "5556503031")
+        assert "path" not in temp_gattprint
+
+        flush_output()
+        assert temp_gattprint["opens"] == 1
+        assert len(list(csv.reader(open(temp_gattprint["path"])))) == 2
+
+    def test_second_flush_writes_nothing_more(self, temp_gattprint, clean_globals):
+        clean_globals.target_bdaddr = "ca:fe:13:37:00:01"
+        store_characteristic_values_in_existing_format_expectations(0x000B, "5556503031")
+        flush_output()
+        flush_output()
+        assert temp_gattprint["opens"] == 1
+        assert len(list(csv.reader(open(temp_gattprint["path"])))) == 1
+
+    def test_print_all_info_rows_flushed_in_one_write(self, temp_gattprint, clean_globals):
+        _load_small_gatt_db(clean_globals)
+        print_all_info()
+        flush_output()
+
+        rows = list(csv.reader(open(temp_gattprint["path"])))
+        assert temp_gattprint["opens"] == 1
+        assert [r[0] for r in rows].count("GATTPRINT:HANDLE_UUID") == 5
+        assert ["GATTPRINT:CHAR_DESC", "random", "ca:fe:13:37:00:01", "0x0002", "0x02", "0x0003",
+                "00002a00-0000-1000-8000-00805f9b34fb"] in rows
+        assert [r[3:5] for r in rows if r[0] == "GATTPRINT:SERVICE"] == [["0x0001", "0x0003"], ["0x0004", "0x0005"]]
+
+    def test_btides_output(self, temp_gattprint, clean_globals, tmp_path):
+        _load_small_gatt_db(clean_globals)
+        clean_globals.btides_output_path = str(tmp_path / "out.btides")
+        print_all_info()
+        flush_output()
+
+        with open(tmp_path / "out.btides") as f:
+            btides = json.load(f)
+        assert len(btides) == 1
+        entry = btides[0]
+        assert entry["bdaddr"] == "ca:fe:13:37:00:01"
+        assert entry["bdaddr_rand"] == 1
+        assert [(s["utype"], s["begin_handle"], s["end_handle"], s["UUID"]) for s in entry["GATTArray"]] == [
+            ("2800", 1, 3, "1800"), ("2801", 4, 5, "180f")]
+        assert entry["GATTArray"][0]["characteristics"] == [{
+            "handle": 2, "properties": 0x02, "value_handle": 3, "value_uuid": "2a00",
+            "char_value": {"handle": 3, "value_uuid": "2a00",
+                           "io_array": [{"io_type": 0x0B, "value_hex_str": "5556503031"}]},
+        }]
+        # The CCCD's value has no characteristic to go in, so it gets a placeholder one
+        placeholder = entry["GATTArray"][1]["characteristics"][0]
+        assert placeholder["placeholder_entry"] is True
+        assert placeholder["char_value"]["io_array"][0]["value_hex_str"] == "0000"
+        assert entry["ATTArray"] == [{"ATT_handle_enumeration": [
+            {"handle": 1, "UUID": "2800"}, {"handle": 2, "UUID": "2803"}, {"handle": 3, "UUID": "2a00"},
+            {"handle": 4, "UUID": "2801"}, {"handle": 5, "UUID": "2902"}]}]
+
+    def test_no_btides_output_by_default(self, temp_gattprint, clean_globals, tmp_path, monkeypatch):
+        _load_small_gatt_db(clean_globals)
+        monkeypatch.chdir(tmp_path)
+        print_all_info()
+        flush_output()
+        assert list(tmp_path.glob("*.btides")) == []
@@ -184,6 +184,31 @@ def _record_outbound_att_read_handle(body, clean_globals):
         clean_globals.handle_read_req_sent_time = 1
 
 
+@pytest.mark.parametrize("pcap_fixture", ["cafe_pcap_path", "public_pcap_path"])
+def test_next_handle_to_read_matches_legacy_walk(pcap_fixture, request, mock_hw, clean_globals,
+                                                  monkeypatch, legacy_next_handle):
+    """Every handle that get_next_handle_to_att_read() hands out during a
+    replay must be the one the original sort-and-recurse walk would have
+    picked, given received_handles as it stood at that moment."""
+    import BG_Helper_ATT
+    import BG_Helper_GATT
+    real_get_next = BG_Helper_ATT.get_next_handle_to_att_read
+    calls = []
+
+    def checked_get_next(last_read_handle):
+        expected = legacy_next_handle(dict(g.received_handles), last_read_handle)
+        got = real_get_next(last_read_handle)
+        calls.append((last_read_handle, got, expected))
+        return got
+
+    monkeypatch.setattr(BG_Helper_ATT, "get_next_handle_to_att_read", checked_get_next)
+    monkeypatch.setattr(BG_Helper_GATT, "get_next_handle_to_att_read", checked_get_next)
+    _replay_pcap(request.getfixturevalue(pcap_fixture), mock_hw, clean_globals)
+
+    assert len(calls) > 0
+    assert [got for (_, got, _) in calls] == [expected for (_, _, expected) in calls]
+
+
 class TestCAFEReplay:
     """All assertions below mirror the on-the-wire state captured in
     Scripts/BG/tests/fixtures/cafe_capture.pcap."""
@@ -0,0 +1,171 @@
+########################################
+# Created by Xeno Kovah
+# Copyright(c) © Dark Mentor LLC 2023-2026
+########################################
+
+"""Tests for per-connection sessions (BG_Helper_Session.py).
+
+The strongest check replays both capture fixtures at once, one frame from
+each in turn, through two sessions with their own MockHW. That's how one
+process driving two dongles would interleave them. Each session must end
+up exactly where a replay of its capture alone in globals.py does, and
+globals.py itself must be left untouched."""
+
+import pytest
+
+import globals as g
+from BG_Helper_Session import BG_session, activated_session
+from conftest import MockHW
+from test_pcap_replay import (
+    _iter_pcap_frames,
+    _record_outbound_att_read_handle,
+    _record_outbound_state,
+    _replay_pcap,
+    _ReplayPkt,
+)
+
+
+def _replay_frames(pcap_path, session):
+    """_replay_pcap(), one frame per step, handing each frame to `session`'s
+    handlers. The outbound bookkeeping is written to globals.py while the
+    session is swapped in, like BG's own send_*() helpers would."""
+    from BG_Helper_GATT import stateful_GATT_getter
+    from BG_Helper_L2CAP import stateful_incoming_L2CAP_handler
+    from BG_Helper_LL import stateful_LL_CTRL_incoming_handler
+    from BG_Helper_SMP import handle_SMP_Pairing
+
+    for body, chan, peripheral_send in _iter_pcap_frames(pcap_path):
+        if chan >= 37:
+            continue
+        if not peripheral_send:
+            with activated_session(session):
+                if len(body) >= 3 and (body[0] & 0x3) == 0x3:
+                    _record_outbound_state(body[2], g)
+                _record_outbound_att_read_handle(body, g)
+            yield
+            continue
+
+        actual_body_len = len(body)
+        pkt = _ReplayPkt(body)
+        if actual_body_len >= 3 and (body[0] & 0x3) == 0x3:
+            stateful_LL_CTRL_incoming_handler(actual_body_len, body[2], pkt, session=session)
+        elif actual_body_len >= 2:
+            for handler in (stateful_incoming_L2CAP_handler, stateful_GATT_getter):
+                handler(actual_body_len, pkt, session=session)
+                if session.finished:
+                    return
+            handle_SMP_Pairing(actual_body_len, pkt, max_key_size=0x10, session=session)
+        if session.finished:
+            return
+        yield
+
+
+def _connection_state(state):
+    return {
+        "received_handles": dict(state.received_handles),
+        "values": dict(state.all_handles_received_values),
+        "errors": dict(state.handles_with_error_rsp),
+        "att_mtu": state.att_mtu,
+        "all_handles_read": state.all_handles_read,
+        "smp": (state.smp_legacy_pairing_rsp_recv, state.smp_SC_pairing_rsp_recv),
+        "ll": vars(state.current_ll_ctrl_state).copy(),
+        "transmitted": list(state.hw.transmitted),
+    }
+
+
+@pytest.fixture
+def reference_states(request, mock_hw, clean_globals):
+    """What replaying each capture alone, straight into globals.py, ends up as."""
+    import importlib
+    states = {}
+    for name in ("cafe_pcap_path", "public_pcap_path"):
+        importlib.reload(g)
+        g.hw = MockHW()
+        _replay_pcap(request.getfixturevalue(name), g.hw, g)
+        states[name] = _connection_state(g)
+    importlib.reload(g)
+    g.hw = mock_hw
+    return states
+
+
+class TestSession:
+    def test_starts_from_declared_defaults_with_its_own_hw(self, clean_globals, mock_hw):
+        hw = MockHW()
+        clean_globals.received_handles[3] = b"\x00\x2a"
+        clean_globals.att_mtu = 247
+        session = BG_session(hw)
+        assert session.hw is hw
+        assert session.att_mtu == 23
+        assert dict(session.received_handles) == {}
+        assert session.current_ll_ctrl_state is not clean_globals.current_ll_ctrl_state
+
+    def test_activation_swaps_state_in_and_back(self, clean_globals, mock_hw):
+        session = BG_session(MockHW())
+        with activated_session(session):
+            assert g.hw is session.hw
+            g.att_mtu = 100
+            g.received_handles[5] = b"\x01\x2a"
+            g.not_declared_in_globals = True
+        assert g.hw is mock_hw
+        assert g.att_mtu == 23
+        assert dict(g.received_handles) == {}
+        assert not hasattr(g, "not_declared_in_globals")
+        assert session.att_mtu == 100
+        assert dict(session.received_handles) == {5: b"\x01\x2a"}
+        # ... and it's all still there next time
+        with activated_session(session):
+            assert g.att_mtu == 100
+            assert g.not_declared_in_globals is True
+
+    def test_state_swapped_back_after_exit(self, clean_globals, mock_hw):
+        session = BG_session(MockHW())
+        with pytest.raises(SystemExit):
+            with activated_session(session):
+                g.all_handles_read = True
+                raise SystemExit(0)
+        assert g.all_handles_read is False
+        assert session.all_handles_read is True
+
+    def test_ending_a_session_only_ends_that_session(self, clean_globals, mock_hw):
+        from BG_Helper_GATT import stateful_GATT_getter
+        from BG_Helper_Session import SessionFinished
+        (apple, other) = (BG_session(MockHW()), BG_session(MockHW()))
+        with activated_session(apple):
+            g.skip_apple = True
+        # No exit(): the handler just returns, with the session marked finished
+        with pytest.MonkeyPatch.context() as mp:
+            import BG_Helper_GATT
+            mp.setattr(BG_Helper_GATT, "detect_Apple_by_GATT_Manufacturer_Name", lambda *args: True)
+            assert stateful_GATT_getter(2, _ReplayPkt(b"\x01\x00"), session=apple) is None
+            assert stateful_GATT_getter(2, _ReplayPkt(b"\x01\x00"), session=other) is None
+        assert (apple.finished, apple.exit_code) == (True, 0x0A)
+        assert other.finished is False
+        # Without a session it's still a process exit with the same code
+        g.skip_apple = True
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(BG_Helper_GATT, "detect_Apple_by_GATT_Manufacturer_Name", lambda *args: True)
+            with pytest.raises(SystemExit) as e:
+                stateful_GATT_getter(2, _ReplayPkt(b"\x01\x00"))
+        assert isinstance(e.value, SessionFinished) and e.value.code == 0x0A
+
+    def test_no_session_uses_globals(self, clean_globals, mock_hw):
+        from BG_Helper_LL import stateful_LL_CTRL_outgoing_handler
+        stateful_LL_CTRL_outgoing_handler()
+        assert len(mock_hw.transmitted) > 0
+
+
+def test_interleaved_connections_match_separate_runs(request, reference_states, mock_hw):
+    sessions = {name: BG_session(MockHW()) for name in reference_states}
+    replays = [_replay_frames(request.getfixturevalue(name), session) for (name, session) in sessions.items()]
+    while replays:
+        for replay in list(replays):
+            if next(replay, StopIteration) is StopIteration:
+                replays.remove(replay)
+
+    for name, session in sessions.items():
+        assert _connection_state(session) == reference_states[name]
+    # Nothing of either connection was left behind in globals.py
+    assert g.hw is mock_hw
+    assert mock_hw.transmitted == []
+    assert dict(g.received_handles) == {}
+    assert g.all_handles_received_values == {}
@@ -0,0 +1,155 @@
+########################################
+# Created by Xeno Kovah
+# Copyright(c) © Dark Mentor LLC 2023-2026
+########################################
+
+"""Unit tests for Better_Getter.py's persistent worker mode (--worker-fd).
+
+central_app_launcher.py keeps one worker alive per BG dongle and feeds it
+one JSON argument list per target on stdin. The worker writes back one line
+per target holding the exit status a standalone `python3 Better_Getter.py`
+run would have returned — the launcher's bg_dongle_consecutive_failures /
+BG_FAST_FAIL_S handling depends on those codes being unchanged.
+
+Driven in-process against the same MockHW as test_cli.py, with
+hw.recv_and_decode() raising KeyboardInterrupt so every target ends through
+run_target()'s LL_TERMINATE_IND + end_connection(-1) path (status 0xFF).
+"""
+
+import io
+import json
+import os
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def worker_bg(monkeypatch, clean_globals, mock_hw):
+    """Better_Getter module with SniffleHW / PcapBleWriter patched out."""
+    import importlib
+    import Better_Getter as bg
+    importlib.reload(bg)
+
+    class _StubPcwriter:
+        def __init__(self, path):
+            self.path = path
+            self.packets = []
+            self.closed = False
+        def write_packet_message(self, pkt):
+            self.packets.append(pkt)
+        def close(self):
+            self.closed = True
+
+    monkeypatch.setattr(bg, "SniffleHW", lambda *a, **kw: mock_hw, raising=False)
+    monkeypatch.setattr(bg, "PcapBleWriter", _StubPcwriter, raising=False)
+
+    def _kbint():
+        raise KeyboardInterrupt
+    mock_hw.recv_and_decode = _kbint
+    return bg
+
+
+@pytest.fixture
+def worker_sessions(worker_bg, monkeypatch):
+    """The BG_session of each target the worker runs, in order."""
+    sessions = []
+
+    class _RecordedSession(worker_bg.BG_session):
+        def __init__(self, hw=None):
+            super().__init__(hw)
+            sessions.append(self)
+
+    monkeypatch.setattr(worker_bg, "BG_session", _RecordedSession)
+    return sessions
+
+
+def _run_worker(bg, monkeypatch, targets):
+    """Run main() in worker mode over `targets` (list of argv lists, or raw
+    strings for malformed lines). Returns the list of reported exit codes."""
+    result_r, result_w = os.pipe()
+    lines = "".join((t if isinstance(t, str) else json.dumps(t)) + "\n" for t in targets)
+    monkeypatch.setattr(sys, "stdin", io.StringIO(lines))
+    monkeypatch.setattr(sys, "argv", ["Better_Getter.py", "-s", "/dev/ttyUSB0", f"--worker-fd={result_w}"])
+    bg.main()   # returns at EOF on stdin; closes result_w via its file object
+    with os.fdopen(result_r) as f:
+        return [int(line) for line in f.read().splitlines()]
+
+
+class TestExitStatus:
+    @pytest.mark.parametrize("code,expected", [
+        (None, 0), (0, 0), (-1, 0xFF), (-2, 0xFE), (0x0A, 0x0A), ("error", 1),
+    ])
+    def test_matches_standalone_process_exit_status(self, worker_bg, code, expected):
+        assert worker_bg.exit_status(code) == expected
+
+
+class TestWorkerProtocol:
+    def test_one_result_line_per_target(self, worker_bg, monkeypatch, mock_hw):
+        rcs = _run_worker(worker_bg, monkeypatch, [
+            ["-q", "-b=ca:fe:13:37:00:01", "-P", "-2"],
+            ["-q", "-b=ca:fe:13:37:00:02", "-2"],
+        ])
+        # Both targets ended via the KeyboardInterrupt → end_connection(-1) path
+        assert rcs == [0xFF, 0xFF]
+        assert [m[0] for m in mock_hw.mac_calls] == [
+            (0x01, 0x00, 0x37, 0x13, 0xfe, 0xca),
+            (0x02, 0x00, 0x37, 0x13, 0xfe, 0xca),
+        ]
+
+    def test_each_target_gets_a_fresh_session(self, worker_bg, worker_sessions, monkeypatch, clean_globals, mock_hw):
+        _run_worker(worker_bg, monkeypatch, [
+            ["-q", "-b=ca:fe:13:37:00:01", "-P", "-2", "-A"],
+            ["-b=ca:fe:13:37:00:02"],
+        ])
+        (first, second) = worker_sessions
+        assert first.target_bdaddr == "ca:fe:13:37:00:01"
+        assert first.skip_apple is True
+        # Nothing from the first target's flags leaks into the second
+        assert second.target_bdaddr == "ca:fe:13:37:00:02"
+        assert second.target_bdaddr_type_public is False
+        assert second.skip_apple is False
+        assert second.attempt_2M_PHY_update is False
+        assert second.verbose is True
+        assert second.current_ll_ctrl_state.supported_PHYs == 0x1
+        # ...but the open sniffer is kept
+        assert first.hw is second.hw is mock_hw
+        # ...and the worker's own globals.py is never touched
+        assert clean_globals.target_bdaddr == ""
+        assert clean_globals.skip_apple is False
+        assert clean_globals.hw is mock_hw
+
+    def test_pcap_writer_closed_after_each_target(self, worker_bg, worker_sessions, monkeypatch, tmp_path):
+        out_path = str(tmp_path / "out.pcap")
+        _run_worker(worker_bg, monkeypatch, [["-b=ca:fe:13:37:00:01", f"-o={out_path}"]])
+        (session,) = worker_sessions
+        assert session.pcwriter.path == out_path
+        assert session.pcwriter.closed is True
+
+    def test_each_target_appends_to_its_own_stdout_log(self, worker_bg, monkeypatch, tmp_path, capfd):
+        def _run_target(args):
+            os.write(1, f"connecting to {args.bdaddr}\n".encode())
+            worker_bg.end_connection(-1)
+        monkeypatch.setattr(worker_bg, "run_target", _run_target)
+        (first_log, second_log) = (tmp_path / "first.log", tmp_path / "second.log")
+        first_log.write_text("earlier run\n")
+        rcs = _run_worker(worker_bg, monkeypatch, [
+            ["-b=ca:fe:13:37:00:01", f"--stdout-log={first_log}"],
+            ["-b=ca:fe:13:37:00:02", f"--stdout-log={second_log}"],
+            ["-b=ca:fe:13:37:00:03"],
+        ])
+        assert rcs == [0xFF, 0xFF, 0xFF]
+        assert first_log.read_text() == "earlier run\nconnecting to ca:fe:13:37:00:01\n"
+        assert second_log.read_text() == "connecting to ca:fe:13:37:00:02\n"
+        # Without one it's the worker's own stdout again
+        assert capfd.readouterr().out == "connecting to ca:fe:13:37:00:03\n"
+
+    def test_bad_target_lines_do_not_kill_worker(self, worker_bg, monkeypatch, capsys):
+        rcs = _run_worker(worker_bg, monkeypatch, [
+            ["-c", "40", "-b=ca:fe:13:37:00:01"],   # argparse rejection
+            "not json",
+            [],                                      # no -b
+            ["-b=ca:fe:13:37:00:01"],
+        ])
+        assert rcs == [2, 2, 0, 0xFF]
+        assert "Must specify target BDADDR address" in capsys.readouterr().err
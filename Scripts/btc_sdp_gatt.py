@@ -1012,7 +1012,8 @@ def write_sdp_btides(out_path, bdaddr_colon, sdp_pdu_entries):
 
     TME.TME_glob.BTIDES_JSON = existing
     rebuild_SingleBDADDR_index()
-    write_BTIDES(out_path)
+    # Only this device's entry changed; the rest were validated when the file was last written
+    write_BTIDES(out_path, changed_entries=[base])
     qprint(f"  Wrote {len(sdp_pdu_entries)} SDP PDUs ({appended} new) -> {out_path}")
 
 
@@ -1032,7 +1033,8 @@ def write_gatt_btides(out_path, bdaddr_colon, gatt_services):
 
     TME.TME_glob.BTIDES_JSON = existing
     rebuild_SingleBDADDR_index()
-    write_BTIDES(out_path)
+    # Only this device's entry changed; the rest were validated when the file was last written
+    write_BTIDES(out_path, changed_entries=[base])
     qprint(f"  Wrote GATT snapshot ({new_svcs} new svc, {new_chars} new chars) -> {out_path}")
 
 
@@ -22,6 +22,11 @@ import subprocess
 import threading
 import time
 import glob
+import heapq
+import itertools
+import json
+import select
+import signal
 from queue import Queue
 from subprocess import TimeoutExpired
 import traceback
@@ -41,7 +46,9 @@ Sniffle_thread_enabled = True
 
 lmp2thprint_enabled = True # When True, the BTC worker runs DarkFirmware_VSC_LMP (BlueZ Realtek-VSC) against discovered BR/EDR devices to capture LMP PDUs. The legacy ESP32 Braktooth + FTDI path has been removed.
 better_getter_enabled = True
+better_getter_persistent_workers = True # When True, each BG dongle gets one long-lived Better_Getter.py worker process that is handed targets one at a time, instead of a fresh python3 cold start + serial open per BLE target. Flip to False to go back to one Better_Getter.py process per target.
 better_getter_skip_apple = True # When True, every Better_Getter.py launch gets -A (skip-apple), so BG early-exits (rc 0x0A) the moment it confirms an Apple device via Advertisement Company ID, LL_VERSION_IND, or the GATT Manufacturer Name. Belt-and-suspenders with the discovery-time APPLE_COMPANY_ID deprioritization below: a deprioritized Apple device that still reaches a BG launch via the fallback path won't waste a full ~20s enumeration timeout. Flip to False to fully enumerate Apple devices.
+better_getter_gatt_hash_cache = False # When True, every Better_Getter.py launch gets --gatt-hash-cache, so BG reads the GATT Database Hash (0x2B2A) first, and skips GATT discovery for any device whose hash it has already enumerated (or that Analysis/Export_GATT_DB_hash_cache.py exported from the database). Off by default because the cached structure only ends up in the GATTPRINT CSV, not in the BG pcap.
 sdptool_enabled = False    # Legacy SDP path via the custom bluez-5.66 sdptool binary. Kept as a toggleable fallback for diagnostics; superseded by btc_sdp_gatt_enabled below.
 btc_sdp_gatt_enabled = True # When True, runs Scripts/btc_sdp_gatt.py for SDP enumeration plus GATT-over-BR/EDR enumeration via BlueZ kernel L2CAP sockets. Enable this OR sdptool_enabled, not both — they probe the same target on the same hci adapter and would race.
 
@@ -129,6 +136,7 @@ default_cwd = f"{REPO_ROOT}/"
 
 BG_exec_path = str(REPO_ROOT / "Scripts/BG/Better_Getter.py")
 BG_output_pcap_path = str(REPO_ROOT / "Logs/BetterGetter")
+BG_gatt_hash_cache_path = str(REPO_ROOT / "Logs/BetterGetter/GATT_DB_hash_cache.json")
 
 sdptool_exec_path = str(REPO_ROOT / "bluez-5.66/tools/sdptool")
 sdptool_log_path = str(REPO_ROOT / "Logs/sdptool")
@@ -160,11 +168,130 @@ sniffle_pcap_log_folder = str(REPO_ROOT / "Logs/sniffle")
 for _d in (BG_output_pcap_path, sdptool_log_path, btides_lmp_dir, sniffle_pcap_log_folder, btc_sdp_gatt_log_dir):
     os.makedirs(_d, exist_ok=True)
 
+##################################################
+# Target priority queues
+##################################################
+
+# ble_bdaddrs / btc_bdaddrs map bdaddr -> (address type, RSSI), and double as the
+# priority queues that the BLE and BTC worker threads take their next target from.
+# The workers used to re-sort the whole dict under its lock on every loop through
+# it, which with thousands of advertisers around dominated the CPU and kept the
+# D-Bus callbacks waiting on the lock. Instead every write to the dict keeps a heap
+# up to date, so handing out the next target is O(log n).
+#
+# The workers still go through the targets in passes, the same as the old sorted
+# snapshot: start_pass() queues every current bdaddr, and pop_next() hands each one
+# out once, best target_priority() first. A bdaddr added mid-pass joins the current
+# pass, and one updated (e.g. new RSSI) before being handed out is re-keyed in place.
+# Updates to one that was already handed out this pass take effect next pass.
+#
+# Like the plain dicts they replaced, these must only be accessed with the matching
+# ble_bdaddrs_lock / btc_bdaddrs_lock held.
+#
+# The workers also block on them between passes, instead of sleep-polling: anything
+# that may give a worker something new to do (a new bdaddr, or a finished
+# ApplicationThread freeing up a dongle or an in-flight bdaddr) calls notify_work(),
+# and wait_for_work() sleeps on a Condition built on the same lock until it does.
+class TargetQueue(dict):
+    def __init__(self, priority, lock):
+        super().__init__()
+        # priority(bdaddr, (atype, rssi)) returns the sort key, lowest first
+        self._priority = priority
+        self._heap = []
+        self._queued = {} # bdaddr -> its live heap entry
+        self._counter = itertools.count()
+        self._work_available = threading.Condition(lock)
+        self._work_generation = 0
+
+    def _entry(self, bdaddr, value):
+        # The unique counter breaks ties, so bdaddrs are never compared
+        return [self._priority(bdaddr, value), next(self._counter), bdaddr]
+
+    def _push(self, bdaddr, value):
+        entry = self._entry(bdaddr, value)
+        self._queued[bdaddr] = entry
+        heapq.heappush(self._heap, entry)
+        # Stale entries are only dropped once they reach the top of the heap, so don't
+        # let a burst of RSSI updates during a long pass grow the heap without bound.
+        if(len(self._heap) > 2 * len(self._queued) + 64):
+            self._heap = list(self._queued.values())
+            heapq.heapify(self._heap)
+
+    def _unqueue(self, bdaddr):
+        entry = self._queued.pop(bdaddr, None)
+        if(entry is not None):
+            entry[2] = None # Mark stale
+
+    def __setitem__(self, bdaddr, value):
+        is_new = bdaddr not in self
+        super().__setitem__(bdaddr, value)
+        if(is_new or bdaddr in self._queued):
+            self._unqueue(bdaddr)
+            self._push(bdaddr, value)
+        if(is_new):
+            self.notify_work()
+
+    def __delitem__(self, bdaddr):
+        super().__delitem__(bdaddr)
+        self._unqueue(bdaddr)
+
+    def pop(self, bdaddr, *default):
+        self._unqueue(bdaddr)
+        return super().pop(bdaddr, *default)
+
+    # Queue every current bdaddr for a new pass. Returns how many were queued.
+    def start_pass(self):
+        priority = self._priority
+        counter = self._counter
+        self._heap = [[priority(bdaddr, value), next(counter), bdaddr] for (bdaddr, value) in self.items()]
+        heapq.heapify(self._heap)
+        self._queued = {entry[2]: entry for entry in self._heap}
+        return len(self._heap)
+
+    # Number of bdaddrs still waiting to be handed out this pass
+    def queued_count(self):
+        return len(self._queued)
+
+    # Returns the highest priority bdaddr not yet handed out this pass, or None at the end of the pass
+    def pop_next(self):
+        while self._heap:
+            bdaddr = heapq.heappop(self._heap)[2]
+            if(bdaddr is not None):
+                del self._queued[bdaddr]
+                return bdaddr
+        return None
+
+    # Wake up the worker waiting in wait_for_work(), if any
+    def notify_work(self):
+        self._work_generation += 1
+        self._work_available.notify_all()
+
+    # Opaque token to hand to wait_for_work(), taken at the start of a pass
+    def work_generation(self):
+        return self._work_generation
+
+    # Block until there is at least one bdaddr, and if since_generation is given, until
+    # notify_work() has been called since work_generation() returned it. (I.e. until
+    # something changed since a pass that couldn't launch anything, such as one where
+    # every bdaddr already had a BG run in flight.)
+    def wait_for_work(self, since_generation=None, timeout=None):
+        return self._work_available.wait_for(lambda: len(self) > 0 and self._work_generation != since_generation, timeout)
+
+# Sort key for TargetQueue: fewest connection attempts first, then strongest RSSI,
+# then most recently heard from. Recency is keyed as the time until a fixed date far
+# in the future, since subtracting datetimes is much cheaper than .timestamp().
+_TARGET_PRIORITY_EPOCH = datetime.datetime(9999, 1, 1)
+_TARGET_PRIORITY_NEVER_SEEN = _TARGET_PRIORITY_EPOCH - datetime.datetime.min
+def target_priority(bdaddr, value):
+    last_seen = device_last_seen.get(bdaddr)
+    return (device_connect_attempts.get(bdaddr, 0), -value[1],
+            _TARGET_PRIORITY_EPOCH - last_seen if last_seen is not None else _TARGET_PRIORITY_NEVER_SEEN)
+
 # Define a dictionary to store BDADDRs and their RSSI values
-ble_bdaddrs = {}
 ble_bdaddrs_lock = threading.Lock()
-btc_bdaddrs = {}
+ble_bdaddrs = TargetQueue(target_priority, ble_bdaddrs_lock)
 btc_bdaddrs_lock = threading.Lock()
+btc_bdaddrs = TargetQueue(target_priority, btc_bdaddrs_lock)
 ble_deprioritized_bdaddrs = {}
 ble_deprioritized_bdaddrs_lock = threading.Lock()
 btc_deprioritized_bdaddrs = {}
@@ -532,8 +659,8 @@ class ApplicationThread(threading.Thread):
 
     def _release_bg_dongle(self):
         global _last_bg_uhubctl_cycle_at
-        # Drop the in-flight marker first so a re-iteration of sorted_ble_bdaddrs
-        # can pick this bdaddr up again on its next pass. Safe to do unconditionally —
+        # Drop the in-flight marker first so a later pass through ble_bdaddrs
+        # can pick this bdaddr up again. Safe to do unconditionally —
         # discard() is a no-op for already-absent entries, e.g. non-GATT info_types
         # (LMP2thprint / SDP / BTC_SDP_GATT / Sniffle) which never set the marker.
         if self.info_type == "GATT" and self.bdaddr is not None:
@@ -548,6 +675,9 @@ class ApplicationThread(threading.Thread):
                 # happens to be the one handed out.
                 consec = bg_dongle_consecutive_failures.get(self.bg_dongle_path, 0)
                 tprint(f"BG: {self.bg_dongle_path} likely wedged ({consec} consecutive failures); running usbreset before re-queueing")
+                # The persistent worker's serial port handle won't survive the reset;
+                # the next target on this dongle starts a fresh worker.
+                close_bg_worker(self.bg_dongle_path)
                 ok = _usbreset_dongle(self.bg_dongle_path)
                 if not ok:
                     # usbreset failing typically means the cp210x has fully detached
@@ -584,6 +714,11 @@ class ApplicationThread(threading.Thread):
                 bg_dongle_consecutive_failures[self.bg_dongle_path] = 0
             bg_dongle_queue.put(self.bg_dongle_path)
             if(print_verbose): tprint(f"Released BG dongle {self.bg_dongle_path} back to queue")
+        # The bdaddr is no longer in flight and its dongle is free again, so wake up the
+        # BLE worker if it's waiting after a pass where it couldn't launch anything.
+        if self.info_type == "GATT":
+            with ble_bdaddrs_lock:
+                ble_bdaddrs.notify_work()
 
     def run(self):
         try:
@@ -652,11 +787,15 @@ class ApplicationThread(threading.Thread):
                        #   * consecutive >= BG_CONSECUTIVE_FAILURE_THRESHOLD — repeated
                        #     non-zero exits on the same dongle regardless of timing,
                        #     covering wedges that don't fit the fast-fail signature.
+                       #   A persistent BG worker that was already running has no cold start
+                       #   or serial open left to fail fast on, so only targets that
+                       #   (re)started the worker are held to the elapsed-time leg.
                        if self.bg_dongle_path is not None:
                            elapsed_s = (datetime.datetime.now() - self.started_at).total_seconds()
+                           fast_fail = elapsed_s < BG_FAST_FAIL_S and getattr(self.process, "cold_start", True)
                            consecutive = bg_dongle_consecutive_failures.get(self.bg_dongle_path, 0) + 1
                            bg_dongle_consecutive_failures[self.bg_dongle_path] = consecutive
-                           if elapsed_s < BG_FAST_FAIL_S or consecutive >= BG_CONSECUTIVE_FAILURE_THRESHOLD:
+                           if fast_fail or consecutive >= BG_CONSECUTIVE_FAILURE_THRESHOLD:
                                self._bg_dongle_needs_usbreset = True
                     elif(self.info_type == "LMP2thprint"):
                        external_log_write(btc2thprint_log_path, f"BTC_2THPRINT: FAILURE 0x{retCode:02x} FOR: {self.bdaddr} {datetime.datetime.now()}")
@@ -743,6 +882,179 @@ def launch_application(cmd, target_cwd, stdout=None):
 
     return process
 
+##################################################
+# Persistent Better_Getter.py workers
+##################################################
+#
+# Launching a fresh `python3 Better_Getter.py` per BLE target costs a Python
+# interpreter cold start, every BG module import, and a serial port open each
+# time — several seconds on a Pi, which is a large fraction of the 20s budget
+# per target. Instead we keep one `Better_Getter.py --worker-fd` process alive
+# per BG dongle, and hand it one target at a time over its stdin. The worker
+# writes back one line per target holding the exit code a standalone run would
+# have returned, so ApplicationThread's success/failure handling is unchanged.
+#
+# A worker that dies (serial I/O error, uncaught exception) is simply started
+# again for the next target on that dongle.
+
+# Keyed by BG dongle path. Only touched by whoever currently holds that path
+# from bg_dongle_queue, the same serialization bg_dongle_consecutive_failures relies on.
+bg_workers = {}
+# How long an aborted (timed out) target gets to send LL_TERMINATE_IND and report
+# back before the whole worker is killed.
+BG_WORKER_ABORT_S = 2.0
+
+class BGWorker:
+    def __init__(self, dongle_path):
+        self.dongle_path = dongle_path
+        self.process = None
+        self.result_fd = None
+        self.result_buf = b""
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def _spawn(self, stdout):
+        result_r, result_w = os.pipe()
+        # -u for unbuffered python output (so it streams to log realtime)
+        cmd = ["python3", "-u", BG_exec_path, f"-s={self.dongle_path}", f"--worker-fd={result_w}"]
+        try:
+            self.process = subprocess.Popen(cmd, cwd=default_cwd, stdin=subprocess.PIPE, stdout=stdout, pass_fds=(result_w,))
+        finally:
+            os.close(result_w)
+        self.result_fd = result_r
+        self.result_buf = b""
+        print(f"PID: {self.process.pid}: central_app_launcher.py: launched {cmd}")
+
+    # Returns a BGWorkerTarget, or raises like launch_application's Popen() would
+    def submit(self, target_args, stdout):
+        cold_start = False
+        if not self.alive():
+            self.close()
+            self._spawn(stdout)
+            cold_start = True
+        try:
+            self.process.stdin.write((json.dumps(target_args) + "\n").encode("utf-8"))
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            # Died between the alive() check and the write; one fresh start
+            self.close()
+            self._spawn(stdout)
+            cold_start = True
+            self.process.stdin.write((json.dumps(target_args) + "\n").encode("utf-8"))
+            self.process.stdin.flush()
+        return BGWorkerTarget(self, cold_start)
+
+    # Returns the next result line's exit code, None if nothing arrived within timeout,
+    # or the worker's own exit code if it died instead of answering
+    def read_result(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while b"\n" not in self.result_buf:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.result_fd], [], [], remaining)
+            if not ready:
+                return None
+            chunk = os.read(self.result_fd, 64)
+            if not chunk:
+                self.process.wait()
+                rc = self.process.returncode
+                self.close()
+                return rc
+            self.result_buf += chunk
+        line, self.result_buf = self.result_buf.split(b"\n", 1)
+        return int(line)
+
+    def close(self):
+        if self.process is not None:
+            if self.process.poll() is None:
+                try:
+                    self.process.stdin.close()
+                except OSError:
+                    pass
+                try:
+                    self.process.wait(BG_WORKER_ABORT_S)
+                except TimeoutExpired:
+                    self.process.kill()
+                    self.process.wait() # This avoids defunct processes on Ubuntu 24.04
+            self.process = None
+        if self.result_fd is not None:
+            os.close(self.result_fd)
+            self.result_fd = None
+        self.result_buf = b""
+
+# The subset of the Popen interface ApplicationThread uses, for one target on a BGWorker
+class BGWorkerTarget:
+    def __init__(self, worker, cold_start):
+        self.worker = worker
+        self.pid = worker.process.pid
+        self.returncode = None
+        # True if this target paid for the worker's interpreter start and serial open,
+        # which is what the BG_FAST_FAIL_S heuristic is looking at.
+        self.cold_start = cold_start
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            rc = self.worker.read_result(timeout)
+            if rc is None:
+                raise TimeoutExpired(self.worker.dongle_path, timeout)
+            self.returncode = rc
+        return self.returncode
+
+    # Abort the current target the way Ctrl-C on a standalone run would (LL_TERMINATE_IND,
+    # exit(-1)), keeping the worker if it reports back in time. Otherwise kill it outright.
+    def kill(self):
+        if self.returncode is not None:
+            return
+        if self.worker.alive():
+            self.worker.process.send_signal(signal.SIGINT)
+            rc = self.worker.read_result(BG_WORKER_ABORT_S)
+            if rc is not None:
+                self.returncode = rc
+                return
+            self.worker.process.kill()
+        self.worker.close()
+        self.returncode = -signal.SIGKILL
+
+def launch_better_getter(bg_dongle_path, target_args, stdout=None):
+    if not better_getter_persistent_workers:
+        return launch_application(["python3", "-u", BG_exec_path, f"-s={bg_dongle_path}"] + target_args, default_cwd, stdout=stdout)
+    worker = bg_workers.get(bg_dongle_path)
+    if worker is None:
+        worker = BGWorker(bg_dongle_path)
+        bg_workers[bg_dongle_path] = worker
+    # The worker's stdout was fixed when it was spawned, so tell it where this target's output goes
+    if(stdout is not None and hasattr(stdout, "name")):
+        target_args = target_args + [f"--stdout-log={stdout.name}"]
+    try:
+        process = worker.submit(target_args, stdout)
+        print(f"PID: {process.pid}: central_app_launcher.py: sent BG worker {target_args}")
+    except BlockingIOError as e:
+        print(f"launch_better_getter: Caught BlockingIOError while launching BG worker: {e}")
+        # Same unrecoverable fork() failure launch_application handles
+        force_reboot()
+        return None
+    except OSError as e:
+        # Spawning the worker or writing to its pipes failed even after a fresh start
+        print(f"launch_better_getter: Caught an I/O error while launching BG worker: {e}")
+        close_bg_worker(bg_dongle_path)
+        force_reboot()
+        return None
+    except Exception as e:
+        # Anything else is a problem with this one target, not the system. Drop the
+        # worker (it may be half-way through a command) and let the next target start a fresh one.
+        print(f"launch_better_getter: Caught an exception while launching BG worker: {e}")
+        close_bg_worker(bg_dongle_path)
+        return None
+    return process
+
+def close_bg_worker(bg_dongle_path):
+    worker = bg_workers.pop(bg_dongle_path, None)
+    if worker is not None:
+        worker.close()
+
 def force_reboot():
     print(f"UNRECOVERABLE ERROR. REBOOTING at {datetime.datetime.now()}")
     time.sleep(30) # TODO: for testing only. Deleteme
@@ -1113,10 +1425,10 @@ def _device_props_changed(path, changed):
                     (atype, rssi, _vendor) = ble_deprioritized_bdaddrs.pop(bdaddr)
                     promoted_state = (atype, rssi)
         if promoted_state is not None:
-            with btc_bdaddrs_lock:
-                btc_bdaddrs[bdaddr] = promoted_state
             device_connect_attempts[bdaddr] = 0
             device_total_attempts.setdefault(bdaddr, 0)
+            with btc_bdaddrs_lock:
+                btc_bdaddrs[bdaddr] = promoted_state
             if(BTC_thread_enabled): print(f"[PROMOTE BLE->BTC] {bdaddr} (atype={promoted_state[0]}, rssi={promoted_state[1]})")
 
     # RSSI update
@@ -1333,7 +1645,7 @@ def reprioritize_ble_bdaddr(bdaddr):
                 print(f"Reprioritized {type} {bdaddr} ({rssi})")
 
 def reprioritize_btc_bdaddr(bdaddr):
-    with ble_bdaddrs_lock:
+    with btc_bdaddrs_lock:
         type = ""
         rssi = -80
         with btc_deprioritized_bdaddrs_lock:
@@ -1348,18 +1660,28 @@ def ble_thread_function():
     global device_connect_attempts, device_total_attempts
     ble_external_tool_threads = []
     while True:
-        # Get the BDADDRs sorted in descending order of their RSSI, so we process higher RSSI first.
-        # Snapshot under lock to avoid 'dictionary changed size during iteration' against the
-        # D-Bus discovery callbacks which run on the asyncio main thread.
+        # Queue up all the current BDADDRs for one pass through them. pop_next() hands them out
+        # in target_priority() order, so we process the strongest RSSI first (among those with
+        # the fewest attempts so far). Only hold the lock per pop, so that the D-Bus discovery
+        # callbacks running on the asyncio main thread aren't kept waiting.
         with ble_bdaddrs_lock:
-            sorted_ble_bdaddrs = sorted(ble_bdaddrs.keys(), key=lambda x: ble_bdaddrs[x][1], reverse=True)
+            pass_size = ble_bdaddrs.start_pass()
+            pass_generation = ble_bdaddrs.work_generation()
 
         if(print_verbose):
-            print(f"Begin loop through sorted_ble_bdaddrs {datetime.datetime.now()}")
-            print(f"sorted_ble_bdaddrs = {sorted_ble_bdaddrs}")
+            print(f"Begin loop through ble_bdaddrs {datetime.datetime.now()}")
+            print(f"{pass_size} ble_bdaddrs queued")
 
         skip_count = int(0)
-        for bdaddr in sorted_ble_bdaddrs:
+        handed_out_count = int(0)
+        launched_count = int(0)
+        while True:
+            with ble_bdaddrs_lock:
+                bdaddr = ble_bdaddrs.pop_next()
+                remaining_count = ble_bdaddrs.queued_count()
+            if(bdaddr is None):
+                break
+            handed_out_count += 1
             # Skip devices that may be traveling with us, to not waste time on them
             # Only try collecting data from a given bd_addr max_connect_attempts times before skipping forever thereafter
             # This is so that we don't waste time trying to get info from something that will never give it to us,
@@ -1373,12 +1695,12 @@ def ble_thread_function():
                         print(f"BLE: Max connect attempts exceeded for {bdaddr}, skipping")
                 skip_count += 1
                 if(print_skipped):
-                    print(f"BLE: skip_count = {skip_count} of {len(sorted_ble_bdaddrs)}")
+                    print(f"BLE: skip_count = {skip_count} of {handed_out_count + remaining_count}")
 
                 # Delete it otherwise it will just keep coming up over and over again in the while True loop
                 locked_delete_from_dict(ble_bdaddrs, ble_bdaddrs_lock, bdaddr)
 
-                if(skip_count == len(sorted_ble_bdaddrs) and len(ble_deprioritized_bdaddrs) > 0):
+                if(skip_count == handed_out_count and remaining_count == 0 and len(ble_deprioritized_bdaddrs) > 0):
                     print("BLE: Everything's being skipped. We could go ahead and do some deprioritized bdaddrs now...")
                     # Only fall back onto deprioritized bdaddrs that we've still been
                     # hearing adverts from in the last DEPRIORITIZED_RECENCY_S seconds.
@@ -1424,8 +1746,8 @@ def ble_thread_function():
                     if(print_verbose): tprint(f"BLE: Acquired BG dongle {bg_dongle_path} for {bdaddr}")
 
                     # Single-attempt-per-bdaddr gate. If another worker is already
-                    # running a BG against this bdaddr (which happens when the outer
-                    # while-loop re-iterates a small ble_bdaddrs while the previous
+                    # running a BG against this bdaddr (which happens when the next
+                    # pass re-queues a small ble_bdaddrs while the previous
                     # BG is still in flight), release the dongle and move on. Without
                     # this gate the NYC capture observed up to 6 parallel BG inits on
                     # one target — only one can win the CONNECT_IND race, the rest
@@ -1453,21 +1775,21 @@ def ble_thread_function():
                             current_time = datetime.datetime.now()
                             launch_time = current_time.strftime('%Y-%m-%d-%H-%M-%S')
                             pcap_output = f"-o={BG_output_pcap_path}/{launch_time}_{bdaddr}_BG_{hostname}.pcap"
-                            serial_port = f"-s={bg_dongle_path}"
-                            # -u for unbuffered python output (so it streams to log realtime)
                             if(type != "random"):
-                                gatt_cmd = ["python3", "-u", BG_exec_path, "-q", serial_port, pcap_output, f"-b={bdaddr}", "-P", "-2"]
+                                gatt_args = ["-q", pcap_output, f"-b={bdaddr}", "-P", "-2"]
                             else:
-                                gatt_cmd = ["python3", "-u", BG_exec_path, "-q", serial_port, pcap_output, f"-b={bdaddr}", "-2"]
+                                gatt_args = ["-q", pcap_output, f"-b={bdaddr}", "-2"]
                             # Skip-apple: BG will early-exit (rc 0x0A) on confirmed Apple devices.
                             if(better_getter_skip_apple):
-                                gatt_cmd.append("-A")
+                                gatt_args.append("-A")
+                            if(better_getter_gatt_hash_cache):
+                                gatt_args.append(f"--gatt-hash-cache={BG_gatt_hash_cache_path}")
                             try:
                                 if(sniffle_stdout_logging):
                                     sniffle_append_stdout = open(f"{BG_output_pcap_path}/Sniffle_stdout.log", "a")
                                 else:
                                     sniffle_append_stdout = open(f"/dev/null", "a")
-                                gatt_process = launch_application(gatt_cmd, default_cwd, stdout=sniffle_append_stdout)
+                                gatt_process = launch_better_getter(bg_dongle_path, gatt_args, stdout=sniffle_append_stdout)
                             except BlockingIOError as e:
                                 print(f"Caught BlockingIOError while launching GATT application: {e}") # This seems to be due to a rare error while attempting a fork() within Popen()
                                 # This doesn't seem to ever resolve itself for hours after it eventually occurs (which takes about 5 hours). So I need to just reboot to resolve it
@@ -1481,6 +1803,7 @@ def ble_thread_function():
                                 try:
                                     gatt_thread.start()
                                     launched_thread = gatt_thread
+                                    launched_count += 1
                                     ble_external_tool_threads.append(gatt_thread)
                                 except Exception as e:
                                     print(f"Caught an exception while starting GATT thread: {e}")
@@ -1502,15 +1825,24 @@ def ble_thread_function():
             # round-robin parallelism when MAX_BG > 1.
             ble_external_tool_threads = [t for t in ble_external_tool_threads if not t.is_terminated]
 
-        print(f"Finished one complete loop through sorted_ble_bdaddrs {datetime.datetime.now()}")
-
-        # Sleep-poll until the dictionary has entries to process before proceeding again.
-        # The original 'while ... pass' busy-wait was tolerable when the main thread blocked
-        # on inotify syscalls for discovery, but with the new asyncio D-Bus discovery loop
-        # running on the main thread it caused CPU starvation under the GIL — D-Bus signal
-        # callbacks couldn't run, ble_bdaddrs never got populated, and the worker spun forever.
-        while(len(ble_bdaddrs) == 0):
-            time.sleep(1)
+        print(f"Finished one complete loop through ble_bdaddrs {datetime.datetime.now()}")
+
+        # Block until there are entries to process before proceeding again. The original
+        # 'while ... pass' busy-wait was tolerable when the main thread blocked on inotify
+        # syscalls for discovery, but with the asyncio D-Bus discovery loop running on the
+        # main thread it caused CPU starvation under the GIL — D-Bus signal callbacks
+        # couldn't run, ble_bdaddrs never got populated, and the worker spun forever. The
+        # 1 second sleep-poll that replaced it still woke up the idle thread constantly,
+        # and left a new device waiting up to a second to be scheduled. Instead _device_added()
+        # (via TargetQueue.__setitem__) wakes us up as soon as there's a new bdaddr.
+        # If this pass couldn't launch anything (e.g. every bdaddr left already has a BG run
+        # in flight), starting another one straight away would just spin, so also wait for
+        # something to change: a new bdaddr, or an ApplicationThread finishing.
+        with ble_bdaddrs_lock:
+            if(launched_count == 0):
+                ble_bdaddrs.wait_for_work(since_generation=pass_generation)
+            else:
+                ble_bdaddrs.wait_for_work()
 
 
 ##################################################
@@ -1522,19 +1854,25 @@ def btc_thread_function():
     global device_connect_attempts, device_total_attempts
     btc_external_tool_threads = []
     while True:
-        # Get the BDADDRs sorted in descending order of their RSSI, so we process higher RSSI first.
-        # Snapshot under lock to avoid 'dictionary changed size during iteration' against the
-        # D-Bus discovery callbacks which run on the asyncio main thread.
+        # Queue up all the current BDADDRs for one pass through them, in target_priority() order.
+        # See ble_thread_function.
         with btc_bdaddrs_lock:
-            sorted_btc_bdaddrs = sorted(btc_bdaddrs.keys(), key=lambda x: btc_bdaddrs[x][1], reverse=True)
+            pass_size = btc_bdaddrs.start_pass()
 
         if(print_verbose):
-            print(f"Begin loop through sorted_btc_bdaddrs {datetime.datetime.now()}")
-            print(f"sorted_btc_bdaddrs = {sorted_btc_bdaddrs}")
+            print(f"Begin loop through btc_bdaddrs {datetime.datetime.now()}")
+            print(f"{pass_size} btc_bdaddrs queued")
             print(f"btc_deprioritized_bdaddrs = {btc_deprioritized_bdaddrs}")
 
         skip_count = 0
-        for bdaddr in sorted_btc_bdaddrs:
+        handed_out_count = 0
+        while True:
+            with btc_bdaddrs_lock:
+                bdaddr = btc_bdaddrs.pop_next()
+                remaining_count = btc_bdaddrs.queued_count()
+            if(bdaddr is None):
+                break
+            handed_out_count += 1
             # Skip devices that may be traveling with us, to not waste time on them
             # Only try collecting data from a given bd_addr max_connect_attempts times before skipping forever thereafter
             # This is so that we don't waste time trying to get info from something that will never give it to us,
@@ -1548,11 +1886,11 @@ def btc_thread_function():
                         print(f"BTC: Max connect attempts exceeded for {bdaddr}, skipping")
                 skip_count += 1
                 if(print_skipped):
-                    print(f"BTC: skip_count = {skip_count} of {len(sorted_btc_bdaddrs)}")
+                    print(f"BTC: skip_count = {skip_count} of {handed_out_count + remaining_count}")
                 # Delete it otherwise it will just keep coming up over and over again in the while True loop
                 locked_delete_from_dict(btc_bdaddrs, btc_bdaddrs_lock, bdaddr)
 
-                if(skip_count == len(sorted_btc_bdaddrs) and len(btc_deprioritized_bdaddrs) > 0):
+                if(skip_count == handed_out_count and remaining_count == 0 and len(btc_deprioritized_bdaddrs) > 0):
                     print("BTC: Everything's being skipped. We could go ahead and do some deprioritized bdaddrs now...")
                     print(btc_deprioritized_bdaddrs)
                     bdaddr = list(btc_deprioritized_bdaddrs.keys())[0] # Grab a single bdaddr
@@ -1722,10 +2060,10 @@ def btc_thread_function():
 
             #if(print_verbose): print(f"BTC Address: {bdaddr}")
 
-        print(f"Finished one complete loop through sorted_btc_bdaddrs {datetime.datetime.now()}")
-        # See ble_thread_function for why this sleep matters with the asyncio main loop.
-        while(len(btc_bdaddrs) == 0):
-            time.sleep(1)
+        print(f"Finished one complete loop through btc_bdaddrs {datetime.datetime.now()}")
+        # Block until _device_added() / _device_props_changed() add a bdaddr. See ble_thread_function.
+        with btc_bdaddrs_lock:
+            btc_bdaddrs.wait_for_work()
 
 ##################################################
 # Sniffle-handling thread
@@ -2168,9 +2506,13 @@ def sniffle_thread_function():
                     print(f"Caught an exception while starting Sniffle thread: {e}")
                     # This doesn't seem to ever resolve itself for hours after it eventually occurs (which takes about 5 hours). So I need to just reboot to resolve it
                     force_reboot()
-        # We have now launched threads for all available serial ports
+        # We have now launched threads for all available serial ports. Block until an
+        # ApplicationThread marks one available again. Waiting on the port status rather than
+        # a bare wait() means a notify() that lands while we're still in the loop above (e.g.
+        # in the post-usbreset backoff) isn't lost, leaving that port idle until some other
+        # port's sniffer happens to exit.
         with start_sniffle_threads_condition:
-            start_sniffle_threads_condition.wait()
+            start_sniffle_threads_condition.wait_for(lambda: any(status == 0 for status in serial_port_status.values()))
 
     # End while(True)
 